@@ -3,14 +3,21 @@ Additional route handlers for Phase 6B features.
 """
 
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import io
 from datetime import datetime
 import os
 
 from storage.sqlite import SQLiteRepository
+from storage.backup import (
+    backup_database, backup_filename, backup_jobs, compression_of, is_backup_file,
+    restore_database, zstd_available
+)
+from storage.integrity import cached_results, summarize
+from storage.journal import export_delta, parse_delta_filename
 from .dependencies import get_repository
 
 router = APIRouter()
@@ -81,63 +88,106 @@ async def get_depth_anomalies(
         )
 
 
-@router.post("/backup")
+@router.post("/backup", status_code=status.HTTP_202_ACCEPTED)
 async def create_backup(
+    response: Response,
+    compression: str = Query("none", pattern="^(none|gzip|zstd)$"),
+    wait: bool = Query(False, description="Block until the backup has finished"),
     repo: SQLiteRepository = Depends(get_repository)
 ):
-    """Create a backup of the database."""
-    try:
-        import subprocess
-        import os
-        from datetime import datetime
-        
-        # Get database path from repository
-        db_path = repo._db_path
-        if not os.path.exists(db_path):
+    """
+    Start an online backup of the database.
+
+    The copy runs on a background thread through the SQLite backup API; poll
+    ``GET /backup/jobs/{job_id}`` for progress (202). With ``wait=true`` the
+    response is returned once the backup (and its quick_check) has finished,
+    as 200 with the final job state.
+    """
+    db_path = repo._db_path
+    if not os.path.exists(db_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Database file not found"
+        )
+    if compression == "zstd" and not zstd_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="zstandard required for zstd backups"
+        )
+
+    backup_dir = os.path.join(os.path.dirname(db_path), "backups")
+    backup_path = os.path.join(backup_dir, backup_filename(compression))
+    job = backup_jobs.start(db_path, backup_path, compression)
+
+    if wait:
+        await run_in_threadpool(job.done.wait)
+        if job.state == "failed":
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Database file not found"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create backup: {job.error}"
             )
-        
-        # Create backup directory if it doesn't exist
-        backup_dir = os.path.join(os.path.dirname(db_path), "backups")
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        # Generate backup filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"lorien_backup_{timestamp}.db"
-        backup_path = os.path.join(backup_dir, backup_filename)
-        
-        # Copy database file
-        import shutil
-        shutil.copy2(db_path, backup_path)
-        
-        # Run integrity check
-        integrity_result = repo.check_integrity()
-        
-        return {
-            "ok": True,
-            "path": backup_path,
-            "integrity": integrity_result
-        }
-    except Exception as e:
+        response.status_code = status.HTTP_200_OK
+
+    info = job.to_dict()
+    return {
+        "ok": True,
+        "job_id": job.id,
+        "state": info["state"],
+        "path": backup_path,
+        "integrity": (job.result or {}).get("integrity"),
+        "job": info
+    }
+
+
+@router.get("/backup/jobs/{job_id}")
+async def get_backup_job(job_id: str):
+    """Progress and result of a backup job."""
+    job = backup_jobs.get(job_id)
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create backup: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Backup job {job_id} not found"
         )
+    return job.to_dict()
+
+
+@router.post("/backup/delta")
+async def create_delta_backup(
+    compression: str = Query("gzip", pattern="^(none|gzip|zstd)$"),
+    repo: SQLiteRepository = Depends(get_repository)
+):
+    """
+    Export journal entries written since the last full or delta backup.
+
+    Returns ``path: null`` when nothing changed; 409 if no full backup has
+    been taken on the current journal timeline yet.
+    """
+    if compression == "zstd" and not zstd_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="zstandard required for zstd backups"
+        )
+    backup_dir = os.path.join(os.path.dirname(repo._db_path), "backups")
+    try:
+        result = await run_in_threadpool(export_delta, repo._db_path, backup_dir, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"ok": True, **result}
 
 
 @router.post("/restore")
 async def restore_backup(
+    filename: Optional[str] = Query(None, description="Backup file in backups/; defaults to the latest"),
+    with_deltas: bool = Query(False, description="Replay delta backups taken after the full backup"),
     repo: SQLiteRepository = Depends(get_repository)
 ):
-    """Restore from the latest backup."""
+    """
+    Restore a backup into the live database without stopping the server.
+
+    The backup is validated on a staging copy first; the swap itself is one
+    backup-API step into the open database, reported as ``downtime_ms``.
+    """
     try:
-        import subprocess
-        import os
-        from datetime import datetime
-        
-        # Get database path from repository
         db_path = repo._db_path
         backup_dir = os.path.join(os.path.dirname(db_path), "backups")
         
@@ -147,43 +197,52 @@ async def restore_backup(
                 detail="No backup directory found"
             )
         
-        # Find latest backup file
-        backup_files = []
-        for file in os.listdir(backup_dir):
-            if file.startswith("lorien_backup_") and file.endswith(".db"):
-                backup_files.append(file)
+        # Plain and compressed backups share the timestamped name, so name order is age order
+        backup_files = sorted((f for f in os.listdir(backup_dir) if is_backup_file(f)), reverse=True)
+        if filename is not None:
+            if filename not in backup_files:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Backup {filename} not found"
+                )
+            backup_files = [filename]
         
         if not backup_files:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No backup files found"
             )
+        backup_path = os.path.join(backup_dir, backup_files[0])
         
-        # Sort by timestamp and get latest
-        backup_files.sort(reverse=True)
-        latest_backup = backup_files[0]
-        backup_path = os.path.join(backup_dir, latest_backup)
-        
-        # Create a backup of current database before restore
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        current_backup = f"lorien_pre_restore_{timestamp}.db"
-        current_backup_path = os.path.join(backup_dir, current_backup)
+        # Snapshot the current database first (online, like POST /backup)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        current_backup_path = os.path.join(backup_dir, f"lorien_pre_restore_{timestamp}.db")
+        # Not a delta base: it must not move or prune the journal
+        await run_in_threadpool(backup_database, db_path, current_backup_path, checkpoint=False)
         
-        import shutil
-        shutil.copy2(db_path, current_backup_path)
-        
-        # Restore from backup
-        shutil.copy2(backup_path, db_path)
-        
-        # Run integrity check
-        integrity_result = repo.check_integrity()
+        deltas = [
+            os.path.join(backup_dir, f) for f in os.listdir(backup_dir) if parse_delta_filename(f)
+        ] if with_deltas else []
+        try:
+            result = await run_in_threadpool(restore_database, backup_path, db_path, deltas)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Backup rejected: {str(e)}"
+            )
         
         return {
             "ok": True,
             "path": backup_path,
             "pre_restore_backup": current_backup_path,
-            "integrity": integrity_result
+            "integrity": result["integrity"],
+            "deltas": result["deltas"],
+            "downtime_ms": result["downtime_ms"],
+            "validate_ms": result["validate_ms"],
+            "total_ms": result["total_ms"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -213,13 +272,14 @@ async def get_backup_status(
         # List available backups
         backup_files = []
         for file in os.listdir(backup_dir):
-            if file.startswith("lorien_backup_") and file.endswith(".db"):
+            if is_backup_file(file):
                 file_path = os.path.join(backup_dir, file)
                 stat = os.stat(file_path)
                 backup_files.append({
                     "filename": file,
                     "path": file_path,
                     "size_bytes": stat.st_size,
+                    "compression": compression_of(file),
                     "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
                     "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
                 })
@@ -227,11 +287,26 @@ async def get_backup_status(
         # Sort by creation time (newest first)
         backup_files.sort(key=lambda x: x["created"], reverse=True)
         
+        delta_files = []
+        for file in sorted(os.listdir(backup_dir)):
+            parsed = parse_delta_filename(file)
+            if parsed:
+                delta_files.append({
+                    "filename": file,
+                    "timeline": parsed[0],
+                    "seq_from": parsed[1],
+                    "seq_to": parsed[2],
+                    "size_bytes": os.path.getsize(os.path.join(backup_dir, file))
+                })
+        
         return {
             "backup_directory": backup_dir,
             "exists": True,
             "backups": backup_files,
-            "total_backups": len(backup_files)
+            "total_backups": len(backup_files),
+            "deltas": delta_files,
+            "jobs": [job.to_dict() for job in backup_jobs.list()[:10]],
+            "integrity": summarize(cached_results(db_path))
         }
     except Exception as e:
         raise HTTPException(
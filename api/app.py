@@ -9,7 +9,6 @@ import sqlite3
 import logging
 import os
 
-from .middleware.metrics_middleware import MetricsMiddleware
 
 # Deprecation response header helper
 def add_deprecation_headers(response):
@@ -52,6 +51,8 @@ from .routers.admin_root_audit_router import router as admin_root_audit_router
 from .routers.conflicts_root_router import router as conflicts_root_router
 from .routers.data_quality import router as data_quality_router
 from .routers.performance import router as performance_router
+from .routers.publish import router as publish_router
+from .routers.workbooks import router as workbooks_router
 from .routers.concurrency import router as concurrency_router
 from .routers.audit import router as audit_router
 from .routers.enhanced_audit import router as enhanced_audit_router
@@ -66,8 +67,9 @@ from .exceptions import (
     DecisionTreeAPIException, handle_value_error, handle_integrity_error,
     handle_decision_tree_api_exception
 )
-from .middleware import TelemetryMiddleware, AuthMiddleware
-from .middleware.enhanced_auth import EnhancedAuthMiddleware
+from .middleware.pipeline import RequestPipelineMiddleware
+from .middleware.read_only import ReadOnlyReplicaMiddleware
+from .middleware.workbook import WorkbookMiddleware
 from core.version import __version__
 
 # Create FastAPI app
@@ -95,6 +97,9 @@ else:
         "http://10.0.2.2"  # Android emulator
     ]
 
+# Refuse writes in read-only replica mode (inside CORS so the 405 carries its headers)
+app.add_middleware(ReadOnlyReplicaMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -103,17 +108,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add telemetry middleware (always present, but only active when analytics enabled)
-app.add_middleware(TelemetryMiddleware, analytics_enabled=False)  # Will check env at runtime
-
-# Add enhanced auth middleware (RBAC + ETag support)
-app.add_middleware(EnhancedAuthMiddleware)
-
-# Add legacy auth middleware (optional token-based authentication)
-app.add_middleware(AuthMiddleware, auth_token=os.getenv("AUTH_TOKEN"))
+# Metrics, auth (AUTH_TOKEN / RBAC + ETag) and telemetry in one plain ASGI layer.
+# Telemetry and write auth follow ANALYTICS_ENABLED / AUTH_TOKEN at runtime;
+# metrics are enabled when ANALYTICS_ENABLED=true at startup.
+app.add_middleware(
+    RequestPipelineMiddleware,
+    metrics_enabled=os.getenv("ANALYTICS_ENABLED", "false").lower() == "true",
+)
 
-# Add metrics middleware (enabled when ANALYTICS_ENABLED=true)
-app.add_middleware(MetricsMiddleware, enabled=os.getenv("ANALYTICS_ENABLED", "false").lower() == "true")
+# Resolve the workbook (outermost, so every layer sees the /w/{workbook} prefix stripped)
+app.add_middleware(WorkbookMiddleware)
 
 # Add exception handlers
 app.add_exception_handler(ValueError, handle_value_error)
@@ -277,9 +281,53 @@ app.include_router(vm_builder_router, prefix=API_PREFIX)
 app.include_router(large_workbook_router, prefix="")
 app.include_router(large_workbook_router, prefix=API_PREFIX)
 
+# Mount snapshot publishing router at both bare and versioned paths
+app.include_router(publish_router, prefix="")
+app.include_router(publish_router, prefix=API_PREFIX)
+
+# Mount workbook admin router at both bare and versioned paths
+app.include_router(workbooks_router, prefix="")
+app.include_router(workbooks_router, prefix=API_PREFIX)
+
 # Startup logging
 logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def _log_mount_prefix():
     logger.info("API mounted at %s", API_PREFIX)
+
+@app.on_event("startup")
+async def _start_maintenance():
+    from storage.integrity import integrity_scanner
+    from storage.maintenance import maintenance
+    from .dependencies import get_repository, replica_dir
+    if replica_dir():
+        return  # nothing to maintain on an immutable snapshot
+    db_path = get_repository().db_path
+    if maintenance.config.enabled:
+        maintenance.start(db_path)
+    if integrity_scanner.enabled:
+        integrity_scanner.start(db_path)
+
+@app.on_event("startup")
+async def _start_metrics_flush():
+    from .metrics import flush_interval, flusher, metrics_dir
+    if metrics_dir():
+        flusher.start(flush_interval())
+
+@app.on_event("shutdown")
+async def _stop_metrics_flush():
+    from .metrics import flusher
+    if flusher.running:
+        flusher.stop()
+
+@app.on_event("shutdown")
+async def _stop_maintenance():
+    from storage.integrity import integrity_scanner
+    from storage.maintenance import maintenance
+    from storage.slowlog import slow_queries
+    from storage.workbooks import workbooks
+    maintenance.stop()
+    integrity_scanner.stop()
+    workbooks.close_all()
+    slow_queries.close()
@@ -17,6 +17,8 @@ import uuid
 import asyncio
 from dataclasses import dataclass
 
+from storage import tracing
+
 logger = logging.getLogger(__name__)
 
 class ImportStatus(Enum):
@@ -289,7 +291,8 @@ class LargeWorkbookManager:
             self._update_chunk_status(chunk_id, "processing")
             
             # Process the chunk
-            result = self._process_chunk_data(chunk_data)
+            with tracing.span("import.chunk", chunk_id=chunk_id, rows=len(chunk_data)):
+                result = self._process_chunk_data(chunk_data)
             
             # Mark chunk as completed
             self._update_chunk_status(
@@ -0,0 +1,113 @@
+"""
+Spooled upload handling for file imports.
+
+Uploads are copied in fixed-size chunks into a size-limited
+SpooledTemporaryFile while a SHA-256 digest is computed, so parsers receive a
+seekable handle instead of a fully buffered ``bytes`` copy of the body.
+Small uploads stay in memory; larger ones roll over to a temp file on disk.
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+
+# Bytes read from the upload per iteration
+CHUNK_SIZE = 1 << 20
+# Spool stays in memory up to this size, then rolls over to disk
+SPOOL_MAX_MEMORY = 2 << 20
+# Hard limit on accepted upload size (override with LORIEN_MAX_UPLOAD_BYTES)
+DEFAULT_MAX_UPLOAD_BYTES = 200 << 20
+
+
+def max_upload_bytes() -> int:
+    """Configured upload size limit in bytes."""
+    return int(os.getenv("LORIEN_MAX_UPLOAD_BYTES", DEFAULT_MAX_UPLOAD_BYTES))
+
+
+class SpooledUpload:
+    """
+    A received upload: spooled content plus its size and content hash.
+
+    Use as a context manager so the spool (and any rolled-over temp file) is
+    released when the request is done with it.
+    """
+
+    def __init__(self, filename: Optional[str] = None):
+        self.filename = filename
+        self.size_bytes = 0
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        self._digest = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        """Hex SHA-256 of the bytes written so far."""
+        return self._digest.hexdigest()
+
+    @property
+    def on_disk(self) -> bool:
+        """True once the spool has rolled over to a temp file."""
+        return bool(getattr(self.file, "_rolled", False))
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self._digest.update(chunk)
+        self.size_bytes += len(chunk)
+
+    def open(self) -> BinaryIO:
+        """Rewind and return the spooled handle for a parser."""
+        self.file.seek(0)
+        return self.file
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+async def spool_upload(file: UploadFile,
+                       max_bytes: Optional[int] = None,
+                       chunk_size: int = CHUNK_SIZE) -> SpooledUpload:
+    """
+    Stream an UploadFile into a SpooledUpload, hashing as it goes.
+
+    Args:
+        file: Incoming multipart file
+        max_bytes: Size limit; defaults to max_upload_bytes()
+        chunk_size: Bytes read per iteration
+
+    Returns:
+        SpooledUpload rewound to the start
+
+    Raises:
+        HTTPException: 413 with ``value_error.upload_too_large`` if the limit is exceeded
+    """
+    limit = max_upload_bytes() if max_bytes is None else max_bytes
+    upload = SpooledUpload(file.filename)
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            upload.write(chunk)
+            if upload.size_bytes > limit:
+                raise HTTPException(
+                    status_code=413,
+                    detail=[{
+                        "loc": ["body", "file"],
+                        "msg": "Upload exceeds size limit",
+                        "type": "value_error.upload_too_large",
+                        "ctx": {"limit_bytes": limit}
+                    }]
+                )
+    except BaseException:
+        upload.close()
+        raise
+    upload.open()
+    return upload
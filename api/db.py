@@ -1,6 +1,13 @@
 import os, sqlite3
 from contextlib import contextmanager
 
+from fastapi import HTTPException, status
+
+from storage import querystats
+from storage.publish import legacy_snapshot, open_snapshot
+from storage.workbooks import workbooks
+from .dependencies import _replica_snapshot, replica_dir
+
 SCHEMA_SQL = """
 PRAGMA journal_mode=WAL;
 PRAGMA foreign_keys=ON;
@@ -36,14 +43,49 @@ CREATE TABLE IF NOT EXISTS dictionary_terms (
   created_at TEXT
 );
 CREATE UNIQUE INDEX IF NOT EXISTS ux_dict_type_normalized ON dictionary_terms(type, normalized);
+
+-- Content hashes of imported paths (incremental re-import)
+CREATE TABLE IF NOT EXISTS import_row_hashes (
+  path_key   INTEGER PRIMARY KEY,  -- hash of Vital Measurement + Node 1..5
+  row_hash   INTEGER NOT NULL,     -- hash of all 8 canonical columns
+  leaf_id    INTEGER,              -- last realized node of the path
+  updated_at TEXT
+);
+
+-- Nodes an import created (hand-made nodes are never listed); the
+-- incremental import's removal pass only prunes these
+CREATE TABLE IF NOT EXISTS import_owned_nodes (
+  node_id INTEGER PRIMARY KEY REFERENCES nodes(id) ON DELETE CASCADE
+);
 """
 
 def ensure_schema(conn: sqlite3.Connection) -> None:
+    if replica_dir():
+        return  # a published snapshot: complete and read-only
+    if getattr(conn, "schema_ready", False):
+        return  # a workbook's pooled connection: set up when the pool was first used
     conn.executescript(SCHEMA_SQL)
 
+def legacy_db_path() -> str:
+    """Legacy database of the current request: the workbook's, else LORIEN_DB."""
+    wb = workbooks.current()
+    return wb.legacy_db_path if wb else os.getenv("LORIEN_DB", "lorien.db")
+
 def get_conn() -> sqlite3.Connection:
-    db_path = os.getenv("LORIEN_DB", "lorien.db")
-    conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    if replica_dir():
+        # the legacy copy published with the current snapshot; the live file is never touched
+        path = legacy_snapshot(_replica_snapshot())
+        if not os.path.exists(path):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Current snapshot was published without the legacy database")
+        conn = open_snapshot(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+    wb = workbooks.current()
+    if wb is not None:
+        # pooled and warm; close() (or dropping it) returns it to the workbook
+        return wb.legacy_connection(ensure_schema)
+    conn = querystats.connect(os.getenv("LORIEN_DB", "lorien.db"), isolation_level=None, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA foreign_keys=ON;")
@@ -4,22 +4,51 @@ Dependency injection for FastAPI application.
 
 import sqlite3
 import os
-from typing import Generator, Iterator
+from typing import Generator, Iterator, Optional
 from fastapi import Depends, HTTPException, status
 from contextlib import contextmanager
 
+from storage import querystats, tracing
+from storage.publish import current_snapshot, open_snapshot
 from storage.sqlite import SQLiteRepository
+from storage.workbooks import workbooks
 from core.models import Node, Triaging
 
 
+def replica_dir() -> Optional[str]:
+    """Publish directory served in read-only replica mode, or None on the editor server."""
+    return os.getenv("LORIEN_REPLICA_DIR") or None
+
+
+def _replica_snapshot() -> str:
+    snapshot = current_snapshot(replica_dir())
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No published snapshot to serve yet"
+        )
+    return snapshot
+
+
 def get_repository() -> SQLiteRepository:
     """
     Get SQLite repository instance.
     
+    In replica mode this is the current published snapshot, opened
+    read-only; a new publish is picked up by the next request. On a
+    workbook-scoped request it is that workbook's (already initialized)
+    repository.
+    
     Returns:
         SQLiteRepository: Configured repository instance
     """
-    return SQLiteRepository()
+    with tracing.span("dependency.get_repository"):
+        if replica_dir():
+            return SQLiteRepository(db_path=_replica_snapshot(), read_only=True)
+        wb = workbooks.current()
+        if wb is not None:
+            return wb.repo
+        return SQLiteRepository()
 
 
 import logging
@@ -31,7 +60,11 @@ DB_PATH = os.getenv("LORIEN_DB_PATH", os.path.expanduser("~/.local/share/lorien/
 
 def _open_conn() -> sqlite3.Connection:
     """Open a new database connection with proper configuration."""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    if replica_dir():
+        conn = open_snapshot(_replica_snapshot())
+        conn.row_factory = sqlite3.Row
+        return conn
+    conn = querystats.connect(DB_PATH, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
     # Pragmas (idempotent)
     conn.execute("PRAGMA foreign_keys=ON;")
@@ -48,9 +81,19 @@ def get_db_connection() -> Iterator[sqlite3.Connection]:
         sqlite3.Connection: Configured database connection
         
     Note:
-        Connection is automatically closed when request completes.
+        Connection is automatically closed when request completes; on a
+        workbook-scoped request it goes back to the workbook's pool.
     """
-    conn = _open_conn()
+    # the span covers getting the connection; the request's use of it is traced by its statements
+    with tracing.span("dependency.get_db_connection"):
+        wb = None if replica_dir() else workbooks.current()
+        conn = wb.acquire() if wb is not None else _open_conn()
+    if wb is not None:
+        try:
+            yield conn
+        finally:
+            wb.release(conn)
+        return
     try:
         yield conn
     finally:
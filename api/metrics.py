@@ -3,114 +3,410 @@ Telemetry and metrics collection for the decision tree API.
 
 This module provides non-PHI counters and timings for monitoring
 API stability and performance.
+
+Recording is lock-free: every thread writes to its own shard (the event
+loop thread and each threadpool worker get one), and a snapshot merges the
+shards. Response times go into fixed log-linear histograms (8 buckets per
+doubling, about 9% relative error), so percentiles cost O(buckets)
+instead of a sort and memory stays constant per route.
+
+With ``LORIEN_METRICS_DIR`` set, each worker process also writes its
+totals to ``<dir>/lorien_metrics_<pid>.json`` every
+``LORIEN_METRICS_FLUSH_SECONDS``, and snapshots merge every file in the
+directory. /health/metrics and the Prometheus exposition then report the
+whole deployment, not only the worker that answered. A file whose worker
+has exited, or that has not been rewritten for ``STALE_FLUSHES`` flush
+intervals (a worker in another pid namespace that stopped), is deleted
+instead of being merged.
 """
 
-import time
-import os
-from typing import Dict, Any, Optional
-from collections import defaultdict, deque
-from threading import Lock
+import json
 import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Histogram layout: bucket 0 is (0, LOWEST_MS], bucket i covers
+# (LOWEST_MS * 2**((i-1)/SUB_BUCKETS), LOWEST_MS * 2**(i/SUB_BUCKETS)],
+# the last bucket is everything above the top bound
+LOWEST_MS = 0.01
+SUB_BUCKETS = 8
+OCTAVES = 24  # top bound ~168 s
+BUCKETS = OCTAVES * SUB_BUCKETS + 2
+BUCKET_BOUNDS_MS = [LOWEST_MS * 2 ** (i / SUB_BUCKETS) for i in range(BUCKETS - 1)] + [math.inf]
+
+COUNTERS = (
+    "import_success",
+    "import_errors",
+    "export_success",
+    "export_errors",
+    "conflict_count",
+    "validation_errors",
+)
+PERCENTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+
+# Worker files not rewritten for this many flush intervals are dropped
+STALE_FLUSHES = 10
+
+
+def bucket_index(value_ms: float) -> int:
+    if value_ms <= LOWEST_MS:
+        return 0
+    return min(math.ceil(math.log2(value_ms / LOWEST_MS) * SUB_BUCKETS), BUCKETS - 1)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with exact count, sum, min and max."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value_ms: float) -> None:
+        self.counts[bucket_index(value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other: "Histogram") -> None:
+        for i, n in enumerate(other.counts):
+            if n:
+                self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th sample, clamped to [min, max]."""
+        if not self.count:
+            return 0
+        target = min(int(self.count * q), self.count - 1)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen > target:
+                return min(max(BUCKET_BOUNDS_MS[i], self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"count": self.count}
+        for name, q in PERCENTILES:
+            out[name] = self.percentile(q)
+        out.update(avg=self.total / self.count if self.count else 0,
+                   min=self.min if self.count else 0, max=self.max)
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"buckets": {i: n for i, n in enumerate(self.counts) if n},
+                "count": self.count, "total": self.total,
+                "min": self.min if self.count else None, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        h = cls()
+        for i, n in data["buckets"].items():
+            h.counts[int(i)] = n
+        h.count, h.total, h.max = data["count"], data["total"], data["max"]
+        h.min = math.inf if data["min"] is None else data["min"]
+        return h
+
+
+class _Shard:
+    """Metrics written by one thread; only that thread mutates it."""
+
+    __slots__ = ("route_hits", "status_codes", "counters", "latency")
+
+    def __init__(self) -> None:
+        self.route_hits: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[int, int] = defaultdict(int)
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.latency: Dict[str, Histogram] = {}
+
+
+_local = threading.local()
+_registry_lock = threading.Lock()  # taken once per thread (and by reset/snapshot), never per update
+_shards: List[_Shard] = []
+_generation = 0
+
+
+def _shard() -> _Shard:
+    mine = getattr(_local, "shard", None)
+    if mine is not None and mine[0] == _generation:
+        return mine[1]
+    shard = _Shard()
+    with _registry_lock:
+        _shards.append(shard)
+        _local.shard = (_generation, shard)
+    return shard
 
-# Global metrics storage
-_metrics_lock = Lock()
-_metrics = {
-    "route_hits": defaultdict(int),
-    "status_codes": defaultdict(int),
-    "response_times": defaultdict(lambda: deque(maxlen=1000)),  # Rolling window
-    "import_success": 0,
-    "import_errors": 0,
-    "export_success": 0,
-    "export_errors": 0,
-    "conflict_count": 0,
-    "validation_errors": 0,
-}
-
-# Rolling window for response times (last 1000 requests per route)
-_response_times = defaultdict(lambda: deque(maxlen=1000))
 
 def increment_route_hit(route: str) -> None:
     """Increment hit count for a route."""
-    with _metrics_lock:
-        _metrics["route_hits"][route] += 1
+    _shard().route_hits[route] += 1
 
 def increment_status_code(status_code: int) -> None:
     """Increment status code counter."""
-    with _metrics_lock:
-        _metrics["status_codes"][status_code] += 1
+    _shard().status_codes[status_code] += 1
 
 def record_response_time(route: str, response_time_ms: float) -> None:
     """Record response time for a route."""
-    with _metrics_lock:
-        _response_times[route].append(response_time_ms)
+    latency = _shard().latency
+    hist = latency.get(route)
+    if hist is None:
+        hist = latency[route] = Histogram()
+    hist.record(response_time_ms)
 
 def increment_import_success() -> None:
     """Increment import success counter."""
-    with _metrics_lock:
-        _metrics["import_success"] += 1
+    _shard().counters["import_success"] += 1
 
 def increment_import_error() -> None:
     """Increment import error counter."""
-    with _metrics_lock:
-        _metrics["import_errors"] += 1
+    _shard().counters["import_errors"] += 1
 
 def increment_export_success() -> None:
     """Increment export success counter."""
-    with _metrics_lock:
-        _metrics["export_success"] += 1
+    _shard().counters["export_success"] += 1
 
 def increment_export_error() -> None:
     """Increment export error counter."""
-    with _metrics_lock:
-        _metrics["export_errors"] += 1
+    _shard().counters["export_errors"] += 1
 
 def increment_conflict(route: str, parent_id: Optional[int] = None, slot: Optional[int] = None) -> None:
     """Increment conflict counter and log single line (no PHI)."""
-    with _metrics_lock:
-        _metrics["conflict_count"] += 1
-    
+    _shard().counters["conflict_count"] += 1
+
     # Log single line for 409s with {route, parent_id, slot} (no labels/PHI)
     logging.info(f"409_CONFLICT: route={route}, parent_id={parent_id}, slot={slot}")
 
 def increment_validation_error() -> None:
     """Increment validation error counter."""
-    with _metrics_lock:
-        _metrics["validation_errors"] += 1
+    _shard().counters["validation_errors"] += 1
+
+
+def _merge_local() -> _Shard:
+    """This process's shards merged into one."""
+    total = _Shard()
+    with _registry_lock:
+        shards = list(_shards)
+    for shard in shards:
+        # list() copies in one step, so a concurrent insert cannot break the iteration
+        for route, n in list(shard.route_hits.items()):
+            total.route_hits[route] += n
+        for code, n in list(shard.status_codes.items()):
+            total.status_codes[code] += n
+        for name, n in list(shard.counters.items()):
+            total.counters[name] += n
+        for route, hist in list(shard.latency.items()):
+            total.latency.setdefault(route, Histogram()).merge(hist)
+    return total
+
+
+def _shard_to_dict(shard: _Shard) -> Dict[str, Any]:
+    return {
+        "pid": os.getpid(),
+        "written_at": time.time(),
+        "route_hits": dict(shard.route_hits),
+        "status_codes": {str(k): v for k, v in shard.status_codes.items()},
+        "counters": shard.counters,
+        "latency": {route: h.to_dict() for route, h in shard.latency.items()},
+    }
+
+
+def _merge_file(total: _Shard, data: Dict[str, Any]) -> None:
+    for route, n in data["route_hits"].items():
+        total.route_hits[route] += n
+    for code, n in data["status_codes"].items():
+        total.status_codes[int(code)] += n
+    for name, n in data["counters"].items():
+        total.counters[name] = total.counters.get(name, 0) + n
+    for route, h in data["latency"].items():
+        total.latency.setdefault(route, Histogram()).merge(Histogram.from_dict(h))
+
+
+# ---- multi-process aggregation ----
+
+def metrics_dir() -> Optional[str]:
+    return os.getenv("LORIEN_METRICS_DIR") or None
+
+
+def flush_interval() -> float:
+    """Seconds between flushes of this worker's totals (LORIEN_METRICS_FLUSH_SECONDS, default 5)."""
+    try:
+        return max(float(os.getenv("LORIEN_METRICS_FLUSH_SECONDS", "5")), 0.1)
+    except ValueError:
+        logging.warning(f"Ignoring invalid LORIEN_METRICS_FLUSH_SECONDS={os.getenv('LORIEN_METRICS_FLUSH_SECONDS')!r}")
+        return 5.0
+
+
+def _process_file(directory: str, pid: Optional[int] = None) -> str:
+    return os.path.join(directory, f"lorien_metrics_{pid or os.getpid()}.json")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError, OverflowError):
+        pass  # exists under another user, or not ours to judge
+    return True
+
+
+def _is_stale(path: str, name: str) -> bool:
+    """True for the file of a worker that exited or stopped flushing."""
+    pid = name[len("lorien_metrics_"):-len(".json")]
+    if pid.isdigit() and not _pid_alive(int(pid)):
+        return True
+    return time.time() - os.path.getmtime(path) > STALE_FLUSHES * flush_interval()
+
+
+def flush(directory: Optional[str] = None) -> Optional[str]:
+    """Write this process's totals to the aggregation directory (atomic replace)."""
+    directory = directory or metrics_dir()
+    if directory is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = _process_file(directory)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(_shard_to_dict(_merge_local()), fh)
+    os.replace(tmp, path)
+    return path
+
+
+class _Flusher:
+    """Daemon thread that flushes this worker's metrics periodically."""
+
+    def __init__(self) -> None:
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        try:
+            flush()  # final totals of this worker
+        except OSError as e:
+            logging.warning(f"Metrics flush failed: {e}")
+
+    def _loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                flush()
+            except OSError as e:
+                logging.warning(f"Metrics flush failed: {e}")
+
+
+# Process-wide flusher, started by the API when LORIEN_METRICS_DIR is set
+flusher = _Flusher()
+
+
+def _merged() -> Tuple[_Shard, int]:
+    """Totals across this process and (in multi-process mode) the other workers' files."""
+    total = _merge_local()
+    processes = 1
+    directory = metrics_dir()
+    if directory and os.path.isdir(directory):
+        own = os.path.basename(_process_file(directory))
+        for name in os.listdir(directory):
+            if not (name.startswith("lorien_metrics_") and name.endswith(".json")) or name == own:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if _is_stale(path, name):
+                    os.remove(path)
+                    continue
+                with open(path) as fh:
+                    _merge_file(total, json.load(fh))
+                processes += 1
+            except FileNotFoundError:
+                continue  # removed by another worker
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Skipping metrics file {name}: {e}")
+    return total, processes
+
 
 def snapshot() -> Dict[str, Any]:
     """Get current metrics snapshot."""
-    with _metrics_lock:
-        # Calculate percentiles for response times
-        response_stats = {}
-        for route, times in _response_times.items():
-            if times:
-                sorted_times = sorted(times)
-                n = len(sorted_times)
-                response_stats[route] = {
-                    "count": n,
-                    "p50": sorted_times[n // 2] if n > 0 else 0,
-                    "p95": sorted_times[min(int(n * 0.95), n - 1)] if n > 0 else 0,
-                    "avg": sum(times) / n if n > 0 else 0,
-                    "min": min(times) if n > 0 else 0,
-                    "max": max(times) if n > 0 else 0,
-                }
-        
-        # Convert defaultdicts to regular dicts for JSON serialization
-        route_hits = dict(_metrics["route_hits"])
-        status_codes = dict(_metrics["status_codes"])
-        
-        return {
-            "route_hits": route_hits,
-            "status_codes": status_codes,
-            "response_times": response_stats,
-            "import_success": _metrics["import_success"],
-            "import_errors": _metrics["import_errors"],
-            "export_success": _metrics["export_success"],
-            "export_errors": _metrics["export_errors"],
-            "conflict_count": _metrics["conflict_count"],
-            "validation_errors": _metrics["validation_errors"],
-            "uptime_seconds": time.time() - _get_start_time(),
-        }
+    total, processes = _merged()
+    out: Dict[str, Any] = {
+        "route_hits": dict(total.route_hits),
+        "status_codes": dict(total.status_codes),
+        "response_times": {route: h.summary() for route, h in total.latency.items() if h.count},
+    }
+    out.update(total.counters)
+    out["uptime_seconds"] = time.time() - _get_start_time()
+    if metrics_dir():
+        out["processes"] = processes
+    return out
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    """Metrics in the Prometheus text exposition format (version 0.0.4)."""
+    total, _ = _merged()
+    lines = [
+        "# HELP lorien_route_hits_total Requests per route.",
+        "# TYPE lorien_route_hits_total counter",
+    ]
+    lines += [f'lorien_route_hits_total{{route="{_label(r)}"}} {n}' for r, n in sorted(total.route_hits.items())]
+    lines += [
+        "# HELP lorien_http_responses_total Responses per status code.",
+        "# TYPE lorien_http_responses_total counter",
+    ]
+    lines += [f'lorien_http_responses_total{{code="{c}"}} {n}' for c, n in sorted(total.status_codes.items())]
+    for name in COUNTERS:
+        lines += [f"# TYPE lorien_{name}_total counter", f"lorien_{name}_total {total.counters[name]}"]
+
+    # Exposed at every doubling (each SUB_BUCKETS-th bound) to keep series count sane
+    lines += [
+        "# HELP lorien_request_duration_seconds Response time per route.",
+        "# TYPE lorien_request_duration_seconds histogram",
+    ]
+    for route, hist in sorted(total.latency.items()):
+        label = _label(route)
+        cumulative = 0
+        for i, n in enumerate(hist.counts[:-1]):
+            cumulative += n
+            if i % SUB_BUCKETS == 0:
+                le = BUCKET_BOUNDS_MS[i] / 1000
+                lines.append(f'lorien_request_duration_seconds_bucket{{route="{label}",le="{le:.6g}"}} {cumulative}')
+        lines.append(f'lorien_request_duration_seconds_bucket{{route="{label}",le="+Inf"}} {hist.count}')
+        lines.append(f'lorien_request_duration_seconds_sum{{route="{label}"}} {hist.total / 1000:.6f}')
+        lines.append(f'lorien_request_duration_seconds_count{{route="{label}"}} {hist.count}')
+
+    lines += ["# TYPE lorien_uptime_seconds gauge", f"lorien_uptime_seconds {time.time() - _get_start_time():.1f}"]
+    return "\n".join(lines) + "\n"
+
 
 def _get_start_time() -> float:
     """Get application start time."""
@@ -119,18 +415,8 @@ def _get_start_time() -> float:
     return _get_start_time._start_time
 
 def reset() -> None:
-    """Reset all metrics (for testing)."""
-    global _metrics, _response_times
-    with _metrics_lock:
-        _metrics = {
-            "route_hits": defaultdict(int),
-            "status_codes": defaultdict(int),
-            "response_times": defaultdict(lambda: deque(maxlen=1000)),
-            "import_success": 0,
-            "import_errors": 0,
-            "export_success": 0,
-            "export_errors": 0,
-            "conflict_count": 0,
-            "validation_errors": 0,
-        }
-        _response_times = defaultdict(lambda: deque(maxlen=1000))
\ No newline at end of file
+    """Reset all metrics of this process (for testing)."""
+    global _shards, _generation
+    with _registry_lock:
+        _shards = []
+        _generation += 1
@@ -2,7 +2,6 @@
 Middleware package for the decision tree API.
 """
 
-from .telemetry import TelemetryMiddleware
-from .auth import AuthMiddleware
+from .pipeline import RequestPipelineMiddleware
 
-__all__ = ["TelemetryMiddleware", "AuthMiddleware"]
+__all__ = ["RequestPipelineMiddleware"]
@@ -1,17 +1,16 @@
 """
-Enhanced authentication middleware with RBAC and ETag support.
+Enhanced authentication with RBAC and ETag support.
 
 Provides comprehensive authentication, authorization, and concurrency control
-for all API endpoints.
+for all API endpoints: ``EnhancedAuth`` is the request pipeline stage, the
+functions below are the endpoint dependencies.
 """
 
 import os
 import logging
 from typing import Optional, Set, Dict, Any
 from fastapi import HTTPException, Request, Depends, Header
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from fastapi.security import HTTPBearer
 
 from ..core.rbac import rbac_manager, Permission, User
 from ..core.etag import ETagManager, ConcurrencyError
@@ -21,43 +20,39 @@ logger = logging.getLogger(__name__)
 # Security scheme for OpenAPI docs
 security = HTTPBearer(auto_error=False)
 
-class EnhancedAuthMiddleware(BaseHTTPMiddleware):
-    """Enhanced middleware for authentication, authorization, and ETag handling."""
+class EnhancedAuth:
+    """Authentication and RBAC authorization stage of the request pipeline."""
     
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self.auth_enabled = os.getenv("AUTH_TOKEN") is not None
-        self.rbac_enabled = rbac_manager.is_enabled()
+    def __init__(self, auth_enabled: bool, rbac_enabled: bool):
+        self.auth_enabled = auth_enabled
+        self.rbac_enabled = rbac_enabled
         
         # Define endpoint permissions
         self.endpoint_permissions = self._build_endpoint_permissions()
+        self._protected_prefixes = tuple(self.endpoint_permissions)
+    
+    @property
+    def active(self) -> bool:
+        return self.auth_enabled or self.rbac_enabled
     
     def _build_endpoint_permissions(self) -> Dict[str, Set[Permission]]:
         """Build endpoint to permissions mapping."""
         return {
             # Tree operations
             "/api/v1/tree/children": {Permission.WRITE_TREE},
-            "/api/v1/tree/children/": {Permission.WRITE_TREE},
             "/tree/children": {Permission.WRITE_TREE},
-            "/tree/children/": {Permission.WRITE_TREE},
             
             # Triage operations
             "/api/v1/triage": {Permission.WRITE_TRIAGE},
-            "/api/v1/triage/": {Permission.WRITE_TRIAGE},
             "/triage": {Permission.WRITE_TRIAGE},
-            "/triage/": {Permission.WRITE_TRIAGE},
             
             # Dictionary operations
             "/api/v1/dictionary": {Permission.WRITE_DICTIONARY},
-            "/api/v1/dictionary/": {Permission.WRITE_DICTIONARY},
             "/dictionary": {Permission.WRITE_DICTIONARY},
-            "/dictionary/": {Permission.WRITE_DICTIONARY},
             
             # Flags operations
             "/api/v1/flags": {Permission.WRITE_FLAGS},
-            "/api/v1/flags/": {Permission.WRITE_FLAGS},
             "/flags": {Permission.WRITE_FLAGS},
-            "/flags/": {Permission.WRITE_FLAGS},
             
             # Export operations
             "/api/v1/tree/export": {Permission.WRITE_EXPORT},
@@ -67,44 +62,27 @@ class EnhancedAuthMiddleware(BaseHTTPMiddleware):
             
             # Admin operations
             "/api/v1/admin": {Permission.ADMIN_SYSTEM},
-            "/api/v1/admin/": {Permission.ADMIN_SYSTEM},
             "/admin": {Permission.ADMIN_SYSTEM},
-            "/admin/": {Permission.ADMIN_SYSTEM},
         }
     
-    async def dispatch(self, request: Request, call_next):
-        """Process request with enhanced authentication and authorization."""
-        # Add user context to request
-        request.state.user = None
-        request.state.permissions = set()
-        
-        # Handle authentication
-        if self.auth_enabled or self.rbac_enabled:
-            await self._authenticate_request(request)
+    def check(self, method: str, path: str, authorization: Optional[str], state: Dict[str, Any]) -> None:
+        """
+        Authenticate and authorize the request, filling ``state`` (request.state).
         
-        # Handle authorization
+        Raises:
+            HTTPException: 401 when authentication fails, 403 when the user
+                lacks the endpoint's permissions
+        """
+        self._authenticate_request(method, path, authorization, state)
         if self.rbac_enabled:
-            await self._authorize_request(request)
-        
-        # Handle ETag validation for write operations
-        if request.method in ["PUT", "PATCH", "POST", "DELETE"]:
-            await self._validate_etag(request)
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Add ETag headers to response if applicable
-        if hasattr(request.state, 'etag'):
-            response.headers.update(ETagManager.create_etag_response_headers(request.state.etag))
-        
-        return response
+            self._authorize_request(path, state)
     
-    async def _authenticate_request(self, request: Request):
+    def _authenticate_request(self, method: str, path: str, authorization: Optional[str],
+                              state: Dict[str, Any]) -> None:
         """Authenticate the request."""
         # Check for Authorization header
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            if self._requires_auth(request):
+        if not authorization:
+            if self._requires_auth(method, path):
                 raise HTTPException(
                     status_code=401,
                     detail={
@@ -115,7 +93,7 @@ class EnhancedAuthMiddleware(BaseHTTPMiddleware):
             return
         
         # Parse Bearer token
-        if not auth_header.startswith("Bearer "):
+        if not authorization.startswith("Bearer "):
             raise HTTPException(
                 status_code=401,
                 detail={
@@ -124,7 +102,7 @@ class EnhancedAuthMiddleware(BaseHTTPMiddleware):
                 }
             )
         
-        token = auth_header[7:]  # Remove "Bearer " prefix
+        token = authorization[7:]  # Remove "Bearer " prefix
         
         # Handle RBAC authentication
         if self.rbac_enabled:
@@ -137,9 +115,9 @@ class EnhancedAuthMiddleware(BaseHTTPMiddleware):
                         "message": "Invalid or expired authentication token"
                     }
                 )
-            request.state.user = user
-            request.state.permissions = rbac_manager.get_user_permissions(user)
-            logger.info(f"Authenticated user: {user.username} with permissions: {[p.value for p in request.state.permissions]}")
+            state["user"] = user
+            state["permissions"] = rbac_manager.get_user_permissions(user)
+            logger.info(f"Authenticated user: {user.username} with permissions: {[p.value for p in state['permissions']]}")
         
         # Handle simple token authentication
         elif self.auth_enabled:
@@ -152,54 +130,41 @@ class EnhancedAuthMiddleware(BaseHTTPMiddleware):
                         "message": "Invalid authentication token"
                     }
                 )
-            logger.info(f"Authenticated with simple token: {request.method} {request.url.path}")
+            logger.info(f"Authenticated with simple token: {method} {path}")
     
-    async def _authorize_request(self, request: Request):
+    def _authorize_request(self, path: str, state: Dict[str, Any]) -> None:
         """Authorize the request based on user permissions."""
-        if not self.rbac_enabled or not request.state.user:
+        user = state.get("user")
+        if not user:
             return
         
         # Check if endpoint requires specific permissions
-        path = request.url.path
         required_permissions = self._get_required_permissions(path)
         
         if not required_permissions:
             return  # No specific permissions required
         
         # Check if user has required permissions
-        if not rbac_manager.has_any_permission(request.state.user, required_permissions):
+        if not rbac_manager.has_any_permission(user, required_permissions):
             raise HTTPException(
                 status_code=403,
                 detail={
                     "error": "insufficient_permissions",
                     "message": f"Access denied. Required permissions: {[p.value for p in required_permissions]}",
-                    "user_permissions": [p.value for p in request.state.permissions]
+                    "user_permissions": [p.value for p in state["permissions"]]
                 }
             )
         
-        logger.info(f"Authorized user {request.state.user.username} for {path}")
+        logger.info(f"Authorized user {user.username} for {path}")
     
-    async def _validate_etag(self, request: Request):
-        """Validate ETag for write operations."""
-        if_match = request.headers.get("If-Match")
-        if not if_match:
-            # ETag validation is optional for now
-            return
-        
-        # Store If-Match header for later validation
-        request.state.if_match = if_match
-    
-    def _requires_auth(self, request: Request) -> bool:
+    def _requires_auth(self, method: str, path: str) -> bool:
         """Check if request requires authentication."""
         # GET requests generally don't require auth
-        if request.method == "GET":
+        if method == "GET":
             return False
         
         # Check if path matches any write endpoint
-        path = request.url.path
-        return any(
-            path.startswith(endpoint) for endpoint in self.endpoint_permissions.keys()
-        )
+        return path.startswith(self._protected_prefixes)
     
     def _get_required_permissions(self, path: str) -> Set[Permission]:
         """Get required permissions for a path."""
@@ -0,0 +1,227 @@
+"""
+Request pipeline: metrics, token auth, RBAC auth and telemetry in one
+plain ASGI middleware.
+
+This replaces four BaseHTTPMiddleware layers. Each of them ran the rest of
+the app in a separate task and re-wrapped the response body in a memory
+stream, which cost throughput on every request and broke true streaming
+for exports. Here the stages run inline, in the order the layers had::
+
+    metrics -> span trace -> token auth (AUTH_TOKEN) -> RBAC auth -> telemetry -> SQL trace -> profiler -> app
+
+Configuration is resolved when the middleware stack is built. The
+switches that are runtime toggles (ANALYTICS_ENABLED for telemetry,
+AUTH_TOKEN for write endpoints, LORIEN_SQL_TRACE/_HEADERS for per-request
+SQL stats, LORIEN_SLOW_QUERY_MS for the slow-query log,
+LORIEN_PROFILE_TOKEN/_SAMPLE for the profiler, LORIEN_TRACE/_SAMPLE for
+span tracing) are re-derived only when their raw values change. Disabled
+stages are skipped outright. ``send`` is wrapped only to read the status
+line and add the ETag (and SQL debug, profile and trace id) headers, so
+body chunks pass through untouched.
+"""
+
+import inspect
+import os
+import random
+import time
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.etag import ETagManager
+from ..core.rbac import rbac_manager
+from .. import profiling
+from storage import querystats, tracing
+from storage.slowlog import threshold_ms
+from .auth import check_write_token
+from .enhanced_auth import EnhancedAuth
+from .metrics_middleware import normalize_path, record_exception, record_request, record_response
+from .telemetry import collect_telemetry
+
+WRITE_METHODS = frozenset({"PUT", "PATCH", "POST", "DELETE"})
+
+
+class RequestPipelineMiddleware:
+    """Metrics, authentication and telemetry without per-layer task/stream wrapping."""
+
+    def __init__(self, app: ASGIApp, metrics_enabled: bool = False):
+        self.app = app
+        self.metrics_enabled = metrics_enabled
+        self.auth = EnhancedAuth(
+            auth_enabled=os.getenv("AUTH_TOKEN") is not None,
+            rbac_enabled=rbac_manager.is_enabled(),
+        )
+        self._env: Optional[Tuple[Optional[str], ...]] = None
+        self._telemetry = False
+        self._write_token: Optional[str] = None
+        self._sql_trace = False
+        self._sql_headers = False
+        self._sql_collect = False
+        self._profile_token: Optional[str] = None
+        self._profile_rates = []
+        self._tracing = False
+        self._trace_rate = 0.0
+
+    def _runtime(self) -> Tuple[bool, Optional[str]]:
+        env = (os.environ.get("ANALYTICS_ENABLED"), os.environ.get("AUTH_TOKEN"),
+               os.environ.get("LORIEN_SQL_TRACE"), os.environ.get("LORIEN_SQL_TRACE_HEADERS"),
+               os.environ.get("LORIEN_SLOW_QUERY_MS"), os.environ.get("LORIEN_PROFILE_TOKEN"),
+               os.environ.get("LORIEN_PROFILE_SAMPLE"), os.environ.get("LORIEN_TRACE"),
+               os.environ.get("LORIEN_TRACE_SAMPLE"))
+        if env != self._env:
+            self._env = env
+            self._telemetry = (env[0] or "false").lower() == "true"
+            self._write_token = env[1] or None
+            self._sql_trace = querystats.enabled()
+            self._sql_headers = querystats.headers_enabled()
+            # the slow-query log wants the route even without tracing
+            self._sql_collect = self._sql_trace or threshold_ms() is not None
+            self._profile_token = profiling.profile_token()
+            self._profile_rates = profiling.sample_rates()
+            self._tracing = tracing.enabled()
+            self._trace_rate = tracing.sample_rate() if self._tracing else 0.0
+        return self._telemetry, self._write_token
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        telemetry, write_token = self._runtime()
+        method = scope["method"]
+        path = scope["path"]
+        state = scope.setdefault("state", {})
+        state["user"] = None
+        state["permissions"] = set()
+        headers = Headers(scope=scope) if (
+            self.metrics_enabled or write_token or self.auth.active or method in WRITE_METHODS
+            or self._profile_token or self._tracing
+        ) else None
+
+        started = time.perf_counter()
+        metrics_path = None
+        if self.metrics_enabled:
+            metrics_path = normalize_path(path)
+            record_request(method, metrics_path, headers.get("user-agent", "unknown"))
+
+        root = None
+        if self._tracing:
+            traceparent = headers.get("traceparent")
+            # the caller's sampled flag decides; the rate only covers requests without one
+            sample = tracing.sampled(traceparent)
+            if sample is None:
+                sample = random.random() < self._trace_rate
+            if sample:
+                root = tracing.start_trace(f"http {method} {metrics_path or normalize_path(path)}",
+                                           traceparent, method=method, path=path)
+        trace_token = tracing.current_span.set(root) if root is not None else None
+
+        try:
+            if write_token or self.auth.active:
+                with tracing.span("pipeline.auth", rbac=self.auth.rbac_enabled):
+                    if write_token:
+                        check_write_token(method, path, headers.get("authorization"), write_token)
+                    if self.auth.active:
+                        self.auth.check(method, path, headers.get("authorization"), state)
+        except HTTPException as e:
+            await JSONResponse(status_code=e.status_code, content={"detail": e.detail},
+                               headers=self._trace_headers(root, e.headers))(scope, receive, send)
+            if metrics_path is not None:
+                record_response(method, metrics_path, e.status_code, (time.perf_counter() - started) * 1000)
+            if root is not None:
+                tracing.current_span.reset(trace_token)
+                root.set(status=e.status_code)
+                tracing.end_trace(root)
+            return
+
+        # ETag validation is optional: keep If-Match for the endpoint
+        if method in WRITE_METHODS:
+            if_match = headers.get("if-match")
+            if if_match:
+                state["if_match"] = if_match
+
+        status_code = 500
+        queries = querystats.RequestQueries(metrics_path or normalize_path(path)) if self._sql_collect else None
+        sql_trace, sql_headers = self._sql_trace, self._sql_headers
+        # the sampler attributes loop-thread stacks above this frame to the request
+        profile = self._start_profile(method, path, headers, state, inspect.currentframe())
+        body_span = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, body_span
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if root is not None:
+                    MutableHeaders(scope=message).update(self._trace_headers(root))
+                    root.set(time_to_headers_ms=round((time.perf_counter() - started) * 1000, 3))
+                    body_span = root.child("response.body")
+                etag = state.get("etag")
+                if etag:
+                    MutableHeaders(scope=message).update(ETagManager.create_etag_response_headers(etag))
+                if sql_headers:
+                    # what has run by the time the headers go out (all of it unless streaming)
+                    MutableHeaders(scope=message).update({
+                        "X-SQL-Queries": str(queries.queries),
+                        "X-SQL-Time-Ms": f"{queries.sql_ms:.2f}",
+                        "Server-Timing": f'sql;dur={queries.sql_ms:.2f};desc="{queries.queries} queries"',
+                    })
+                if profile is not None and profile.trigger == "on_demand":
+                    MutableHeaders(scope=message)["X-Profile-Id"] = profile.id
+            elif body_span is not None and not message.get("more_body", False):
+                await send(message)
+                body_span.end()
+                return
+            await send(message)
+
+        token = querystats.current_queries.set(queries) if queries is not None else None
+        profile_token = profiling.current_profile.set(profile) if profile is not None else None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            if metrics_path is not None:
+                record_exception(method, metrics_path, e, (time.perf_counter() - started) * 1000)
+            if root is not None:
+                root.fail(e)
+            raise
+        finally:
+            if root is not None:
+                tracing.current_span.reset(trace_token)
+                root.set(status=status_code)
+                tracing.end_trace(root)
+            if profile_token is not None:
+                profiling.current_profile.reset(profile_token)
+                profiling.profiler.stop(profile, status_code, (time.perf_counter() - started) * 1000)
+            if token is not None:
+                querystats.current_queries.reset(token)
+                if sql_trace:
+                    querystats.finish(queries, method)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if telemetry:
+            # the normalized path, so ids do not each get their own series
+            collect_telemetry(metrics_path or normalize_path(path), status_code, elapsed_ms,
+                              scope.get("path_params"))
+        if metrics_path is not None:
+            record_response(method, metrics_path, status_code, elapsed_ms)
+
+    @staticmethod
+    def _trace_headers(root: Optional[tracing.Span], extra: Optional[dict] = None) -> Optional[dict]:
+        if root is None:
+            return extra
+        return {**(extra or {}), "X-Trace-Id": root.trace_id, "traceparent": tracing.traceparent(root)}
+
+    def _start_profile(self, method: str, path: str, headers: Optional[Headers], state: dict,
+                       anchor) -> Optional[profiling.Profile]:
+        """Start a profile when the request asks for one or is sampled (see api/profiling.py)."""
+        if not (self._profile_token or self._profile_rates):
+            return None
+        # header only: a query string would put the token in access logs
+        value = headers.get(profiling.PROFILE_HEADER) if self._profile_token else None
+        trigger = profiling.choose(method, path, value, state, self._profile_token,
+                                   self._profile_rates, self.auth.rbac_enabled)
+        if trigger is None:
+            return None
+        return profiling.profiler.start(method, path, trigger, anchor)
@@ -0,0 +1,33 @@
+"""
+Read-only replica guard.
+
+In replica mode (LORIEN_REPLICA_DIR set) the API serves an immutable
+published snapshot, so every unsafe method is refused before it reaches a
+router. Written as a plain ASGI middleware: no request/response wrapping on
+the read path.
+"""
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..dependencies import replica_dir
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ReadOnlyReplicaMiddleware:
+    """Reject writes with 405 while the API runs as a read-only replica."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["method"] not in SAFE_METHODS and replica_dir():
+            response = JSONResponse(
+                status_code=405,
+                content={"detail": "Read-only replica: writes go to the editor server"},
+                headers={"Allow": ", ".join(sorted(SAFE_METHODS))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,76 @@
+"""
+Workbook routing.
+
+With LORIEN_WORKBOOKS_DIR set, a request selects its workbook either by
+path prefix or by header::
+
+    /api/v1/w/site-a/tree/roots    ->  /api/v1/tree/roots  (workbook site-a)
+    /w/site-a/health               ->  /health             (workbook site-a)
+    X-Lorien-Workbook: site-a
+
+The prefix is stripped before routing, so every router serves every
+workbook unchanged; ``storage.workbooks.current_workbook`` carries the
+choice to the database dependencies. Plain ASGI, so the context variable
+is set in the task that runs the rest of the stack.
+"""
+
+import re
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from storage.workbooks import current_workbook, workbooks, workbooks_dir
+
+WORKBOOK_HEADER = b"x-lorien-workbook"
+_PREFIX = re.compile(r"^(?P<base>/api/v\d+)?/w/(?P<name>[^/]+)(?P<rest>/.*)?$")
+
+
+class WorkbookMiddleware:
+    """Resolve the request's workbook and strip the ``/w/{workbook}`` prefix."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or workbooks_dir() is None:
+            await self.app(scope, receive, send)
+            return
+
+        name = None
+        m = _PREFIX.match(scope["path"])
+        if m:
+            name = m.group("name")
+            path = (m.group("base") or "") + (m.group("rest") or "/")
+            scope = dict(scope, path=path, raw_path=path.encode())
+        header = dict(scope["headers"]).get(WORKBOOK_HEADER)
+        if header is not None:
+            header = header.decode("latin-1")
+            if name is not None and header != name:
+                await self._error(400, f"Workbook header {header!r} does not match path workbook {name!r}",
+                                  scope, receive, send)
+                return
+            name = header
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            # the first request to a workbook opens it (schema setup): keep that off the event loop
+            wb = await run_in_threadpool(workbooks.get, name)
+        except ValueError as e:
+            await self._error(400, str(e), scope, receive, send)
+            return
+        except KeyError:
+            await self._error(404, f"Workbook not found: {name}", scope, receive, send)
+            return
+        wb.requests += 1
+        token = current_workbook.set(name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_workbook.reset(token)
+
+    @staticmethod
+    async def _error(status_code: int, detail: str, scope: Scope, receive: Receive, send: Send) -> None:
+        await JSONResponse(status_code=status_code, content={"detail": detail})(scope, receive, send)
@@ -0,0 +1,396 @@
+"""
+Per-request sampling profiler.
+
+A profiled request runs as usual. While it runs, a background thread takes
+a snapshot of the Python stacks every ``LORIEN_PROFILE_INTERVAL_MS``
+(default 5) with ``sys._current_frames()``. A sample counts for the
+request when it comes from:
+
+- the event loop thread, with the request's pipeline frame on the stack
+  (async endpoints and middleware);
+- an AnyIO worker thread running a call made in the request's context
+  (sync endpoints and dependencies, which is where the repository and
+  pandas work happens).
+
+Ticks where neither ran the request count as ``[waiting]``: awaiting I/O or
+a free worker, or the GIL. The sampler only runs while a profile is active;
+a request that is not profiled costs one check.
+
+Worker attribution reads the context AnyIO runs the call in from its
+worker frame. If a busy worker thread shows no such frame (an AnyIO
+release changed its internals), a warning is logged once and that time
+counts as ``[waiting]``; tests/test_profiling.py fails in that case too.
+
+A request is profiled when:
+
+- ``LORIEN_PROFILE_TOKEN`` is set and the request carries that token in
+  the ``X-Lorien-Profile`` header (never the query string, which ends up
+  in access logs). With RBAC enabled the caller must also hold
+  ``admin:system``.
+- ``LORIEN_PROFILE_SAMPLE`` picks it. A bare rate such as ``0.01`` applies
+  to every route. ``/tree/export=0.05,*=0.001`` sets rates per route
+  prefix, and the longest prefix wins. Paths are matched without the
+  ``/api/v1`` prefix.
+
+Finished profiles are kept in memory, the last ``LORIEN_PROFILE_KEEP``
+(default 50) per worker process. Each has a call tree, folded stacks
+(``frame;frame;frame count``) for flamegraph.pl or speedscope, and the
+time split by layer. The layer of a sample is that of its innermost frame
+in pandas (``pandas``), the repositories and storage (``repository``),
+or the routers (``router``); anything else is ``framework``.
+"""
+
+import hmac
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import Context, ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .core.rbac import Permission
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-lorien-profile"
+
+ROOT = Path(__file__).resolve().parent.parent
+LAYERS = (
+    ("pandas", ("pandas/",)),
+    ("repository", ("storage/", "api/repositories/", "api/db.py")),
+    ("router", ("api/routers/", "api/routes.py", "api/additional_routes.py")),
+)
+_API_PREFIX = re.compile(r"^/api/v\d+(?=/)")
+_WORKER_THREAD = "AnyIO worker thread"
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+WAITING = ("[waiting]",)
+
+current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r", name, os.getenv(name))
+        return default
+
+
+def profile_token() -> Optional[str]:
+    """Token that switches on-demand profiling on, or None when it is off."""
+    return os.getenv("LORIEN_PROFILE_TOKEN") or None
+
+
+def sample_rates() -> List[Tuple[str, float]]:
+    """
+    Parse LORIEN_PROFILE_SAMPLE into (route prefix, rate) pairs, longest first.
+
+    ``*`` (or a bare rate) is the default and sorts last.
+    """
+    raw = os.getenv("LORIEN_PROFILE_SAMPLE", "").strip()
+    rates = []
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        prefix, _, rate = item.rpartition("=")
+        try:
+            value = float(rate)
+        except ValueError:
+            logger.warning("Ignoring invalid LORIEN_PROFILE_SAMPLE entry %r", item)
+            continue
+        if value > 0:
+            rates.append((prefix.strip() if prefix.strip() not in ("", "*") else "", min(value, 1.0)))
+    return sorted(rates, key=lambda r: len(r[0]), reverse=True)
+
+
+def route_key(path: str) -> str:
+    """Path as matched against the sampling rates: without the API version prefix."""
+    return _API_PREFIX.sub("", path)
+
+
+def sample_rate(rates: List[Tuple[str, float]], path: str) -> float:
+    key = route_key(path)
+    for prefix, rate in rates:
+        if key.startswith(prefix):
+            return rate
+    return 0.0
+
+
+def requested(value: Optional[str], token: Optional[str], state: Dict[str, Any], rbac_enabled: bool) -> bool:
+    """
+    True when a request asked for a profile and is allowed one.
+
+    ``value`` is the X-Lorien-Profile header.
+    A wrong or missing token is ignored rather than refused, so the flag
+    does not reveal whether profiling is on.
+    """
+    if not value or not token or not hmac.compare_digest(value.encode(), token.encode()):
+        return False
+    if rbac_enabled:
+        return Permission.ADMIN_SYSTEM in state.get("permissions", ())
+    return True
+
+
+_labels: Dict[Any, str] = {}
+
+
+def _frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        path = Path(code.co_filename)
+        try:
+            name = path.resolve().relative_to(ROOT).as_posix()
+        except ValueError:
+            parts = path.parts
+            marker = next((i for i, p in enumerate(parts) if p in ("site-packages", "dist-packages")), None)
+            name = "/".join(parts[marker + 1:]) if marker is not None else path.name
+        label = _labels[code] = f"{name}:{getattr(code, 'co_qualname', code.co_name)}"
+    return label
+
+
+def layer_of(stack: Iterable[str]) -> str:
+    """Layer of a sample: that of its innermost frame in a known layer."""
+    if tuple(stack) == WAITING:
+        return "waiting"
+    for label in reversed(tuple(stack)):
+        for layer, prefixes in LAYERS:
+            if label.startswith(prefixes):
+                return layer
+    return "framework"
+
+
+class Profile:
+    """Samples of one request, aggregated by stack."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, method: str, path: str, trigger: str, anchor=None):
+        self.id = f"{os.getpid()}-{next(self._ids)}"
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.recorded_at = datetime.now(timezone.utc).isoformat()
+        self.anchor = anchor
+        self.loop_thread = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampled_ms = 0.0
+        self.status: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+
+    @property
+    def ms_per_sample(self) -> float:
+        return self.sampled_ms / self.samples if self.samples else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "recorded_at": self.recorded_at,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            "samples": self.samples,
+            "layers_ms": self.layers(),
+        }
+
+    def layers(self) -> Dict[str, float]:
+        totals: Counter = Counter()
+        for stack, count in self.stacks.items():
+            totals[layer_of(stack)] += count
+        return {layer: round(count * self.ms_per_sample, 2) for layer, count in totals.most_common()}
+
+    def folded(self) -> str:
+        """Folded stacks, one ``root;frame;...;frame count`` line per distinct stack."""
+        root = f"{self.method} {self.path}".replace(";", ":")
+        return "".join(
+            f"{';'.join((root,) + stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def call_tree(self) -> Dict[str, Any]:
+        """Nested call tree; ``total_ms`` includes callees, ``self_ms`` does not."""
+        root: Dict[str, Any] = {"name": f"{self.method} {self.path}", "samples": 0, "self": 0, "children": {}}
+        for stack, count in self.stacks.items():
+            node = root
+            node["samples"] += count
+            for label in stack:
+                node = node["children"].setdefault(label, {"name": label, "samples": 0, "self": 0, "children": {}})
+                node["samples"] += count
+            node["self"] += count
+
+        def finish(node: Dict[str, Any]) -> Dict[str, Any]:
+            children = sorted(node["children"].values(), key=lambda n: n["samples"], reverse=True)
+            return {
+                "name": node["name"],
+                "total_ms": round(node["samples"] * self.ms_per_sample, 2),
+                "self_ms": round(node["self"] * self.ms_per_sample, 2),
+                "samples": node["samples"],
+                "children": [finish(child) for child in children],
+            }
+
+        return finish(root)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.summary(), "ms_per_sample": round(self.ms_per_sample, 3), "call_tree": self.call_tree()}
+
+
+def _stack(frame, stop=None) -> Tuple[str, ...]:
+    """Frame labels outermost first, from above ``stop`` (exclusive) or the thread's entry."""
+    labels = []
+    while frame is not None and frame is not stop:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    if frame is None and stop is not None:
+        return ()
+    labels.reverse()
+    return tuple(labels)
+
+
+_unattributed_warned = False
+
+
+def _unattributed() -> None:
+    global _unattributed_warned
+    if not _unattributed_warned:
+        _unattributed_warned = True
+        logger.warning("Profiler cannot find the request context in AnyIO worker threads; "
+                       "their samples count as [waiting]")
+
+
+def _worker_profile(frame) -> Optional["Profile"]:
+    """Profile of the call an AnyIO worker thread is running, if any."""
+    if frame.f_code.co_filename.endswith(_IDLE_FILES):
+        return None
+    while frame is not None:
+        if frame.f_code.co_name == "run" and "anyio" in frame.f_code.co_filename:
+            context = frame.f_locals.get("context")
+            if isinstance(context, Context):
+                return context.get(current_profile)
+            break
+        frame = frame.f_back
+    _unattributed()
+    return None
+
+
+def _trim_worker(stack: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Drop the thread bootstrap and AnyIO dispatch frames below the call."""
+    for i, label in enumerate(stack):
+        if not label.startswith(("threading.py:", "anyio/")):
+            return stack[i:]
+    return ()
+
+
+class Profiler:
+    """Active profiles, the sampler thread and the finished-profile ring."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: List[Profile] = []
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._finished: deque = deque(maxlen=_env_int("LORIEN_PROFILE_KEEP", 50))
+
+    def start(self, method: str, path: str, trigger: str, anchor) -> Profile:
+        profile = Profile(method, path, trigger, anchor)
+        with self._lock:
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="lorien-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile
+
+    def stop(self, profile: Profile, status: Optional[int], duration_ms: float) -> None:
+        profile.status = status
+        profile.duration_ms = duration_ms
+        profile.anchor = None
+        with self._lock:
+            self._active.remove(profile)
+            keep = _env_int("LORIEN_PROFILE_KEEP", 50)
+            if self._finished.maxlen != keep:
+                self._finished = deque(self._finished, maxlen=keep)
+            self._finished.append(profile)
+        logger.info("Profiled %s %s (%s): %.1f ms, %d samples",
+                    profile.method, profile.path, profile.trigger, duration_ms, profile.samples)
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        last = time.perf_counter()
+        while True:
+            if not self._active:
+                self._wake.clear()
+                if not self._active:
+                    self._wake.wait()
+                last = time.perf_counter()
+            time.sleep(_env_int("LORIEN_PROFILE_INTERVAL_MS", 5) / 1000)
+            now = time.perf_counter()
+            elapsed_ms, last = (now - last) * 1000, now
+            with self._lock:
+                active = list(self._active)
+            if active:
+                self.sample(active, elapsed_ms, skip=me)
+
+    def sample(self, active: List[Profile], elapsed_ms: float, skip: Optional[int] = None) -> None:
+        """Attribute one snapshot of every thread's stack to the active profiles."""
+        frames = sys._current_frames()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        loop_threads = {p.loop_thread for p in active}
+        seen = set()
+        for ident, frame in frames.items():
+            if ident == skip:
+                continue
+            if ident in loop_threads:
+                for profile in active:
+                    if profile.loop_thread == ident and profile.anchor is not None:
+                        stack = _stack(frame, stop=profile.anchor)
+                        if stack:
+                            profile.stacks[stack] += 1
+                            seen.add(profile.id)
+                            break
+            elif names.get(ident) == _WORKER_THREAD:
+                profile = _worker_profile(frame)
+                if profile in active:
+                    stack = _trim_worker(_stack(frame))
+                    if stack:
+                        profile.stacks[stack] += 1
+                        seen.add(profile.id)
+        for profile in active:
+            profile.samples += 1
+            profile.sampled_ms += elapsed_ms
+            if profile.id not in seen:
+                profile.stacks[WAITING] += 1
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self._finished if p.id == profile_id), None)
+
+    def profiles(self) -> List[Profile]:
+        """Finished profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._finished))
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._finished)
+            self._finished.clear()
+        return removed
+
+
+profiler = Profiler()
+
+
+def choose(method: str, path: str, value: Optional[str], state: Dict[str, Any],
+           token: Optional[str], rates: List[Tuple[str, float]], rbac_enabled: bool) -> Optional[str]:
+    """Why this request is profiled (``on_demand`` or ``sampled``), or None."""
+    if value and requested(value, token, state, rbac_enabled):
+        return "on_demand"
+    if rates and random.random() < sample_rate(rates, path):
+        return "sampled"
+    return None
@@ -1,7 +1,7 @@
 from typing import Dict, Any
 import sqlite3
 
-from api.db import get_conn, ensure_schema, tx
+from api.db import SCHEMA_SQL, get_conn, ensure_schema, tx
 
 CLEARABLE_OPTIONAL_TABLES = ["triage", "flags"]  # if present
 DICTIONARY_TABLES = ["dictionary_terms"]         # cleared only when include_dictionary=True
@@ -73,8 +73,15 @@ def clear_nodes_only(conn: sqlite3.Connection) -> None:
     Used for replace mode imports.
     """
     ensure_schema(conn)
+    delete_nodes(conn)
+
+
+def delete_nodes(conn: sqlite3.Connection) -> None:
+    """Delete nodes, outcomes, import hashes and ownership; runs inside the caller's transaction."""
     conn.execute("DELETE FROM outcomes")
     conn.execute("DELETE FROM nodes")
+    conn.execute("DELETE FROM import_row_hashes")
+    conn.execute("DELETE FROM import_owned_nodes")
 
 
 def hard_reset_nodes(conn: sqlite3.Connection) -> None:
@@ -87,6 +94,8 @@ def hard_reset_nodes(conn: sqlite3.Connection) -> None:
     try:
         conn.execute("DROP TABLE IF EXISTS outcomes")
         conn.execute("DROP TABLE IF EXISTS nodes")
+        conn.execute("DELETE FROM import_row_hashes")
+        conn.execute("DELETE FROM import_owned_nodes")
         # Recreate minimal schema exactly as bootstrap does
         conn.execute("""
         CREATE TABLE nodes (
@@ -104,6 +113,8 @@ def hard_reset_nodes(conn: sqlite3.Connection) -> None:
             diagnostic_triage TEXT,
             actions TEXT
         )""")
+        # the tables' indexes went with them; pooled connections skip ensure_schema
+        conn.executescript(SCHEMA_SQL)
         conn.execute("PRAGMA wal_checkpoint(FULL)")
         conn.execute("VACUUM")
     finally:
@@ -1,11 +1,16 @@
-from typing import Optional, Tuple, Dict, Any, List
+from typing import Optional, Tuple, Dict, Any, List, Iterable, Iterator, Callable
 import sqlite3
 import math
 import csv
 import io
+import numpy as np
+import pandas as pd
 from api.db import get_conn, ensure_schema, tx
 from collections import defaultdict
+from api.repositories.admin_repo import delete_nodes
 from api.repositories.validators import ensure_unique_5
+from core.importers.workbook_parse import parse_workbook, DEFAULT_CHUNK_ROWS
+from storage import tracing
 
 try:
     import openpyxl  # ensure dependency exists
@@ -33,10 +38,18 @@ def create_root_if_missing(conn, label: str) -> int:
     lab = sanitize_label(label)
     if not lab:
         raise ValueError("empty_root_label")
+    return _root_or_create(conn, lab)[0]
+
+def _root_or_create(conn, lab: str) -> Tuple[int, bool]:
+    """Returns (root_id, created) for an already sanitized label."""
     row = conn.execute("SELECT id FROM nodes WHERE parent_id IS NULL AND label=?", (lab,)).fetchone()
-    if row: return int(row["id"])
+    if row: return int(row["id"]), False
     cur = conn.execute("INSERT INTO nodes(parent_id,label,depth,slot) VALUES (NULL,?,0,NULL)", (lab,))
-    return int(cur.lastrowid)
+    return int(cur.lastrowid), True
+
+def _own(conn: sqlite3.Connection, node_id: int) -> None:
+    """Mark a node as created by an import (see import_owned_nodes)."""
+    conn.execute("INSERT OR IGNORE INTO import_owned_nodes(node_id) VALUES (?)", (node_id,))
 
 def _is_blank_label(val) -> bool:
     """Check if a label value is blank, None, or NaN."""
@@ -137,74 +150,244 @@ def stats(conn: sqlite3.Connection) -> Dict[str, int]:
         "incomplete_parents": int(incomplete_parents)
     }
 
+def new_import_summary() -> Dict[str, Any]:
+    """Empty import summary in the shape returned by import_dataframe/import_rows."""
+    return {
+        "status": "success",
+        "rows_processed": 0,
+        "created": {"roots": 0, "nodes": 0},
+        "updated": {"nodes": 0, "outcomes": 0},  # updated nodes: no-op in this phase, reserved
+        "skipped": {"overfull_parents": 0}
+    }
+
+def _import_row(conn: sqlite3.Connection, row, summary: Dict[str, Any]) -> Optional[int]:
+    """
+    Apply one canonical row (Series or mapping) to nodes/outcomes, updating summary.
+    Returns the last realized node of the path, or None if the row was skipped.
+    """
+    # Sanitize root label
+    root_label = sanitize_label(row.get("Vital Measurement"))
+    if not root_label:
+        return None  # skip row if no valid root
+    parent_id, root_created = _root_or_create(conn, root_label)
+    # Root creation is not counted here; acceptance relies on stats for node counts.
+    if root_created:
+        _own(conn, parent_id)
+
+    # Walk levels
+    last_node_id = parent_id
+    for i, col in enumerate(["Node 1","Node 2","Node 3","Node 4","Node 5"], start=1):
+        lab = sanitize_label(row.get(col))
+        if not lab:
+            break  # stop deeper creation at first blank
+        node_id, created, skipped = get_or_create_child(conn, last_node_id, lab, i)
+        if skipped:
+            summary["skipped"]["overfull_parents"] += 1
+            break  # cannot go deeper if parent is overfull
+        last_node_id = node_id
+        if created:
+            summary["created"]["nodes"] += 1
+            _own(conn, node_id)
+
+    # Outcomes at the last realized node in path (if any outcome present)
+    triage = sanitize_label(row.get("Diagnostic Triage"))
+    actions = sanitize_label(row.get("Actions"))
+    if last_node_id is not None and (triage or actions):
+        _, u = upsert_outcome(conn, last_node_id, triage, actions)
+        if u: summary["updated"]["outcomes"] += 1
+
+    summary["rows_processed"] += 1
+    return last_node_id
+
+def import_rows(conn: sqlite3.Connection, rows: Iterable[Any],
+                summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Transactionally import an iterable of canonical rows (mappings keyed by CANON_HEADERS).
+
+    Pass the summary returned by a previous call to accumulate totals across
+    batches; each call commits on its own.
+    """
+    if summary is None:
+        summary = new_import_summary()
+    before = summary["rows_processed"]
+    with tracing.span("import.batch") as span, tx(conn):
+        for row in rows:
+            _import_row(conn, row, summary)
+        if span is not None:
+            span.set(rows=summary["rows_processed"] - before)
+    return summary
+
+def _create_stage(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_stage ("
+                 "seq INTEGER PRIMARY KEY, vital, n1, n2, n3, n4, n5, triage, actions)")
+
+def drop_stage(conn: sqlite3.Connection) -> None:
+    """Discard this connection's staged rows (pooled connections outlive the request)."""
+    conn.execute("DROP TABLE IF EXISTS temp.import_stage")
+
+def stage_rows(conn: sqlite3.Connection, rows: Iterable[Any]) -> int:
+    """
+    Append canonical rows to this connection's TEMP staging table.
+
+    Replace-mode stream imports stage the whole feed first, so nothing in
+    ``nodes`` changes until ``replace_from_stage`` swaps it in.
+    """
+    _create_stage(conn)
+    with tx(conn):
+        cur = conn.executemany(
+            "INSERT INTO temp.import_stage (vital, n1, n2, n3, n4, n5, triage, actions) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ([row.get(h) for h in CANON_HEADERS] for row in rows))
+    return cur.rowcount
+
+def replace_from_stage(conn: sqlite3.Connection, batch_size: int = 1000) -> Dict[str, Any]:
+    """Clear nodes/outcomes and import every staged row in one transaction, then drop the stage."""
+    summary = new_import_summary()
+    _create_stage(conn)
+    try:
+        with tracing.span("import.replace") as span, tx(conn):
+            delete_nodes(conn)
+            cur = conn.execute("SELECT vital, n1, n2, n3, n4, n5, triage, actions "
+                               "FROM temp.import_stage ORDER BY seq")
+            while True:
+                staged = cur.fetchmany(batch_size)
+                if not staged:
+                    break
+                for values in staged:
+                    _import_row(conn, dict(zip(CANON_HEADERS, values)), summary)
+            if span is not None:
+                span.set(rows=summary["rows_processed"])
+    finally:
+        drop_stage(conn)
+    return summary
+
+def import_path_batches(conn: sqlite3.Connection, batches: Iterable[Any],
+                        summary: Optional[Dict[str, Any]] = None,
+                        on_batch: Optional[Callable[[Any, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Single-writer stage: apply parsed PathBatch objects in the order given.
+
+    Each batch commits on its own; ``on_batch(batch, summary)`` runs after
+    every commit (progress reporting).
+    """
+    if summary is None:
+        summary = new_import_summary()
+    for batch in batches:
+        import_rows(conn, batch.records, summary)
+        if on_batch is not None:
+            on_batch(batch, summary)
+    return summary
+
+def import_workbook(conn: sqlite3.Connection, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                    on_batch: Optional[Callable[[Any, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Parse ``path`` in batches and apply them through the single writer."""
+    ensure_schema(conn)
+    return import_path_batches(conn, parse_workbook(path, chunk_rows=chunk_rows), on_batch=on_batch)
+
 def import_dataframe(conn: sqlite3.Connection, df) -> Dict[str, Any]:
     """
     Transactionally import a canonical dataframe into nodes/outcomes
     """
     ensure_schema(conn)
-    created_roots = 0
-    created_nodes = 0
-    updated_nodes = 0  # (no-op in this phase, reserved)
-    created_outcomes = 0
-    updated_outcomes = 0
-    skipped_overfull = 0
-    rows_processed = 0
+    return import_rows(conn, (row for _, row in df.iterrows()))
 
-    with tx(conn):
-        for _, row in df.iterrows():
-            # Sanitize root label
-            root_label = sanitize_label(row.get("Vital Measurement"))
-            if not root_label:
-                continue  # skip row if no valid root
-            parent_id = create_root_if_missing(conn, root_label)
-            # Count root creation by checking immediate existence delta is tricky; we tolerate approximate:
-            # treat as creation if no prior path existed at this moment (optional). We skip root count accuracy here.
-            # (We'll count nodes via stats for acceptance instead.)
-
-            # Walk levels
-            last_node_id = parent_id
-            depth = 0
-            child_count = 0
-            for i, col in enumerate(["Node 1","Node 2","Node 3","Node 4","Node 5"], start=1):
-                lab = sanitize_label(row.get(col))
-                if not lab:
-                    break  # stop deeper creation at first blank
-                node_id, created, skipped = get_or_create_child(conn, last_node_id, lab, i)
-                if skipped:
-                    skipped_overfull += 1
-                    break  # cannot go deeper if parent is overfull
-                last_node_id = node_id
-                depth = i
-                child_count += 1
-                if created: created_nodes += 1
-
-            # Outcomes at the last realized node in path (if any outcome present)
-            triage = sanitize_label(row.get("Diagnostic Triage"))
-            actions = sanitize_label(row.get("Actions"))
-            if last_node_id is not None and (triage or actions):
-                c, u = upsert_outcome(conn, last_node_id, triage, actions)
-                if c: created_outcomes += 1
-                if u: updated_outcomes += 1
-
-            rows_processed += 1
+def _hash_columns(frame) -> "np.ndarray":
+    """Vectorized 64-bit row hashes, reinterpreted as signed for SQLite INTEGER storage."""
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view(np.int64)
 
-    return {
-        "status": "success",
-        "rows_processed": rows_processed,
-        "created": {"roots": created_roots, "nodes": created_nodes},
-        "updated": {"nodes": updated_nodes, "outcomes": updated_outcomes},
-        "skipped": {"overfull_parents": skipped_overfull}
-    }
+def _remove_imported_path(conn: sqlite3.Connection, leaf_id: int, keep_ids: set) -> int:
+    """
+    Drop the outcome at a path terminal, then prune the node and any ancestors
+    left childless, stopping at nodes still owned by another imported path and
+    at nodes no import created (hand-made, or imported before ownership was
+    recorded). Returns the number of nodes deleted.
+    """
+    conn.execute("DELETE FROM outcomes WHERE node_id=?", (leaf_id,))
+    deleted = 0
+    nid = leaf_id
+    while nid is not None and nid not in keep_ids:
+        row = conn.execute(
+            "SELECT parent_id, EXISTS(SELECT 1 FROM nodes c WHERE c.parent_id = n.id) AS has_kids, "
+            "EXISTS(SELECT 1 FROM import_owned_nodes o WHERE o.node_id = n.id) AS owned "
+            "FROM nodes n WHERE n.id=?", (nid,)
+        ).fetchone()
+        if row is None or row["has_kids"] or not row["owned"]:
+            break
+        conn.execute("DELETE FROM nodes WHERE id=?", (nid,))
+        deleted += 1
+        nid = row["parent_id"]
+    return deleted
 
-def export_rows(conn: sqlite3.Connection, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+def import_dataframe_incremental(conn: sqlite3.Connection, df) -> Dict[str, Any]:
     """
-    Reconstruct rows in the canonical 8-column shape from persisted nodes + outcomes.
-    A row represents the path from a root to:
-      - any leaf (no children), OR
-      - any node explicitly having an outcome.
+    Re-import a canonical dataframe, applying only paths whose content changed.
+
+    Each path (root + Node 1..5) is keyed by a hash of its labels and stored with
+    a hash of the full 8-column row. Incoming rows are hashed in bulk and diffed
+    against the stored hashes: new and changed paths are applied, vanished paths
+    are removed, and unchanged rows are skipped. A stored path whose terminal
+    node has since been deleted counts as changed and is re-applied.
     """
-    # Recursive CTE to build paths and pivot depths into columns
-    base_cte = """
+    ensure_schema(conn)
+    frame = df[CANON_HEADERS].where(df[CANON_HEADERS].notna(), "")
+    frame = frame[frame["Vital Measurement"] != ""].reset_index(drop=True)
+
+    incoming = pd.DataFrame({
+        "path_key": _hash_columns(frame[CANON_HEADERS[:6]]),
+        "row_hash": _hash_columns(frame),
+        "pos": np.arange(len(frame)),
+    }).drop_duplicates("path_key", keep="last")
+    stored = pd.read_sql_query("""
+        SELECT h.path_key, h.row_hash AS stored_hash, h.leaf_id,
+               (n.id IS NOT NULL) AS present
+        FROM import_row_hashes h
+        LEFT JOIN nodes n ON n.id = h.leaf_id
+    """, conn)
+    merged = incoming.merge(stored, on="path_key", how="outer", indicator=True)
+
+    both = merged[merged["_merge"] == "both"]
+    stale = (both["row_hash"] != both["stored_hash"]) | (both["present"] == 0)
+    inserted = merged[merged["_merge"] == "left_only"]
+    changed = both[stale]
+    removed = merged[merged["_merge"] == "right_only"]
+    unchanged_paths = int((~stale).sum())
+
+    summary = new_import_summary()
+    records = frame.to_dict("records")
+    apply = pd.concat([inserted, changed]).sort_values("pos")
+    nodes_removed = 0
+
+    with tx(conn):
+        for pos, path_key, row_hash in zip(apply["pos"].astype(int), apply["path_key"], apply["row_hash"]):
+            rec = records[pos]
+            leaf_id = _import_row(conn, rec, summary)
+            if leaf_id is not None and not rec["Diagnostic Triage"] and not rec["Actions"]:
+                conn.execute("DELETE FROM outcomes WHERE node_id=?", (leaf_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO import_row_hashes(path_key, row_hash, leaf_id, updated_at) "
+                "VALUES (?,?,?,strftime('%Y-%m-%dT%H:%M:%fZ','now'))",
+                (int(path_key), int(row_hash), leaf_id)
+            )
+
+        if len(removed):
+            conn.executemany("DELETE FROM import_row_hashes WHERE path_key=?",
+                             [(int(k),) for k in removed["path_key"]])
+            keep_ids = {r[0] for r in conn.execute("SELECT leaf_id FROM import_row_hashes WHERE leaf_id IS NOT NULL")}
+            for leaf_id in removed["leaf_id"].dropna().astype(int):
+                nodes_removed += _remove_imported_path(conn, int(leaf_id), keep_ids)
+
+    summary["skipped"]["unchanged_rows"] = len(frame) - len(apply)
+    summary["incremental"] = {
+        "inserted": int(len(inserted)),
+        "changed": int(len(changed)),
+        "unchanged": unchanged_paths,
+        "removed": int(len(removed)),
+        "nodes_removed": nodes_removed,
+    }
+    return summary
+
+# Recursive CTE to build paths and pivot depths into columns
+_EXPORT_CHAIN_CTE = """
     WITH RECURSIVE chain AS (
       SELECT
         id, parent_id, label, depth,
@@ -226,8 +409,7 @@ def export_rows(conn: sqlite3.Connection, limit: int = 50, offset: int = 0) -> D
     )
     """
 
-    rows_sql = f"""
-    {base_cte}
+_EXPORT_ROWS_SQL = _EXPORT_CHAIN_CTE + """
     SELECT
       chain.root_label AS "Vital Measurement",
       chain.n1 AS "Node 1",
@@ -250,11 +432,22 @@ def export_rows(conn: sqlite3.Connection, limit: int = 50, offset: int = 0) -> D
       "Node 3" ASC,
       "Node 4" ASC,
       "Node 5" ASC
+    """
+
+def export_rows(conn: sqlite3.Connection, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+    """
+    Reconstruct rows in the canonical 8-column shape from persisted nodes + outcomes.
+    A row represents the path from a root to:
+      - any leaf (no children), OR
+      - any node explicitly having an outcome.
+    """
+    rows_sql = f"""
+    {_EXPORT_ROWS_SQL}
     LIMIT ? OFFSET ?;
     """
 
     total_sql = f"""
-    {base_cte}
+    {_EXPORT_CHAIN_CTE}
     SELECT COUNT(*)
     FROM (
       SELECT chain.id
@@ -284,6 +477,29 @@ def export_rows(conn: sqlite3.Connection, limit: int = 50, offset: int = 0) -> D
         })
     return {"items": items, "total": total, "limit": int(limit), "offset": int(offset)}
 
+def iter_export_rows(conn: sqlite3.Connection, batch_size: int = 1000) -> Iterator[tuple]:
+    """Stream every export row (same shape and order as export_rows) as 8-tuples."""
+    cur = conn.execute(_EXPORT_ROWS_SQL)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        for r in rows:
+            yield tuple(r)
+
+def iter_node_rows(conn: sqlite3.Connection, batch_size: int = 1000) -> Iterator[tuple]:
+    """Stream raw nodes as (id, parent_id, depth, slot, label, is_leaf) tuples."""
+    cur = conn.execute("""
+        SELECT id, parent_id, depth, slot, label, CASE WHEN depth = 5 THEN 1 ELSE 0 END
+        FROM nodes ORDER BY id
+    """)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        for r in rows:
+            yield tuple(r)
+
 def missing_slots(conn: sqlite3.Connection, limit: int, offset: int, depth: Optional[int] = None, q: Optional[str] = None) -> Dict[str, Any]:
     where = []
     params: List[Any] = []
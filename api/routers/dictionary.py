@@ -2,16 +2,18 @@
 Dictionary router for medical term administration.
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File
 from pydantic import BaseModel, Field, constr
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, get_args
+import pandas as pd
 import sqlite3
 import logging
 import re
 from datetime import datetime, timezone
 
-from api.db import get_conn, ensure_schema
+from api.db import get_conn, ensure_schema, tx
 from ..core.validators import validate_dictionary_term, normalize_term
+from ..core.uploads import spool_upload
 
 router = APIRouter(prefix="/dictionary", tags=["dictionary"])
 logger = logging.getLogger(__name__)
@@ -19,6 +21,10 @@ logger = logging.getLogger(__name__)
 # Locked dictionary types
 DictType = Literal["vital_measurement", "node_label", "outcome_template"]
 
+# Columns accepted by the bulk import; type and term are required
+IMPORT_REQUIRED_COLUMNS = ["type", "term"]
+IMPORT_OPTIONAL_COLUMNS = ["hints", "red_flag"]
+
 
 def _normalize(s: str) -> str:
     """Normalize term: lowercase + internal whitespace collapsed + trimmed."""
@@ -214,4 +220,102 @@ def normalize_term(
 
     except Exception as e:
         logger.exception("Error normalizing term")
-        raise HTTPException(status_code=500, detail="Database error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Database error")
+
+def _import_cell(value) -> str:
+    if value is None:
+        return ""
+    s = str(value).strip()
+    return "" if s.lower() == "nan" else s
+
+
+@router.post("/import")
+async def import_terms(file: Optional[UploadFile] = File(None)):
+    """
+    Bulk import dictionary terms from CSV or Excel.
+
+    Rows upsert on (type, normalized term); blank rows, unknown types and
+    invalid terms are skipped.
+    """
+    if file is None or not file.filename:
+        raise HTTPException(status_code=422, detail=[{
+            "loc": ["body", "file"], "msg": "No file provided", "type": "value_error.no_file"
+        }])
+
+    name = file.filename.lower()
+    if not name.endswith((".csv", ".xlsx", ".xls")):
+        raise HTTPException(status_code=422, detail=[{
+            "loc": ["body", "file"], "msg": "Only .csv, .xlsx and .xls files are supported",
+            "type": "value_error.invalid_file_type", "ctx": {"filename": file.filename}
+        }])
+
+    with await spool_upload(file) as upload:
+        try:
+            if name.endswith(".csv"):
+                handle = upload.open()
+                width = len(pd.read_csv(handle, nrows=0).columns)
+                handle.seek(0)
+                # Trailing delimiters on blank rows (",,,") are truncated rather than rejected
+                df = pd.read_csv(handle, dtype=object, keep_default_na=False,
+                                 engine="python", on_bad_lines=lambda cells: cells[:width])
+            else:
+                df = pd.read_excel(upload.open(), dtype=object)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=[{
+                "loc": ["body", "file"], "msg": f"Could not parse file: {e}", "type": "value_error.file_parse"
+            }])
+
+    received = [str(c).strip().lower() for c in df.columns]
+    missing = [c for c in IMPORT_REQUIRED_COLUMNS if c not in received]
+    if missing:
+        raise HTTPException(status_code=422, detail=[{
+            "loc": ["body", "file"], "msg": "Dictionary header mismatch", "type": "value_error.csv_schema",
+            "ctx": {"missing": missing, "expected": IMPORT_REQUIRED_COLUMNS + IMPORT_OPTIONAL_COLUMNS,
+                    "received": received}
+        }])
+    df.columns = received
+
+    allowed_types = set(get_args(DictType))
+    inserted = updated = skipped = 0
+    now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+    conn = get_conn()
+    try:
+        ensure_schema(conn)
+        with tx(conn):
+            for rec in df.to_dict("records"):
+                term_type = _import_cell(rec.get("type"))
+                term = _import_cell(rec.get("term"))
+                if term_type not in allowed_types:
+                    skipped += 1
+                    continue
+                try:
+                    validate_dictionary_term(term, "term")
+                except ValueError:
+                    skipped += 1
+                    continue
+                hints = _import_cell(rec.get("hints")) or None
+                red_flag = 1 if _import_cell(rec.get("red_flag")).lower() in ("1", "true", "yes", "y") else 0
+                normalized = _normalize(term)
+
+                row = conn.execute(
+                    "SELECT id FROM dictionary_terms WHERE type = ? AND normalized = ?",
+                    (term_type, normalized)
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE dictionary_terms SET term = ?, hints = ?, red_flag = ?, updated_at = ? WHERE id = ?",
+                        (term, hints, red_flag, now, row[0])
+                    )
+                    updated += 1
+                else:
+                    conn.execute("""
+                        INSERT INTO dictionary_terms (type, term, normalized, hints, red_flag, updated_at, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (term_type, term, normalized, hints, red_flag, now, now))
+                    inserted += 1
+    finally:
+        conn.close()
+
+    return {"inserted": inserted, "updated": updated, "skipped": skipped,
+            "size_bytes": upload.size_bytes, "sha256": upload.sha256}
@@ -145,8 +145,9 @@ def update_parent_children(
         raise HTTPException(status_code=404, detail="Parent not found")
 
     # 4) Check optimistic concurrency
+    submitted = [child.model_dump() for child in body.children]
     if client_version is not None and client_version != current["version"]:
-        conflicts = build_slot_conflicts(body.children, current)
+        conflicts = build_slot_conflicts(submitted, current)
         if conflicts:
             # Add client version to each conflict
             for conflict in conflicts:
@@ -161,7 +162,7 @@ def update_parent_children(
 
     # 6) Apply updates
     try:
-        result = children_update_apply(repo, parent_id, body.children, current["version"])
+        result = children_update_apply(repo, parent_id, submitted, current["version"])
         return result
     except Exception as e:
         logger.exception("Error updating parent children")
@@ -2,12 +2,19 @@
 Health check router for the decision tree API.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Dict, Any
 import os
+import sqlite3
+import threading
+import time
 
 from ..dependencies import get_repository
 from storage.sqlite import SQLiteRepository
+from storage import querystats
+from storage.integrity import cached_results, integrity_scanner, summarize
 from core.version import __version__
 from ..models import HealthResponse, DBInfo
 
@@ -60,6 +67,74 @@ async def health_metrics():
     metrics_data = await _get_runtime_metrics()
     return metrics_data
 
+
+@router.get("/health/metrics/prometheus")
+async def health_metrics_prometheus():
+    """
+    Telemetry counters and latency histograms in Prometheus text format.
+
+    Only available when ANALYTICS_ENABLED=true. In multi-worker deployments
+    (LORIEN_METRICS_DIR) the values cover every worker.
+    """
+    analytics_enabled = os.getenv("ANALYTICS_ENABLED", "false").lower() == "true"
+    if not analytics_enabled:
+        raise HTTPException(status_code=404, detail="Analytics disabled")
+
+    from ..metrics import prometheus_text
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/health/sql")
+async def health_sql():
+    """
+    Per-route SQL totals: queries, SQL time, slowest statements, N+1 suspects.
+
+    Only available when LORIEN_SQL_TRACE=true; covers this process only.
+    """
+    if not querystats.enabled():
+        raise HTTPException(status_code=404, detail="SQL tracing disabled")
+    return {"repeat_threshold": querystats.repeat_threshold(), "routes": querystats.route_stats()}
+
+
+@router.get("/health/integrity")
+async def integrity_status(repo: SQLiteRepository = Depends(get_repository)):
+    """
+    Last integrity scan results, answered from the cache.
+
+    Returns:
+        200 with an overall summary, the latest quick / full / foreign_keys
+        result (each with age_seconds, or null if never run) and the scans
+        currently in progress
+    """
+    results = cached_results(repo.db_path)
+    return {
+        "summary": summarize(results),
+        "results": results,
+        "in_progress": integrity_scanner.in_progress(),
+        "scheduler_running": integrity_scanner.running,
+    }
+
+
+@router.post("/health/integrity/scan", status_code=status.HTTP_202_ACCEPTED)
+async def start_integrity_scan(
+    kind: str = Query("quick", pattern="^(quick|full|foreign_keys)$"),
+    wait: bool = Query(False, description="Block until the scan has finished"),
+    repo: SQLiteRepository = Depends(get_repository)
+):
+    """
+    Start an integrity scan in the background.
+
+    A scan of a kind already running is not started twice. With
+    ``wait=true`` the stored result is returned once the scan finishes.
+    """
+    integrity_scanner.attach(repo.db_path)
+    finished = integrity_scanner.trigger(kind)
+    if wait:
+        await run_in_threadpool(finished.wait)
+        return {"kind": kind, "state": "completed", "result": cached_results(repo.db_path)[kind]}
+    return {"kind": kind, "state": "running"}
+
+
 async def _check_database_health(repo: SQLiteRepository) -> Dict[str, Any]:
     """Check database configuration and health."""
     try:
@@ -86,7 +161,9 @@ async def _check_database_health(repo: SQLiteRepository) -> Dict[str, Any]:
                 "wal": journal_mode == "wal",
                 "foreign_keys": bool(foreign_keys),
                 "page_size": page_size,
-                "path": db_path
+                "path": db_path,
+                # Cached scanner verdict; never runs a check inline
+                "integrity": summarize(cached_results(db_path))
             }
     except Exception as e:
         return {
@@ -111,64 +188,76 @@ async def _check_features() -> Dict[str, bool]:
         "llm": llm_enabled
     }
 
+def _count_rows(cursor, table: str) -> int:
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    except sqlite3.OperationalError:  # table not in this schema
+        return 0
+    return cursor.fetchone()[0]
+
+# Row counts cost a table scan each; scrapes within this window reuse them
+COUNTS_TTL_SECONDS = 60
+_counts_cache: Dict[str, Any] = {}
+_counts_lock = threading.Lock()
+
+
+def _table_counts() -> Dict[str, Any]:
+    """Table counts and audit retention status, cached per database for COUNTS_TTL_SECONDS."""
+    # Import here to avoid circular dependencies
+    from storage.sqlite import SQLiteRepository
+    repo = SQLiteRepository()
+    db_path = repo.get_resolved_db_path()
+    with _counts_lock:
+        cached = _counts_cache.get(db_path)
+        if cached is not None and time.monotonic() - cached[0] < COUNTS_TTL_SECONDS:
+            return cached[1]
+
+    with repo._get_connection() as conn:
+        cursor = conn.cursor()
+
+        # Count records in main tables (non-PHI)
+        table_counts = {table: _count_rows(cursor, table)
+                        for table in ("nodes", "red_flags", "red_flag_audit", "triage")}
+
+        # Get audit retention status
+        try:
+            cursor.execute("SELECT retention_status FROM audit_retention_status LIMIT 1")
+            retention_status = cursor.fetchone()
+            retention_status = retention_status[0] if retention_status else "UNKNOWN"
+        except:
+            retention_status = "VIEW_NOT_AVAILABLE"
+
+    counts = {"table_counts": table_counts, "retention_status": retention_status}
+    with _counts_lock:
+        _counts_cache[db_path] = (time.monotonic(), counts)
+    return counts
+
+
 async def _get_runtime_metrics() -> Dict[str, Any]:
     """Get runtime metrics (non-PHI counters only)."""
+    # Import here to avoid circular dependencies
+    from ..metrics import snapshot
+
+    # Histogram-backed: O(buckets) per route, no sorting
+    telemetry = snapshot()
     try:
-        # Import here to avoid circular dependencies
-        from ..metrics import snapshot
-        
-        # Get telemetry snapshot
-        telemetry = snapshot()
-        
-        # Import here to avoid circular dependencies
-        from storage.sqlite import SQLiteRepository
-        repo = SQLiteRepository()
-        
-        with repo._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Count records in main tables (non-PHI)
-            cursor.execute("SELECT COUNT(*) FROM nodes")
-            node_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM red_flags")
-            flag_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM red_flag_audit")
-            audit_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM triage")
-            triage_count = cursor.fetchone()[0]
-            
-            # Get audit retention status
-            try:
-                cursor.execute("SELECT retention_status FROM audit_retention_status LIMIT 1")
-                retention_status = cursor.fetchone()
-                retention_status = retention_status[0] if retention_status else "UNKNOWN"
-            except:
-                retention_status = "VIEW_NOT_AVAILABLE"
-            
-            return {
-                "telemetry": telemetry,
-                "table_counts": {
-                    "nodes": node_count,
-                    "red_flags": flag_count,
-                    "red_flag_audit": audit_count,
-                    "triage": triage_count
-                },
-                "audit_retention": {
-                    "status": retention_status,
-                    "total_audit_rows": audit_count
-                },
-                "cache": {
-                    "enabled": True,
-                    "ttl_seconds": 300  # 5 minutes default
-                }
+        counts = await run_in_threadpool(_table_counts)
+        return {
+            "telemetry": telemetry,
+            "table_counts": dict(counts["table_counts"]),
+            "audit_retention": {
+                "status": counts["retention_status"],
+                "total_audit_rows": counts["table_counts"]["red_flag_audit"]
+            },
+            "cache": {
+                "enabled": True,
+                "ttl_seconds": COUNTS_TTL_SECONDS
             }
+        }
     except Exception as e:
         return {
             "error": str(e),
-            "telemetry": {},
+            "telemetry": telemetry,
             "table_counts": {},
             "audit_retention": {"status": "ERROR"},
             "cache": {"enabled": False}
@@ -7,10 +7,10 @@ from pydantic import BaseModel
 from typing import List, Optional
 import logging
 import pandas as pd
-import io
 from datetime import datetime
 
 from ..dependencies import get_repository
+from ..core.uploads import spool_upload
 from storage.sqlite import SQLiteRepository
 from core.import_export import assert_csv_header
 
@@ -59,18 +59,30 @@ async def import_excel(
         
         logger.info(f"Created import job {job_id} for file {file.filename}")
         
-        # Read file content
-        content = await file.read()
+        # Spool the upload instead of buffering it whole; a rejected upload
+        # (413) must not leave the job queued forever
+        try:
+            upload = await spool_upload(file)
+        except HTTPException as e:
+            repo.update_import_job(
+                job_id,
+                state="failed",
+                message=f"Upload rejected: {e.status_code}",
+                finished_at=datetime.utcnow().isoformat()
+            )
+            logger.error(f"Import job {job_id} failed: upload rejected ({e.status_code})")
+            raise
         
         # Update job with actual size
-        repo.update_import_job(job_id, size_bytes=len(content))
+        repo.update_import_job(job_id, size_bytes=upload.size_bytes)
         
         # Update job state to processing
         repo.update_import_job(job_id, state="processing")
         
         try:
             # Parse Excel file
-            df = pd.read_excel(io.BytesIO(content))
+            with upload:
+                df = pd.read_excel(upload.open())
             
             # Validate headers
             headers = df.columns.tolist()
@@ -121,7 +133,7 @@ async def import_excel(
                 finished_at=datetime.utcnow().isoformat(),
                 message="Import completed successfully",
                 filename=file.filename,
-                size_bytes=len(content)
+                size_bytes=upload.size_bytes
             )
             
         except HTTPException:
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 import pandas as pd
 import io
 import numpy as np
 
 from api.db import get_conn, ensure_schema, tx
-from api.repositories.tree_repo import import_dataframe, CANON_HEADERS, sanitize_label
+from api.repositories.tree_repo import (import_dataframe, import_dataframe_incremental, import_rows, replace_from_stage,
+                                        drop_stage, stage_rows, CANON_HEADERS, sanitize_label)
+from core.importers.stream_import import PathRecordDecoder, StreamFormatError, format_from_content_type
 from api.repositories.admin_repo import clear_nodes_only, hard_reset_nodes
 
 router = APIRouter()
@@ -70,7 +74,7 @@ async def import_preview(file: UploadFile = File(...)):
     return JSONResponse({"ok": True, "rows": int(df.shape[0]), "roots_detected": uniq, "roots_count": len(uniq)})
 
 @router.post("/import")
-async def import_file(file: UploadFile = File(...), mode: str = Query("append", pattern="^(append|replace|hard_replace)$")):
+async def import_file(file: UploadFile = File(...), mode: str = Query("append", pattern="^(append|replace|hard_replace|incremental)$")):
     # Parse file into DataFrame
     try:
         df = _read_table_like(file.file, file.filename)
@@ -108,6 +112,72 @@ async def import_file(file: UploadFile = File(...), mode: str = Query("append",
         hard_reset_nodes(conn)  # drop and recreate tables
     elif mode == "replace":
         clear_nodes_only(conn)  # keep dictionary & schema intact
-    result = import_dataframe(conn, df)
+    if mode == "incremental":
+        result = import_dataframe_incremental(conn, df)  # apply only new/changed/removed paths
+    else:
+        result = import_dataframe(conn, df)
 
     return JSONResponse({"ok": True, "rows": int(len(df)), "mode": mode, "result": result})
+
+
+@router.post("/import/stream")
+async def import_stream(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    mode: str = Query("append", pattern="^(append|replace)$"),
+    batch_size: int = Query(1000, ge=1, le=50000),
+):
+    """
+    Stream the canonical 8-column CSV (with header) or NDJSON path records
+    straight from the request body into the bulk import engine.
+
+    The body is decoded incrementally and applied in batches of ``batch_size``
+    rows, each committed on its own, so feeds of any size import without being
+    buffered. Format comes from ``format`` or the Content-Type header.
+
+    ``mode=replace`` stages the batches in a TEMP table instead; once the
+    whole body has decoded, the clear and the import run in one transaction,
+    so a bad record anywhere in the feed leaves the existing tree untouched.
+    """
+    fmt = format or format_from_content_type(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Use text/csv or application/x-ndjson, or pass ?format=csv|ndjson")
+
+    decoder = PathRecordDecoder(fmt)
+    conn = get_conn()
+    ensure_schema(conn)
+    summary = None
+    batches = 0
+    pending = []
+
+    async def _apply(rows):
+        nonlocal summary, batches
+        if mode == "replace":
+            await run_in_threadpool(stage_rows, conn, rows)
+        else:
+            summary = await run_in_threadpool(import_rows, conn, rows, summary)
+        batches += 1
+
+    try:
+        async for chunk in request.stream():
+            pending.extend(decoder.feed(chunk))
+            while len(pending) >= batch_size:
+                await _apply(pending[:batch_size])
+                del pending[:batch_size]
+        pending.extend(decoder.close())
+        if pending or batches == 0:
+            await _apply(pending)
+        if mode == "replace":
+            summary = await run_in_threadpool(replace_from_stage, conn, batch_size)
+    except StreamFormatError as e:
+        ctx = dict(e.args[0])
+        ctx["rows_committed"] = summary["rows_processed"] if summary else 0
+        raise HTTPException(status_code=422, detail=[{"loc": ["body"], "msg": ctx.get("msg", "Invalid record"),
+                                                      "type": "value_error.stream_record", "ctx": ctx}])
+    finally:
+        if mode == "replace":
+            drop_stage(conn)  # a feed that failed mid-stream leaves its rows staged
+        conn.close()
+
+    return JSONResponse({"ok": True, "format": fmt, "rows": decoder.rows_decoded, "batches": batches,
+                         "mode": mode, "result": summary})
@@ -7,12 +7,12 @@ Delegates to existing import logic with strict 422 ctx for schema errors.
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from fastapi.responses import JSONResponse
 import pandas as pd
-import io
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO
 import logging
 
 from ..dependencies import get_repository, get_db_connection
+from ..core.uploads import spool_upload
 from storage.sqlite import SQLiteRepository
 from core.import_export import assert_csv_header
 import sqlite3
@@ -157,12 +157,12 @@ def _ensure_leaf_path(cursor: sqlite3.Cursor, root_id: int, node_labels: list) -
     return current_id
 
 
-def _process_import(content: bytes, filename: str, repo: SQLiteRepository) -> Dict[str, Any]:
+def _process_import(source: BinaryIO, filename: str, repo: SQLiteRepository) -> Dict[str, Any]:
     """
     Process import file with strict validation.
 
     Args:
-        content: File content as bytes
+        source: Seekable handle on the uploaded workbook
         filename: Original filename
 
     Returns:
@@ -173,7 +173,7 @@ def _process_import(content: bytes, filename: str, repo: SQLiteRepository) -> Di
     """
     try:
         # Parse Excel file
-        df = pd.read_excel(io.BytesIO(content))
+        df = pd.read_excel(source)
 
         # Validate headers with strict ctx
         headers = df.columns.tolist()
@@ -234,11 +234,10 @@ async def import_workbook(
         )
 
     try:
-        # Read file content
-        content = await file.read()
-
-        # Process import with strict validation
-        result = _process_import(content, file.filename, repo)
+        # Spool the upload instead of buffering it whole
+        with await spool_upload(file) as upload:
+            # Process import with strict validation
+            result = _process_import(upload.open(), file.filename, repo)
 
         return result
 
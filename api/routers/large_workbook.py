@@ -16,6 +16,8 @@ from datetime import datetime, timezone
 from pydantic import BaseModel
 
 from ..dependencies import get_repository
+from ..core.uploads import spool_upload
+from storage import tracing
 from storage.sqlite import SQLiteRepository
 from ..core.large_workbook_manager import (
     LargeWorkbookManager,
@@ -74,11 +76,10 @@ async def create_import_job(
         )
     
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Parse Excel file to get row count
-        df = pd.read_excel(io.BytesIO(content))
+        # Spool the upload instead of buffering it whole
+        with await spool_upload(file) as upload:
+            # Parse Excel file to get row count
+            df = pd.read_excel(upload.open())
         total_rows = len(df)
         
         # Validate headers
@@ -111,7 +112,8 @@ async def create_import_job(
                 chunk_size=chunk_size,
                 metadata={
                     "strategy": strategy,
-                    "file_size_bytes": len(content),
+                    "file_size_bytes": upload.size_bytes,
+                    "sha256": upload.sha256,
                     "created_at": datetime.now(timezone.utc).isoformat()
                 }
             )
@@ -570,11 +572,12 @@ async def process_import_job(job_id: str, repo: SQLiteRepository):
                     
                     # Process chunk (this would need the actual file data)
                     # For now, we'll just mark it as completed
-                    manager._update_chunk_status(chunk["id"], "completed")
-                    
-                    # Update progress
-                    progress = manager.get_job_progress(job_id)
-                    manager.update_job_status(job_id, ImportStatus.PROCESSING, progress.__dict__)
+                    with tracing.span("import.chunk", chunk_id=chunk["id"]):
+                        manager._update_chunk_status(chunk["id"], "completed")
+                        
+                        # Update progress
+                        progress = manager.get_job_progress(job_id)
+                        manager.update_job_status(job_id, ImportStatus.PROCESSING, progress.__dict__)
                     
                 except Exception as e:
                     logging.error(f"Error processing chunk {chunk['id']}: {e}")
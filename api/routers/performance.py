@@ -5,15 +5,23 @@ Provides endpoints for monitoring database performance, managing indexes,
 and streaming large exports.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List
+from starlette.concurrency import run_in_threadpool
 import logging
+import os
 import io
 import csv
 
 from ..dependencies import get_repository
 from storage.sqlite import SQLiteRepository
+from storage.maintenance import MANUAL_TASKS, TASKS, maintenance
+from storage.index_advisor import index_advisor
+from storage.slowlog import slow_queries, threshold_ms
+from storage import tracing
+from ..profiling import profile_token, profiler, sample_rates
 from ..repositories.performance import PerformanceOptimizer, StreamingCSVExporter, get_cache_stats, clear_navigation_cache
 
 router = APIRouter(tags=["performance"])
@@ -118,6 +126,235 @@ async def analyze_query_performance(
             }
         )
 
+@router.get("/admin/performance/slow-queries")
+def get_slow_queries(limit: int = Query(50, ge=1, le=500)):
+    """
+    Slow-query log grouped by query fingerprint, most total time first.
+    
+    Statements taking LORIEN_SLOW_QUERY_MS or longer are logged with their
+    parameter shape, duration and EXPLAIN QUERY PLAN. Entries logged before
+    the log was switched off are still reported.
+    
+    Returns:
+        200 with groups (count, p95/max/total ms, routes, plan) and
+        full_scan set for plans that read the whole nodes table
+    """
+    try:
+        groups = slow_queries.summary(limit)
+    except Exception as e:
+        logging.error(f"Error reading slow-query log: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Failed to read slow-query log",
+                "message": str(e)
+            }
+        )
+    return {
+        "enabled": threshold_ms() is not None,
+        "threshold_ms": threshold_ms(),
+        "groups": groups,
+        "full_scan_groups": sum(1 for g in groups if g["full_scan"]),
+        "status": "healthy"
+    }
+
+@router.delete("/admin/performance/slow-queries")
+def clear_slow_queries():
+    """
+    Empty the slow-query log.
+    
+    Returns:
+        200 with the number of entries removed
+    """
+    return {"removed": slow_queries.clear(), "status": "completed"}
+
+@router.get("/admin/performance/profiles")
+async def list_profiles():
+    """
+    Request profiles kept by this worker process, newest first.
+    
+    Requests are profiled on demand (X-Lorien-Profile with
+    LORIEN_PROFILE_TOKEN) or sampled per route (LORIEN_PROFILE_SAMPLE).
+    
+    Returns:
+        200 with one summary per profile: route, trigger, duration,
+        samples and time per layer (router, repository, pandas)
+    """
+    return {
+        "on_demand": profile_token() is not None,
+        "sample_rates": {prefix or "*": rate for prefix, rate in sample_rates()},
+        "profiles": [p.summary() for p in profiler.profiles()],
+    }
+
+@router.get("/admin/performance/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|folded)$")):
+    """
+    One request profile.
+    
+    Args:
+        profile_id: id from X-Profile-Id or the profile list
+        format: json for the call tree, folded for flamegraph.pl/speedscope
+        
+    Returns:
+        200 with the profile; 404 if this worker does not hold it
+    """
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    if format == "folded":
+        return PlainTextResponse(profile.folded())
+    return profile.to_dict()
+
+@router.delete("/admin/performance/profiles")
+async def clear_profiles():
+    """
+    Drop the profiles kept by this worker process.
+    
+    Returns:
+        200 with the number of profiles removed
+    """
+    return {"removed": profiler.clear(), "status": "completed"}
+
+@router.get("/admin/performance/traces")
+async def list_traces(limit: int = Query(50, ge=1, le=500)):
+    """
+    Most recent traced requests in this worker's span ring, newest first.
+    
+    Requests are traced with LORIEN_TRACE=true; their trace id is echoed
+    in X-Trace-Id. LORIEN_TRACE_FILE keeps every span as JSON lines.
+    
+    Returns:
+        200 with one entry per trace: root span name, duration, status
+        and span count
+    """
+    return {
+        "enabled": tracing.enabled(),
+        "file": os.getenv("LORIEN_TRACE_FILE") or None,
+        "traces": tracing.spans.traces(limit),
+    }
+
+@router.get("/admin/performance/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    Spans of one trace and the time spent in each kind of span.
+    
+    Args:
+        trace_id: id from X-Trace-Id or the trace list
+        
+    Returns:
+        200 with the spans in start order and the self time per span
+        name (middleware, dependencies, repository methods, sqlite, ...);
+        404 if the ring no longer holds the trace
+    """
+    trace_spans = tracing.spans.trace(trace_id)
+    if not trace_spans:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+    return {"trace_id": trace_id, "breakdown": tracing.breakdown(trace_spans), "spans": trace_spans}
+
+@router.delete("/admin/performance/traces")
+async def clear_traces():
+    """
+    Empty this worker's span ring (the JSON-lines file is left alone).
+    
+    Returns:
+        200 with the number of spans removed
+    """
+    return {"removed": tracing.spans.clear(), "status": "completed"}
+
+class IndexAdvisorRequest(BaseModel):
+    """Statements to analyse on top of the traced workload and slow-query log."""
+    statements: List[str] = Field(default_factory=list)
+
+@router.post("/admin/performance/index-advisor", status_code=202)
+async def run_index_advisor(
+    response: Response,
+    request: Optional[IndexAdvisorRequest] = None,
+    wait: bool = Query(False, description="Block until the advisor has finished"),
+    repo: SQLiteRepository = Depends(get_repository)
+):
+    """
+    Recommend indexes for the statements the app actually runs.
+    
+    Replays the workload (LORIEN_SQL_TRACE, the slow-query log and any
+    statements in the body) against a scratch copy of the database and
+    tests candidate indexes with EXPLAIN QUERY PLAN and timing. The run
+    happens on a background thread; poll
+    ``GET /admin/performance/index-advisor/jobs/{job_id}``.
+    
+    Returns:
+        202 with the job; with ``wait=true``, 200 with the report
+        (recommendations with plans and timings before/after, write cost,
+        and indexes to drop)
+    """
+    job = index_advisor.start(repo.db_path, request.statements if request else ())
+    if not wait:
+        return job.to_dict()
+    await run_in_threadpool(job.done.wait)
+    if job.state == "failed":
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Index advisor failed",
+                "message": job.error
+            }
+        )
+    response.status_code = 200
+    return job.report
+
+@router.get("/admin/performance/index-advisor/jobs/{job_id}")
+async def get_index_advisor_job(job_id: str):
+    """
+    State of one advisor run.
+    
+    Returns:
+        200 with the job (and its report once completed); 404 for an unknown job
+    """
+    job = index_advisor.job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Index advisor job {job_id} not found")
+    return {**job.to_dict(), "report": job.report}
+
+@router.get("/admin/performance/index-advisor")
+async def get_index_advisor_report():
+    """
+    Last index advisor report.
+    
+    Returns:
+        200 with the report; 404 if the advisor has not run yet
+    """
+    if index_advisor.last is None:
+        raise HTTPException(status_code=404, detail="Index advisor has not run yet")
+    return index_advisor.last
+
+@router.post("/admin/performance/index-advisor/apply")
+def apply_index_recommendation(name: str, repo: SQLiteRepository = Depends(get_repository)):
+    """
+    Create (or drop) one index from the last advisor report on the live database.
+    
+    Args:
+        name: index name from the report's recommendations or drop list
+        
+    Returns:
+        200 with the statement run; 404 if the index is not in the last
+        report; 409 for dropping an index storage/schema.sql recreates
+    """
+    try:
+        result = index_advisor.apply(repo.db_path, name)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logging.error(f"Applying index {name} failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": f"Applying index {name} failed",
+                "message": str(e)
+            }
+        )
+    return {**result, "status": "completed"}
+
 @router.get("/admin/performance/export/tree-streaming")
 async def export_tree_streaming(
     batch_size: int = 1000,
@@ -271,10 +508,12 @@ async def get_performance_health(repo: SQLiteRepository = Depends(get_repository
             else:
                 performance_status = "healthy"
             
+            maintenance.attach(repo.db_path)
             return {
                 "performance_status": performance_status,
                 "database_stats": db_stats,
                 "cache_stats": cache_stats,
+                "maintenance": maintenance.status()["metrics"],
                 "recommendations": _get_performance_recommendations(db_stats, cache_stats),
                 "status": "healthy"
             }
@@ -289,6 +528,83 @@ async def get_performance_health(repo: SQLiteRepository = Depends(get_repository
             }
         )
 
+class MaintenanceConfigUpdate(BaseModel):
+    """Partial update of the maintenance scheduler settings."""
+    enabled: Optional[bool] = None
+    interval: Optional[float] = Field(None, gt=0)
+    quiet_seconds: Optional[float] = Field(None, ge=0)
+    optimize_every: Optional[float] = Field(None, ge=0)
+    analyze_every: Optional[float] = Field(None, ge=0)
+    vacuum_min_free_pages: Optional[int] = Field(None, ge=0)
+    vacuum_pages_per_step: Optional[int] = Field(None, gt=0)
+    vacuum_max_steps: Optional[int] = Field(None, gt=0)
+    vacuum_step_sleep: Optional[float] = Field(None, ge=0)
+    journal_max_rows: Optional[int] = Field(None, gt=0)
+
+@router.get("/admin/performance/maintenance")
+async def get_maintenance_status(repo: SQLiteRepository = Depends(get_repository)):
+    """
+    Maintenance scheduler state, settings and database metrics.
+    
+    Returns:
+        200 with running flag, config, metrics (WAL size, checkpoint lag,
+        free pages) and per-task run history
+    """
+    maintenance.attach(repo.db_path)
+    return maintenance.status()
+
+@router.put("/admin/performance/maintenance")
+async def update_maintenance_config(
+    update: MaintenanceConfigUpdate,
+    repo: SQLiteRepository = Depends(get_repository)
+):
+    """
+    Change maintenance scheduler settings; takes effect on the next pass.
+    
+    Returns:
+        200 with the updated status
+    """
+    maintenance.config.update(**update.model_dump(exclude_none=True))
+    if maintenance.config.enabled and not maintenance.running:
+        maintenance.start(repo.db_path)
+    maintenance.poke()
+    maintenance.attach(repo.db_path)
+    return maintenance.status()
+
+@router.post("/admin/performance/maintenance/run")
+def run_maintenance_task(task: str, repo: SQLiteRepository = Depends(get_repository)):
+    """
+    Run one maintenance task now, ignoring the quiet-period check.
+    
+    Args:
+        task: optimize, analyze, journal, vacuum, checkpoint or enable_incremental_vacuum
+        
+    Returns:
+        200 with the task result; 422 for an unknown task
+    """
+    if task not in TASKS + MANUAL_TASKS:
+        raise HTTPException(
+            status_code=422,
+            detail=[{
+                "loc": ["query", "task"],
+                "msg": f"task must be one of: {', '.join(TASKS + MANUAL_TASKS)}",
+                "type": "value_error.task",
+            }]
+        )
+    maintenance.attach(repo.db_path)
+    try:
+        result = maintenance.run_task(task)
+    except Exception as e:
+        logging.error(f"Maintenance task {task} failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": f"Maintenance task {task} failed",
+                "message": str(e)
+            }
+        )
+    return {"task": task, "result": result, "status": "completed"}
+
 def _get_performance_recommendations(db_stats: Dict[str, Any], cache_stats: Dict[str, Any]) -> List[str]:
     """Get performance optimization recommendations."""
     recommendations = []
@@ -0,0 +1,72 @@
+"""
+Publishing of immutable snapshots for read-only calculator replicas.
+
+Editors call ``POST /admin/publish``; replicas started with
+``LORIEN_REPLICA_DIR`` pointing at the same directory switch to the new
+version on their next request.
+"""
+
+import logging
+import os
+import sqlite3
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
+
+from ..db import ensure_schema, get_conn, legacy_db_path
+from ..dependencies import get_repository, replica_dir
+from storage.publish import DEFAULT_KEEP, current_snapshot, list_versions, publish_snapshot
+from storage.sqlite import SQLiteRepository
+
+router = APIRouter(tags=["publish"])
+logger = logging.getLogger(__name__)
+
+
+def publish_dir_for(repo: SQLiteRepository) -> str:
+    """LORIEN_PUBLISH_DIR, else ``published/`` next to the database."""
+    return os.getenv("LORIEN_PUBLISH_DIR") or os.path.join(os.path.dirname(repo.db_path), "published")
+
+
+@router.post("/admin/publish")
+async def publish(
+    keep: int = Query(DEFAULT_KEEP, ge=1, le=100, description="Published versions to retain"),
+    repo: SQLiteRepository = Depends(get_repository)
+):
+    """
+    Publish a compacted, read-optimized snapshot and make it current.
+
+    The legacy database behind the ``/tree/*`` routers is published with
+    it, so replicas serve those routes from the snapshot as well.
+
+    Returns:
+        200 with version, path, size and the indexes added for readers
+    """
+    # replicas serve the legacy /tree/* tables from the same version
+    conn = get_conn()
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+    try:
+        result = await run_in_threadpool(publish_snapshot, repo.db_path, publish_dir_for(repo), keep,
+                                         legacy_db_path())
+    except (sqlite3.Error, ValueError) as e:
+        logger.error(f"Publish failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to publish snapshot: {str(e)}"
+        )
+    return {"ok": True, **result}
+
+
+@router.get("/admin/publish")
+async def publish_status(repo: SQLiteRepository = Depends(get_repository)):
+    """Published versions and the one replicas currently serve."""
+    publish_dir = replica_dir() or publish_dir_for(repo)
+    current = current_snapshot(publish_dir)
+    return {
+        "replica": bool(replica_dir()),
+        "publish_dir": publish_dir,
+        "current": os.path.basename(current) if current else None,
+        "versions": list_versions(publish_dir),
+    }
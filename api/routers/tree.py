@@ -181,6 +181,8 @@ def get_node_path(
                 csv_header=csv_header
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error getting node path")
         raise HTTPException(status_code=500, detail="Database error")
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse, StreamingResponse
 from api.db import get_conn, ensure_schema
-from api.repositories.tree_repo import export_rows, export_rows_csv, export_rows_xlsx
+from api.repositories.tree_repo import (
+    export_rows, export_rows_csv, export_rows_xlsx, iter_export_rows, iter_node_rows,
+)
+from core.exporters.columnar import (
+    MEDIA_TYPES, columnar_available, write_columnar,
+)
 import datetime
 import io
+import tempfile
+
+# Columnar exports stay in memory up to this size, then spool to disk
+COLUMNAR_SPOOL_MAX_MEMORY = 8 << 20
+COLUMNAR_CHUNK_SIZE = 1 << 20
 
 router = APIRouter()
 
@@ -18,6 +28,37 @@ def _xlsx_response(data: bytes):
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f'attachment; filename="{fname}"'})
 
+def _columnar_response(fmt: str, table: str):
+    if not columnar_available():
+        raise HTTPException(status_code=501, detail=[{
+            "loc": ["query", "format"],
+            "msg": "pyarrow required for parquet/arrow export",
+            "type": "value_error.dependency_missing",
+            "ctx": {"format": fmt}
+        }])
+    conn = get_conn()
+    ensure_schema(conn)
+    rows = iter_node_rows(conn) if table == "nodes" else iter_export_rows(conn)
+    spool = tempfile.SpooledTemporaryFile(max_size=COLUMNAR_SPOOL_MAX_MEMORY)
+    try:
+        write_columnar(rows, spool, fmt, table=table)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+
+    def _chunks():
+        try:
+            for chunk in iter(lambda: spool.read(COLUMNAR_CHUNK_SIZE), b""):
+                yield chunk
+        finally:
+            spool.close()
+
+    ext = "parquet" if fmt == "parquet" else "arrow"
+    fname = f"tree_export_{table}_{datetime.datetime.utcnow():%Y%m%d_%H%M%S}.{ext}"
+    return StreamingResponse(_chunks(), media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{fname}"'})
+
 @router.get("/tree/export-json")
 def tree_export(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
     conn = get_conn()
@@ -40,6 +81,14 @@ def export_xlsx():
     ensure_schema(conn)
     return _xlsx_response(export_rows_xlsx(conn))
 
+@router.get("/tree/export.parquet", name="tree_export_parquet")
+def export_parquet(table: str = Query("paths", pattern="^(paths|nodes)$")):
+    return _columnar_response("parquet", table)
+
+@router.get("/tree/export.arrow", name="tree_export_arrow")
+def export_arrow(table: str = Query("paths", pattern="^(paths|nodes)$")):
+    return _columnar_response("arrow", table)
+
 # ---- Backward-compat ALIASES (keep until all clients updated) ----
 @router.get("/export/csv", name="export_csv_alias")
 @router.head("/export/csv")
@@ -12,6 +12,7 @@ import uuid
 from datetime import datetime, timezone
 
 from ..dependencies import get_db_connection
+from storage import tracing
 
 router = APIRouter(prefix="/tree/materialize", tags=["tree-materialize"])
 logger = logging.getLogger(__name__)
@@ -124,7 +125,11 @@ def materialize_tree(
         conn.execute("BEGIN IMMEDIATE TRANSACTION")
 
         try:
-            report = _perform_materialization(cursor, target_parents, request)
+            with tracing.span("materialize", parents=len(target_parents),
+                              prune_safe=request.prune_safe) as span:
+                report = _perform_materialization(cursor, target_parents, request)
+                if span is not None:
+                    span.set(added=report.added, filled=report.filled, pruned=report.pruned)
             conn.commit()
 
             finished_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
@@ -0,0 +1,54 @@
+"""
+Workbook administration: list, create and inspect the open-workbook LRU.
+
+Workbook-scoped requests themselves go through WorkbookMiddleware
+(``/w/{workbook}/...`` or ``X-Lorien-Workbook``); these endpoints are not
+workbook-scoped.
+"""
+
+import logging
+
+from fastapi import APIRouter, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
+
+from storage.workbooks import workbooks, workbooks_dir
+
+router = APIRouter(tags=["workbooks"])
+logger = logging.getLogger(__name__)
+
+
+def _require_enabled() -> None:
+    if workbooks_dir() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Workbook routing is not enabled (set LORIEN_WORKBOOKS_DIR)"
+        )
+
+
+@router.get("/admin/workbooks")
+async def list_workbooks():
+    """Workbooks on disk and the open ones, most recently used first."""
+    _require_enabled()
+    return {"workbooks": workbooks.names(), **workbooks.stats()}
+
+
+@router.post("/admin/workbooks", status_code=status.HTTP_201_CREATED)
+async def create_workbook(name: str = Query(..., description="Workbook name: letters, digits, '-' and '_'")):
+    """
+    Create an empty workbook (its directory and database).
+
+    Returns:
+        201 with the workbook name and database path; 409 if it exists
+    """
+    _require_enabled()
+    try:
+        if workbooks.exists(name):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Workbook already exists: {name}")
+        wb = await run_in_threadpool(workbooks.get, name, True)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=[{"loc": ["query", "name"], "msg": str(e), "type": "value_error"}]
+        )
+    logger.info("Created workbook %s", name)
+    return {"ok": True, "name": wb.name, "db_path": wb.db_path}
@@ -3,6 +3,7 @@ CLI command implementations for decision tree operations.
 """
 
 import sys
+import time
 import logging
 from pathlib import Path
 from typing import Optional
@@ -12,6 +13,7 @@ from core.constants import (
     EXIT_SUCCESS, EXIT_VALIDATION_ERROR, EXIT_IMPORT_ERROR, 
     EXIT_EXPORT_ERROR, EXIT_SYSTEM_ERROR, CANON_HEADERS
 )
+from core.importers.workbook_parse import DEFAULT_CHUNK_ROWS
 
 
 logger = logging.getLogger(__name__)
@@ -86,14 +88,136 @@ def validate_tree(repo, exit_on_violations: bool = False) -> int:
         print(f"❌ Validation error: {e}")
         return EXIT_VALIDATION_ERROR
 
-def import_excel(repo, file_path: str, strategy: str) -> int:
+class _Progress:
+    """Single-line progress bar with throughput; redrawn in place on a TTY."""
+
+    def __init__(self, total: Optional[int], width: int = 30, stream=None):
+        self.total = total or None
+        self.width = width
+        self.stream = stream or sys.stdout
+        self.done = 0
+        self.started = time.perf_counter()
+        self._tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def update(self, rows: int) -> None:
+        self.done += rows
+        if self.total:
+            frac = min(self.done / self.total, 1.0)
+            filled = int(frac * self.width)
+            bar = "█" * filled + "░" * (self.width - filled)
+            line = f"   {bar} {frac:4.0%} {self.done:,}/{self.total:,} rows · {self.rate():,.0f} rows/s"
+        else:
+            line = f"   {self.done:,} rows · {self.rate():,.0f} rows/s"
+        if self._tty:
+            self.stream.write("\r" + line)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def finish(self) -> None:
+        if self._tty:
+            self.stream.write("\n")
+            self.stream.flush()
+
+def _report_header_error(e: ValueError) -> int:
+    """Print a header validation failure from the parallel parser (re-raises anything else)."""
+    ctx = e.args[0] if e.args and isinstance(e.args[0], dict) else None
+    if ctx is None:
+        raise e
+    print(f"❌ Header validation failed at column {ctx.get('col_index')}")
+    print(f"   Expected: {ctx.get('expected')}")
+    print(f"   Got: {ctx.get('received')}")
+    return EXIT_IMPORT_ERROR
+
+def _print_bulk_summary(summary: dict, dry_run: bool, started: float) -> None:
+    print(f"✅ {'Dry run' if dry_run else 'Import'} completed in {time.perf_counter() - started:.1f}s")
+    print(f"   Rows processed: {summary['rows_processed']}")
+    print(f"   {'Would create' if dry_run else 'Created'}: {summary['created']['roots']} roots, "
+          f"{summary['created']['nodes']} nodes")
+    print(f"   {'Would set' if dry_run else 'Set'} triage: {summary['updated']['triage']}")
+    if summary["skipped"]["overfull_parents"]:
+        print(f"⚠️  Skipped {summary['skipped']['overfull_parents']} paths under full parents (5 children)")
+    if summary["skipped"]["triage_not_leaf"]:
+        print(f"⚠️  Skipped {summary['skipped']['triage_not_leaf']} triage values on non-leaf paths")
+
+def _bulk_import_file(repo, file_path: Path, jobs: Optional[int], chunk_size: int,
+                      dry_run: bool) -> int:
+    """
+    Parse a canonical workbook/CSV in batches and apply them through the batched writer.
+    
+    Args:
+        repo: SQLite repository (storage schema) or PartitionedRepository
+        file_path: .xlsx/.xlsm/.csv file with the canonical header
+        jobs: Writer threads when partitioned (None = ThreadPoolExecutor default)
+        chunk_size: Rows per parse chunk and per committed batch
+        dry_run: Report what would change without writing
+        
+    Returns:
+        Exit code
+    """
+    from core.importers.workbook_parse import parse_workbook, estimate_data_rows
+    from storage.bulk_import import PathBulkWriter
+    from storage.partitioned import PartitionedRepository
+    
+    print(f"⚙️  Chunk size: {chunk_size}{' (dry run)' if dry_run else ''}")
+    progress = _Progress(estimate_data_rows(str(file_path)))
+    
+    if isinstance(repo, PartitionedRepository):
+        # One writer per Vital Measurement partition; partitions commit in parallel
+        with repo.bulk_writer(jobs=jobs, dry_run=dry_run) as writer:
+            try:
+                for batch in parse_workbook(str(file_path), chunk_rows=chunk_size):
+                    writer.apply(batch.records)
+                    progress.update(batch.rows_read)
+            except ValueError as e:
+                writer.rollback()
+                progress.finish()
+                return _report_header_error(e)
+            summary = writer.summary
+        progress.finish()
+        _print_bulk_summary(summary, dry_run, progress.started)
+        return EXIT_SUCCESS
+    
+    conn = repo._get_connection()
+    try:
+        # WAL is persistent on this database; NORMAL sync is safe under WAL and much faster
+        conn.execute("PRAGMA synchronous = NORMAL")
+        writer = PathBulkWriter(conn, dry_run=dry_run)
+        try:
+            for batch in parse_workbook(str(file_path), chunk_rows=chunk_size):
+                writer.apply(batch.records)
+                if not dry_run:
+                    conn.commit()
+                progress.update(batch.rows_read)
+        except ValueError as e:
+            conn.rollback()
+            progress.finish()
+            return _report_header_error(e)
+        if dry_run:
+            conn.rollback()
+    finally:
+        conn.close()
+    progress.finish()
+    
+    _print_bulk_summary(writer.summary, dry_run, progress.started)
+    return EXIT_SUCCESS
+
+def import_excel(repo, file_path: str, strategy: str, jobs: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_ROWS, dry_run: bool = False) -> int:
     """
     Import decision tree from Excel file.
     
     Args:
-        import_export_engine: Import/export engine instance
-        file_path: Path to Excel file
+        repo: SQLite repository
+        file_path: Path to Excel file (.xlsx/.xlsm, or .csv with the same header)
         strategy: Strategy for handling missing nodes
+        jobs: Partition writer threads (None = ThreadPoolExecutor default)
+        chunk_size: Rows per parse chunk and per committed batch
+        dry_run: Report what would change without writing
         
     Returns:
         Exit code
@@ -105,134 +229,121 @@ def import_excel(repo, file_path: str, strategy: str) -> int:
             print(f"❌ File not found: {file_path}")
             return EXIT_IMPORT_ERROR
         
-        if not file_path.suffix.lower() in ['.xlsx', '.xls']:
+        if file_path.suffix.lower() == '.xls':
+            print("❌ Legacy .xls workbooks are not supported; save as .xlsx")
+            return EXIT_IMPORT_ERROR
+        
+        if not file_path.suffix.lower() in ['.xlsx', '.xlsm', '.csv']:
             print(f"❌ Invalid file extension: {file_path.suffix}")
             return EXIT_IMPORT_ERROR
         
         print(f"📥 Importing from Excel: {file_path}")
         print(f"🔧 Strategy: {strategy}")
         
-        # Read Excel file
-        try:
-            df = pd.read_excel(file_path)
-        except Exception as e:
-            print(f"❌ Failed to read Excel file: {e}")
-            return EXIT_IMPORT_ERROR
-        
-        print(f"📊 Read {len(df)} rows, {len(df.columns)} columns")
-        
-        # Validate headers
-        try:
-            # Validate headers manually
-            if len(df.columns) != len(CANON_HEADERS):
-                raise ValueError(f"Expected {len(CANON_HEADERS)} columns, got {len(df.columns)}")
-            
-            for i, (expected, actual) in enumerate(zip(CANON_HEADERS, df.columns)):
-                if expected != actual:
-                    raise ValueError(f"Column {i}: expected '{expected}', got '{actual}'")
-            
-            print("✅ Headers validated successfully")
-        except ValueError as e:
-            print(f"❌ Header validation failed: {e}")
-            print(f"   Expected: {CANON_HEADERS}")
-            print(f"   Got: {list(df.columns)}")
-            return EXIT_IMPORT_ERROR
-        
-        # Import data using repository
-        print("🔄 Importing data...")
-        
-        rows_processed = 0
-        paths_imported = 0
-        
-        with repo._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            for _, row in df.iterrows():
-                try:
-                    # Extract data from row
-                    vital_measurement = str(row["Vital Measurement"]).strip()
-                    node_1 = str(row["Node 1"]).strip()
-                    node_2 = str(row["Node 2"]).strip()
-                    node_3 = str(row["Node 3"]).strip()
-                    node_4 = str(row["Node 4"]).strip()
-                    node_5 = str(row["Node 5"]).strip()
-                    diagnostic_triage = str(row.get("Diagnostic Triage", "")).strip()
-                    actions = str(row.get("Actions", "")).strip()
-                    
-                    # Create root node (Vital Measurement)
-                    cursor.execute("""
-                        INSERT INTO nodes (parent_id, depth, slot, label, is_leaf, created_at, updated_at)
-                        VALUES (NULL, 0, 0, ?, 0, strftime('%Y-%m-%dT%H:%M:%fZ','now'), strftime('%Y-%m-%dT%H:%M:%fZ','now'))
-                    """, (vital_measurement,))
-                    root_id = cursor.lastrowid
-                    
-                    # Create child nodes
-                    nodes = [node_1, node_2, node_3, node_4, node_5]
-                    parent_id = root_id
-                    
-                    for depth, (node_label, slot) in enumerate(zip(nodes, range(1, 6)), 1):
-                        if node_label:  # Only create if label is not empty
-                            cursor.execute("""
-                                INSERT INTO nodes (parent_id, depth, slot, label, is_leaf, created_at, updated_at)
-                                VALUES (?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%fZ','now'), strftime('%Y-%m-%dT%H:%M:%fZ','now'))
-                            """, (parent_id, depth, slot, node_label, depth == 5))
-                            parent_id = cursor.lastrowid
-                    
-                    # Create triage for leaf node if it exists
-                    if diagnostic_triage or actions:
-                        cursor.execute("""
-                            INSERT INTO triage (node_id, diagnostic_triage, actions, created_at, updated_at)
-                            VALUES (?, ?, ?, strftime('%Y-%m-%dT%H:%M:%fZ','now'), strftime('%Y-%m-%dT%H:%M:%fZ','now'))
-                        """, (parent_id, diagnostic_triage, actions))
-                    
-                    rows_processed += 1
-                    paths_imported += 1
-                    
-                except Exception as e:
-                    print(f"⚠️  Failed to import row {rows_processed + 1}: {e}")
-                    continue
-            
-            conn.commit()
-        
-        print(f"✅ Import completed successfully")
-        print(f"   Rows processed: {rows_processed}")
-        print(f"   Paths imported: {paths_imported}")
-        
-        return EXIT_SUCCESS
-        
-        return EXIT_SUCCESS
+        return _bulk_import_file(repo, file_path, jobs, chunk_size, dry_run)
         
     except Exception as e:
         logger.error(f"Import error: {e}")
         print(f"❌ Import error: {e}")
         return EXIT_IMPORT_ERROR
 
-def import_gsheet(repo, sheet_id: str, worksheet: str, strategy: str) -> int:
+def ingest_stream(file_path: str, fmt: Optional[str] = None, batch_size: int = 1000,
+                  chunk_bytes: int = 1 << 20) -> int:
+    """
+    Stream canonical CSV or NDJSON path records into the bulk import engine.
+    
+    Args:
+        file_path: Input file path, or '-' for stdin
+        fmt: 'csv' or 'ndjson' (inferred from the file extension when omitted)
+        batch_size: Rows applied per committed batch
+        chunk_bytes: Bytes read from the input per step
+        
+    Returns:
+        Exit code
+    """
+    from core.importers.stream_import import iter_path_records, iter_batches, StreamFormatError
+    from api.db import get_conn, ensure_schema
+    from api.repositories.tree_repo import import_rows
+    
+    if fmt is None:
+        suffix = Path(file_path).suffix.lower()
+        fmt = "ndjson" if suffix in (".ndjson", ".jsonl") else "csv"
+    
+    stream = sys.stdin.buffer if file_path == "-" else None
+    if stream is None and not Path(file_path).exists():
+        print(f"❌ File not found: {file_path}")
+        return EXIT_IMPORT_ERROR
+    
+    print(f"📥 Streaming {fmt.upper()} records from: {file_path}")
+    conn = get_conn()
+    ensure_schema(conn)
+    summary = None
+    try:
+        with (open(file_path, "rb") if stream is None else stream) as fh:
+            chunks = iter(lambda: fh.read(chunk_bytes), b"")
+            for batch in iter_batches(iter_path_records(chunks, fmt), batch_size):
+                summary = import_rows(conn, batch, summary)
+                print(f"   … {summary['rows_processed']} rows committed")
+    except StreamFormatError as e:
+        ctx = e.args[0]
+        print(f"❌ Invalid record at row {ctx.get('row')}: {ctx.get('msg')}")
+        return EXIT_IMPORT_ERROR
+    except Exception as e:
+        logger.error(f"Ingest error: {e}")
+        print(f"❌ Ingest error: {e}")
+        return EXIT_IMPORT_ERROR
+    finally:
+        conn.close()
+    
+    rows = summary["rows_processed"] if summary else 0
+    print(f"✅ Ingest completed successfully")
+    print(f"   Rows processed: {rows}")
+    return EXIT_SUCCESS
+
+def import_gsheet(repo, sheet_id: str, worksheet: str, strategy: str, jobs: Optional[int] = None,
+                  chunk_size: int = DEFAULT_CHUNK_ROWS, dry_run: bool = False) -> int:
     """
     Import decision tree from Google Sheets.
     
+    The worksheet is downloaded through the sheet's CSV export (the sheet must
+    be shared by link) and then imported like a local CSV.
+    
     Args:
-        import_export_engine: Import/export engine instance
+        repo: SQLite repository
         sheet_id: Google Sheets ID
         worksheet: Worksheet name
         strategy: Strategy for handling missing nodes
+        jobs: Partition writer threads (None = ThreadPoolExecutor default)
+        chunk_size: Rows per parse chunk and per committed batch
+        dry_run: Report what would change without writing
         
     Returns:
         Exit code
     """
+    import tempfile
+    import urllib.parse
+    import urllib.request
+    
     try:
         print(f"📥 Importing from Google Sheets")
         print(f"   Sheet ID: {sheet_id}")
         print(f"   Worksheet: {worksheet}")
         print(f"   Strategy: {strategy}")
         
-        # This would require Google Sheets API integration
-        # For now, we'll show a placeholder message
-        print("❌ Google Sheets import not yet implemented")
-        print("   This feature requires Google Sheets API setup")
-        print("   Use 'import-excel' for local Excel files instead")
-        
-        return EXIT_IMPORT_ERROR
+        url = (f"https://docs.google.com/spreadsheets/d/{urllib.parse.quote(sheet_id)}"
+               f"/gviz/tq?tqx=out:csv&sheet={urllib.parse.quote(worksheet)}")
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / "sheet.csv"
+            try:
+                with urllib.request.urlopen(url, timeout=60) as resp, open(csv_path, "wb") as out:
+                    for block in iter(lambda: resp.read(1 << 20), b""):
+                        out.write(block)
+            except Exception as e:
+                print(f"❌ Failed to download worksheet: {e}")
+                print("   The sheet must be shared so that anyone with the link can view it")
+                return EXIT_IMPORT_ERROR
+            
+            return _bulk_import_file(repo, csv_path, jobs, chunk_size, dry_run)
         
     except Exception as e:
         logger.error(f"Google Sheets import error: {e}")
@@ -244,7 +355,7 @@ def export_excel(repo, file_path: str) -> int:
     Export decision tree to Excel file.
     
     Args:
-        import_export_engine: Import/export engine instance
+        repo: SQLite repository
         file_path: Output file path
         
     Returns:
@@ -259,35 +370,27 @@ def export_excel(repo, file_path: str) -> int:
         
         print(f"📤 Exporting to Excel: {file_path}")
         
-        # Export data using repository
+        # Stream complete paths into a write-only workbook (rows are never all in memory)
         print("🔄 Exporting data...")
+        from openpyxl import Workbook
         
-        with repo._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Get complete paths using the view
-            cursor.execute("""
-                SELECT vital_measurement, node_1, node_2, node_3, node_4, node_5, 
-                       diagnostic_triage, actions
-                FROM v_paths_complete
-            """)
-            
-            rows = cursor.fetchall()
-            
-            if not rows:
-                print("⚠️  No data to export")
-                # Create empty file with headers
-                df = pd.DataFrame(columns=CANON_HEADERS)
-            else:
-                # Convert to DataFrame
-                df = pd.DataFrame(rows, columns=CANON_HEADERS)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(CANON_HEADERS)
+        rows_exported = 0
+        for row in repo.iter_complete_path_rows():
+            ws.append(list(row))
+            rows_exported += 1
+        
+        if not rows_exported:
+            print("⚠️  No data to export")
         
         # Write to Excel
         try:
-            df.to_excel(file_path, index=False, engine='openpyxl')
+            wb.save(file_path)
             print(f"✅ Export completed successfully")
-            print(f"   Rows exported: {len(df)}")
-            print(f"   Columns: {list(df.columns)}")
+            print(f"   Rows exported: {rows_exported}")
+            print(f"   Columns: {CANON_HEADERS}")
         except Exception as e:
             print(f"❌ Failed to write Excel file: {e}")
             return EXIT_EXPORT_ERROR
@@ -304,7 +407,7 @@ def export_csv(repo, file_path: str) -> int:
     Export decision tree to CSV file.
     
     Args:
-        import_export_engine: Import/export engine instance
+        repo: SQLite repository
         file_path: Output file path
         
     Returns:
@@ -319,39 +422,28 @@ def export_csv(repo, file_path: str) -> int:
         
         print(f"📤 Exporting to CSV: {file_path}")
         
-        # Export data using repository
+        # Stream complete paths straight from the cursor to the file
         print("🔄 Exporting data...")
+        import csv
         
-        with repo._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Get complete paths using the view
-            cursor.execute("""
-                SELECT vital_measurement, node_1, node_2, node_3, node_4, node_5, 
-                       diagnostic_triage, actions
-                FROM v_paths_complete
-            """)
-            
-            rows = cursor.fetchall()
-            
-            if not rows:
-                print("⚠️  No data to export")
-                # Create empty file with headers
-                df = pd.DataFrame(columns=CANON_HEADERS)
-            else:
-                # Convert to DataFrame
-                df = pd.DataFrame(rows, columns=CANON_HEADERS)
-        
-        # Write to CSV
+        rows_exported = 0
         try:
-            df.to_csv(file_path, index=False, encoding='utf-8')
-            print(f"✅ Export completed successfully")
-            print(f"   Rows exported: {len(df)}")
-            print(f"   Columns: {list(df.columns)}")
-        except Exception as e:
+            with open(file_path, "w", newline="", encoding="utf-8") as fh:
+                writer = csv.writer(fh)
+                writer.writerow(CANON_HEADERS)
+                for row in repo.iter_complete_path_rows():
+                    writer.writerow(row)
+                    rows_exported += 1
+        except OSError as e:
             print(f"❌ Failed to write CSV file: {e}")
             return EXIT_EXPORT_ERROR
         
+        if not rows_exported:
+            print("⚠️  No data to export")
+        print(f"✅ Export completed successfully")
+        print(f"   Rows exported: {rows_exported}")
+        print(f"   Columns: {CANON_HEADERS}")
+        
         return EXIT_SUCCESS
         
     except Exception as e:
@@ -359,18 +451,70 @@ def export_csv(repo, file_path: str) -> int:
         print(f"❌ Export error: {e}")
         return EXIT_EXPORT_ERROR
 
-def fix_tree(repo, enforce_five: bool, strategy: str) -> int:
+def export_columnar(repo, file_path: str, fmt: Optional[str] = None,
+                    table: str = "paths") -> int:
+    """
+    Export decision tree to a Parquet or Arrow IPC file.
+
+    Args:
+        repo: SQLite repository
+        file_path: Output file path
+        fmt: 'parquet' or 'arrow'; inferred from the extension when omitted
+        table: 'paths' (canonical 8 columns) or 'nodes' (raw nodes table)
+
+    Returns:
+        Exit code
+    """
+    from core.exporters.columnar import (
+        ColumnarUnavailable, NODE_COLUMNS, format_from_path, write_columnar
+    )
+
+    fmt = fmt or format_from_path(file_path)
+    if fmt is None:
+        print(f"❌ Cannot infer export format from {file_path}; use --format parquet|arrow")
+        return EXIT_EXPORT_ERROR
+
+    try:
+        print(f"📤 Exporting {table} to {fmt}: {file_path}")
+        rows = repo.iter_node_rows() if table == "nodes" else repo.iter_complete_path_rows()
+        try:
+            with open(file_path, "wb") as fh:
+                rows_exported = write_columnar(rows, fh, fmt, table=table)
+        except ColumnarUnavailable as e:
+            print(f"❌ {e} (pip install pyarrow)")
+            return EXIT_EXPORT_ERROR
+        except OSError as e:
+            print(f"❌ Failed to write {fmt} file: {e}")
+            return EXIT_EXPORT_ERROR
+
+        if not rows_exported:
+            print("⚠️  No data to export")
+        print(f"✅ Export completed successfully")
+        print(f"   Rows exported: {rows_exported}")
+        print(f"   Columns: {NODE_COLUMNS if table == 'nodes' else CANON_HEADERS}")
+
+        return EXIT_SUCCESS
+
+    except Exception as e:
+        logger.error(f"Export error: {e}")
+        print(f"❌ Export error: {e}")
+        return EXIT_EXPORT_ERROR
+
+def fix_tree(repo, enforce_five: bool, strategy: str, dry_run: bool = False) -> int:
     """
     Fix tree violations.
     
     Args:
-        import_export_engine: Import/export engine instance
+        repo: SQLite repository
         enforce_five: Whether to enforce exactly 5 children per parent
         strategy: Strategy for fixing violations
+        dry_run: Report what would change without writing
         
     Returns:
         Exit code
     """
+    from storage.tree_fix import enforce_five as enforce_five_children
+    
     try:
         print(f"🔧 Fixing tree violations")
         print(f"   Enforce five children: {enforce_five}")
@@ -378,10 +522,14 @@ def fix_tree(repo, enforce_five: bool, strategy: str) -> int:
         
         if enforce_five:
             print("🔄 Enforcing exactly 5 children per parent...")
-            # This would need to be implemented in the engine
-            # For now, we'll show a placeholder message
-            print("⚠️  Five-children enforcement not yet implemented")
-            print("   This feature requires additional engine methods")
+            conn = repo._get_connection()
+            try:
+                result = enforce_five_children(conn, strategy, dry_run=dry_run)
+            finally:
+                conn.close()
+            verb = "Would" if dry_run else "Did"
+            print(f"   {verb} create {result['nodes_created']} nodes, delete {result['nodes_deleted']} nodes")
+            print(f"   Incomplete parents: {result['incomplete_parents_before']} → {result['incomplete_parents_after']}")
         else:
             print("ℹ️  No specific fixes requested")
         
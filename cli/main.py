@@ -3,6 +3,7 @@
 Decision Tree CLI - Command line interface for decision tree operations.
 """
 
+import os
 import sys
 import argparse
 import logging
@@ -15,11 +16,15 @@ from core.constants import (
 )
 from core.engine import DecisionTreeEngine
 from core.import_export import ImportExportEngine
+from core.importers.workbook_parse import DEFAULT_CHUNK_ROWS
 from .commands import (
     validate_tree, import_excel, import_gsheet, 
-    export_excel, export_csv, fix_tree
+    export_excel, export_csv, export_columnar, fix_tree, ingest_stream
 )
 
+# Commands that accept a PartitionedRepository (--partition-dir)
+PARTITIONED_COMMANDS = ('import-excel', 'import-gsheet', 'export')
+
 def setup_logging(verbose: bool = False) -> None:
     """Setup logging configuration."""
     level = logging.DEBUG if verbose else logging.INFO
@@ -37,8 +42,12 @@ def main() -> int:
 Examples:
   dt validate                    # Validate tree structure
   dt import-excel data.xlsx     # Import from Excel file
+  dt import-excel big.xlsx -j 8 --dry-run  # Parallel parse, report changes only
+  dt ingest feed.ndjson         # Stream CSV/NDJSON path records
   dt export-csv output.csv      # Export to CSV
+  dt export tree.parquet        # Columnar export (Parquet / Arrow IPC)
   dt fix --enforce-five         # Fix tree violations
+  dt --partition-dir parts/ import-excel big.xlsx  # One DB file per Vital Measurement
 
 Version: {APP_VERSION}
         """
@@ -49,6 +58,18 @@ Version: {APP_VERSION}
         action='store_true',
         help='Enable verbose logging'
     )
+    parser.add_argument(
+        '--partition-dir',
+        default=os.getenv('LORIEN_PARTITION_DIR'),
+        help='Partitioned storage directory: one database per Vital Measurement '
+             '(import and export commands; default: $LORIEN_PARTITION_DIR)'
+    )
+    parser.add_argument(
+        '--partition-groups',
+        type=int,
+        default=int(os.getenv('LORIEN_PARTITION_GROUPS', '0')),
+        help='Hash roots into N partition files instead of one per root (new stores only)'
+    )
     
     subparsers = parser.add_subparsers(
         dest='command',
@@ -74,7 +95,7 @@ Version: {APP_VERSION}
     import_excel_parser.add_argument(
         'file',
         type=str,
-        help='Excel file path (.xlsx or .xls)'
+        help='Excel file path (.xlsx, or .csv with the same header)'
     )
     import_excel_parser.add_argument(
         '--strategy',
@@ -105,6 +126,48 @@ Version: {APP_VERSION}
         help='Strategy for handling missing nodes (default: placeholder)'
     )
     
+    for bulk_parser in (import_excel_parser, import_gsheet_parser):
+        bulk_parser.add_argument(
+            '--jobs', '-j',
+            type=int,
+            default=None,
+            help='Partition writer threads with --partition-dir (default: min(32, CPUs + 4))'
+        )
+        bulk_parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_ROWS,
+            help=f'Rows per parse chunk and committed batch (default: {DEFAULT_CHUNK_ROWS})'
+        )
+        bulk_parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing'
+        )
+    
+    # Streaming ingest command
+    ingest_parser = subparsers.add_parser(
+        'ingest',
+        help='Stream canonical CSV or NDJSON path records into the tree'
+    )
+    ingest_parser.add_argument(
+        'file',
+        type=str,
+        help="Input file path ('-' reads stdin)"
+    )
+    ingest_parser.add_argument(
+        '--format',
+        choices=['csv', 'ndjson'],
+        default=None,
+        help='Record format (default: from file extension, else csv)'
+    )
+    ingest_parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=1000,
+        help='Rows committed per batch (default: 1000)'
+    )
+    
     # Export Excel command
     export_excel_parser = subparsers.add_parser(
         'export-excel',
@@ -127,6 +190,29 @@ Version: {APP_VERSION}
         help='Output CSV file path (.csv)'
     )
     
+    # Columnar export command
+    export_parser = subparsers.add_parser(
+        'export',
+        help='Export decision tree to Parquet or Arrow IPC'
+    )
+    export_parser.add_argument(
+        'file',
+        type=str,
+        help='Output file path (.parquet, .arrow, .feather)'
+    )
+    export_parser.add_argument(
+        '--format',
+        choices=['parquet', 'arrow'],
+        default=None,
+        help='Output format (default: inferred from the file extension)'
+    )
+    export_parser.add_argument(
+        '--table',
+        choices=['paths', 'nodes'],
+        default='paths',
+        help='Complete paths (8 canonical columns) or the raw nodes table (default: paths)'
+    )
+    
     # Fix command
     fix_parser = subparsers.add_parser(
         'fix',
@@ -143,6 +229,11 @@ Version: {APP_VERSION}
         default='placeholder',
         help='Strategy for fixing violations (default: placeholder)'
     )
+    fix_parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Report what would change without writing'
+    )
     
     args = parser.parse_args()
     
@@ -156,22 +247,35 @@ Version: {APP_VERSION}
     
     try:
         # Initialize real storage layer
-        from storage.sqlite import SQLiteRepository
-        repo = SQLiteRepository()
+        if args.partition_dir:
+            if args.command not in PARTITIONED_COMMANDS:
+                print(f"❌ {args.command} does not support partitioned storage")
+                return EXIT_SYSTEM_ERROR
+            from storage.partitioned import PartitionedRepository
+            repo = PartitionedRepository(args.partition_dir, groups=args.partition_groups)
+        else:
+            from storage.sqlite import SQLiteRepository
+            repo = SQLiteRepository()
         
         # Execute command
         if args.command == 'validate':
             return validate_tree(repo, args.exit_on_violations)
         elif args.command == 'import-excel':
-            return import_excel(repo, args.file, args.strategy)
+            return import_excel(repo, args.file, args.strategy,
+                                args.jobs, args.chunk_size, args.dry_run)
         elif args.command == 'import-gsheet':
-            return import_gsheet(repo, args.sheet_id, args.worksheet, args.strategy)
+            return import_gsheet(repo, args.sheet_id, args.worksheet, args.strategy,
+                                 args.jobs, args.chunk_size, args.dry_run)
+        elif args.command == 'ingest':
+            return ingest_stream(args.file, args.format, args.batch_size)
         elif args.command == 'export-excel':
             return export_excel(repo, args.file)
         elif args.command == 'export-csv':
             return export_csv(repo, args.file)
+        elif args.command == 'export':
+            return export_columnar(repo, args.file, args.format, args.table)
         elif args.command == 'fix':
-            return fix_tree(repo, args.enforce_five, args.strategy)
+            return fix_tree(repo, args.enforce_five, args.strategy, args.dry_run)
         else:
             print(f"Unknown command: {args.command}")
             return EXIT_SYSTEM_ERROR
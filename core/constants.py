@@ -4,6 +4,8 @@ Constants for the Lorien decision tree application.
 
 from core.version import __version__ as APP_VERSION
 
+APP_NAME = "Lorien"
+
 # API Configuration
 API_PREFIX = "/api/v1"
 DEFAULT_PAGE_SIZE = 100
@@ -0,0 +1,3 @@
+"""
+Core exporters package for decision tree data.
+"""
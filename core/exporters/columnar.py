@@ -0,0 +1,196 @@
+"""
+Columnar (Parquet / Arrow IPC) export of tree data.
+
+Rows are pulled from a cursor or generator and written in record batches,
+so the full export is never materialized. Label columns are dictionary
+encoded so readers can load labels as categoricals:
+
+- Arrow IPC files may not replace a dictionary, so each label column keeps
+  one running dictionary; a batch only appends the values it introduces and
+  the writer emits just those as a dictionary delta.
+- Parquet stores a dictionary per row group, so each batch is encoded on
+  its own with only the values it contains.
+
+pyarrow is an optional dependency (``pip install .[columnar]``).
+"""
+
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence
+
+from ..constants import CANON_HEADERS
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+FORMATS = ("parquet", "arrow")
+TABLES = ("paths", "nodes")
+
+# File extensions accepted for each format
+FORMAT_EXTENSIONS = {
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# Raw nodes table columns, in output order
+NODE_COLUMNS = ["id", "parent_id", "depth", "slot", "label", "is_leaf"]
+
+DEFAULT_BATCH_ROWS = 65536
+
+
+class ColumnarUnavailable(RuntimeError):
+    """Raised when pyarrow is not installed."""
+
+
+def columnar_available() -> bool:
+    return pa is not None
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ColumnarUnavailable("pyarrow required for parquet/arrow export")
+
+
+def format_from_path(path: str) -> Optional[str]:
+    """Map a file name onto an export format by extension, if known."""
+    lower = path.lower()
+    for ext, fmt in FORMAT_EXTENSIONS.items():
+        if lower.endswith(ext):
+            return fmt
+    return None
+
+
+def _label_type():
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def table_schema(table: str):
+    """Arrow schema for the ``paths`` (canonical 8 columns) or ``nodes`` export."""
+    require_pyarrow()
+    if table == "paths":
+        return pa.schema([pa.field(h, _label_type()) for h in CANON_HEADERS])
+    if table == "nodes":
+        return pa.schema([
+            pa.field("id", pa.int64(), nullable=False),
+            pa.field("parent_id", pa.int64()),
+            pa.field("depth", pa.int8()),
+            pa.field("slot", pa.int8()),
+            pa.field("label", _label_type()),
+            pa.field("is_leaf", pa.bool_()),
+        ])
+    raise ValueError(f"Unknown export table: {table}")
+
+
+class _RunningDictionary:
+    """Append-only value -> code mapping shared by every batch of one column."""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self._dictionary = pa.array([], type=pa.string())
+
+    def encode(self, values: Sequence[Optional[str]]):
+        codes = []
+        added: List[str] = []
+        for v in values:
+            if v is None:
+                codes.append(None)
+                continue
+            code = self._codes.get(v)
+            if code is None:
+                code = self._codes[v] = len(self._codes)
+                added.append(v)
+            codes.append(code)
+        if added:
+            # only the new values are converted; the old dictionary stays a prefix
+            self._dictionary = pa.concat_arrays([self._dictionary, pa.array(added, type=pa.string())])
+        return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32()), self._dictionary)
+
+
+def _encode_batch(values: Sequence[Optional[str]]):
+    """Dictionary of just this batch's values (one Parquet row group)."""
+    encoded = pa.array(values, type=pa.string()).dictionary_encode()
+    return pa.DictionaryArray.from_arrays(encoded.indices.cast(pa.int32()), encoded.dictionary)
+
+
+class _BatchBuilder:
+    def __init__(self, schema, running: bool = True):
+        self.schema = schema
+        self._labels = [i for i, f in enumerate(schema) if pa.types.is_dictionary(f.type)]
+        self._dicts = {i: _RunningDictionary() for i in self._labels} if running else {}
+
+    def build(self, rows: List[Sequence[Any]]):
+        columns = list(zip(*rows)) if rows else [[] for _ in self.schema]
+        arrays = []
+        for i, field in enumerate(self.schema):
+            col = columns[i]
+            if i in self._dicts:
+                arrays.append(self._dicts[i].encode([None if v is None else str(v) for v in col]))
+            elif i in self._labels:
+                arrays.append(_encode_batch([None if v is None else str(v) for v in col]))
+            elif pa.types.is_boolean(field.type):
+                # SQLite has no boolean type; flags arrive as 0/1
+                arrays.append(pa.array([None if v is None else bool(v) for v in col], type=field.type))
+            else:
+                arrays.append(pa.array(col, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+def _batched(rows: Iterable[Sequence[Any]], size: int):
+    batch: List[Sequence[Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_columnar(rows: Iterable[Sequence[Any]], sink: BinaryIO, fmt: str,
+                   table: str = "paths", batch_rows: int = DEFAULT_BATCH_ROWS) -> int:
+    """
+    Write rows to ``sink`` as Parquet or an Arrow IPC file.
+
+    Args:
+        rows: Tuples in the column order of ``table`` (a DB cursor works)
+        sink: Writable binary file object
+        fmt: 'parquet' or 'arrow'
+        table: 'paths' (canonical 8 columns) or 'nodes'
+        batch_rows: Rows per record batch / Parquet row group
+
+    Returns:
+        Number of rows written
+
+    Raises:
+        ColumnarUnavailable: If pyarrow is not installed
+        ValueError: On unknown format or table
+    """
+    require_pyarrow()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    schema = table_schema(table)
+    builder = _BatchBuilder(schema, running=fmt == "arrow")
+
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        options = pa_ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        writer = pa_ipc.new_file(sink, schema, options=options)
+
+    written = 0
+    try:
+        for batch in _batched(rows, batch_rows):
+            writer.write_batch(builder.build(batch))
+            written += len(batch)
+    finally:
+        writer.close()
+    return written
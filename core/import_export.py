@@ -4,12 +4,12 @@ Implements deterministic algorithms for data transformation.
 """
 
 import pandas as pd
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Iterator
 from pathlib import Path
 import logging
 
 from .constants import (
-    CSV_HEADERS, ROOT_DEPTH, MAX_DEPTH, LEAF_DEPTH,
+    CSV_HEADERS, CANON_HEADERS, ROOT_DEPTH, MAX_DEPTH, LEAF_DEPTH,
     ROOT_SLOT, MIN_CHILD_SLOT, MAX_CHILD_SLOT,
     STRATEGY_PLACEHOLDER, STRATEGY_PRUNE, PLACEHOLDER_TEXT
 )
@@ -60,8 +60,15 @@ class ImportExportEngine:
     Implements deterministic algorithms with strict validation.
     """
     
-    def __init__(self, tree_engine: DecisionTreeEngine):
+    def __init__(self, tree_engine: DecisionTreeEngine, repository=None):
+        """
+        Args:
+            tree_engine: Decision tree engine
+            repository: Optional storage repository providing
+                iter_complete_paths()/iter_complete_path_rows() for exports
+        """
         self.tree_engine = tree_engine
+        self.repository = repository
         
     def normalize_label(self, label: str) -> str:
         """
@@ -319,91 +326,60 @@ class ImportExportEngine:
         
         return results
     
+    def iter_paths(self) -> Iterator[Dict[str, str]]:
+        """
+        Stream all complete root→leaf paths.
+        Never shifts children below parent; never recomputes slot indices.
+        
+        With a repository, paths come from one ordered set-based query.
+        Otherwise every branch is walked through the tree engine.
+        
+        Yields:
+            Dict per path keyed by the canonical headers
+        """
+        if self.repository is not None:
+            yield from self.repository.iter_complete_paths()
+            return
+        
+        for root in self.tree_engine.get_all_roots():
+            yield from self._walk_paths_from(root, [root.label])
+    
     def export_paths(self) -> List[Dict[str, str]]:
         """
         Export all complete root→leaf paths.
-        Never shifts children below parent; never recomputes slot indices.
         
         Returns:
             List of dictionaries, each representing one row with canonical headers
         """
-        paths = []
-        
         try:
-            # Get all root nodes
-            root_nodes = self.tree_engine.get_all_roots()
-            
-            for root in root_nodes:
-                # Walk each complete path from root to leaf
-                path_data = self._walk_path_to_leaf(root)
-                if path_data:
-                    paths.append(path_data)
-                    
+            return list(self.iter_paths())
         except Exception as e:
             logger.error(f"Error exporting paths: {e}")
             raise
-        
-        return paths
     
-    def _walk_path_to_leaf(self, root_node: Node) -> Optional[Dict[str, str]]:
+    def _walk_paths_from(self, node: Node, labels: List[str]) -> Iterator[Dict[str, str]]:
         """
-        Walk a single path from root to leaf.
+        Depth-first walk of every branch below a node (engine fallback).
         
         Args:
-            root_node: The root node to start from
+            node: Node whose subtree is walked
+            labels: Labels from the root down to ``node``
             
-        Returns:
-            Dict with canonical headers, or None if path is incomplete
+        Yields:
+            Dict with canonical headers for each complete path
         """
-        try:
-            path_data = {
-                "Vital Measurement": root_node.label,
-                "Node 1": "",
-                "Node 2": "",
-                "Node 3": "",
-                "Node 4": "",
-                "Node 5": "",
-                "Diagnostic Triage": "",
-                "Actions": ""
-            }
-            
-            current_node = root_node
-            current_depth = 0
-            
-            # Walk down the path, one level at a time
-            while current_depth < MAX_DEPTH and current_node:
-                # Find child at next depth
-                next_depth = current_depth + 1
-                next_slot = next_depth
-                
-                children = self.tree_engine.get_children(current_node.id)
-                child = next((c for c in children if c.slot == next_slot), None)
-                
-                if not child:
-                    # Incomplete path - return None
-                    return None
-                
-                # Add child to path data
-                path_data[f"Node {next_depth}"] = child.label
-                current_node = child
-                current_depth = next_depth
-            
-            # If we reached a leaf, get triage data
-            if current_depth == LEAF_DEPTH and current_node:
-                triage = self.tree_engine.get_triage(current_node.id)
-                if triage:
-                    path_data["Diagnostic Triage"] = triage.diagnostic_triage
-                    path_data["Actions"] = triage.actions
-            
-            # Only return complete paths
-            if current_depth == LEAF_DEPTH:
-                return path_data
-            else:
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error walking path from root {root_node.id}: {e}")
-            return None
+        if len(labels) - 1 == LEAF_DEPTH:
+            row = dict(zip(CANON_HEADERS, labels + ["", ""]))
+            triage = self.tree_engine.get_triage(node.id)
+            if triage:
+                row["Diagnostic Triage"] = triage.diagnostic_triage
+                row["Actions"] = triage.actions
+            yield row
+            return
+        
+        children = sorted(self.tree_engine.get_children(node.id), key=lambda c: c.slot)
+        for child in children:
+            yield from self._walk_paths_from(child, labels + [child.label])
     
     def export_to_dataframe(self) -> pd.DataFrame:
         """
@@ -412,25 +388,9 @@ class ImportExportEngine:
         Returns:
             DataFrame with exact canonical column structure
         """
-        paths = self.export_paths()
-        
-        if not paths:
-            # Return empty DataFrame with correct headers
-            return pd.DataFrame(columns=CANON_HEADERS)
-        
-        # Convert to DataFrame with exact column order
-        df_data = []
-        for row in paths:
-            df_row = {
-                "Vital Measurement": row.get("Vital Measurement", row.get("Diagnosis", "")),
-                "Node 1": row.get("Node 1", ""),
-                "Node 2": row.get("Node 2", ""),
-                "Node 3": row.get("Node 3", ""),
-                "Node 4": row.get("Node 4", ""),
-                "Node 5": row.get("Node 5", ""),
-                "Diagnostic Triage": row.get("Diagnostic Triage", ""),
-                "Actions": row.get("Actions", "")
-            }
-            df_data.append(df_row)
-        
-        return pd.DataFrame(df_data)
+        if self.repository is not None:
+            # Build straight from the streamed tuples; no intermediate dicts
+            rows = self.repository.iter_complete_path_rows()
+        else:
+            rows = (tuple(p.get(h, "") for h in CANON_HEADERS) for p in self.iter_paths())
+        return pd.DataFrame.from_records(rows, columns=CANON_HEADERS)
@@ -0,0 +1,209 @@
+"""
+Streaming decoders for canonical path records (CSV / NDJSON).
+
+Bodies are fed in arbitrary byte chunks and complete records are emitted as
+soon as they are available, so callers never hold a whole feed in memory.
+"""
+
+import codecs
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from ..constants import CANON_HEADERS
+
+SUPPORTED_FORMATS = ("csv", "ndjson")
+
+# Content types accepted for each streaming format
+FORMAT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+PathRecord = Dict[str, Optional[str]]
+
+
+class StreamFormatError(ValueError):
+    """
+    Raised when a streamed record cannot be decoded.
+
+    ``args[0]`` is a ctx dict (row, msg, expected, received) suitable for a
+    422 ``detail[].ctx`` payload.
+    """
+
+
+def format_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    """Map a request Content-Type header onto a streaming format, if known."""
+    if not content_type:
+        return None
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return FORMAT_CONTENT_TYPES.get(media_type)
+
+
+def _cell(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return str(value)
+
+
+class PathRecordDecoder:
+    """
+    Incremental decoder turning byte chunks into canonical path records.
+
+    CSV input must start with the frozen 8-column header. NDJSON input carries
+    one record per line, either an object keyed by the canonical headers or an
+    array of 8 values in canonical order.
+    """
+
+    def __init__(self, fmt: str = "csv"):
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported stream format: {fmt}")
+        self.fmt = fmt
+        self.rows_decoded = 0
+        self._line_no = 0
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._pending = ""
+        # CSV records may span several physical lines when a quoted cell contains newlines
+        self._record_lines: List[str] = []
+        self._in_quotes = False
+        self._header_seen = fmt != "csv"
+
+    def feed(self, chunk: bytes) -> List[PathRecord]:
+        """Decode a chunk and return every record completed by it."""
+        return self._drain(self._text.decode(chunk), final=False)
+
+    def close(self) -> List[PathRecord]:
+        """Flush buffered input; raises if the stream ended mid-record."""
+        records = self._drain(self._text.decode(b"", final=True), final=True)
+        if self._record_lines:
+            raise StreamFormatError({
+                "row": self._line_no,
+                "msg": "Unterminated quoted field at end of stream",
+            })
+        if not self._header_seen:
+            raise StreamFormatError({
+                "row": 1,
+                "msg": "Missing CSV header",
+                "expected": CANON_HEADERS,
+                "received": [],
+            })
+        return records
+
+    def _drain(self, text: str, final: bool) -> List[PathRecord]:
+        # Split on "\n" only: str.splitlines() would also break on separators
+        # such as U+2028 that are legal inside labels and JSON strings.
+        *complete, self._pending = (self._pending + text).split("\n")
+        lines = [line + "\n" for line in complete]
+        if final and self._pending:
+            lines.append(self._pending)
+            self._pending = ""
+
+        records: List[PathRecord] = []
+        for line in lines:
+            self._line_no += 1
+            record = self._decode_line(line)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _decode_line(self, line: str) -> Optional[PathRecord]:
+        if self.fmt == "ndjson":
+            return self._decode_ndjson(line)
+
+        self._record_lines.append(line)
+        if line.count('"') % 2:
+            self._in_quotes = not self._in_quotes
+        if self._in_quotes:
+            return None
+
+        raw = "".join(self._record_lines)
+        self._record_lines = []
+        if not raw.strip():
+            return None
+        cells = next(csv.reader(io.StringIO(raw)))
+        return self._decode_csv_cells(cells)
+
+    def _decode_csv_cells(self, cells: List[str]) -> Optional[PathRecord]:
+        if not self._header_seen:
+            received = [c.strip() for c in cells]
+            if received != CANON_HEADERS:
+                col_index = next(
+                    (i for i, (e, r) in enumerate(zip(CANON_HEADERS, received)) if e != r),
+                    min(len(received), len(CANON_HEADERS)),
+                )
+                raise StreamFormatError({
+                    "row": 1,
+                    "msg": "Header mismatch",
+                    "col_index": col_index,
+                    "expected": CANON_HEADERS,
+                    "received": received,
+                })
+            self._header_seen = True
+            return None
+
+        if len(cells) != len(CANON_HEADERS):
+            raise StreamFormatError({
+                "row": self._line_no,
+                "msg": "Wrong number of columns",
+                "expected": len(CANON_HEADERS),
+                "received": len(cells),
+            })
+        self.rows_decoded += 1
+        return dict(zip(CANON_HEADERS, cells))
+
+    def _decode_ndjson(self, line: str) -> Optional[PathRecord]:
+        if not line.strip():
+            return None
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise StreamFormatError({"row": self._line_no, "msg": f"Invalid JSON: {e.msg}"})
+
+        if isinstance(obj, list):
+            if len(obj) != len(CANON_HEADERS):
+                raise StreamFormatError({
+                    "row": self._line_no,
+                    "msg": "Wrong number of values",
+                    "expected": len(CANON_HEADERS),
+                    "received": len(obj),
+                })
+            record = {h: _cell(v) for h, v in zip(CANON_HEADERS, obj)}
+        elif isinstance(obj, dict):
+            unknown = [k for k in obj if k not in CANON_HEADERS]
+            if unknown:
+                raise StreamFormatError({
+                    "row": self._line_no,
+                    "msg": "Unknown keys",
+                    "expected": CANON_HEADERS,
+                    "received": unknown,
+                })
+            record = {h: _cell(obj.get(h)) for h in CANON_HEADERS}
+        else:
+            raise StreamFormatError({"row": self._line_no, "msg": "Record must be an object or array"})
+
+        self.rows_decoded += 1
+        return record
+
+
+def iter_path_records(chunks: Iterable[bytes], fmt: str = "csv") -> Iterator[PathRecord]:
+    """Decode an iterable of byte chunks (e.g. a file read in blocks) into records."""
+    decoder = PathRecordDecoder(fmt)
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+def iter_batches(records: Iterable[PathRecord], batch_size: int) -> Iterator[List[PathRecord]]:
+    """Group records into lists of at most ``batch_size``."""
+    batch: List[PathRecord] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
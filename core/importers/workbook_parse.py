@@ -0,0 +1,157 @@
+"""
+Parsing stage for workbook imports.
+
+The workbook is streamed once (openpyxl read-only, or csv), its header is
+checked, and its rows are cut into fixed-size chunks that are sanitized
+into canonical path records. Batches come out in workbook order, so a
+single writer applies them deterministically, one commit per batch.
+
+Parsing runs in-process: the sheet is decoded sequentially anyway, and
+shipping chunks to worker processes costs more than the sanitizing they
+would take over.
+"""
+
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Sequence
+
+from ..constants import CANON_HEADERS
+from ..import_export import assert_csv_header
+from .stream_import import PathRecord
+
+DEFAULT_CHUNK_ROWS = 5000
+
+_NODE_COLUMNS = CANON_HEADERS[1:6]
+
+
+@dataclass
+class PathBatch:
+    """Normalized records parsed from one contiguous range of workbook rows."""
+    index: int
+    first_row: int  # 1-based sheet row of the first data row in the chunk
+    rows_read: int
+    records: List[PathRecord]
+
+
+def _clean_cell(value: Any) -> Optional[str]:
+    # Same rules as tree_repo.sanitize_label: trim, blank/"nan" -> None
+    if value is None:
+        return None
+    s = str(value).strip()
+    if s == "" or s.lower() == "nan":
+        return None
+    return s
+
+
+def normalize_rows(rows: Sequence[Sequence[Any]]) -> List[PathRecord]:
+    """
+    Sanitize raw sheet rows into canonical path records.
+
+    Rows without a root label are dropped, and node labels after the first
+    blank level are cleared, matching how the writer realizes a path.
+    """
+    width = len(CANON_HEADERS)
+    records: List[PathRecord] = []
+    for cells in rows:
+        values = [_clean_cell(v) for v in list(cells)[:width]]
+        values += [None] * (width - len(values))
+        if values[0] is None:
+            continue
+        record = dict(zip(CANON_HEADERS, values))
+        blank = False
+        for col in _NODE_COLUMNS:
+            if blank:
+                record[col] = None
+            elif record[col] is None:
+                blank = True
+        records.append(record)
+    return records
+
+
+def iter_sheet_rows(path: str) -> Iterator[Sequence[Any]]:
+    """
+    Stream raw rows from the first sheet of an .xlsx/.xlsm file or a .csv file.
+
+    The header row is validated against CANON_HEADERS and not yielded.
+
+    Raises:
+        ValueError: With an assert_csv_header ctx dict on header mismatch
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as fh:
+            reader = csv.reader(fh)
+            header = next(reader, [])
+            assert_csv_header([h.strip() for h in header])
+            yield from reader
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, ())
+        assert_csv_header([str(h).strip() if h is not None else "" for h in header])
+        yield from rows
+    finally:
+        wb.close()
+
+
+def estimate_data_rows(path: str) -> Optional[int]:
+    """
+    Cheap data-row estimate for progress reporting (no cell parsing).
+
+    CSV counts line breaks, so quoted multi-line cells over-count; XLSX uses
+    the sheet's recorded dimension. Returns None when unknown.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        lines = 0
+        last = b"\n"
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                lines += block.count(b"\n")
+                last = block[-1:]
+        if last != b"\n":
+            lines += 1
+        return max(lines - 1, 0)
+
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        max_row = wb.worksheets[0].max_row
+    finally:
+        wb.close()
+    return None if max_row is None else max(max_row - 1, 0)
+
+
+def _chunked(rows: Iterator[Sequence[Any]], size: int) -> Iterator[List[Sequence[Any]]]:
+    chunk: List[Sequence[Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_workbook(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[PathBatch]:
+    """
+    Parse a workbook into normalized path batches.
+
+    Args:
+        path: .xlsx or .csv file with the canonical 8-column header
+        chunk_rows: Rows per batch
+
+    Yields:
+        PathBatch objects in workbook order
+    """
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be >= 1")
+    first_row = 2
+    for index, chunk in enumerate(_chunked(iter_sheet_rows(path), chunk_rows)):
+        yield PathBatch(index, first_row, len(chunk), normalize_rows(chunk))
+        first_row += len(chunk)
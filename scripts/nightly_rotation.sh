@@ -28,7 +28,8 @@ fi
 # Create backup before rotation
 if [[ -d "$BACKUP_DIR" ]]; then
     BACKUP_FILE="$BACKUP_DIR/audit_pre_rotation_$(date +%Y%m%d_%H%M%S).db"
-    cp "$DB_PATH" "$BACKUP_FILE"
+    # Online backup: consistent with pages still in the -wal file
+    sqlite3 "$DB_PATH" ".backup '$BACKUP_FILE'"
     log "Created backup: $BACKUP_FILE"
 fi
 
@@ -0,0 +1,428 @@
+"""
+Online backups of the live database through the SQLite backup API.
+
+Pages are copied in small steps with a short sleep between them, so writers
+only wait for one step at a time and the copy is still a consistent snapshot
+(the backup restarts if another connection writes mid-copy). After
+``max_restarts`` restarts the copy finishes in a single step instead, so a
+busy database cannot keep the backup from ever completing. The snapshot is
+checked with ``PRAGMA quick_check`` on the copy, never on the live database,
+and can be compressed with gzip or zstd (``pip install zstandard``).
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .integrity import record_result
+from .journal import (
+    apply_deltas, has_journal, has_table, journal_seq, prune_journal, record_checkpoint,
+    start_new_timeline
+)
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+BACKUP_PREFIX = "lorien_backup_"
+# Pages copied per backup step (4 KiB pages -> 1 MiB per step)
+DEFAULT_PAGES_PER_STEP = 256
+# Pause between steps so foreground queries get the database
+DEFAULT_STEP_SLEEP = 0.005
+# Restarts (a write landed mid-copy) before finishing in one step
+DEFAULT_MAX_RESTARTS = 5
+COMPRESSIONS = ("none", "gzip", "zstd")
+COMPRESSION_EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+_COPY_CHUNK = 1 << 20
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class _TooManyRestarts(Exception):
+    """Raised from the progress callback to abort a stepped copy that keeps restarting."""
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+def _check_compression(compression: Optional[str]) -> str:
+    compression = compression or "none"
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise RuntimeError("zstandard required for zstd backups")
+    return compression
+
+
+def backup_filename(compression: Optional[str] = None, when: Optional[datetime] = None) -> str:
+    """
+    Timestamped backup file name, e.g. ``lorien_backup_20250101_120000_000123.db.gz``.
+
+    Microseconds keep two backups started in the same second apart; the
+    fixed width keeps name order equal to age order.
+    """
+    when = when or datetime.now()
+    ext = COMPRESSION_EXTENSIONS[_check_compression(compression)]
+    return f"{BACKUP_PREFIX}{when:%Y%m%d_%H%M%S_%f}.db{ext}"
+
+
+def is_backup_file(name: str) -> bool:
+    """True for plain or compressed backup files written by this module."""
+    if not name.startswith(BACKUP_PREFIX):
+        return False
+    return any(name.endswith(".db" + ext) for ext in COMPRESSION_EXTENSIONS.values())
+
+
+def compression_of(path: str) -> str:
+    """Compression of a backup file, from its extension."""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+def _compress(src: str, dest: str, compression: str) -> None:
+    with open(src, "rb") as fin:
+        if compression == "gzip":
+            with gzip.open(dest, "wb", compresslevel=6) as fout:
+                shutil.copyfileobj(fin, fout, _COPY_CHUNK)
+        else:
+            cctx = zstandard.ZstdCompressor(level=3, threads=-1)
+            with open(dest, "wb") as fout:
+                cctx.copy_stream(fin, fout, read_size=_COPY_CHUNK)
+
+
+def decompress_backup(src: str, dest: str) -> None:
+    """Write the plain SQLite file for a (possibly compressed) backup to ``dest``."""
+    compression = _check_compression(compression_of(src))
+    if compression == "none":
+        shutil.copyfile(src, dest)
+        return
+    with open(dest, "wb") as fout:
+        if compression == "gzip":
+            with gzip.open(src, "rb") as fin:
+                shutil.copyfileobj(fin, fout, _COPY_CHUNK)
+        else:
+            with open(src, "rb") as fin:
+                zstandard.ZstdDecompressor().copy_stream(fin, fout, read_size=_COPY_CHUNK)
+
+
+def quick_check(db_path: str) -> Dict[str, Any]:
+    """Run ``PRAGMA quick_check`` on a database file."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = [r[0] for r in conn.execute("PRAGMA quick_check")]
+    finally:
+        conn.close()
+    ok = rows == ["ok"]
+    return {"ok": ok, "details": "ok" if ok else "; ".join(rows[:20])}
+
+
+def _snapshot_journal_seq(path: str) -> Optional[int]:
+    conn = sqlite3.connect(path)
+    try:
+        return journal_seq(conn) if has_journal(conn) else None
+    finally:
+        conn.close()
+
+
+def backup_database(src_path: str, dest_path: str,
+                    pages_per_step: int = DEFAULT_PAGES_PER_STEP,
+                    step_sleep: float = DEFAULT_STEP_SLEEP,
+                    compression: Optional[str] = None,
+                    progress: Optional[ProgressCallback] = None,
+                    checkpoint: bool = True,
+                    max_restarts: int = DEFAULT_MAX_RESTARTS) -> Dict[str, Any]:
+    """
+    Copy a live database to ``dest_path`` with the online backup API.
+
+    Args:
+        src_path: Database to back up (may be open and in WAL mode)
+        dest_path: Output file; written via a temp file and renamed into place
+        pages_per_step: Pages copied per step; -1 copies everything in one step
+        step_sleep: Seconds to sleep between steps
+        compression: 'none', 'gzip' or 'zstd'
+        progress: Called as ``progress(pages_done, pages_total)`` after each step
+        checkpoint: Record the snapshot as a base for delta backups and prune
+            the journal; off for internal copies such as the pre-restore one
+        max_restarts: Restarts tolerated before the rest of the copy is done
+            in one step (holding the read lock for its duration)
+
+    Returns:
+        Dict with path, size_bytes, pages, journal_seq, compression,
+        integrity, restarts, single_step and duration_ms
+    """
+    compression = _check_compression(compression)
+    started = time.perf_counter()
+    dest = Path(dest_path)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    # Per-call temp names: a concurrent copy to the same destination cannot
+    # overwrite or clean up this one's files
+    scratch = uuid.uuid4().hex[:8]
+    snapshot = dest.with_name(f"{dest.name}.{scratch}.partial")
+    partial = dest.with_name(f"{dest.name}.{scratch}.tmp")
+    pages_total = 0
+    pages_done = 0
+    restarts = 0
+    single_step = pages_per_step < 0
+
+    def _on_step(status: int, remaining: int, total: int) -> None:
+        nonlocal pages_total, pages_done, restarts
+        if pages_done and total - remaining <= pages_done:
+            restarts += 1  # a restarted copy is back at its first step
+        pages_total, pages_done = total, total - remaining
+        if progress:
+            progress(pages_done, total)
+        if restarts > max_restarts and remaining:
+            raise _TooManyRestarts()
+        if step_sleep > 0 and remaining:
+            time.sleep(step_sleep)
+
+    try:
+        src = sqlite3.connect(src_path, timeout=30)
+        try:
+            dst = sqlite3.connect(str(snapshot))
+            try:
+                try:
+                    src.backup(dst, pages=pages_per_step, progress=_on_step)
+                except _TooManyRestarts:
+                    single_step = True
+                    src.backup(dst, pages=-1, progress=_on_step)
+                # Snapshot is standalone: no WAL sidecars next to the backup
+                dst.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                dst.close()
+        finally:
+            src.close()
+
+        integrity = quick_check(str(snapshot))
+        journal_at = _snapshot_journal_seq(str(snapshot))
+        if compression == "none":
+            os.replace(snapshot, dest)
+        else:
+            _compress(str(snapshot), str(partial), compression)
+            os.replace(partial, dest)
+    finally:
+        for leftover in (snapshot, partial):
+            if leftover.exists():
+                leftover.unlink()
+
+    if checkpoint and journal_at is not None:
+        # Later delta backups can be replayed onto this snapshot
+        live = sqlite3.connect(src_path, timeout=30)
+        try:
+            record_checkpoint(live, journal_at, "full", str(dest))
+            prune_journal(live)
+            live.commit()
+        finally:
+            live.close()
+
+    return {
+        "path": str(dest),
+        "size_bytes": dest.stat().st_size,
+        "pages": pages_total,
+        "journal_seq": journal_at,
+        "compression": compression,
+        "integrity": integrity,
+        "restarts": restarts,
+        "single_step": single_step,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def restore_database(backup_path: str, db_path: str,
+                     deltas: Sequence[str] = (),
+                     busy_timeout: float = 30.0) -> Dict[str, Any]:
+    """
+    Restore a backup into the live database without closing it.
+
+    The backup is decompressed to a staging file next to the database,
+    delta backups are replayed onto it, and it is validated there
+    (quick_check plus a ``nodes`` table). Only then is it copied into the
+    live file with a single backup-API step: that step holds the write lock,
+    so it is the whole downtime window. Connections stay valid and see the
+    restored content on their next transaction; nothing is renamed under
+    them and no stale -wal/-shm can be replayed.
+
+    Args:
+        backup_path: Plain or compressed full backup
+        db_path: Live database to overwrite
+        deltas: Delta files (see storage.journal); only those continuing the
+            backup's journal timeline are applied, in seq order
+        busy_timeout: Seconds to wait for in-flight writers to finish
+
+    Returns:
+        Dict with integrity, pages, deltas, validate_ms, downtime_ms and total_ms
+
+    Raises:
+        ValueError: If the backup fails validation (the live DB is untouched)
+    """
+    started = time.perf_counter()
+    db = Path(db_path)
+    staging = db.with_name(f".{db.name}.restore-{uuid.uuid4().hex[:8]}")
+    delta_result = None
+    try:
+        decompress_backup(backup_path, str(staging))
+        src = sqlite3.connect(str(staging))
+        try:
+            if not has_table(src, "nodes"):
+                raise ValueError("Backup has no nodes table")
+            if has_journal(src):
+                if deltas:
+                    delta_result = apply_deltas(src, deltas)
+                # The restored database starts a new history
+                start_new_timeline(src)
+            elif deltas:
+                raise ValueError("Backup predates the change journal; deltas cannot be applied")
+            check_started, check_t0 = _now_iso(), time.perf_counter()
+            integrity = quick_check(str(staging))
+            if not integrity["ok"]:
+                raise ValueError(f"Backup failed quick_check: {integrity['details']}")
+            if has_table(src, "integrity_results"):
+                # Cached scan results describe the backed-up file; keep only this check
+                src.execute("DELETE FROM integrity_results")
+                record_result(src, "quick", {"ok": True, "errors": []}, check_started,
+                              round((time.perf_counter() - check_t0) * 1000, 1))
+                src.commit()
+            pages = src.execute("PRAGMA page_count").fetchone()[0]
+            validated = time.perf_counter()
+
+            live = sqlite3.connect(db_path, timeout=busy_timeout)
+            try:
+                swap_started = time.perf_counter()
+                src.backup(live, pages=-1)
+                swapped = time.perf_counter()
+            finally:
+                live.close()
+        finally:
+            src.close()
+    finally:
+        for leftover in (staging, staging.with_name(staging.name + "-journal")):
+            if leftover.exists():
+                leftover.unlink()
+
+    return {
+        "path": str(db),
+        "restored_from": backup_path,
+        "integrity": integrity,
+        "pages": pages,
+        "deltas": delta_result,
+        "validate_ms": round((validated - started) * 1000, 1),
+        "downtime_ms": round((swapped - swap_started) * 1000, 1),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class BackupJob:
+    """State of one background backup, readable while it runs."""
+
+    def __init__(self, src_path: str, dest_path: str, compression: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.src_path = src_path
+        self.dest_path = dest_path
+        self.compression = compression
+        self.state = "queued"
+        self.pages_done = 0
+        self.pages_total = 0
+        self.created_at = _now_iso()
+        self.finished_at: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+    def _progress(self, done: int, total: int) -> None:
+        self.pages_done, self.pages_total = done, total
+
+    def to_dict(self) -> Dict[str, Any]:
+        percent = 100.0 * self.pages_done / self.pages_total if self.pages_total else 0.0
+        if self.state == "completed":
+            percent = 100.0
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "path": self.dest_path,
+            "compression": self.compression,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "percent": round(percent, 1),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class BackupJobRegistry:
+    """Runs backups on daemon threads and keeps the most recent finished jobs."""
+
+    def __init__(self, keep: int = 50):
+        self.keep = keep
+        self._jobs: Dict[str, BackupJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, src_path: str, dest_path: str, compression: Optional[str] = None,
+              pages_per_step: int = DEFAULT_PAGES_PER_STEP,
+              step_sleep: float = DEFAULT_STEP_SLEEP) -> BackupJob:
+        """
+        Run a backup on a daemon thread; returns its job.
+
+        While a backup to ``dest_path`` is in progress every caller gets that
+        job. Only finished jobs are evicted, so a running job's id always
+        resolves.
+        """
+        compression = _check_compression(compression)
+        with self._lock:
+            running = next((j for j in self._jobs.values()
+                            if j.dest_path == dest_path and not j.done.is_set()), None)
+            if running is not None:
+                return running
+            job = BackupJob(src_path, dest_path, compression)
+            self._jobs[job.id] = job
+            finished = [k for k, j in self._jobs.items() if j.done.is_set()]
+            for k in finished[:max(0, len(self._jobs) - self.keep)]:
+                del self._jobs[k]
+
+        def _run() -> None:
+            job.state = "running"
+            try:
+                job.result = backup_database(
+                    src_path, dest_path, pages_per_step=pages_per_step,
+                    step_sleep=step_sleep, compression=job.compression,
+                    progress=job._progress,
+                )
+                job.state = "completed"
+            except Exception as e:
+                job.error = str(e)
+                job.state = "failed"
+            finally:
+                job.finished_at = _now_iso()
+                job.done.set()
+
+        threading.Thread(target=_run, name=f"backup-{job.id}", daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[BackupJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[BackupJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+
+# Process-wide registry used by the API
+backup_jobs = BackupJobRegistry()
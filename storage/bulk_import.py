@@ -0,0 +1,140 @@
+"""
+Batched path writer for bulk imports into the storage schema.
+
+Existing nodes are indexed in memory once, so resolving a path costs no
+SELECTs; new nodes are inserted as they are first seen and triage rows are
+written with one executemany per batch. Callers commit between batches.
+"""
+
+import sqlite3
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from core.constants import CANON_HEADERS
+
+_NODE_COLUMNS = CANON_HEADERS[1:6]
+_SLOTS = (1, 2, 3, 4, 5)
+
+# New root with id above a floor; children then follow rowid = MAX(id) + 1
+ROOT_INSERT_WITH_BASE_SQL = """
+INSERT INTO nodes (id, parent_id, depth, slot, label, is_leaf)
+VALUES ((SELECT MAX(COALESCE(MAX(id), 0), ?) + 1 FROM nodes), NULL, 0, 0, ?, 0)
+"""
+
+
+def new_bulk_summary() -> Dict[str, Any]:
+    """Empty summary in the shape returned by PathBulkWriter."""
+    return {
+        "rows_processed": 0,
+        "created": {"roots": 0, "nodes": 0},
+        "updated": {"triage": 0},
+        "skipped": {"overfull_parents": 0, "triage_not_leaf": 0},
+    }
+
+
+class PathBulkWriter:
+    """
+    Resolve canonical path records onto nodes/triage with an in-memory index.
+
+    With ``dry_run=True`` nothing is written: new nodes receive synthetic
+    negative ids so the summary reports exactly what an import would change.
+    ``id_base`` keeps new roots above that id (partitioned storage).
+    """
+
+    def __init__(self, conn: sqlite3.Connection, dry_run: bool = False, id_base: int = 0):
+        self.conn = conn
+        self.dry_run = dry_run
+        self.id_base = id_base
+        self.summary = new_bulk_summary()
+        self._roots: Dict[str, int] = {}
+        self._children: Dict[Tuple[int, str], int] = {}
+        self._used_slots: Dict[int, Set[int]] = {}
+        self._next_fake_id = -1
+        self._load_index()
+
+    def _load_index(self) -> None:
+        for node_id, parent_id, label, slot in self.conn.execute(
+            "SELECT id, parent_id, label, slot FROM nodes"
+        ):
+            if parent_id is None:
+                self._roots.setdefault(label, node_id)
+            else:
+                self._children.setdefault((parent_id, label), node_id)
+                self._used_slots.setdefault(parent_id, set()).add(slot)
+
+    def _insert(self, parent_id: Optional[int], depth: int, slot: int, label: str) -> int:
+        if self.dry_run:
+            node_id = self._next_fake_id
+            self._next_fake_id -= 1
+            return node_id
+        if parent_id is None and self.id_base:
+            cur = self.conn.execute(ROOT_INSERT_WITH_BASE_SQL, (self.id_base, label))
+            return int(cur.lastrowid)
+        cur = self.conn.execute(
+            "INSERT INTO nodes (parent_id, depth, slot, label, is_leaf) VALUES (?, ?, ?, ?, ?)",
+            (parent_id, depth, slot, label, 1 if depth == 5 else 0),
+        )
+        return int(cur.lastrowid)
+
+    def _root(self, label: str) -> int:
+        node_id = self._roots.get(label)
+        if node_id is None:
+            node_id = self._insert(None, 0, 0, label)
+            self._roots[label] = node_id
+            self.summary["created"]["roots"] += 1
+        return node_id
+
+    def _child(self, parent_id: int, label: str, depth: int) -> Optional[int]:
+        node_id = self._children.get((parent_id, label))
+        if node_id is not None:
+            return node_id
+        used = self._used_slots.setdefault(parent_id, set())
+        slot = next((s for s in _SLOTS if s not in used), None)
+        if slot is None:
+            return None
+        node_id = self._insert(parent_id, depth, slot, label)
+        used.add(slot)
+        self._children[(parent_id, label)] = node_id
+        self.summary["created"]["nodes"] += 1
+        return node_id
+
+    def apply(self, records: Iterable[Mapping[str, Optional[str]]]) -> Dict[str, Any]:
+        """
+        Apply normalized path records (see core.importers.workbook_parse).
+
+        Returns the running summary.
+        """
+        triage: List[Tuple[int, Optional[str], Optional[str]]] = []
+        for rec in records:
+            root_label = rec.get("Vital Measurement")
+            if not root_label:
+                continue
+            node_id = self._root(root_label)
+            depth = 0
+            for col in _NODE_COLUMNS:
+                label = rec.get(col)
+                if not label:
+                    break
+                child_id = self._child(node_id, label, depth + 1)
+                if child_id is None:
+                    self.summary["skipped"]["overfull_parents"] += 1
+                    break
+                node_id, depth = child_id, depth + 1
+
+            diagnostic, actions = rec.get("Diagnostic Triage"), rec.get("Actions")
+            if diagnostic or actions:
+                if depth == 5:
+                    triage.append((node_id, diagnostic, actions))
+                else:
+                    # Triage is only allowed on leaves (tr_triage_only_leaf)
+                    self.summary["skipped"]["triage_not_leaf"] += 1
+            self.summary["rows_processed"] += 1
+
+        if triage and not self.dry_run:
+            self.conn.executemany("""
+                INSERT INTO triage (node_id, diagnostic_triage, actions) VALUES (?, ?, ?)
+                ON CONFLICT(node_id) DO UPDATE SET
+                    diagnostic_triage = excluded.diagnostic_triage,
+                    actions = excluded.actions
+            """, triage)
+        self.summary["updated"]["triage"] += len(triage)
+        return self.summary
@@ -0,0 +1,603 @@
+"""
+Workload-driven index advisor.
+
+``IndexAdvisor.run()`` replays the statements the app actually ran
+against a scratch copy of a database. The statements come from:
+
+- the traced workload (``querystats.workload()``, LORIEN_SQL_TRACE=true);
+- the slow-query log (storage/slowlog.py);
+- any statements passed in by the caller.
+
+The copy is made with the online backup API, so the live file is only
+read, and is ANALYZEd so every plan is costed on the same statistics.
+
+For each statement a candidate index is derived from its WHERE/ON
+predicates: equality columns, most selective first, then one range
+column. ``LOWER(col)`` becomes an expression index. A candidate is
+skipped if an existing index already leads with the same columns.
+Each remaining candidate is created on the copy and kept only if
+``EXPLAIN QUERY PLAN`` picks it for some statement and that plan is
+faster, no longer scans the table, or searches on more key columns.
+SELECTs are timed before and after, with parameters sampled from the
+table.
+
+Existing indexes that no plan uses, or whose columns are a prefix of
+another index, are reported as drop candidates. "Unused" is only judged
+for indexes the workload cannot see being used: an index leading with a
+foreign-key child column (it serves the FK checks and cascades) or on a
+column a trigger looks rows up by is kept, and one named in a trigger's
+``INDEXED BY`` is never dropped. Every index in the
+report carries its write cost: the extra microseconds per updated row,
+measured on the copy by updating a sample of rows with and without it.
+
+``start()`` runs the advisor on a daemon thread, as backups and
+integrity scans do; the API polls the returned job.
+
+``apply()`` runs one recommendation against the live database. CREATE
+INDEX holds the write lock while it builds, but WAL readers carry on.
+Indexes defined in storage/schema.sql are recreated at start-up, so
+dropping those is refused.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import querystats
+from .slowlog import normalize, slow_queries
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent / "schema.sql"
+TIMING_RUNS = 3
+WRITE_SAMPLE_ROWS = 500
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_PREDICATE = re.compile(
+    r"(?:\bLOWER\(\s*(?:(?P<fq>\w+)\.)?(?P<fcol>\w+)\s*\)|(?:(?P<q>\w+)\.)?(?P<col>\w+))\s*"
+    r"(?P<op>==|=|<=|>=|<|>|\bIS\b(?!\s+NOT)|\bLIKE\b|\bIN\b|\bBETWEEN\b)\s*"
+    r"(?P<rhs>\?|NULL\b|LOWER\(\s*\?\s*\)|\(|(?:\w+\.)?\w+)",
+    re.IGNORECASE,
+)
+_CLAUSE = re.compile(r"\b(?:WHERE|ON)\b", re.IGNORECASE)
+_RANGE_OPS = {"<", ">", "<=", ">=", "LIKE", "BETWEEN"}
+_KEYWORDS = {
+    "where", "on", "join", "left", "right", "inner", "outer", "cross", "natural", "order", "group",
+    "limit", "set", "values", "select", "using", "as", "and", "or", "not", "having", "union", "default",
+}
+
+
+def _uses_index(plan: List[str], name: str) -> bool:
+    pattern = re.compile(rf"INDEX {re.escape(name)}(?:\s|$)")
+    return any(pattern.search(detail) for detail in plan)
+
+
+def _full_scan(plan: List[str], table: str) -> bool:
+    return any(re.match(rf"^SCAN (?:TABLE )?{re.escape(table)}$", detail) for detail in plan)
+
+
+def _search_terms(plan: List[str], table: str) -> int:
+    """Key constraints the plan's index searches on ``table`` use, e.g. 2 for ``(a=? AND b>?)``."""
+    terms = 0
+    for detail in plan:
+        match = re.match(rf"^SEARCH (?:TABLE )?{re.escape(table)} USING .*\((.*)\)$", detail)
+        if match:
+            terms = max(terms, len(match.group(1).split(" AND ")))
+    return terms
+
+
+class _Statement:
+    """One workload statement, parsed against the scratch database."""
+
+    def __init__(self, sql: str, calls: int, ms: float):
+        self.sql = sql.replace("IN (?...)", "IN (?)")
+        self.calls = calls
+        self.ms = ms
+        self.is_select = self.sql.lstrip().split(None, 1)[0].upper() in ("SELECT", "WITH")
+        self.predicates: List[Tuple[str, str, str]] = []  # (table, column or LOWER(column), eq|range)
+        self.param_columns: Dict[int, Tuple[str, str]] = {}  # offset of a ? -> (table, column)
+        self.params: Any = ()
+        self.plan: List[str] = []
+        self.baseline_ms: Optional[float] = None
+
+    @property
+    def tables(self) -> List[str]:
+        return sorted({table for table, _, _ in self.predicates})
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class AdvisorJob:
+    """State of one background advisor run, readable while it runs."""
+
+    def __init__(self, db_path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.db_path = db_path
+        self.state = "queued"
+        self.created_at = _now_iso()
+        self.finished_at: Optional[str] = None
+        self.report: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class IndexAdvisor:
+    """Recommends indexes to add and drop; keeps the last report for ``apply()``."""
+
+    def __init__(self, keep_jobs: int = 20):
+        self._lock = threading.Lock()
+        self.last: Optional[Dict[str, Any]] = None
+        self.keep_jobs = keep_jobs
+        self._jobs: Dict[str, AdvisorJob] = {}
+
+    # ---- background runs ------------------------------------------------
+
+    def start(self, db_path: str, statements: Iterable[str] = ()) -> AdvisorJob:
+        """
+        Run the advisor on a daemon thread; returns its job.
+
+        While a run is in progress every caller gets that run's job, so the
+        scratch copy is made once.
+        """
+        statements = list(statements)
+        with self._lock:
+            running = next((j for j in self._jobs.values() if not j.done.is_set()), None)
+            if running is not None:
+                return running
+            job = AdvisorJob(db_path)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep_jobs:
+                self._jobs.pop(next(iter(self._jobs)))
+
+        def _run() -> None:
+            job.state = "running"
+            try:
+                job.report = self.run(db_path, statements)
+                job.state = "completed"
+            except Exception as e:
+                logger.warning("Index advisor failed: %s", e)
+                job.error = str(e)
+                job.state = "failed"
+            finally:
+                job.finished_at = _now_iso()
+                job.done.set()
+
+        threading.Thread(target=_run, name=f"index-advisor-{job.id}", daemon=True).start()
+        return job
+
+    def job(self, job_id: str) -> Optional[AdvisorJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # ---- workload -------------------------------------------------------
+
+    @staticmethod
+    def collect_workload(extra: Iterable[str] = ()) -> Dict[str, List[Any]]:
+        """Normalized SQL -> [calls, total ms] from tracing, the slow log and ``extra``."""
+        workload: Dict[str, List[Any]] = {}
+
+        def add(sql: str, calls: int, ms: float) -> None:
+            key = normalize(sql)
+            entry = workload.setdefault(key, [0, 0.0])
+            entry[0] += calls
+            entry[1] += ms
+
+        for sql, (calls, ms) in querystats.workload().items():
+            add(sql, calls, ms)
+        try:
+            for entry in slow_queries.entries():
+                add(entry["sql"], 1, entry["duration_ms"])
+        except sqlite3.Error as e:
+            logger.warning("Index advisor could not read the slow-query log: %s", e)
+        for sql in extra:
+            add(sql, 1, 0.0)
+        return workload
+
+    # ---- scratch database helpers ---------------------------------------
+
+    def _tables(self, conn: sqlite3.Connection) -> Dict[str, Dict[str, Any]]:
+        tables = {}
+        for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ):
+            info = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+            tables[name.lower()] = {
+                "name": name,
+                "columns": {row[1].lower(): row[1] for row in info},
+                "rowid_alias": next((row[1] for row in info
+                                     if row[5] == 1 and (row[2] or "").upper() == "INTEGER"), None),
+            }
+        return tables
+
+    @staticmethod
+    def _fk_columns(conn: sqlite3.Connection, tables: Dict[str, Dict[str, Any]]) -> set:
+        """(table, column) pairs, lowercased, that are the child side of a foreign key."""
+        return {(table["name"].lower(), row[3].lower())
+                for table in tables.values()
+                for row in conn.execute(f'PRAGMA foreign_key_list("{table["name"]}")')}
+
+    @staticmethod
+    def _trigger_bodies(conn: sqlite3.Connection) -> List[str]:
+        bodies = []
+        for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger'"):
+            match = re.search(r"\bBEGIN\b(.*)", sql or "", re.IGNORECASE | re.DOTALL)
+            if match:
+                bodies.append(match.group(1))
+        return bodies
+
+    def _trigger_keys(self, bodies: List[str], tables: Dict[str, Dict[str, Any]]) -> set:
+        """(table, column) pairs, lowercased, that trigger statements look rows up by."""
+        keys = set()
+        for body in bodies:
+            # NEW.x / OLD.x are bound values, like a ? in application SQL
+            for sql in re.sub(r"\b(?:NEW|OLD)\.\w+", "?", body, flags=re.IGNORECASE).split(";"):
+                if not sql.strip() or re.fullmatch(r"\s*END\s*", sql, re.IGNORECASE):
+                    continue
+                stmt = _Statement(sql.strip(), 0, 0.0)
+                self._parse(stmt, tables)
+                keys.update((table.lower(), key.lower()) for table, key, _ in stmt.predicates)
+        return keys
+
+    @staticmethod
+    def _indexes(conn: sqlite3.Connection, tables: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        sql_by_name = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index'"))
+        indexes = []
+        for table in tables.values():
+            for _, name, unique, origin, partial in conn.execute(f'PRAGMA index_list("{table["name"]}")'):
+                sql = sql_by_name.get(name)
+                if sql:
+                    body = re.search(r"\bON\s+\"?\w+\"?\s*\((.*?)\)\s*(?:WHERE\b|$)", sql, re.IGNORECASE | re.DOTALL)
+                    columns = [" ".join(c.split()) for c in body.group(1).split(",")] if body else []
+                else:
+                    columns = [row[2] for row in conn.execute(f'PRAGMA index_info("{name}")')]
+                indexes.append({
+                    "name": name, "table": table["name"], "columns": columns, "sql": sql,
+                    "unique": bool(unique), "origin": origin, "partial": bool(partial),
+                })
+        return indexes
+
+    def _parse(self, stmt: _Statement, tables: Dict[str, Dict[str, Any]]) -> None:
+        aliases: Dict[str, str] = {}
+        order: List[str] = []
+        for match in _TABLE_REF.finditer(stmt.sql):
+            table = tables.get(match.group(1).lower())
+            if table is None:
+                continue
+            aliases[match.group(1).lower()] = table["name"]
+            if match.group(2) and match.group(2).lower() not in _KEYWORDS:
+                aliases[match.group(2).lower()] = table["name"]
+            if table["name"] not in order:
+                order.append(table["name"])
+
+        def resolve(qualifier: Optional[str], column: str) -> Optional[Tuple[str, str]]:
+            candidates = [aliases[qualifier.lower()]] if qualifier and qualifier.lower() in aliases else (
+                [] if qualifier else order)
+            for name in candidates:
+                real = tables[name.lower()]["columns"].get(column.lower())
+                if real:
+                    return name, real
+            return None
+
+        clause = _CLAUSE.search(stmt.sql)
+        if clause is None:
+            return
+        for match in _PREDICATE.finditer(stmt.sql, clause.start()):
+            if match.group("fcol"):
+                found = resolve(match.group("fq"), match.group("fcol"))
+                key = f"LOWER({found[1]})" if found else None
+            else:
+                if match.group("col").lower() in _KEYWORDS:
+                    continue
+                found = resolve(match.group("q"), match.group("col"))
+                key = found[1] if found else None
+            if found is None:
+                continue
+            op = match.group("op").upper()
+            rhs = match.group("rhs")
+            if rhs not in ("?", "(") and not rhs.upper().startswith(("NULL", "LOWER")):
+                if resolve(*(rhs.split(".", 1) if "." in rhs else (None, rhs))) is None:
+                    continue  # compared with something that is not a column: not an index key
+            stmt.predicates.append((found[0], key, "range" if op in _RANGE_OPS else "eq"))
+            if "?" in rhs:
+                stmt.param_columns[match.start("rhs") + rhs.index("?")] = found
+
+    def _sample(self, conn: sqlite3.Connection, table: str, column: str, cache: Dict) -> Any:
+        key = (table, column)
+        if key not in cache:
+            row = conn.execute(
+                f'SELECT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL '
+                f'LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM "{table}")'
+            ).fetchone() or conn.execute(f'SELECT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL LIMIT 1').fetchone()
+            cache[key] = row[0] if row else None
+        return cache[key]
+
+    def _bind(self, conn: sqlite3.Connection, stmt: _Statement, cache: Dict) -> None:
+        names = re.findall(r"(?<![:\w]):([A-Za-z_]\w*)", stmt.sql)
+        if names:
+            stmt.params = {name: None for name in names}
+            return
+        params: List[Any] = []
+        for match in re.finditer(r"\?", stmt.sql):
+            column = stmt.param_columns.get(match.start())
+            before = stmt.sql[:match.start()].rstrip().upper()
+            if column is not None:
+                params.append(self._sample(conn, column[0], column[1], cache))
+            elif before.endswith("LIMIT"):
+                params.append(100)
+            elif before.endswith("OFFSET"):
+                params.append(0)
+            elif before.endswith("AND") and params and re.search(r"BETWEEN\s+\?\s+AND$", before):
+                params.append(params[-1])
+            else:
+                params.append(None)
+        stmt.params = tuple(params)
+
+    @staticmethod
+    def _plan(conn: sqlite3.Connection, stmt: _Statement) -> List[str]:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + stmt.sql, stmt.params)]
+
+    @staticmethod
+    def _time(conn: sqlite3.Connection, stmt: _Statement) -> Optional[float]:
+        if not stmt.is_select:
+            return None
+        best = None
+        for _ in range(TIMING_RUNS):
+            started = time.perf_counter()
+            conn.execute(stmt.sql, stmt.params).fetchall()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best, 4)
+
+    @staticmethod
+    def _write_cost_us(conn: sqlite3.Connection, table: str, columns: List[str]) -> Optional[float]:
+        """Microseconds per row to rewrite ``columns`` on a sample of rows (rolled back)."""
+        plain = sorted({m for c in columns for m in re.findall(r"\w+", c) if m.upper() != "LOWER"})
+        if not plain:
+            return None
+        assignments = ", ".join(f'"{c}" = "{c}"' for c in plain)
+        sql = (f'UPDATE "{table}" SET {assignments} '
+               f'WHERE rowid IN (SELECT rowid FROM "{table}" LIMIT {WRITE_SAMPLE_ROWS})')
+        best = None
+        for _ in range(TIMING_RUNS):
+            conn.execute("BEGIN")
+            try:
+                started = time.perf_counter()
+                rows = conn.execute(sql).rowcount
+                elapsed = time.perf_counter() - started
+            except sqlite3.Error as e:
+                logger.debug("Write-cost probe on %s failed: %s", table, e)
+                return None
+            finally:
+                conn.execute("ROLLBACK")
+            if rows <= 0:
+                return None
+            per_row = elapsed / rows * 1e6
+            best = per_row if best is None else min(best, per_row)
+        return best
+
+    def _index_cost(self, conn: sqlite3.Connection, table: str, columns: List[str],
+                    create_sql: str, drop_sql: str, present: bool) -> Optional[float]:
+        """Extra write cost of one index: measured with it, then without it."""
+        if not present:
+            conn.execute(create_sql)
+        with_index = self._write_cost_us(conn, table, columns)
+        conn.execute(drop_sql)
+        without = self._write_cost_us(conn, table, columns)
+        if present:
+            conn.execute(create_sql)
+        if with_index is None or without is None:
+            return None
+        return round(max(0.0, with_index - without), 3)
+
+    # ---- the advisor ----------------------------------------------------
+
+    def run(self, db_path: str, statements: Iterable[str] = ()) -> Dict[str, Any]:
+        """Analyse the workload against a scratch copy of ``db_path``; returns the report."""
+        started = time.perf_counter()
+        workload = self.collect_workload(statements)
+        with tempfile.TemporaryDirectory(prefix="lorien_advisor_") as scratch_dir:
+            scratch = os.path.join(scratch_dir, "scratch.db")
+            src = sqlite3.connect(db_path, timeout=30)
+            dst = sqlite3.connect(scratch, isolation_level=None)
+            try:
+                src.backup(dst)
+            finally:
+                src.close()
+            try:
+                report = self._analyse(dst, workload)
+            finally:
+                dst.close()
+        report.update(
+            database=str(db_path),
+            generated_at=datetime.now(timezone.utc).isoformat(),
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+        with self._lock:
+            self.last = report
+        return report
+
+    def _analyse(self, conn: sqlite3.Connection, workload: Dict[str, List[Any]]) -> Dict[str, Any]:
+        conn.execute("ANALYZE")
+        tables = self._tables(conn)
+        indexes = self._indexes(conn, tables)
+        samples: Dict = {}
+
+        parsed: List[_Statement] = []
+        skipped = []
+        for sql, (calls, ms) in workload.items():
+            stmt = _Statement(sql, calls, ms)
+            self._parse(stmt, tables)
+            try:
+                self._bind(conn, stmt, samples)
+                stmt.plan = self._plan(conn, stmt)
+                stmt.baseline_ms = self._time(conn, stmt)
+            except sqlite3.Error as e:
+                skipped.append({"sql": querystats.preview(sql), "error": str(e)})
+                continue
+            parsed.append(stmt)
+
+        # candidates: one per (table, column list), evaluated against every statement on that table
+        candidates: Dict[Tuple[str, Tuple[str, ...]], List[_Statement]] = {}
+        distinct: Dict[Tuple[str, str], int] = {}
+        for stmt in parsed:
+            for table in stmt.tables:
+                eq = list(dict.fromkeys(k for t, k, kind in stmt.predicates if t == table and kind == "eq"))
+                rng = next((k for t, k, kind in stmt.predicates if t == table and kind == "range" and k not in eq), None)
+                if not eq and rng is None:
+                    continue
+                for key in eq:
+                    if (table, key) not in distinct:
+                        distinct[(table, key)] = conn.execute(f'SELECT COUNT(DISTINCT {key}) FROM "{table}"').fetchone()[0]
+                eq.sort(key=lambda k: -distinct[(table, k)])
+                columns = tuple(eq + ([rng] if rng else []))
+                if columns[0] == tables[table.lower()]["rowid_alias"]:
+                    continue
+                if any(ix["table"] == table and not ix["partial"]
+                       and [c.lower() for c in ix["columns"][:len(columns)]] == [c.lower() for c in columns]
+                       for ix in indexes):
+                    continue
+                candidates.setdefault((table, columns), [])
+        for (table, columns), users in candidates.items():
+            users.extend(s for s in parsed if table in s.tables)
+
+        recommendations = []
+        for (table, columns), users in candidates.items():
+            name = "idx_" + "_".join([table.lower()] + [re.sub(r"\W+", "_", c.lower()).strip("_") for c in columns])
+            create_sql = f'CREATE INDEX IF NOT EXISTS {name} ON "{table}"({", ".join(columns)})'
+            drop_sql = f"DROP INDEX IF EXISTS {name}"
+            conn.execute(create_sql)
+            conn.execute(f"ANALYZE {name}")
+            helped = []
+            for stmt in users:
+                plan = self._plan(conn, stmt)
+                if not _uses_index(plan, name):
+                    continue
+                after = self._time(conn, stmt)
+                gain = None
+                if stmt.baseline_ms is not None and after is not None:
+                    gain = round(stmt.calls * (stmt.baseline_ms - after), 4)
+                helped.append({
+                    "sql": querystats.preview(stmt.sql), "calls": stmt.calls,
+                    "plan_before": stmt.plan, "plan_after": plan,
+                    "ms_before": stmt.baseline_ms, "ms_after": after, "saved_ms": gain,
+                    "full_scan_removed": _full_scan(stmt.plan, table) and not _full_scan(plan, table),
+                    "narrower_search": _search_terms(plan, table) > _search_terms(stmt.plan, table),
+                })
+            # timings of fast lookups are noise-level, so a tighter plan counts on its own
+            if any((h["saved_ms"] or 0) > 0 or h["full_scan_removed"] or h["narrower_search"] for h in helped):
+                recommendations.append({
+                    "name": name, "table": table, "columns": list(columns), "sql": create_sql,
+                    "statements": helped,
+                    "saved_ms": round(sum(h["saved_ms"] or 0 for h in helped), 4),
+                    "write_cost_us_per_row": self._index_cost(conn, table, list(columns), create_sql, drop_sql, True),
+                })
+            conn.execute(drop_sql)
+        recommendations.sort(key=lambda r: -r["saved_ms"])
+
+        used = {ix["name"] for ix in indexes for stmt in parsed if _uses_index(stmt.plan, ix["name"])}
+        touched = {table for stmt in parsed for table in stmt.tables}
+        fk_columns = self._fk_columns(conn, tables)
+        triggers = self._trigger_bodies(conn)
+        trigger_keys = self._trigger_keys(triggers, tables)
+        schema_sql = SCHEMA_PATH.read_text() if SCHEMA_PATH.exists() else ""
+        drops = []
+        for ix in indexes:
+            if ix["origin"] != "c" or ix["unique"] or ix["sql"] is None:
+                continue  # constraint indexes are not ours to drop
+            lowered = [c.lower() for c in ix["columns"]]
+            if any(re.search(rf"\bINDEXED\s+BY\s+\"?{re.escape(ix['name'])}\b", body, re.IGNORECASE)
+                   for body in triggers):
+                continue  # dropping it would break the trigger
+            covering = next((other["name"] for other in indexes
+                             if other is not ix and other["table"] == ix["table"] and not other["partial"]
+                             and not ix["partial"]
+                             and [c.lower() for c in other["columns"][:len(lowered)]] == lowered
+                             and (len(other["columns"]) > len(lowered) or other["unique"] or other["name"] < ix["name"])),
+                            None)
+            if covering:
+                reason = f"redundant: {covering} starts with the same columns"
+            elif ix["table"] in touched and ix["name"] not in used:
+                # FK checks, cascades and trigger statements use indexes the
+                # workload never shows; a covering index would still serve them
+                leading = re.sub(r"^lower\(\s*(\w+)\s*\)$", r"\1", lowered[0]) if lowered else ""
+                if (ix["table"].lower(), leading) in fk_columns | trigger_keys:
+                    continue
+                reason = "no plan in the observed workload uses it"
+            else:
+                continue
+            drops.append({
+                "name": ix["name"], "table": ix["table"], "columns": ix["columns"], "reason": reason,
+                "sql": f"DROP INDEX IF EXISTS {ix['name']}",
+                "in_schema": re.search(rf"\b{re.escape(ix['name'])}\b", schema_sql) is not None,
+                "write_cost_us_per_row": self._index_cost(conn, ix["table"], ix["columns"], ix["sql"],
+                                                          f"DROP INDEX {ix['name']}", True),
+            })
+
+        return {
+            "statements": len(parsed),
+            "skipped": skipped,
+            "candidates": len(candidates),
+            "recommendations": recommendations,
+            "drop": drops,
+        }
+
+    # ---- applying -------------------------------------------------------
+
+    def apply(self, db_path: str, name: str) -> Dict[str, Any]:
+        """
+        Create (or drop) the index ``name`` from the last report on the live database.
+
+        Raises LookupError when there is no report or ``name`` is not in it,
+        PermissionError for an index that storage/schema.sql would recreate.
+        """
+        with self._lock:
+            report = self.last
+        if report is None:
+            raise LookupError("Run the index advisor first")
+        item = next((r for r in report["recommendations"] if r["name"] == name), None)
+        action = "create"
+        if item is None:
+            item = next((d for d in report["drop"] if d["name"] == name), None)
+            action = "drop"
+        if item is None:
+            raise LookupError(f"Index {name} is not in the last advisor report")
+        if action == "drop" and item["in_schema"]:
+            raise PermissionError(f"Index {name} is defined in storage/schema.sql and is recreated at start-up")
+
+        started = time.perf_counter()
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute(item["sql"])
+            if action == "create":
+                conn.execute(f"ANALYZE {name}")
+        finally:
+            conn.close()
+        with self._lock:
+            key = "recommendations" if action == "create" else "drop"
+            if self.last is report:
+                report[key] = [r for r in report[key] if r["name"] != name]
+        logger.info("Index advisor applied: %s", item["sql"])
+        return {"action": action, "name": name, "sql": item["sql"],
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+index_advisor = IndexAdvisor()
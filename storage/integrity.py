@@ -0,0 +1,252 @@
+"""
+Background integrity scanning with cached results.
+
+Three scan kinds run on their own cadence from a daemon thread:
+
+- ``quick``: ``PRAGMA quick_check`` (every few minutes);
+- ``full``: ``PRAGMA integrity_check`` (rarely; minutes on a large file);
+- ``foreign_keys``: ``PRAGMA foreign_key_check(<table>)`` one table at a
+  time, each in its own short read transaction.
+
+The latest result of each kind is stored in the ``integrity_results``
+table, so endpoints can answer from the cache (with its age) instead of
+blocking on a scan, and results survive restarts.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCAN_KINDS = ("quick", "full", "foreign_keys")
+# Problems kept per scan; the pragma stops after this many
+MAX_ERRORS = 100
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r", name, os.getenv(name))
+        return default
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout = 30000")
+    return conn
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def run_quick_check(conn: sqlite3.Connection) -> Dict[str, Any]:
+    rows = [r[0] for r in conn.execute(f"PRAGMA quick_check({MAX_ERRORS})")]
+    ok = rows == ["ok"]
+    return {"ok": ok, "errors": [] if ok else rows}
+
+
+def run_integrity_check(conn: sqlite3.Connection) -> Dict[str, Any]:
+    rows = [r[0] for r in conn.execute(f"PRAGMA integrity_check({MAX_ERRORS})")]
+    ok = rows == ["ok"]
+    return {"ok": ok, "errors": [] if ok else rows}
+
+
+def run_foreign_key_check(conn: sqlite3.Connection, pause: float = 0.0) -> Dict[str, Any]:
+    """Check foreign keys table by table, sleeping ``pause`` seconds in between."""
+    tables = [
+        r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+    ]
+    violations: Dict[str, int] = {}
+    samples: List[Dict[str, Any]] = []
+    for i, table in enumerate(tables):
+        if i and pause:
+            time.sleep(pause)
+        rows = conn.execute(f'PRAGMA foreign_key_check("{table}")').fetchall()
+        if rows:
+            violations[table] = len(rows)
+            samples.extend(
+                {"table": t, "rowid": rowid, "parent": parent, "fk_index": fk}
+                for t, rowid, parent, fk in rows[:MAX_ERRORS - len(samples)]
+            )
+    return {"ok": not violations, "tables_checked": len(tables),
+            "violations": violations, "errors": samples}
+
+
+def record_result(conn: sqlite3.Connection, kind: str, result: Dict[str, Any],
+                  started_at: str, duration_ms: float) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO integrity_results (kind, ok, result, started_at, finished_at, duration_ms) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (kind, int(result["ok"]), json.dumps(result), started_at, _now_iso(), duration_ms),
+    )
+
+
+def cached_results(db_path: str) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Last stored result of each scan kind with ``age_seconds``; None if never run."""
+    out: Dict[str, Optional[Dict[str, Any]]] = {kind: None for kind in SCAN_KINDS}
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT kind, ok, result, started_at, finished_at, duration_ms FROM integrity_results"
+        ).fetchall()
+    except sqlite3.OperationalError:  # database predates the table
+        rows = []
+    finally:
+        conn.close()
+    now = datetime.now(timezone.utc)
+    for kind, ok, result, started_at, finished_at, duration_ms in rows:
+        age = (now - datetime.fromisoformat(finished_at)).total_seconds()
+        out[kind] = {
+            "ok": bool(ok), **json.loads(result), "started_at": started_at,
+            "finished_at": finished_at, "duration_ms": duration_ms,
+            "age_seconds": round(age, 1),
+        }
+    return out
+
+
+def summarize(results: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Overall verdict from cached results: ok is None until something has run."""
+    ran = {k: v for k, v in results.items() if v is not None}
+    return {
+        "ok": all(v["ok"] for v in ran.values()) if ran else None,
+        "failed": sorted(k for k, v in ran.items() if not v["ok"]),
+        "age_seconds": {k: v["age_seconds"] for k, v in ran.items()},
+    }
+
+
+class IntegrityScanner:
+    """Runs scans on a daemon thread (or on demand) and stores their results."""
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv("LORIEN_INTEGRITY_ENABLED", "true").lower() == "true"
+        self.every = {
+            "quick": _env_float("LORIEN_INTEGRITY_QUICK_EVERY", 300),
+            "full": _env_float("LORIEN_INTEGRITY_FULL_EVERY", 7 * 86400),
+            "foreign_keys": _env_float("LORIEN_INTEGRITY_FK_EVERY", 86400),
+        }
+        self.fk_table_pause = _env_float("LORIEN_INTEGRITY_FK_TABLE_PAUSE", 0.05)
+        self.db_path: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running: Dict[str, threading.Event] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def attach(self, db_path: str) -> None:
+        if not self.running:
+            self.db_path = db_path
+
+    def start(self, db_path: str) -> None:
+        if self.running:
+            return
+        self.attach(db_path)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="integrity-scan", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def in_progress(self) -> List[str]:
+        with self._lock:
+            return [k for k, done in self._running.items() if not done.is_set()]
+
+    def _claim(self, kind: str) -> Tuple[threading.Event, bool]:
+        """The event of the running ``kind`` scan, or a new one marked running (second item True)."""
+        if kind not in SCAN_KINDS:
+            raise ValueError(f"Unknown scan kind: {kind}")
+        with self._lock:
+            pending = self._running.get(kind)
+            if pending is not None and not pending.is_set():
+                return pending, False
+            done = self._running[kind] = threading.Event()
+            return done, True
+
+    def scan(self, kind: str) -> Dict[str, Any]:
+        """Run one scan now on the calling thread and store its result."""
+        done, claimed = self._claim(kind)
+        if not claimed:
+            raise RuntimeError(f"A {kind} scan is already running")
+        return self._run(kind, done)
+
+    def _run(self, kind: str, done: threading.Event) -> Dict[str, Any]:
+        started_at = _now_iso()
+        started = time.perf_counter()
+        try:
+            conn = _connect(self.db_path)
+            try:
+                if kind == "quick":
+                    result = run_quick_check(conn)
+                elif kind == "full":
+                    result = run_integrity_check(conn)
+                else:
+                    result = run_foreign_key_check(conn, self.fk_table_pause)
+                duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                record_result(conn, kind, result, started_at, duration_ms)
+            finally:
+                conn.close()
+        finally:
+            done.set()
+        if not result["ok"]:
+            logger.error("Integrity %s scan found problems: %s", kind, result["errors"][:5])
+        return {"kind": kind, **result, "started_at": started_at, "duration_ms": duration_ms}
+
+    def trigger(self, kind: str) -> threading.Event:
+        """
+        Start a scan on its own daemon thread; the returned event is set when it ends.
+
+        The scan is marked running before the thread starts, so concurrent
+        callers all get the event of the one scan.
+        """
+        done, claimed = self._claim(kind)
+        if not claimed:
+            return done
+
+        def _scan() -> None:
+            try:
+                self._run(kind, done)
+            except Exception as e:
+                logger.warning("Integrity %s scan failed: %s", kind, e)
+
+        threading.Thread(target=_scan, name=f"integrity-{kind}", daemon=True).start()
+        return done
+
+    def due(self) -> List[str]:
+        """Scan kinds whose cached result is missing or older than their period."""
+        cached = cached_results(self.db_path)
+        return [
+            kind for kind in SCAN_KINDS
+            if cached[kind] is None or cached[kind]["age_seconds"] >= self.every[kind]
+        ]
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            if self.enabled:
+                try:
+                    for kind in self.due():
+                        if self._stop.is_set():
+                            break
+                        self.scan(kind)
+                except Exception as e:
+                    logger.warning("Integrity scan failed: %s", e)
+            self._stop.wait(min(30.0, min(self.every.values())))
+
+
+# Process-wide scanner used by the API
+integrity_scanner = IntegrityScanner()
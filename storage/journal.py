@@ -0,0 +1,336 @@
+"""
+Change journal and delta backups.
+
+Triggers in schema.sql append every row-level change to nodes, triage,
+red_flags and node_red_flags to ``change_journal``. A delta backup exports
+only the entries written since the last full or delta backup into a small
+compressed JSON-lines file, so backup I/O follows churn rather than database
+size. Restoring replays deltas, in seq order, onto a full backup.
+
+Delta file layout (one JSON value per line)::
+
+    {"format": "lorien-delta/1", "timeline": ..., "seq_from": a, "seq_to": b, ...}
+    [seq, table, op, row_key, row_data]
+    ...
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+DELTA_FORMAT = "lorien-delta/1"
+DELTA_PREFIX = "lorien_delta_"
+# Journaled tables and their primary key columns
+JOURNAL_TABLES = {
+    "nodes": ("id",),
+    "triage": ("node_id",),
+    "red_flags": ("id",),
+    "node_red_flags": ("node_id", "red_flag_id"),
+}
+_DELTA_NAME = re.compile(
+    re.escape(DELTA_PREFIX) + r"(?P<timeline>[0-9a-f]+)_(?P<seq_from>\d+)_(?P<seq_to>\d+)\.jsonl(\.gz|\.zst)?$"
+)
+_FETCH_ROWS = 5000
+
+
+def has_table(conn: sqlite3.Connection, name: str) -> bool:
+    """True if the database on ``conn`` has a table called ``name``."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def has_journal(conn: sqlite3.Connection) -> bool:
+    return has_table(conn, "change_journal_state")
+
+
+def journal_seq(conn: sqlite3.Connection) -> int:
+    """Highest journal seq ever assigned (unaffected by pruning)."""
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'"
+    ).fetchone() if has_table(conn, "sqlite_sequence") else None
+    return int(row[0]) if row else 0
+
+
+def journal_timeline(conn: sqlite3.Connection) -> str:
+    return conn.execute("SELECT timeline FROM change_journal_state WHERE id = 1").fetchone()[0]
+
+
+def delta_base(conn: sqlite3.Connection) -> Optional[int]:
+    """
+    Journal seq the next delta continues from, or None without a usable full backup.
+
+    That is the last delta, unless every retained full backup (its file
+    still exists) is newer; then the oldest retained full backup. A later
+    full backup does not move it, so the delta chain of an older base is
+    never cut. If trim_journal dropped entries past that point, the chain
+    restarts at the oldest retained full backup the journal still covers.
+    """
+    fulls = sorted(seq for seq, path in conn.execute(
+        "SELECT seq, path FROM journal_checkpoints WHERE kind = 'full'"
+    ) if path is None or os.path.exists(path))
+    if not fulls:
+        return None
+    last_delta = conn.execute(
+        "SELECT MAX(seq) FROM journal_checkpoints WHERE kind = 'delta'"
+    ).fetchone()[0]
+    base = fulls[0] if last_delta is None or last_delta < fulls[0] else last_delta
+    first = conn.execute("SELECT MIN(seq) FROM change_journal").fetchone()[0]
+    covered_from = journal_seq(conn) if first is None else first - 1
+    if base >= covered_from:
+        return base
+    return next((seq for seq in fulls if seq >= covered_from), None)
+
+
+def record_checkpoint(conn: sqlite3.Connection, seq: int, kind: str, path: Optional[str]) -> None:
+    conn.execute(
+        "INSERT INTO journal_checkpoints (seq, kind, path) VALUES (?, ?, ?)", (seq, kind, path)
+    )
+
+
+def prune_journal(conn: sqlite3.Connection) -> int:
+    """Drop entries no delta will need again (up to delta_base); returns rows deleted."""
+    base = delta_base(conn)
+    if base is None:
+        return 0
+    return conn.execute("DELETE FROM change_journal WHERE seq <= ?", (base,)).rowcount
+
+
+def trim_journal(conn: sqlite3.Connection, max_rows: int) -> int:
+    """
+    Keep at most ``max_rows`` journal entries, dropping the oldest.
+
+    Bounds the journal when no backups run. Trimming past delta_base breaks
+    the delta chain; the next delta then needs a full backup taken after
+    the trim.
+    """
+    low, high = conn.execute("SELECT MIN(seq), MAX(seq) FROM change_journal").fetchone()
+    if low is None or high - low + 1 <= max_rows:
+        return 0
+    return conn.execute("DELETE FROM change_journal WHERE seq <= ?", (high - max_rows,)).rowcount
+
+
+def delta_filename(timeline: str, seq_from: int, seq_to: int, compression: str = "gzip") -> str:
+    ext = {"none": "", "gzip": ".gz", "zstd": ".zst"}[compression]
+    return f"{DELTA_PREFIX}{timeline}_{seq_from:012d}_{seq_to:012d}.jsonl{ext}"
+
+
+def parse_delta_filename(name: str) -> Optional[Tuple[str, int, int]]:
+    """(timeline, seq_from, seq_to) for a delta file name, or None."""
+    m = _DELTA_NAME.match(os.path.basename(name))
+    if not m:
+        return None
+    return m.group("timeline"), int(m.group("seq_from")), int(m.group("seq_to"))
+
+
+def _open_delta(path: str, mode: str, name: Optional[str] = None) -> BinaryIO:
+    # Compression follows the final file name, which may differ from a temp path
+    name = name or path
+    if name.endswith(".gz"):
+        return gzip.open(path, mode + "b", compresslevel=6)
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard required for zstd deltas")
+        raw = open(path, mode + "b")
+        if mode == "w":
+            return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+    return open(path, mode + "b")
+
+
+def export_delta(db_path: str, dest_dir: str, compression: str = "gzip") -> Dict[str, Any]:
+    """
+    Write journal entries since the last checkpoint to a delta file.
+
+    Args:
+        db_path: Live database
+        dest_dir: Directory for the delta file
+        compression: 'none', 'gzip' or 'zstd'
+
+    Returns:
+        Dict with path (None when nothing changed), seq_from, seq_to,
+        entries, size_bytes and duration_ms
+
+    Raises:
+        ValueError: If no full backup has been taken on this timeline yet
+    """
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("BEGIN")  # one read snapshot for range + rows
+        base = delta_base(conn)
+        if base is None:
+            conn.rollback()
+            raise ValueError("No full backup to base a delta on; take a full backup first")
+        upto = journal_seq(conn)
+        timeline = journal_timeline(conn)
+        result: Dict[str, Any] = {
+            "path": None, "timeline": timeline, "seq_from": base + 1, "seq_to": upto,
+            "entries": 0, "size_bytes": 0,
+        }
+        if upto > base:
+            dest = Path(dest_dir) / delta_filename(timeline, base + 1, upto, compression)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            partial = dest.with_name(dest.name + ".partial")
+            header = {"format": DELTA_FORMAT, "timeline": timeline,
+                      "seq_from": base + 1, "seq_to": upto}
+            cur = conn.execute(
+                "SELECT seq, tbl, op, row_key, row_data FROM change_journal "
+                "WHERE seq > ? AND seq <= ? ORDER BY seq", (base, upto)
+            )
+            try:
+                with _open_delta(str(partial), "w", dest.name) as fh:
+                    fh.write((json.dumps(header) + "\n").encode())
+                    while True:
+                        rows = cur.fetchmany(_FETCH_ROWS)
+                        if not rows:
+                            break
+                        # row_key / row_data are already JSON text
+                        fh.write("".join(
+                            f'[{seq},"{tbl}","{op}",{key},{data or "null"}]\n'
+                            for seq, tbl, op, key, data in rows
+                        ).encode())
+                        result["entries"] += len(rows)
+                os.replace(partial, dest)
+            finally:
+                if partial.exists():
+                    partial.unlink()
+            result["path"] = str(dest)
+            result["size_bytes"] = dest.stat().st_size
+        conn.rollback()
+
+        if result["path"]:
+            record_checkpoint(conn, upto, "delta", result["path"])
+            result["pruned"] = prune_journal(conn)
+            conn.commit()
+    finally:
+        conn.close()
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def read_delta(path: str) -> Tuple[Dict[str, Any], Iterator[List[Any]]]:
+    """Header and entry iterator of a delta file (the file stays open until exhausted)."""
+    fh = _open_delta(path, "r")
+    header = json.loads(fh.readline())
+    if header.get("format") != DELTA_FORMAT:
+        fh.close()
+        raise ValueError(f"Not a delta file: {path}")
+
+    def _entries() -> Iterator[List[Any]]:
+        with fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, _entries()
+
+
+def _table_columns(conn: sqlite3.Connection, tbl: str) -> Set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({tbl})")}
+
+
+def _apply_entry(conn: sqlite3.Connection, tbl: str, op: str,
+                 key: Dict[str, Any], data: Optional[Dict[str, Any]],
+                 columns: Dict[str, Set[str]]) -> None:
+    pk = JOURNAL_TABLES.get(tbl)
+    if pk is None:
+        raise ValueError(f"Unknown journaled table: {tbl}")
+    if op == "D":
+        conn.execute(
+            f"DELETE FROM {tbl} WHERE " + " AND ".join(f"{c} = ?" for c in pk),
+            [key[c] for c in pk],
+        )
+        return
+    cols = list(data)
+    if tbl not in columns:
+        columns[tbl] = _table_columns(conn, tbl)
+    unknown = [c for c in cols if c not in columns[tbl]]
+    if unknown:
+        # Column names are spliced into the SQL; only the table's own are allowed
+        raise ValueError(f"Unknown columns for {tbl}: {', '.join(map(repr, unknown))}")
+    updates = [c for c in cols if c not in pk]
+    conflict = (
+        "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)
+        if updates else "DO NOTHING"
+    )
+    conn.execute(
+        f"INSERT INTO {tbl} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+        f"ON CONFLICT({', '.join(pk)}) {conflict}",
+        [data[c] for c in cols],
+    )
+
+
+def apply_deltas(conn: sqlite3.Connection, paths: Sequence[str]) -> Dict[str, Any]:
+    """
+    Replay delta files onto a restored snapshot, in seq order.
+
+    Deltas from other timelines or already covered by the snapshot are
+    skipped; a gap in the seq chain, or an entry naming a column the table
+    does not have, raises. Journaling is suspended during the replay and
+    the original entries are copied verbatim, so the snapshot's journal
+    matches the source. Foreign keys must be off on ``conn`` (the default)
+    so cascades are not applied twice.
+
+    Returns:
+        Dict with deltas_applied, entries and the resulting seq
+    """
+    timeline = journal_timeline(conn)
+    current = journal_seq(conn)
+    chain = []
+    for path in paths:
+        parsed = parse_delta_filename(path)
+        if parsed and parsed[0] == timeline and parsed[2] > current:
+            chain.append((parsed[1], parsed[2], path))
+    chain.sort()
+
+    applied = entries = 0
+    columns: Dict[str, Set[str]] = {}
+    conn.execute("UPDATE change_journal_state SET suspended = 1")
+    try:
+        for seq_from, seq_to, path in chain:
+            if seq_to <= current:
+                continue
+            if seq_from > current + 1:
+                raise ValueError(f"Delta chain gap: have seq {current}, next delta starts at {seq_from}")
+            header, rows = read_delta(path)
+            for seq, tbl, op, key, data in rows:
+                if seq <= current:
+                    continue
+                _apply_entry(conn, tbl, op, key, data, columns)
+                conn.execute(
+                    "INSERT INTO change_journal (seq, tbl, op, row_key, row_data) VALUES (?, ?, ?, ?, ?)",
+                    (seq, tbl, op, json.dumps(key), None if data is None else json.dumps(data)),
+                )
+                entries += 1
+            current = header["seq_to"]
+            applied += 1
+    finally:
+        conn.execute("UPDATE change_journal_state SET suspended = 0")
+    conn.commit()
+    return {"deltas_applied": applied, "entries": entries, "seq": current}
+
+
+def start_new_timeline(conn: sqlite3.Connection) -> str:
+    """
+    Fork the journal after a restore: new timeline id, no checkpoints.
+
+    The next delta then requires a fresh full backup, and deltas written
+    before the restore can never be replayed onto the new history.
+    """
+    conn.execute("UPDATE change_journal_state SET timeline = lower(hex(randomblob(8)))")
+    conn.execute("DELETE FROM journal_checkpoints")
+    conn.execute("DELETE FROM change_journal")
+    conn.commit()
+    return journal_timeline(conn)
@@ -0,0 +1,414 @@
+"""
+Background database maintenance.
+
+A daemon thread wakes every ``interval`` seconds and runs, against the
+storage database:
+
+- ``PRAGMA optimize`` on a fixed period, so the planner keeps statistics
+  for new and changed indexes;
+- a full ``ANALYZE`` on a longer period;
+- ``PRAGMA wal_checkpoint(TRUNCATE)`` when the WAL has content;
+- ``PRAGMA incremental_vacuum`` in bounded steps when free pages pile up
+  (needs ``auto_vacuum = INCREMENTAL``, set by schema.sql on new databases);
+- a cap on the change journal (storage/journal.py) at ``journal_max_rows``
+  entries, for databases whose delta backups stopped running.
+
+Everything except ``PRAGMA optimize`` waits for a quiet period: the
+database and WAL files unchanged for ``quiet_seconds``. Vacuum steps stop
+as soon as another connection commits. A database that already has
+statistics (``sqlite_stat1``) is not re-analyzed at startup, only after
+``analyze_every``. A task that fails is retried after an exponential
+backoff instead of on every pass.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from .journal import has_journal, has_table, trim_journal
+
+logger = logging.getLogger(__name__)
+
+# Trim the journal before vacuum, vacuum before checkpoint, so freed pages
+# are released and leave the WAL in the same pass
+TASKS = ("optimize", "analyze", "journal", "vacuum", "checkpoint")
+# Run only on request: rewrites the whole file
+MANUAL_TASKS = ("enable_incremental_vacuum",)
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+_WAL_HEADER = 32
+_WAL_FRAME_HEADER = 24
+# Longest wait before retrying a failed task
+MAX_BACKOFF_SECONDS = 3600
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r", name, os.getenv(name))
+        return default
+
+
+class MaintenanceConfig:
+    """Scheduler settings; defaults come from LORIEN_MAINTENANCE_* variables."""
+
+    FIELDS = (
+        "interval", "quiet_seconds", "optimize_every", "analyze_every",
+        "vacuum_min_free_pages", "vacuum_pages_per_step", "vacuum_max_steps",
+        "vacuum_step_sleep", "journal_max_rows",
+    )
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv("LORIEN_MAINTENANCE_ENABLED", "true").lower() == "true"
+        self.interval = _env_float("LORIEN_MAINTENANCE_INTERVAL", 60)
+        self.quiet_seconds = _env_float("LORIEN_MAINTENANCE_QUIET_SECONDS", 30)
+        self.optimize_every = _env_float("LORIEN_MAINTENANCE_OPTIMIZE_EVERY", 3600)
+        self.analyze_every = _env_float("LORIEN_MAINTENANCE_ANALYZE_EVERY", 86400)
+        self.vacuum_min_free_pages = int(_env_float("LORIEN_MAINTENANCE_VACUUM_MIN_FREE_PAGES", 1024))
+        self.vacuum_pages_per_step = int(_env_float("LORIEN_MAINTENANCE_VACUUM_PAGES_PER_STEP", 256))
+        self.vacuum_max_steps = int(_env_float("LORIEN_MAINTENANCE_VACUUM_MAX_STEPS", 16))
+        self.vacuum_step_sleep = _env_float("LORIEN_MAINTENANCE_VACUUM_STEP_SLEEP", 0.05)
+        self.journal_max_rows = int(_env_float("LORIEN_MAINTENANCE_JOURNAL_MAX_ROWS", 1_000_000))
+
+    def update(self, **changes: Any) -> None:
+        for name, value in changes.items():
+            if name != "enabled" and name not in self.FIELDS:
+                raise ValueError(f"Unknown maintenance setting: {name}")
+            if name != "enabled" and value < 0:
+                raise ValueError(f"{name} must be >= 0")
+            current = getattr(self, name)
+            setattr(self, name, type(current)(value))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **{f: getattr(self, f) for f in self.FIELDS}}
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=5, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    return conn
+
+
+def _has_statistics(db_path: str) -> bool:
+    """True if ANALYZE has run on the database (sqlite_stat1 exists)."""
+    try:
+        conn = _connect(db_path)
+    except sqlite3.Error:
+        return False
+    try:
+        return has_table(conn, "sqlite_stat1")
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+def file_fingerprint(db_path: str) -> Tuple:
+    """(mtime_ns, size) of the database and its WAL; changes on every commit."""
+    out = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+            out.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            out.append(None)
+    return tuple(out)
+
+
+def collect_metrics(db_path: str) -> Dict[str, Any]:
+    """WAL size, page and free-page counts for the database at ``db_path``."""
+    conn = _connect(db_path)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+    try:
+        wal_size = os.path.getsize(db_path + "-wal")
+    except FileNotFoundError:
+        wal_size = 0
+    return {
+        "page_size": page_size,
+        "page_count": page_count,
+        "db_size_bytes": page_size * page_count,
+        "freelist_count": freelist,
+        "free_bytes": freelist * page_size,
+        "auto_vacuum": AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum)),
+        "journal_mode": journal_mode,
+        "wal_size_bytes": wal_size,
+        "wal_frames": max(0, (wal_size - _WAL_HEADER) // (page_size + _WAL_FRAME_HEADER)),
+    }
+
+
+def run_optimize(conn: sqlite3.Connection) -> Dict[str, Any]:
+    conn.execute("PRAGMA optimize")
+    return {}
+
+
+def run_analyze(conn: sqlite3.Connection) -> Dict[str, Any]:
+    conn.execute("ANALYZE")
+    return {}
+
+
+def run_checkpoint(conn: sqlite3.Connection, mode: str = "TRUNCATE") -> Dict[str, Any]:
+    """Checkpoint the WAL; ``lag_frames`` is what could not be copied back yet."""
+    busy, log, done = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    # A successful TRUNCATE reports (0, 0, 0): the WAL is empty
+    return {"busy": bool(busy), "log_frames": log, "checkpointed_frames": done,
+            "lag_frames": max(0, log - done) if busy else 0}
+
+
+def run_incremental_vacuum(
+    conn: sqlite3.Connection,
+    pages_per_step: int = 256,
+    max_steps: int = 16,
+    step_sleep: float = 0.05,
+) -> Dict[str, Any]:
+    """
+    Release free pages in steps of ``pages_per_step``.
+
+    Each step is its own short write transaction. ``PRAGMA data_version``
+    changes only when another connection commits, so the loop stops as soon
+    as some other writer becomes active.
+    """
+    if AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0]) != "incremental":
+        return {"skipped": "auto_vacuum is not incremental", "pages_freed": 0, "steps": 0}
+    before = remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    steps = 0
+    interrupted = False
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    while remaining and steps < max_steps:
+        if conn.execute("PRAGMA data_version").fetchone()[0] != version:
+            interrupted = True
+            break
+        # execute() steps the pragma once (one page); executescript runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages_per_step)})")
+        steps += 1
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+    return {"pages_freed": before - remaining, "steps": steps,
+            "freelist_count": remaining, "interrupted": interrupted}
+
+
+def journal_rows(conn: sqlite3.Connection) -> int:
+    """Entries in the change journal (seqs are contiguous, so two index lookups)."""
+    if not has_journal(conn):
+        return 0
+    low, high = conn.execute("SELECT MIN(seq), MAX(seq) FROM change_journal").fetchone()
+    return 0 if low is None else high - low + 1
+
+
+def run_trim_journal(conn: sqlite3.Connection, max_rows: int) -> Dict[str, Any]:
+    if not has_journal(conn):
+        return {"skipped": "no change journal", "trimmed": 0}
+    return {"trimmed": trim_journal(conn, max_rows), "max_rows": max_rows}
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """One-off conversion of an existing database (rewrites the file with VACUUM)."""
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {"auto_vacuum": AUTO_VACUUM_MODES.get(mode, str(mode))}
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MaintenanceScheduler:
+    """Runs maintenance tasks on a daemon thread and records what they did."""
+
+    def __init__(self, config: Optional[MaintenanceConfig] = None):
+        self.config = config or MaintenanceConfig()
+        self.db_path: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._run_lock = threading.Lock()
+        self._fingerprint: Optional[Tuple] = None
+        self._changed_at = time.monotonic()
+        self._last_run: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self.tasks: Dict[str, Dict[str, Any]] = {
+            t: {"runs": 0, "errors": 0, "last_run": None, "last_duration_ms": None,
+                "last_result": None, "last_error": None}
+            for t in TASKS + MANUAL_TASKS
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def attach(self, db_path: str) -> None:
+        """Point the scheduler at ``db_path`` unless its thread is already running."""
+        if self.running or db_path == self.db_path:
+            return
+        self.db_path = db_path
+        self._fingerprint = file_fingerprint(db_path)
+        self._changed_at = time.monotonic()
+        self._last_run.clear()
+        self._failures.clear()
+        self._retry_at.clear()
+        if _has_statistics(db_path):
+            # Analyzed before: wait a full period rather than on every boot
+            self._last_run["analyze"] = time.monotonic()
+
+    def start(self, db_path: str) -> None:
+        if self.running:
+            return
+        self.attach(db_path)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def poke(self) -> None:
+        """Wake the loop early, e.g. after the config changed."""
+        self._wake.set()
+
+    def quiet_for(self) -> float:
+        """Seconds since the database files last changed."""
+        fp = file_fingerprint(self.db_path)
+        if fp != self._fingerprint:
+            self._fingerprint = fp
+            self._changed_at = time.monotonic()
+        return time.monotonic() - self._changed_at
+
+    def is_quiet(self) -> bool:
+        return self.quiet_for() >= self.config.quiet_seconds
+
+    def due(self, task: str, now: Optional[float] = None) -> bool:
+        cfg = self.config
+        now = time.monotonic() if now is None else now
+        last = self._last_run.get(task)
+        if now < self._retry_at.get(task, 0):
+            return False
+        if task == "optimize":
+            return last is None or now - last >= cfg.optimize_every
+        if task == "analyze" and last is not None and now - last < cfg.analyze_every:
+            return False
+        if not self.is_quiet():
+            return False
+        if task == "analyze":
+            return True
+        metrics = collect_metrics(self.db_path)
+        if task == "checkpoint":
+            return metrics["wal_size_bytes"] > 0
+        if task == "vacuum":
+            return (metrics["auto_vacuum"] == "incremental"
+                    and metrics["freelist_count"] >= cfg.vacuum_min_free_pages)
+        if task == "journal":
+            conn = _connect(self.db_path)
+            try:
+                return journal_rows(conn) > cfg.journal_max_rows
+            finally:
+                conn.close()
+        raise ValueError(f"Unknown maintenance task: {task}")
+
+    def run_task(self, task: str) -> Dict[str, Any]:
+        """Run one task now (also used by the admin endpoint); returns its result."""
+        if task not in TASKS + MANUAL_TASKS:
+            raise ValueError(f"Unknown maintenance task: {task}")
+        if self.db_path is None:
+            raise RuntimeError("Maintenance scheduler has no database")
+        stats = self.tasks[task]
+        started = time.perf_counter()
+        with self._run_lock:
+            conn = _connect(self.db_path)
+            try:
+                if task == "optimize":
+                    result = run_optimize(conn)
+                elif task == "analyze":
+                    result = run_analyze(conn)
+                elif task == "checkpoint":
+                    result = run_checkpoint(conn)
+                elif task == "journal":
+                    result = run_trim_journal(conn, self.config.journal_max_rows)
+                elif task == "enable_incremental_vacuum":
+                    result = enable_incremental_vacuum(conn)
+                else:
+                    cfg = self.config
+                    result = run_incremental_vacuum(
+                        conn, cfg.vacuum_pages_per_step, cfg.vacuum_max_steps, cfg.vacuum_step_sleep,
+                    )
+            except Exception as e:
+                stats["errors"] += 1
+                stats["last_error"] = str(e)
+                # Not a run: retry after a growing pause
+                failures = self._failures[task] = self._failures.get(task, 0) + 1
+                self._retry_at[task] = time.monotonic() + min(
+                    self.config.interval * 2 ** failures, MAX_BACKOFF_SECONDS)
+                raise
+            finally:
+                conn.close()
+                stats["runs"] += 1
+                stats["last_run"] = _now_iso()
+                stats["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._last_run[task] = time.monotonic()
+            self._failures.pop(task, None)
+            self._retry_at.pop(task, None)
+        stats["last_result"] = result
+        # Our own writes must not count as activity
+        self._fingerprint = file_fingerprint(self.db_path)
+        return result
+
+    def tick(self) -> Dict[str, Any]:
+        """One scheduler pass; returns {task: result} for tasks that ran."""
+        ran = {}
+        for task in TASKS:
+            try:
+                if self.due(task):
+                    ran[task] = self.run_task(task)
+            except Exception as e:
+                logger.warning("Maintenance task %s failed: %s", task, e)
+        return ran
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            if self.config.enabled:
+                self.tick()
+            self._wake.wait(self.config.interval)
+            self._wake.clear()
+
+    def status(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {}
+        if self.db_path is not None:
+            try:
+                metrics = collect_metrics(self.db_path)
+                # TRUNCATE empties the WAL, so every frame in it is pending
+                metrics["checkpoint_lag_frames"] = metrics["wal_frames"]
+            except sqlite3.Error as e:
+                metrics = {"error": str(e)}
+            last = self._last_run.get("checkpoint")
+            metrics["seconds_since_checkpoint"] = (
+                None if last is None else round(time.monotonic() - last, 1)
+            )
+            metrics["quiet_seconds"] = round(self.quiet_for(), 1)
+        return {
+            "running": self.running,
+            "db_path": self.db_path,
+            "config": self.config.to_dict(),
+            "metrics": metrics,
+            "tasks": self.tasks,
+        }
+
+
+# Process-wide scheduler used by the API
+maintenance = MaintenanceScheduler()
@@ -0,0 +1,297 @@
+"""
+Partitioned storage: one database file per Vital Measurement (or per group).
+
+Every root lives in its own SQLite file (``groups=0``), or in one of
+``groups`` files chosen by a stable hash of its label. Each file has the
+full storage schema, so imports and edits on different roots take different
+writer locks and commit in parallel.
+
+Node ids stay globally unique: partition ``k`` allocates ids above
+``k << ID_BITS``, so ``node_id >> ID_BITS`` routes any id to its file
+without a lookup. Cross-root reads fan out over the partitions in index
+order, which is also global id order. (ATTACH is not used: SQLite caps
+attached databases at 10 by default, and per-root mode has far more.)
+
+Layout::
+
+    <base_dir>/
+        catalog.db        # partition files and root label -> partition
+        part_000001.db
+        part_000002.db
+"""
+
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from . import tracing
+from .bulk_import import PathBulkWriter, new_bulk_summary
+from .sqlite import SQLiteRepository
+
+# 2**40 ids per partition; ids stay below 2**53 for up to 8191 partitions
+ID_BITS = 40
+MAX_PARTITIONS = (1 << (53 - ID_BITS)) - 1
+
+CATALOG_SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS partitions (
+    idx        INTEGER PRIMARY KEY,
+    filename   TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS root_partitions (
+    label TEXT PRIMARY KEY,
+    idx   INTEGER NOT NULL REFERENCES partitions(idx)
+);
+CREATE TABLE IF NOT EXISTS catalog_settings (
+    id     INTEGER PRIMARY KEY CHECK (id = 1),
+    groups INTEGER NOT NULL
+);
+"""
+
+
+def partition_of(node_id: int) -> int:
+    """Partition index that owns ``node_id``."""
+    return node_id >> ID_BITS
+
+
+def _merge_summary(total: Dict[str, Any], part: Dict[str, Any]) -> None:
+    for key, value in part.items():
+        if isinstance(value, dict):
+            _merge_summary(total[key], value)
+        else:
+            total[key] += value
+
+
+@tracing.trace_methods
+class PartitionedRepository:
+    """Routes storage operations to per-root (or per-group) SQLite files."""
+
+    def __init__(self, base_dir: str, groups: int = 0):
+        """
+        Open or create a partitioned store.
+
+        Args:
+            base_dir: Directory holding catalog.db and the partition files
+            groups: 0 for one file per root, N to hash roots into N files.
+                Fixed when the store is created; later values are ignored.
+        """
+        self.base_dir = Path(base_dir).resolve()
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._catalog_path = str(self.base_dir / "catalog.db")
+        self._repos: Dict[int, SQLiteRepository] = {}
+        self._root_idx: Dict[str, int] = {}  # assignments never change once made
+        self._lock = threading.Lock()
+        conn = self._catalog()
+        try:
+            conn.executescript(CATALOG_SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO catalog_settings (id, groups) VALUES (1, ?)", (groups,))
+            conn.commit()
+            self.groups = conn.execute("SELECT groups FROM catalog_settings").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _catalog(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._catalog_path, timeout=30)
+
+    # ---- partition routing ----
+
+    def partitions(self) -> List[int]:
+        conn = self._catalog()
+        try:
+            return [r[0] for r in conn.execute("SELECT idx FROM partitions ORDER BY idx")]
+        finally:
+            conn.close()
+
+    def repo(self, idx: int) -> SQLiteRepository:
+        """Repository of an existing partition."""
+        with self._lock:
+            repo = self._repos.get(idx)
+            if repo is None:
+                path = self.base_dir / f"part_{idx:06d}.db"
+                if not path.exists():
+                    raise KeyError(f"No partition {idx}")
+                repo = self._repos[idx] = SQLiteRepository(str(path), id_base=idx << ID_BITS)
+            return repo
+
+    def _ensure_partition(self, conn: sqlite3.Connection, idx: int) -> None:
+        if idx > MAX_PARTITIONS:
+            raise ValueError(f"Partition limit reached ({MAX_PARTITIONS})")
+        filename = f"part_{idx:06d}.db"
+        conn.execute(
+            "INSERT OR IGNORE INTO partitions (idx, filename, created_at) VALUES (?, ?, ?)",
+            (idx, filename, datetime.now(timezone.utc).isoformat()),
+        )
+        if not (self.base_dir / filename).exists():
+            SQLiteRepository(str(self.base_dir / filename), id_base=idx << ID_BITS)
+
+    def partition_for_root(self, label: str, create: bool = True) -> Optional[int]:
+        """Partition holding the root ``label``; assigned on first use when ``create``."""
+        idx = self._root_idx.get(label)
+        if idx is not None:
+            return idx
+        conn = self._catalog()
+        try:
+            row = conn.execute("SELECT idx FROM root_partitions WHERE label = ?", (label,)).fetchone()
+            if row is not None or not create:
+                if row is not None:
+                    self._root_idx[label] = row[0]
+                return row[0] if row else None
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT idx FROM root_partitions WHERE label = ?", (label,)).fetchone()
+            if row is None:
+                if self.groups:
+                    idx = zlib.crc32(label.encode("utf-8")) % self.groups + 1
+                else:
+                    idx = conn.execute("SELECT COALESCE(MAX(idx), 0) + 1 FROM partitions").fetchone()[0]
+                self._ensure_partition(conn, idx)
+                conn.execute("INSERT INTO root_partitions (label, idx) VALUES (?, ?)", (label, idx))
+            else:
+                idx = row[0]
+            conn.commit()
+            self._root_idx[label] = idx
+            return idx
+        finally:
+            conn.close()
+
+    def repo_for_node(self, node_id: int) -> SQLiteRepository:
+        return self.repo(partition_of(node_id))
+
+    # ---- single-root operations (routed) ----
+
+    def create_root_node(self, label: str) -> int:
+        return self.repo(self.partition_for_root(label)).create_root_node(label)
+
+    def create_child_node(self, parent_id: int, slot: int, label: str, depth: int) -> int:
+        return self.repo_for_node(parent_id).create_child_node(parent_id, slot, label, depth)
+
+    def get_node(self, node_id: int):
+        return self.repo_for_node(node_id).get_node(node_id)
+
+    def get_children(self, parent_id: int):
+        return self.repo_for_node(parent_id).get_children(parent_id)
+
+    def delete_node(self, node_id: int) -> bool:
+        return self.repo_for_node(node_id).delete_node(node_id)
+
+    def get_triage(self, node_id: int):
+        return self.repo_for_node(node_id).get_triage(node_id)
+
+    def update_triage(self, node_id: int, diagnostic_triage: Optional[str], actions: Optional[str]) -> bool:
+        return self.repo_for_node(node_id).update_triage(node_id, diagnostic_triage, actions)
+
+    # ---- cross-root reads (fan out, partitions in id order) ----
+
+    def list_roots(self) -> List[Tuple[int, str]]:
+        roots: List[Tuple[int, str]] = []
+        for idx in self.partitions():
+            with self.repo(idx)._get_connection() as conn:
+                roots.extend(tuple(r) for r in conn.execute(
+                    "SELECT id, label FROM nodes WHERE parent_id IS NULL ORDER BY id"))
+        return roots
+
+    def iter_complete_path_rows(self, batch_size: int = 1000) -> Iterator[Tuple]:
+        """Complete paths of every partition, in global root id order."""
+        for idx in self.partitions():
+            yield from self.repo(idx).iter_complete_path_rows(batch_size)
+
+    def iter_node_rows(self, batch_size: int = 1000) -> Iterator[Tuple]:
+        for idx in self.partitions():
+            yield from self.repo(idx).iter_node_rows(batch_size)
+
+    # ---- bulk import ----
+
+    def bulk_writer(self, jobs: Optional[int] = None, dry_run: bool = False) -> "PartitionedBulkWriter":
+        return PartitionedBulkWriter(self, jobs=jobs, dry_run=dry_run)
+
+
+class PartitionedBulkWriter:
+    """
+    PathBulkWriter per partition, applied in parallel.
+
+    Each batch is split by Vital Measurement and every partition's share is
+    written and committed on a worker thread with its own connection, so
+    unrelated roots never wait on one writer lock. Use as a context manager.
+    """
+
+    def __init__(self, store: PartitionedRepository, jobs: Optional[int] = None, dry_run: bool = False):
+        self.store = store
+        self.dry_run = dry_run
+        self._pool = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="partition-import")
+        self._writers: Dict[int, Tuple[sqlite3.Connection, PathBulkWriter]] = {}
+
+    def _writer(self, idx: int) -> Tuple[sqlite3.Connection, PathBulkWriter]:
+        entry = self._writers.get(idx)
+        if entry is None:
+            repo = self.store.repo(idx)
+            conn = sqlite3.connect(repo.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            entry = self._writers[idx] = (conn, PathBulkWriter(conn, self.dry_run, id_base=repo.id_base))
+        return entry
+
+    def _apply_one(self, idx: int, records: List[Mapping[str, Optional[str]]]) -> None:
+        conn, writer = self._writers[idx]
+        writer.apply(records)
+        if not self.dry_run:
+            conn.commit()
+
+    def apply(self, records: Iterable[Mapping[str, Optional[str]]]) -> None:
+        """Apply one batch; returns once every partition has committed its share."""
+        by_partition: Dict[int, List[Mapping[str, Optional[str]]]] = {}
+        for rec in records:
+            label = rec.get("Vital Measurement")
+            if not label:
+                continue
+            idx = self.store.partition_for_root(label, create=not self.dry_run)
+            if idx is None:  # dry run of a new root: count it without a file
+                idx = 0
+            by_partition.setdefault(idx, []).append(rec)
+        for idx in by_partition:
+            if idx:
+                self._writer(idx)
+        futures = [
+            self._pool.submit(self._apply_one, idx, recs)
+            for idx, recs in by_partition.items() if idx
+        ]
+        if 0 in by_partition:
+            self._dry_run_new_roots(by_partition[0])
+        for future in futures:
+            future.result()
+
+    def _dry_run_new_roots(self, records: List[Mapping[str, Optional[str]]]) -> None:
+        conn = self._writers.get(0)
+        if conn is None:
+            mem = sqlite3.connect(":memory:", check_same_thread=False)
+            mem.executescript((Path(__file__).parent / "schema.sql").read_text())
+            conn = self._writers[0] = (mem, PathBulkWriter(mem, dry_run=True))
+        conn[1].apply(records)
+
+    @property
+    def summary(self) -> Dict[str, Any]:
+        total = new_bulk_summary()
+        for _, writer in self._writers.values():
+            _merge_summary(total, writer.summary)
+        return total
+
+    def rollback(self) -> None:
+        for conn, _ in self._writers.values():
+            conn.rollback()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        for conn, _ in self._writers.values():
+            conn.close()
+        self._writers.clear()
+
+    def __enter__(self) -> "PartitionedBulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.rollback()
+        self.close()
@@ -0,0 +1,254 @@
+"""
+Published snapshots for read-only replicas.
+
+``publish_snapshot`` writes a compacted copy of the live database with
+``VACUUM INTO``, adds covering indexes for the read paths, analyzes it and
+then atomically points ``CURRENT`` in the publish directory at it. Published
+files are never modified again, so replicas open them with ``immutable=1``:
+no locks, no -wal/-shm, and any number of replica processes can share the
+directory.
+
+Layout::
+
+    published/
+        CURRENT                           # name of the live version
+        lorien_published_000003_<ts>.db
+        lorien_published_000003_<ts>.legacy.db  # legacy API tables (api/db.py), same version
+        lorien_published_000002_<ts>.db   # kept for in-flight readers
+        .version_000003                   # reservation, removed with the version
+
+A version number is reserved by creating its ``.version_NNNNNN`` file with
+``O_CREAT | O_EXCL`` before anything is written, so two publishes running
+at once never take the same number.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import querystats
+
+PUBLISH_PREFIX = "lorien_published_"
+LEGACY_SUFFIX = ".legacy.db"
+CURRENT_FILE = "CURRENT"
+DEFAULT_KEEP = 3
+_VERSION_NAME = re.compile(re.escape(PUBLISH_PREFIX) + r"(?P<version>\d{6})_\d{8}_\d{6}\.db$")
+_RESERVATION = re.compile(r"\.version_(?P<version>\d{6})$")
+
+# Covering indexes for replica read paths; pointless on the write path
+READ_INDEXES = (
+    # children lists and the root→leaf chain join read only the index
+    "CREATE INDEX IF NOT EXISTS idx_pub_nodes_children ON nodes(parent_id, slot, depth, label, is_leaf)",
+    "CREATE INDEX IF NOT EXISTS idx_pub_nodes_roots ON nodes(label) WHERE parent_id IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_pub_node_red_flags ON node_red_flags(node_id, red_flag_id)",
+)
+# Write-side bookkeeping a read-only copy does not need
+_CLEARED_TABLES = ("change_journal", "journal_checkpoints", "integrity_results")
+
+# publish dir -> ((mtime_ns, size) of CURRENT, resolved snapshot path)
+_current_cache: Dict[str, Tuple[Tuple[int, int], Optional[str]]] = {}
+
+
+def parse_version(name: str) -> Optional[int]:
+    m = _VERSION_NAME.match(os.path.basename(name))
+    return int(m.group("version")) if m else None
+
+
+def list_versions(publish_dir: str) -> List[Dict[str, Any]]:
+    """Published snapshots, newest first."""
+    if not os.path.isdir(publish_dir):
+        return []
+    out = []
+    for name in os.listdir(publish_dir):
+        version = parse_version(name)
+        if version is not None:
+            path = os.path.join(publish_dir, name)
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:  # pruned by a concurrent publish
+                continue
+            out.append({"version": version, "filename": name, "path": path, "size_bytes": size})
+    return sorted(out, key=lambda v: v["version"], reverse=True)
+
+
+def legacy_snapshot(snapshot: str) -> str:
+    """Path of the legacy database published alongside ``snapshot``."""
+    return snapshot[:-len(".db")] + LEGACY_SUFFIX
+
+
+def _reservation(out_dir: Path, version: int) -> Path:
+    return out_dir / f".version_{version:06d}"
+
+
+def _reserve_version(out_dir: Path) -> int:
+    """Claim the next version number; the claim is a file only one caller can create."""
+    taken = [0]
+    for name in os.listdir(out_dir):
+        m = _RESERVATION.match(name)
+        version = int(m.group("version")) if m else parse_version(name)
+        if version is not None:
+            taken.append(version)
+    version = max(taken) + 1
+    while True:
+        try:
+            os.close(os.open(_reservation(out_dir, version), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return version
+        except FileExistsError:
+            version += 1
+
+
+def current_snapshot(publish_dir: str) -> Optional[str]:
+    """Path of the snapshot ``CURRENT`` points at (None before the first publish)."""
+    pointer = os.path.join(publish_dir, CURRENT_FILE)
+    try:
+        st = os.stat(pointer)
+    except FileNotFoundError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _current_cache.get(publish_dir)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(pointer) as fh:
+        path = os.path.join(publish_dir, fh.read().strip())
+    _current_cache[publish_dir] = (key, path)
+    return path
+
+
+def open_snapshot(path: str) -> sqlite3.Connection:
+    """Read-only connection to a published snapshot; takes no locks."""
+    return querystats.connect(Path(path).resolve().as_uri() + "?immutable=1", uri=True,
+                              check_same_thread=False)
+
+
+def _prepare(path: str, read_indexes: Sequence[str] = READ_INDEXES) -> List[str]:
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = DELETE")
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in _CLEARED_TABLES:
+            if table in tables:
+                conn.execute(f"DELETE FROM {table}")
+        created = []
+        for sql in read_indexes:
+            table = sql.split(" ON ")[1].split("(")[0]
+            if table in tables:
+                conn.execute(sql)
+                created.append(sql.split()[5])
+        conn.execute("ANALYZE")
+        # Reclaim what the clears freed; the file is final after this
+        conn.execute("VACUUM")
+        ok = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if ok != "ok":
+            raise ValueError(f"Published snapshot failed quick_check: {ok}")
+    finally:
+        conn.close()
+    return created
+
+
+def _fsync(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _point_current(out_dir: Path, version: int) -> None:
+    """
+    Point ``CURRENT`` at the newest published version, in one rename.
+
+    Concurrent publishes may finish out of order; each one re-reads the
+    pointer after its own rename and repeats until it names the newest
+    version, so the last writer always leaves it there.
+    """
+    pointer = out_dir / CURRENT_FILE
+    pointer_tmp = out_dir / f"{CURRENT_FILE}.{version:06d}.tmp"
+    while True:
+        newest = list_versions(str(out_dir))[0]["filename"]
+        try:
+            if pointer.read_text().strip() == newest:
+                return
+        except FileNotFoundError:
+            pass
+        pointer_tmp.write_text(newest + "\n")
+        _fsync(str(pointer_tmp))
+        os.replace(pointer_tmp, pointer)
+
+
+def _vacuum_into(db_path: str, dest: Path) -> None:
+    src = sqlite3.connect(db_path, timeout=30)
+    try:
+        src.execute("VACUUM INTO ?", (str(dest),))
+    finally:
+        src.close()
+
+
+def publish_snapshot(db_path: str, publish_dir: str, keep: int = DEFAULT_KEEP,
+                     legacy_db_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Publish a new immutable snapshot of ``db_path`` and make it current.
+
+    Args:
+        db_path: Live database (read in one transaction by VACUUM INTO)
+        publish_dir: Directory shared with the replicas
+        keep: Published versions to retain; older ones are deleted, the
+            previous ones stay so requests already reading them can finish
+        legacy_db_path: Legacy API database (api/db.py) to publish with the
+            same version, next to the snapshot (see ``legacy_snapshot``)
+
+    Returns:
+        Dict with version, path, legacy_path, size_bytes, indexes, pruned
+        and duration_ms
+    """
+    started = time.perf_counter()
+    out_dir = Path(publish_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    version = _reserve_version(out_dir)
+    name = f"{PUBLISH_PREFIX}{version:06d}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+    dest = out_dir / name
+    legacy_dest = Path(legacy_snapshot(str(dest))) if legacy_db_path else None
+    partials = [out_dir / (name + ".partial"), out_dir / (name + ".legacy.partial")]
+
+    try:
+        _vacuum_into(db_path, partials[0])
+        indexes = _prepare(str(partials[0]))
+        if legacy_dest is not None:
+            _vacuum_into(legacy_db_path, partials[1])
+            _prepare(str(partials[1]), read_indexes=())
+            _fsync(str(partials[1]))
+            # in place before the snapshot, so a reader of the snapshot always finds it
+            os.replace(partials[1], legacy_dest)
+        _fsync(str(partials[0]))
+        os.replace(partials[0], dest)
+    except BaseException:
+        if legacy_dest is not None:
+            legacy_dest.unlink(missing_ok=True)
+        _reservation(out_dir, version).unlink(missing_ok=True)
+        raise
+    finally:
+        for partial in partials:
+            partial.unlink(missing_ok=True)
+
+    _point_current(out_dir, version)
+
+    pruned = []
+    for old in list_versions(publish_dir)[max(keep, 1):]:
+        Path(old["path"]).unlink(missing_ok=True)  # or a concurrent publish pruned it first
+        Path(legacy_snapshot(old["path"])).unlink(missing_ok=True)
+        _reservation(out_dir, old["version"]).unlink(missing_ok=True)
+        pruned.append(old["filename"])
+
+    return {
+        "version": version,
+        "path": str(dest),
+        "legacy_path": str(legacy_dest) if legacy_dest is not None else None,
+        "size_bytes": dest.stat().st_size,
+        "source_size_bytes": os.path.getsize(db_path),
+        "indexes": indexes,
+        "pruned": pruned,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
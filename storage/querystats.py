@@ -0,0 +1,363 @@
+"""
+Per-request SQL instrumentation.
+
+Opt-in with ``LORIEN_SQL_TRACE=true``. The connections the app hands out
+(repository, API dependencies, legacy ``api.db``, workbook pools) are then
+opened through ``connect()``, which:
+
+- uses ``TracedConnection``, whose ``execute``/``executemany``/
+  ``executescript`` (and those of its cursors) are timed and recorded
+  under the statement text as written, placeholders and all. A SELECT
+  is timed until its rows are read, not just until ``execute`` returns
+  the first one (see ``TracedCursor``);
+- installs a ``set_trace_callback`` that counts every statement SQLite
+  actually runs, including the bodies of ``executescript`` and trigger
+  sub-statements, which the wrappers never see.
+
+Both record into the ``RequestQueries`` of the current request, a
+ContextVar the request pipeline sets (api/middleware/pipeline.py); work
+outside a request is not recorded. ``finish()`` folds a request into the
+per-route totals served by ``GET /health/sql`` and into the per-statement
+``workload()`` the index advisor replays (storage/index_advisor.py). It
+also logs statements run ``LORIEN_SQL_REPEAT_THRESHOLD`` or more times in
+one request as N+1 suspects.
+
+The same timing feeds the slow-query log (storage/slowlog.py) when
+``LORIEN_SLOW_QUERY_MS`` is set, with or without tracing, and records a
+``sqlite`` span per statement under the current span when span tracing
+(storage/tracing.py, ``LORIEN_TRACE``) is on. With all three off
+``connect()`` is plain ``sqlite3.connect``.
+"""
+
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import tracing
+from .slowlog import slow_queries, threshold_ms
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_KEPT = 5
+SQL_PREVIEW_CHARS = 200
+WORKLOAD_MAX_STATEMENTS = 2000
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r", name, os.getenv(name))
+        return default
+
+
+def enabled() -> bool:
+    """True when LORIEN_SQL_TRACE=true."""
+    return os.getenv("LORIEN_SQL_TRACE", "false").lower() == "true"
+
+
+def headers_enabled() -> bool:
+    """True when per-request SQL figures go into response headers as well."""
+    return enabled() and os.getenv("LORIEN_SQL_TRACE_HEADERS", "false").lower() == "true"
+
+
+def repeat_threshold() -> int:
+    """Runs of one statement within a request that make it an N+1 suspect."""
+    return max(2, _env_int("LORIEN_SQL_REPEAT_THRESHOLD", 10))
+
+
+def preview(sql: str) -> str:
+    """Statement text on one line, cut to SQL_PREVIEW_CHARS."""
+    flat = " ".join(sql.split())
+    return flat if len(flat) <= SQL_PREVIEW_CHARS else flat[:SQL_PREVIEW_CHARS - 3] + "..."
+
+
+class RequestQueries:
+    """SQL issued while serving one request."""
+
+    __slots__ = ("route", "queries", "statements", "sql_ms", "by_sql", "_slowest")
+
+    def __init__(self, route: str = ""):
+        self.route = route
+        self.queries = 0        # execute/executemany/executescript calls
+        self.statements = 0     # statements SQLite ran (trace callback)
+        self.sql_ms = 0.0
+        self.by_sql: Dict[str, List[Any]] = {}  # sql -> [calls, total ms]
+        self._slowest: List[Tuple[float, str]] = []
+
+    def record(self, sql: str, ms: float) -> None:
+        self.queries += 1
+        self.sql_ms += ms
+        entry = self.by_sql.get(sql)
+        if entry is None:
+            self.by_sql[sql] = [1, ms]
+        else:
+            entry[0] += 1
+            entry[1] += ms
+        if len(self._slowest) < SLOWEST_KEPT:
+            heapq.heappush(self._slowest, (ms, sql))
+        elif ms > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (ms, sql))
+
+    def slowest(self) -> List[Tuple[float, str]]:
+        """Slowest single calls, slowest first."""
+        return sorted(self._slowest, reverse=True)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """(sql, calls, total ms) for statements run at least ``threshold`` times."""
+        hits = [(sql, n, ms) for sql, (n, ms) in self.by_sql.items() if n >= threshold]
+        return sorted(hits, key=lambda hit: -hit[1])
+
+
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_queries", default=None)
+
+
+class _Pending:
+    """One statement's record, held open while its rows are still being read."""
+
+    __slots__ = ("queries", "span", "slow_ms", "sql", "params", "call", "ms")
+
+    def __init__(self, queries, span, slow_ms, sql, params, call):
+        self.queries = queries
+        self.span = span
+        self.slow_ms = slow_ms
+        self.sql = sql
+        self.params = params
+        self.call = call
+        self.ms = 0.0
+
+    def finish(self, conn: sqlite3.Connection) -> None:
+        ms = self.ms
+        if self.queries is not None:
+            self.queries.record(self.sql, ms)
+        if self.span is not None:
+            tracing.record("sqlite", ms, parent=self.span, statement=preview(self.sql), call=self.call)
+        if self.slow_ms is not None and ms >= self.slow_ms:
+            slow_queries.record(conn, self.sql, self.params, ms,
+                                self.queries.route if self.queries is not None else None)
+
+
+def _timed(cursor: "TracedCursor", method, sql: str, *args):
+    cursor._finish()  # a new statement ends the reads of the previous one
+    queries = current_queries.get()
+    slow_ms = cursor.connection.slow_ms
+    span = tracing.current_span.get()
+    if queries is None and slow_ms is None and span is None:
+        return method(sql, *args)
+    pending = _Pending(queries, span, slow_ms, sql, args[0] if args else None, method.__name__)
+    started = time.perf_counter()
+    try:
+        result = method(sql, *args)
+    except BaseException:
+        pending.ms = (time.perf_counter() - started) * 1000
+        pending.finish(cursor.connection)
+        raise
+    pending.ms = (time.perf_counter() - started) * 1000
+    if pending.call == "execute" and cursor.description is not None:
+        cursor._pending = pending  # timed on until its rows are read
+    else:
+        pending.finish(cursor.connection)
+    return result
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor whose statements are timed from ``execute`` until their rows are read.
+
+    For a SELECT, ``execute`` returns at the first row; the rest is read by
+    ``fetch*`` and iteration, which add their time to the statement. The
+    record is made once the rows are exhausted, or when the cursor runs its
+    next statement, is closed or is garbage collected.
+    """
+
+    _pending: Optional[_Pending] = None
+
+    def _finish(self) -> None:
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            pending.finish(self.connection)
+
+    def _read(self, fetch, *args):
+        pending = self._pending
+        if pending is None:
+            return fetch(*args)
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            pending.ms += (time.perf_counter() - started) * 1000
+
+    def execute(self, sql, parameters=()):
+        return _timed(self, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _timed(self, super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return _timed(self, super().executescript, sql_script)
+
+    def fetchone(self):
+        row = self._read(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._read(super().fetchmany, size)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._read(super().fetchall)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        if self._pending is None:
+            return super().__next__()
+        try:
+            return self._read(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class TracedConnection(sqlite3.Connection):
+    slow_ms: Optional[float] = None  # slow-query threshold, fixed when the connection opens
+
+    # Connection.execute and friends do not go through cursor(), so they
+    # are routed through a TracedCursor here.
+    def cursor(self, factory=None):
+        return super().cursor(factory or TracedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def _count_statement(_sql: str) -> None:
+    queries = current_queries.get()
+    if queries is not None:
+        queries.statements += 1
+
+
+def connect(database: str, **kwargs) -> sqlite3.Connection:
+    """``sqlite3.connect``, instrumented while SQL tracing, the slow-query log or span tracing is on."""
+    trace = enabled()
+    slow_ms = threshold_ms()
+    if not trace and slow_ms is None and not tracing.enabled():
+        return sqlite3.connect(database, **kwargs)
+    kwargs.setdefault("factory", TracedConnection)
+    conn = sqlite3.connect(database, **kwargs)
+    conn.slow_ms = slow_ms
+    if trace:
+        conn.set_trace_callback(_count_statement)
+    return conn
+
+
+class _RouteTotals:
+    __slots__ = ("requests", "queries", "statements", "sql_ms", "max_queries", "n_plus_one", "slowest")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.statements = 0
+        self.sql_ms = 0.0
+        self.max_queries = 0
+        self.n_plus_one = 0
+        self.slowest: List[Tuple[float, str]] = []
+
+
+_routes: Dict[str, _RouteTotals] = {}
+_workload: Dict[str, List[Any]] = {}  # sql -> [calls, total ms], all requests
+_lock = threading.Lock()
+
+
+def finish(queries: RequestQueries, method: str) -> List[Tuple[str, int, float]]:
+    """
+    Fold a finished request into the per-route totals and log N+1 suspects.
+
+    Returns the suspects as (sql, calls, total ms).
+    """
+    suspects = queries.repeated(repeat_threshold())
+    for sql, calls, ms in suspects:
+        logger.warning("N+1 suspect: %s %s ran %d times (%.1f ms): %s",
+                       method, queries.route, calls, ms, preview(sql))
+    key = f"{method} {queries.route}"
+    with _lock:
+        totals = _routes.get(key)
+        if totals is None:
+            totals = _routes[key] = _RouteTotals()
+        totals.requests += 1
+        totals.queries += queries.queries
+        totals.statements += queries.statements
+        totals.sql_ms += queries.sql_ms
+        totals.max_queries = max(totals.max_queries, queries.queries)
+        if suspects:
+            totals.n_plus_one += 1
+        for entry in queries.slowest():
+            if len(totals.slowest) < SLOWEST_KEPT:
+                heapq.heappush(totals.slowest, entry)
+            elif entry[0] > totals.slowest[0][0]:
+                heapq.heapreplace(totals.slowest, entry)
+            else:
+                break
+        for sql, (calls, ms) in queries.by_sql.items():
+            entry = _workload.get(sql)
+            if entry is not None:
+                entry[0] += calls
+                entry[1] += ms
+            elif len(_workload) < WORKLOAD_MAX_STATEMENTS:
+                _workload[sql] = [calls, ms]
+    return suspects
+
+
+def route_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-route SQL totals since start-up (or the last reset)."""
+    with _lock:
+        items = list(_routes.items())
+        return {
+            key: {
+                "requests": t.requests,
+                "queries": t.queries,
+                "statements": t.statements,
+                "sql_ms": round(t.sql_ms, 3),
+                "avg_queries": round(t.queries / t.requests, 2),
+                "max_queries": t.max_queries,
+                "n_plus_one_requests": t.n_plus_one,
+                "slowest": [{"ms": round(ms, 3), "sql": preview(sql)} for ms, sql in sorted(t.slowest, reverse=True)],
+            }
+            for key, t in items
+        }
+
+
+def workload() -> Dict[str, Tuple[int, float]]:
+    """(calls, total ms) per statement text across all traced requests."""
+    with _lock:
+        return {sql: (calls, ms) for sql, (calls, ms) in _workload.items()}
+
+
+def reset() -> None:
+    with _lock:
+        _routes.clear()
+        _workload.clear()
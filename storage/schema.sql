@@ -3,6 +3,7 @@
 
 -- ---- Connection pragmas (note: foreign_keys must also be enabled per-connection in app code)
 PRAGMA foreign_keys = ON;
+PRAGMA auto_vacuum = INCREMENTAL;  -- takes effect on new databases only (see storage/maintenance.py)
 PRAGMA journal_mode = WAL;
 PRAGMA synchronous = NORMAL;
 PRAGMA cache_size = 10000;
@@ -222,3 +223,162 @@ BEGIN
   SET updated_at = strftime('%Y-%m-%dT%H:%M:%fZ','now')
   WHERE node_id = NEW.node_id;
 END;
+
+-- ---- CHANGE JOURNAL (delta backups) ----
+
+-- Append-only log of row-level changes to nodes, triage and flags. Each entry
+-- carries the row key and, for inserts/updates, the row's data columns, so
+-- replaying entries in seq order onto a full backup reproduces the database.
+CREATE TABLE IF NOT EXISTS change_journal (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl        TEXT NOT NULL,
+    op         TEXT NOT NULL CHECK(op IN ('I','U','D')),
+    row_key    TEXT NOT NULL,   -- JSON object of primary key columns
+    row_data   TEXT,            -- JSON object of data columns (NULL for deletes)
+    changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now'))
+);
+
+-- Journal high-water mark captured by each full or delta backup
+CREATE TABLE IF NOT EXISTS journal_checkpoints (
+    id         INTEGER PRIMARY KEY,
+    seq        INTEGER NOT NULL,
+    kind       TEXT NOT NULL CHECK(kind IN ('full','delta')),
+    path       TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now'))
+);
+
+-- Single-row journal state. Journaling is suspended while deltas are replayed;
+-- the timeline id changes on every restore so deltas from an abandoned
+-- history are never applied to a snapshot of the new one.
+CREATE TABLE IF NOT EXISTS change_journal_state (
+    id        INTEGER PRIMARY KEY CHECK (id = 1),
+    suspended INTEGER NOT NULL DEFAULT 0,
+    timeline  TEXT NOT NULL
+);
+INSERT OR IGNORE INTO change_journal_state (id, suspended, timeline)
+VALUES (1, 0, lower(hex(randomblob(8))));
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_nodes_insert
+AFTER INSERT ON nodes
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key, row_data) VALUES ('nodes', 'I',
+    json_object('id', NEW.id),
+    json_object('id', NEW.id, 'parent_id', NEW.parent_id, 'depth', NEW.depth,
+                'slot', NEW.slot, 'label', NEW.label, 'created_at', NEW.created_at));
+END;
+
+-- is_leaf / updated_at are derived by the touch triggers; only data changes are journaled
+CREATE TRIGGER IF NOT EXISTS tr_journal_nodes_update
+AFTER UPDATE ON nodes
+FOR EACH ROW
+WHEN (OLD.parent_id IS NOT NEW.parent_id OR OLD.depth IS NOT NEW.depth
+      OR OLD.slot IS NOT NEW.slot OR OLD.label IS NOT NEW.label OR OLD.id IS NOT NEW.id)
+  AND NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key, row_data) VALUES ('nodes', 'U',
+    json_object('id', NEW.id),
+    json_object('id', NEW.id, 'parent_id', NEW.parent_id, 'depth', NEW.depth,
+                'slot', NEW.slot, 'label', NEW.label, 'created_at', NEW.created_at));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_nodes_delete
+AFTER DELETE ON nodes
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key) VALUES ('nodes', 'D', json_object('id', OLD.id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_triage_insert
+AFTER INSERT ON triage
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key, row_data) VALUES ('triage', 'I',
+    json_object('node_id', NEW.node_id),
+    json_object('node_id', NEW.node_id, 'diagnostic_triage', NEW.diagnostic_triage,
+                'actions', NEW.actions, 'created_at', NEW.created_at));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_triage_update
+AFTER UPDATE ON triage
+FOR EACH ROW
+WHEN (OLD.diagnostic_triage IS NOT NEW.diagnostic_triage OR OLD.actions IS NOT NEW.actions
+      OR OLD.node_id IS NOT NEW.node_id)
+  AND NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key, row_data) VALUES ('triage', 'U',
+    json_object('node_id', NEW.node_id),
+    json_object('node_id', NEW.node_id, 'diagnostic_triage', NEW.diagnostic_triage,
+                'actions', NEW.actions, 'created_at', NEW.created_at));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_triage_delete
+AFTER DELETE ON triage
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key) VALUES ('triage', 'D', json_object('node_id', OLD.node_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_red_flags_insert
+AFTER INSERT ON red_flags
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key, row_data) VALUES ('red_flags', 'I',
+    json_object('id', NEW.id),
+    json_object('id', NEW.id, 'name', NEW.name, 'description', NEW.description,
+                'severity', NEW.severity, 'created_at', NEW.created_at));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_red_flags_update
+AFTER UPDATE ON red_flags
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key, row_data) VALUES ('red_flags', 'U',
+    json_object('id', NEW.id),
+    json_object('id', NEW.id, 'name', NEW.name, 'description', NEW.description,
+                'severity', NEW.severity, 'created_at', NEW.created_at));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_red_flags_delete
+AFTER DELETE ON red_flags
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key) VALUES ('red_flags', 'D', json_object('id', OLD.id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_node_red_flags_insert
+AFTER INSERT ON node_red_flags
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key, row_data) VALUES ('node_red_flags', 'I',
+    json_object('node_id', NEW.node_id, 'red_flag_id', NEW.red_flag_id),
+    json_object('node_id', NEW.node_id, 'red_flag_id', NEW.red_flag_id, 'created_at', NEW.created_at));
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_journal_node_red_flags_delete
+AFTER DELETE ON node_red_flags
+FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM change_journal_state WHERE suspended = 1)
+BEGIN
+  INSERT INTO change_journal (tbl, op, row_key) VALUES ('node_red_flags', 'D',
+    json_object('node_id', OLD.node_id, 'red_flag_id', OLD.red_flag_id));
+END;
+
+-- ---- INTEGRITY SCAN RESULTS ----
+-- Latest result per scan kind (quick / full / foreign_keys), written by storage/integrity.py
+CREATE TABLE IF NOT EXISTS integrity_results (
+    kind        TEXT PRIMARY KEY,
+    ok          INTEGER NOT NULL,
+    result      TEXT NOT NULL,             -- JSON
+    started_at  TEXT NOT NULL,
+    finished_at TEXT NOT NULL,
+    duration_ms REAL NOT NULL
+);
@@ -0,0 +1,268 @@
+"""
+Persistent slow-query log.
+
+With ``LORIEN_SLOW_QUERY_MS`` set, every statement run on an instrumented
+connection (see storage/querystats.py) that takes at least that long is
+written to a ring-buffer table in a small database of its own
+(``LORIEN_SLOW_QUERY_DB``, default ``slow_queries.db`` next to the app
+database). Each entry keeps:
+
+- the normalized SQL (literals and IN lists folded to ``?``) and its
+  fingerprint, so one query shape groups under one key;
+- the parameter shape, e.g. ``(int, str, None)``, never the values;
+- the duration, fetching included (a full scan spends its time reading
+  rows, after ``execute`` has returned), and the route being served,
+  when SQL tracing knows it;
+- the ``EXPLAIN QUERY PLAN`` of the statement, taken on the same
+  connection once its rows were read, and the tables it scans in full.
+
+The table holds ``LORIEN_SLOW_QUERY_KEEP`` rows (default 1000); entry
+``seq`` goes to slot ``seq % keep``, overwriting the oldest. The seq is
+taken from the table inside the INSERT itself, so several workers writing
+to the same log never reuse one. When ``keep`` changes, the newest
+``keep`` entries are kept and moved to their new slots.
+``summary()`` groups the entries by fingerprint for
+``GET /admin/performance/slow-queries``.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slow_queries (
+  slot        INTEGER PRIMARY KEY,  -- seq % keep
+  seq         INTEGER NOT NULL,
+  recorded_at TEXT NOT NULL,
+  fingerprint TEXT NOT NULL,
+  sql         TEXT NOT NULL,        -- normalized
+  param_shape TEXT,
+  duration_ms REAL NOT NULL,
+  route       TEXT,
+  plan        TEXT,                 -- EXPLAIN QUERY PLAN details, one per line
+  full_scans  TEXT                  -- tables scanned without an index, comma separated
+);
+CREATE INDEX IF NOT EXISTS idx_slow_queries_fingerprint ON slow_queries(fingerprint);
+CREATE INDEX IF NOT EXISTS idx_slow_queries_seq ON slow_queries(seq);
+"""
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r", name, os.getenv(name))
+        return default
+
+
+def threshold_ms() -> Optional[float]:
+    """Slow-query threshold in milliseconds, or None when the log is off."""
+    raw = os.getenv("LORIEN_SLOW_QUERY_MS")
+    if not raw:
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        logger.warning("Ignoring invalid LORIEN_SLOW_QUERY_MS=%r", raw)
+        return None
+    return value if value > 0 else None
+
+
+def log_path() -> str:
+    path = os.getenv("LORIEN_SLOW_QUERY_DB")
+    if path:
+        return path
+    app_db = os.getenv("LORIEN_DB_PATH", os.path.expanduser("~/.local/share/lorien/app.db"))
+    return str(Path(app_db).resolve().parent / "slow_queries.db")
+
+
+def normalize(sql: str) -> str:
+    """One-line SQL with literals and IN lists replaced by placeholders."""
+    flat = " ".join(_NUMBER.sub("?", _STRING.sub("?", sql)).split())
+    return _IN_LIST.sub("IN (?...)", flat)
+
+
+def fingerprint(normalized_sql: str) -> str:
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def param_shape(params: Any) -> Optional[str]:
+    """Types of the bound parameters, e.g. ``(int, str)`` or ``{id: int}``."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    if isinstance(params, (list, tuple)):
+        if params and isinstance(params[0], (list, tuple, dict)):  # executemany rows
+            return f"{len(params)} x {param_shape(params[0])}"
+        return "(" + ", ".join("None" if v is None else type(v).__name__ for v in params) + ")"
+    return type(params).__name__
+
+
+def full_scans(plan: List[str]) -> List[str]:
+    """Tables a query plan reads from end to end without an index."""
+    return [m.group(1) for m in map(_FULL_SCAN.match, plan) if m]
+
+
+def _explain(conn: sqlite3.Connection, sql: str, params: Any) -> List[str]:
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    if head not in _EXPLAINABLE:
+        return []
+    if isinstance(params, (list, tuple)) and params and isinstance(params[0], (list, tuple, dict)):
+        params = params[0]
+    elif not isinstance(params, (list, tuple, dict)):
+        params = ()
+    # a plain cursor, so the EXPLAIN itself is neither timed nor logged
+    rows = conn.cursor(sqlite3.Cursor).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[3] for row in rows]
+
+
+def _p95(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class SlowQueryLog:
+    """Bounded, persistent log of statements over the slow-query threshold."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._path: Optional[str] = None
+        self._keep: Optional[int] = None
+        self.dropped = 0
+
+    def _open(self) -> sqlite3.Connection:
+        path = log_path()
+        if self._conn is None or path != self._path:
+            if self._conn is not None:
+                self._conn.close()
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn, self._path, self._keep = conn, path, None
+        return self._conn
+
+    def record(self, conn: sqlite3.Connection, sql: str, params: Any, duration_ms: float,
+               route: Optional[str] = None) -> None:
+        """Log one slow statement; never raises into the query that triggered it."""
+        try:
+            plan = _explain(conn, sql, params)
+        except sqlite3.Error as e:
+            plan = [f"(EXPLAIN failed: {e})"]
+        normalized = normalize(sql)
+        try:
+            with self._lock:
+                log = self._open()
+                keep = max(1, _env_int("LORIEN_SLOW_QUERY_KEEP", 1000))
+                if keep != self._keep:
+                    self._resize(log, keep)
+                # one statement: the write lock is taken before MAX(seq) is read,
+                # so another process logging at the same time gets the next seq
+                log.execute(
+                    "INSERT OR REPLACE INTO slow_queries "
+                    "(slot, seq, recorded_at, fingerprint, sql, param_shape, duration_ms, route, plan, full_scans) "
+                    "SELECT next.seq % ?, next.seq, ?, ?, ?, ?, ?, ?, ?, ? "
+                    "FROM (SELECT COALESCE(MAX(seq), 0) + 1 AS seq FROM slow_queries) AS next",
+                    (keep, datetime.now(timezone.utc).isoformat(),
+                     fingerprint(normalized), normalized, param_shape(params), round(duration_ms, 3),
+                     route, "\n".join(plan), ",".join(full_scans(plan))),
+                )
+        except sqlite3.Error as e:
+            self.dropped += 1
+            logger.warning("Slow-query log write failed: %s", e)
+
+    def _resize(self, log: sqlite3.Connection, keep: int) -> None:
+        """Keep the newest ``keep`` entries, each in slot ``seq % keep``."""
+        log.execute("BEGIN IMMEDIATE")
+        try:
+            log.execute("DELETE FROM slow_queries WHERE seq <= (SELECT MAX(seq) FROM slow_queries) - ?", (keep,))
+            log.execute("UPDATE slow_queries SET slot = -1 - slot")  # out of the way of the new slots
+            log.execute("UPDATE slow_queries SET slot = seq % ?", (keep,))
+            log.execute("COMMIT")
+        except sqlite3.Error:
+            log.execute("ROLLBACK")
+            raise
+        self._keep = keep
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Every logged statement, newest first."""
+        with self._lock:
+            rows = self._open().execute(
+                "SELECT seq, recorded_at, fingerprint, sql, param_shape, duration_ms, route, plan, full_scans "
+                "FROM slow_queries ORDER BY seq DESC"
+            ).fetchall()
+        keys = ("seq", "recorded_at", "fingerprint", "sql", "param_shape", "duration_ms", "route", "plan", "full_scans")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def summary(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Entries grouped by fingerprint, most total time first.
+
+        Each group has count, p95/max/total ms, the routes and parameter
+        shapes seen, the latest plan and the tables it scans in full.
+        """
+        groups: Dict[str, Dict[str, Any]] = {}
+        for entry in self.entries():  # newest first: the first entry of a group is its latest
+            group = groups.get(entry["fingerprint"])
+            if group is None:
+                group = groups[entry["fingerprint"]] = {
+                    "fingerprint": entry["fingerprint"],
+                    "sql": entry["sql"],
+                    "durations": [],
+                    "routes": set(),
+                    "param_shapes": set(),
+                    "last_seen": entry["recorded_at"],
+                    "plan": entry["plan"].split("\n") if entry["plan"] else [],
+                    "full_scans": entry["full_scans"].split(",") if entry["full_scans"] else [],
+                }
+            group["durations"].append(entry["duration_ms"])
+            if entry["route"]:
+                group["routes"].add(entry["route"])
+            if entry["param_shape"]:
+                group["param_shapes"].add(entry["param_shape"])
+
+        result = []
+        for group in groups.values():
+            durations = group.pop("durations")
+            group.update(
+                count=len(durations),
+                p95_ms=_p95(durations),
+                max_ms=max(durations),
+                total_ms=round(sum(durations), 3),
+                routes=sorted(group["routes"]),
+                param_shapes=sorted(group["param_shapes"]),
+                full_scan="nodes" in group["full_scans"],
+            )
+            result.append(group)
+        result.sort(key=lambda g: -g["total_ms"])
+        return result[:limit]
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = self._open().execute("DELETE FROM slow_queries").rowcount
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+slow_queries = SlowQueryLog()
@@ -9,7 +9,7 @@ import sys
 import json
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from pathlib import Path
 import pandas as pd
 
@@ -18,26 +18,55 @@ logger = logging.getLogger(__name__)
 from core.models import Node, Parent, RedFlag, Triaging, TreeValidationResult
 from core.rules import validate_tree_structure
 from core.storage.path import get_db_path
+from core.constants import CANON_HEADERS
+from storage import querystats, tracing
+from storage.publish import open_snapshot
+
+# Every complete root→leaf path in tree order (root id, then slot at each level).
+# CROSS JOIN pins the join order top-down so each level is read through
+# idx_parent_slot_unique already in slot order: rows stream out with no sort.
+COMPLETE_PATHS_SQL = """
+SELECT r.label, n1.label, n2.label, n3.label, n4.label, n5.label,
+       t.diagnostic_triage, t.actions
+FROM nodes r
+CROSS JOIN nodes n1 ON n1.parent_id = r.id  AND n1.depth = 1
+CROSS JOIN nodes n2 ON n2.parent_id = n1.id AND n2.depth = 2
+CROSS JOIN nodes n3 ON n3.parent_id = n2.id AND n3.depth = 3
+CROSS JOIN nodes n4 ON n4.parent_id = n3.id AND n4.depth = 4
+CROSS JOIN nodes n5 ON n5.parent_id = n4.id AND n5.depth = 5
+LEFT JOIN triage t ON t.node_id = n5.id
+WHERE r.depth = 0
+ORDER BY r.id, n1.slot, n2.slot, n3.slot, n4.slot, n5.slot
+"""
 
 
+@tracing.trace_methods
 class SQLiteRepository:
     """Repository for SQLite-based decision tree storage."""
     
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, read_only: bool = False, id_base: int = 0):
         """
         Initialize SQLite repository.
         
         Args:
             db_path: Path to SQLite database file. If None, uses default app data location.
+            read_only: Open an immutable published snapshot (see storage/publish.py):
+                no schema setup, no locks, writes fail.
+            id_base: New node ids start above this value (one partition of
+                storage/partitioned.py)
         """
         if db_path is None:
             db_path = self._get_default_db_path()
         
         # Always resolve to absolute path
         self._db_path = str(Path(db_path).resolve())
+        self.read_only = read_only
+        self.id_base = id_base
         logger.debug(f"SQLiteRepository: Initializing with resolved DB path: {self._db_path}")
         logger.debug(f"SQLiteRepository: Path exists: {os.path.exists(self._db_path)}")
         
+        if read_only:
+            return
         self._ensure_db_directory()
         self._init_database()
         
@@ -83,7 +112,10 @@ class SQLiteRepository:
     
     def _get_connection(self) -> sqlite3.Connection:
         """Get database connection with proper configuration."""
-        conn = sqlite3.connect(self._db_path)
+        if self.read_only:
+            conn = open_snapshot(self._db_path)
+        else:
+            conn = querystats.connect(self._db_path)
         conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
         
         # Enable foreign key constraints
@@ -631,7 +663,7 @@ class SQLiteRepository:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT p.id, p.label, p.depth,
-                       GROUP_CONCAT(c.slot ORDER BY c.slot) as existing_slots
+                       GROUP_CONCAT(c.slot) as existing_slots
                 FROM nodes p
                 LEFT JOIN nodes c ON p.id = c.parent_id
                 WHERE p.parent_id IS NOT NULL
@@ -641,7 +673,7 @@ class SQLiteRepository:
             
             results = []
             for row in cursor.fetchall():
-                existing_slots = [int(s) for s in row['existing_slots'].split(',') if s] if row['existing_slots'] else []
+                existing_slots = sorted(int(s) for s in row['existing_slots'].split(',') if s) if row['existing_slots'] else []
                 missing_slots = [i for i in range(1, 6) if i not in existing_slots]
                 
                 results.append({
@@ -1069,6 +1101,60 @@ class SQLiteRepository:
             
             return csv_data
     
+    def iter_complete_path_rows(self, batch_size: int = 1000) -> Iterator[Tuple]:
+        """
+        Stream every complete root→leaf path as an 8-tuple in canonical column order.
+        
+        One ordered query over all five levels (following every slot, not just
+        slot == depth), fetched in batches so memory stays flat.
+        
+        Args:
+            batch_size: Rows fetched from the cursor per round trip
+            
+        Yields:
+            (vital_measurement, node_1..node_5, diagnostic_triage, actions)
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.execute(COMPLETE_PATHS_SQL)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            conn.close()
+    
+    def iter_complete_paths(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Stream complete paths as dicts keyed by the canonical headers."""
+        for row in self.iter_complete_path_rows(batch_size):
+            yield dict(zip(CANON_HEADERS, row))
+
+    def iter_node_rows(self, batch_size: int = 1000) -> Iterator[Tuple]:
+        """
+        Stream the raw nodes table ordered by id.
+
+        Args:
+            batch_size: Rows fetched from the cursor per round trip
+
+        Yields:
+            (id, parent_id, depth, slot, label, is_leaf)
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.execute(
+                "SELECT id, parent_id, depth, slot, label, is_leaf FROM nodes ORDER BY id"
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            conn.close()
+
     def get_descendant_nodes(self, root_id: int) -> List[int]:
         """Get all descendant node IDs using recursive CTE."""
         with self._get_connection() as conn:
@@ -1143,9 +1229,12 @@ class SQLiteRepository:
             try:
                 cursor = conn.cursor()
                 cursor.execute("""
-                    INSERT INTO nodes (label, parent_id, slot, depth, is_leaf, created_at, updated_at)
-                    VALUES (?, NULL, 0, 0, 0, ?, ?)
+                    INSERT INTO nodes (id, label, parent_id, slot, depth, is_leaf, created_at, updated_at)
+                    VALUES (CASE WHEN ? > 0 THEN (SELECT MAX(COALESCE(MAX(id), 0), ?) + 1 FROM nodes) END,
+                            ?, NULL, 0, 0, 0, ?, ?)
                 """, (
+                    self.id_base,
+                    self.id_base,
                     label,
                     self._datetime_to_iso(datetime.now()),
                     self._datetime_to_iso(datetime.now())
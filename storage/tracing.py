@@ -0,0 +1,386 @@
+"""
+Span tracing for requests, offline.
+
+Opt-in with ``LORIEN_TRACE=true``. The request pipeline
+(api/middleware/pipeline.py) opens a root span for every request, or for a
+``LORIEN_TRACE_SAMPLE`` fraction of them. An incoming W3C ``traceparent``
+header continues the caller's trace and its sampled flag decides: ``01``
+traces, ``00`` does not, and only requests without a valid header fall
+back to the sample rate. The trace id goes back in ``X-Trace-Id`` and
+``traceparent``.
+
+Code marks its work with ``span(name, **attributes)`` or ``@traced``;
+``trace_methods(cls)`` wraps a class's public methods, as done for the
+repositories. The current span is a ContextVar, so spans nest across
+awaits and into threadpool calls. Outside a traced request ``span()``
+costs one ContextVar lookup and records nothing.
+
+Finished spans go to an in-memory ring of the last ``LORIEN_TRACE_KEEP``
+(default 10000). With ``LORIEN_TRACE_FILE`` set they are also appended to
+that file as JSON lines, one span per line, in one write per trace when
+its root span ends::
+
+    {"trace_id": "...", "span_id": "...", "parent_id": "...", "name": "sqlite",
+     "start": 1760000000.123, "duration_ms": 0.41, "status": "ok",
+     "thread": "AnyIO worker thread", "attributes": {"statement": "SELECT ..."}}
+
+The file is rotated to ``<file>.1`` at ``LORIEN_TRACE_FILE_MAX_MB``
+(default 100). A trace records at most ``LORIEN_TRACE_MAX_SPANS`` spans
+(default 1000). The root span counts the ones dropped beyond that, which
+keeps an N+1 loop from flooding the log. These settings are read when a
+trace starts, not per span.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# Spans buffered before a write is forced, for spans ending outside a root
+_MAX_PENDING = 512
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r", name, os.getenv(name))
+        return default
+
+
+def enabled() -> bool:
+    """True when LORIEN_TRACE=true."""
+    return os.getenv("LORIEN_TRACE", "false").lower() == "true"
+
+
+def sample_rate() -> float:
+    """Fraction of requests traced when tracing is on (LORIEN_TRACE_SAMPLE, default 1)."""
+    try:
+        return min(max(float(os.getenv("LORIEN_TRACE_SAMPLE", "1")), 0.0), 1.0)
+    except ValueError:
+        logger.warning("Ignoring invalid LORIEN_TRACE_SAMPLE=%r", os.getenv("LORIEN_TRACE_SAMPLE"))
+        return 1.0
+
+
+def _parse_traceparent(traceparent: Optional[str]) -> Optional[re.Match]:
+    m = _TRACEPARENT.match(traceparent.strip().lower()) if traceparent else None
+    return m if m and m.group(1) != "0" * 32 else None
+
+
+def sampled(traceparent: Optional[str]) -> Optional[bool]:
+    """The caller's sampled flag from a W3C traceparent, or None if there is no valid header."""
+    m = _parse_traceparent(traceparent)
+    return None if m is None else bool(int(m.group(3), 16) & 0x01)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Trace:
+    """Span budget shared by the spans of one trace."""
+
+    __slots__ = ("trace_id", "root_id", "spans", "max_spans", "dropped", "_lock")
+
+    def __init__(self, trace_id: str, max_spans: int):
+        self.trace_id = trace_id
+        self.root_id: Optional[str] = None
+        self.spans = 0
+        self.max_spans = max_spans
+        self.dropped = 0
+        # spans of one request are opened from the loop and from worker threads
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        with self._lock:
+            if self.spans >= self.max_spans:
+                self.dropped += 1
+                return False
+            self.spans += 1
+            return True
+
+
+class Span:
+    """One timed operation. ``end()`` hands it to the exporter."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "_t0", "duration_ms",
+                 "attributes", "status", "thread")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes = attributes or {}
+        self.status = "ok"
+        self.thread = threading.current_thread().name
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException) -> None:
+        self.status = "error"
+        self.attributes["error"] = f"{type(error).__name__}: {error}"[:200]
+
+    def child(self, name: str, **attributes: Any) -> Optional["Span"]:
+        """A child span, or None when the trace is over its span budget."""
+        if not self.trace.admit():
+            return None
+        return Span(self.trace, name, self.span_id, attributes)
+
+    def end(self) -> None:
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self._t0) * 1000
+            spans.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "status": self.status,
+            "thread": self.thread,
+            "attributes": self.attributes,
+        }
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Span:
+    """Root span of a new trace, or of the caller's trace given a W3C traceparent."""
+    trace_id, parent_id = None, None
+    m = _parse_traceparent(traceparent)
+    if m:
+        trace_id, parent_id = m.group(1), m.group(2)
+    spans.configure()
+    trace = Trace(trace_id or _new_id(128), _env_int("LORIEN_TRACE_MAX_SPANS", 1000))
+    trace.spans = 1
+    root = Span(trace, name, parent_id, attributes)
+    trace.root_id = root.span_id
+    return root
+
+
+def end_trace(root: Span) -> None:
+    if root.trace.dropped:
+        root.attributes["dropped_spans"] = root.trace.dropped
+    root.end()
+    spans.flush()
+
+
+def traceparent(span: Span) -> str:
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time the block as a child of the current span.
+
+    Yields the span (to ``set()`` attributes found along the way), or None
+    outside a traced request.
+    """
+    parent = current_span.get()
+    child = parent.child(name, **attributes) if parent is not None else None
+    if child is None:
+        yield None
+        return
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.fail(e)
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+
+def record(name: str, duration_ms: float, parent: Optional[Span] = None, **attributes: Any) -> None:
+    """Record an operation that has already finished as a child of ``parent`` (default: the current span)."""
+    if parent is None:
+        parent = current_span.get()
+    child = parent.child(name, **attributes) if parent is not None else None
+    if child is not None:
+        child.start -= duration_ms / 1000
+        child.duration_ms = duration_ms
+        spans.export(child)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator: run the function in a span named ``name`` (default: its qualified name)."""
+    def decorate(fn: Callable) -> Callable:
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_span.get() is None:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_methods(cls: type) -> type:
+    """
+    Class decorator: trace every public method.
+
+    Generator methods are left alone; their work happens after they
+    return, in whatever context consumes them.
+    """
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith("_") or not inspect.isfunction(value) or inspect.isgeneratorfunction(value):
+            continue
+        setattr(cls, attr, traced(f"{cls.__name__}.{attr}")(value))
+    return cls
+
+
+class SpanLog:
+    """Ring buffer of finished spans, mirrored to a JSON-lines file when configured."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # held while writing the file; taken before _lock so writes keep span order
+        self._file_lock = threading.Lock()
+        self._ring: deque = deque(maxlen=_env_int("LORIEN_TRACE_KEEP", 10000))
+        self._pending: List[Span] = []
+        self._target: Optional[str] = os.getenv("LORIEN_TRACE_FILE") or None
+        self._max_bytes = _env_int("LORIEN_TRACE_FILE_MAX_MB", 100) * 1024 * 1024
+        self._file = None
+        self._path: Optional[str] = None
+
+    def configure(self) -> None:
+        """Pick up LORIEN_TRACE_KEEP / _FILE / _FILE_MAX_MB (called when a trace starts)."""
+        keep = _env_int("LORIEN_TRACE_KEEP", 10000)
+        target = os.getenv("LORIEN_TRACE_FILE") or None
+        max_bytes = _env_int("LORIEN_TRACE_FILE_MAX_MB", 100) * 1024 * 1024
+        with self._lock:
+            if self._ring.maxlen != keep:
+                self._ring = deque(self._ring, maxlen=keep)
+            self._target, self._max_bytes = target, max_bytes
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._ring.append(span)
+            if self._target is None:
+                return
+            self._pending.append(span)
+            overflow = len(self._pending) >= _MAX_PENDING
+        if overflow:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered spans to the file in one go."""
+        with self._file_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                path, max_bytes = self._target, self._max_bytes
+            if not pending and self._file is None:
+                return
+            try:
+                self._write(path, pending, max_bytes)
+            except OSError as e:
+                logger.warning("Could not write spans to %s: %s", path, e)
+
+    def _write(self, path: Optional[str], pending: List[Span], max_bytes: int) -> None:
+        if path != self._path:
+            self._close()
+            self._path = path
+        if path is None or not pending:
+            return
+        if self._file is None:
+            self._file = open(path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(s.to_dict(), default=str) + "\n" for s in pending))
+        self._file.flush()
+        if self._file.tell() >= max_bytes:
+            self._close()
+            os.replace(path, path + ".1")
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self) -> None:
+        self.flush()
+        with self._file_lock:
+            self._close()
+            self._path = None
+
+    def trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Spans of one trace still in the ring, in start order."""
+        with self._lock:
+            found = [s for s in self._ring if s.trace_id == trace_id]
+        return [s.to_dict() for s in sorted(found, key=lambda s: s.start)]
+
+    def traces(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent finished traces (by root span), newest first."""
+        with self._lock:
+            ring = list(self._ring)
+        counts: Dict[str, int] = {}
+        for s in ring:
+            counts[s.trace_id] = counts.get(s.trace_id, 0) + 1
+        roots = [s for s in reversed(ring) if s.span_id == s.trace.root_id][:limit]
+        return [{
+            "trace_id": s.trace_id,
+            "name": s.name,
+            "start": round(s.start, 6),
+            "duration_ms": round(s.duration_ms, 3),
+            "status": s.status,
+            "spans": counts[s.trace_id],
+            "dropped_spans": s.attributes.get("dropped_spans", 0),
+        } for s in roots]
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._ring)
+            self._ring.clear()
+        return removed
+
+
+spans = SpanLog()
+
+
+def breakdown(trace_spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Self time per span name: each span's duration less that of its children.
+
+    Children that ran concurrently can add up to more than their parent;
+    self time is then clamped at 0.
+    """
+    children_ms: Dict[str, float] = {}
+    for s in trace_spans:
+        if s["parent_id"] is not None:
+            children_ms[s["parent_id"]] = children_ms.get(s["parent_id"], 0.0) + (s["duration_ms"] or 0.0)
+    totals: Dict[str, Dict[str, float]] = {}
+    for s in trace_spans:
+        entry = totals.setdefault(s["name"], {"count": 0, "total_ms": 0.0, "self_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += s["duration_ms"] or 0.0
+        entry["self_ms"] += max((s["duration_ms"] or 0.0) - children_ms.get(s["span_id"], 0.0), 0.0)
+    return {name: {k: round(v, 3) for k, v in entry.items()}
+            for name, entry in sorted(totals.items(), key=lambda kv: -kv[1]["self_ms"])}
@@ -0,0 +1,91 @@
+"""
+Set-based structural fixes for the five-children rule.
+
+Each fix runs one statement per depth inside a single transaction, so even
+large trees are repaired in a handful of round trips. A dry run executes the
+same statements and rolls back, reporting what would have changed.
+"""
+
+import sqlite3
+from typing import Any, Dict
+
+from core.constants import STRATEGY_PLACEHOLDER, STRATEGY_PRUNE
+
+# Placeholder label for a filled slot, matching core.rules ("Option N")
+PLACEHOLDER_LABEL_SQL = "'Option ' || s.slot"
+
+_FILL_MISSING_SLOTS_SQL = f"""
+WITH slots(slot) AS (VALUES (1),(2),(3),(4),(5))
+INSERT INTO nodes (parent_id, depth, slot, label, is_leaf)
+SELECT p.id, p.depth + 1, s.slot, {PLACEHOLDER_LABEL_SQL}, CASE WHEN p.depth + 1 = 5 THEN 1 ELSE 0 END
+FROM nodes p
+CROSS JOIN slots s
+LEFT JOIN nodes c ON c.parent_id = p.id AND c.slot = s.slot
+WHERE p.depth = ? AND c.id IS NULL
+ORDER BY p.id, s.slot
+"""
+
+_PRUNE_DEAD_ENDS_SQL = """
+DELETE FROM nodes
+WHERE depth = ?
+  AND NOT EXISTS (SELECT 1 FROM nodes c WHERE c.parent_id = nodes.id)
+"""
+
+
+def _incomplete_parents(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM v_missing_slots").fetchone()[0]
+
+
+def _node_count(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+
+def enforce_five(conn: sqlite3.Connection, strategy: str = STRATEGY_PLACEHOLDER,
+                 dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Enforce the five-children rule across the whole tree.
+
+    Args:
+        conn: Connection on the storage schema
+        strategy: 'placeholder' fills every missing slot with an "Option N"
+            child, cascading level by level down to depth 5; 'prune' removes
+            non-root branches that end before depth 5
+        dry_run: Roll back instead of committing
+
+    Returns:
+        Dict with nodes_created, nodes_deleted and incomplete parent counts
+    """
+    if strategy not in (STRATEGY_PLACEHOLDER, STRATEGY_PRUNE):
+        raise ValueError(f"Unknown strategy: {strategy}")
+
+    before = _incomplete_parents(conn)
+    nodes_before = _node_count(conn)
+    conn.execute("BEGIN")
+    try:
+        if strategy == STRATEGY_PLACEHOLDER:
+            # Top-down so placeholders created at one depth are filled at the next
+            for depth in range(0, 5):
+                conn.execute(_FILL_MISSING_SLOTS_SQL, (depth,))
+        else:
+            # Bottom-up so a parent emptied at one depth is pruned at the next
+            for depth in range(4, 0, -1):
+                conn.execute(_PRUNE_DEAD_ENDS_SQL, (depth,))
+        after = _incomplete_parents(conn)
+        # Statement rowcounts are unreliable here (CTE inserts, touch triggers)
+        delta = _node_count(conn) - nodes_before
+    except Exception:
+        conn.rollback()
+        raise
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+
+    return {
+        "strategy": strategy,
+        "dry_run": dry_run,
+        "nodes_created": max(delta, 0),
+        "nodes_deleted": max(-delta, 0),
+        "incomplete_parents_before": before,
+        "incomplete_parents_after": after,
+    }
@@ -0,0 +1,376 @@
+"""
+Workbook tenancy: one database directory per workbook, opened on demand.
+
+With ``LORIEN_WORKBOOKS_DIR`` set, every workbook is a subdirectory::
+
+    <workbooks_dir>/
+        site-a/
+            app.db      # storage repository (what LORIEN_DB_PATH is otherwise)
+            lorien.db   # legacy API tables (what LORIEN_DB is otherwise)
+
+A request picks its workbook with the ``/w/{workbook}`` path prefix or the
+``X-Lorien-Workbook`` header (api/middleware/workbook.py), which sets
+``current_workbook`` for the rest of the request.
+
+``WorkbookRegistry`` keeps at most ``max_open`` workbooks open, least
+recently used first out. Opening a workbook sets up its schema once (not
+on every request) and gives each of its two databases a small pool of idle
+connections; SQLite's page cache lives in the connection, so pooled
+connections stay warm between requests. The workbook's repository draws
+from the ``app.db`` pool, and ``api.db.get_conn`` from the ``lorien.db``
+pool, whose schema it sets up on first use. Evicting a workbook closes its
+idle connections, and connections still lent out are closed when they come
+back.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from . import querystats
+from .sqlite import SQLiteRepository
+
+logger = logging.getLogger(__name__)
+
+WORKBOOK_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+APP_DB = "app.db"
+LEGACY_DB = "lorien.db"
+
+# Workbook of the request being served; None means the default database
+current_workbook: ContextVar[Optional[str]] = ContextVar("current_workbook", default=None)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r", name, os.getenv(name))
+        return default
+
+
+def workbooks_dir() -> Optional[str]:
+    """Directory holding the workbooks, or None when tenancy is off."""
+    return os.getenv("LORIEN_WORKBOOKS_DIR") or None
+
+
+def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    # Same settings as api.dependencies._open_conn
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys=ON;")
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    return conn
+
+
+def _configure_legacy(conn: sqlite3.Connection) -> sqlite3.Connection:
+    # Same settings as api.db.get_conn
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA foreign_keys=ON;")
+    return conn
+
+
+class _Pool:
+    """Idle connections to one database file, lent out one at a time."""
+
+    def __init__(self, path: str, size: int, configure: Callable[[sqlite3.Connection], sqlite3.Connection]):
+        self.path = path
+        self.size = size
+        self.closed = False
+        self._configure = configure
+        self._idle: List[sqlite3.Connection] = []
+        self._lent = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            self._lent += 1
+            if self._idle:
+                return self._idle.pop()
+        return self._configure(querystats.connect(self.path, check_same_thread=False, isolation_level=None))
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            conn = None
+        with self._lock:
+            self._lent -= 1
+            if conn is not None and not self.closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        if conn is not None:
+            conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def counts(self) -> Dict[str, int]:
+        return {"idle": len(self._idle), "lent": self._lent}
+
+
+class _Lease:
+    """
+    A pooled connection lent to repository code.
+
+    Used the way SQLiteRepository uses its own connections: ``with
+    repo._get_connection() as conn`` commits or rolls back and then returns
+    the connection to the pool, and ``close()`` returns it too.
+    """
+
+    def __init__(self, workbook: "Workbook", conn: sqlite3.Connection):
+        self._workbook = workbook
+        self._conn: Optional[sqlite3.Connection] = conn
+        # repository code relies on implicit transactions; pooled connections autocommit
+        conn.isolation_level = ""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc) -> bool:
+        try:
+            return self._conn.__exit__(*exc)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.isolation_level = None
+        except sqlite3.Error:
+            pass  # closed by the caller; release() drops it
+        self._workbook.release(conn)
+
+
+class _LegacyLease:
+    """
+    A pooled ``lorien.db`` connection lent to one request (``api.db.get_conn``).
+
+    Behaves as the connection itself. ``close()``, or dropping the last
+    reference as most routers do, returns it to the pool instead of
+    closing it.
+    """
+
+    _conn: Optional[sqlite3.Connection] = None
+    schema_ready = True  # api.db.ensure_schema ran when the pool was first used
+
+    def __init__(self, workbook: "Workbook", conn: sqlite3.Connection):
+        self._workbook = workbook
+        self._conn = conn
+
+    def __getattr__(self, name: str) -> Any:
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._conn, name)
+
+    def __enter__(self) -> "_LegacyLease":
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return self._conn.__exit__(*exc)
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._workbook._legacy.release(conn)
+
+    def __del__(self) -> None:
+        self.close()
+
+
+class _WorkbookRepository(SQLiteRepository):
+    """SQLiteRepository whose connections come from the workbook's pool."""
+
+    def __init__(self, workbook: "Workbook"):
+        self._workbook = workbook
+        super().__init__(db_path=workbook.db_path)
+
+    def _get_connection(self) -> _Lease:
+        return _Lease(self._workbook, self._workbook.acquire())
+
+
+class Workbook:
+    """An open workbook: its repository and a pool of idle connections per database."""
+
+    def __init__(self, name: str, directory: Path, pool_size: int):
+        self.name = name
+        self.directory = directory
+        self.db_path = str(directory / APP_DB)
+        self.legacy_db_path = str(directory / LEGACY_DB)
+        self.pool_size = pool_size
+        self.opened_at = time.time()
+        self.last_used = self.opened_at
+        self.requests = 0
+        self._pool = _Pool(self.db_path, pool_size, _configure)
+        self._legacy = _Pool(self.legacy_db_path, pool_size, _configure_legacy)
+        self._legacy_ready = False
+        self._legacy_setup_lock = threading.Lock()
+        self.repo = _WorkbookRepository(self)
+
+    @property
+    def closed(self) -> bool:
+        return self._pool.closed
+
+    def acquire(self) -> sqlite3.Connection:
+        return self._pool.acquire()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        self._pool.release(conn)
+
+    def legacy_connection(self, setup: Callable[[sqlite3.Connection], None]) -> _LegacyLease:
+        """
+        Lend a pooled ``lorien.db`` connection, returned by its ``close()``.
+
+        ``setup`` (the legacy schema) runs once, on the first connection
+        this workbook lends, instead of on every request.
+        """
+        conn = self._legacy.acquire()
+        if not self._legacy_ready:
+            try:
+                with self._legacy_setup_lock:
+                    if not self._legacy_ready:
+                        setup(conn)
+                        self._legacy_ready = True
+            except BaseException:
+                self._legacy.release(conn)
+                raise
+        return _LegacyLease(self, conn)
+
+    def close(self) -> None:
+        self._pool.close()
+        self._legacy.close()
+
+    def stats(self) -> Dict[str, Any]:
+        app, legacy = self._pool.counts(), self._legacy.counts()
+        return {
+            "name": self.name,
+            "db_path": self.db_path,
+            "requests": self.requests,
+            "idle_connections": app["idle"],
+            "lent_connections": app["lent"],
+            "legacy_idle_connections": legacy["idle"],
+            "legacy_lent_connections": legacy["lent"],
+            "opened_at": self.opened_at,
+            "idle_seconds": round(time.time() - self.last_used, 1),
+        }
+
+
+class WorkbookRegistry:
+    """LRU of open workbooks under ``workbooks_dir()``."""
+
+    def __init__(self, max_open: Optional[int] = None, pool_size: Optional[int] = None):
+        self.max_open = max_open or _env_int("LORIEN_WORKBOOK_MAX_OPEN", 64)
+        self.pool_size = pool_size if pool_size is not None else _env_int("LORIEN_WORKBOOK_POOL_SIZE", 4)
+        self.opens = 0
+        self.evictions = 0
+        # keyed by workbook directory, so a changed LORIEN_WORKBOOKS_DIR never hits stale entries
+        self._open: "OrderedDict[str, Workbook]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _directory(name: str) -> Path:
+        root = workbooks_dir()
+        if root is None:
+            raise LookupError("Workbook routing is not enabled (LORIEN_WORKBOOKS_DIR)")
+        if not WORKBOOK_NAME.match(name):
+            raise ValueError(f"Invalid workbook name: {name!r}")
+        return Path(root).resolve() / name
+
+    def exists(self, name: str) -> bool:
+        return (self._directory(name) / APP_DB).exists()
+
+    def names(self) -> List[str]:
+        root = workbooks_dir()
+        if root is None or not os.path.isdir(root):
+            return []
+        return sorted(
+            entry.name for entry in os.scandir(root)
+            if entry.is_dir() and WORKBOOK_NAME.match(entry.name)
+            and os.path.exists(os.path.join(entry.path, APP_DB))
+        )
+
+    def get(self, name: str, create: bool = False) -> Workbook:
+        """
+        Open workbook ``name`` (or return it from the LRU).
+
+        Raises:
+            LookupError: Tenancy is off
+            ValueError: Invalid name
+            KeyError: No such workbook and ``create`` is False
+        """
+        directory = self._directory(name)
+        key = str(directory)
+        with self._lock:
+            wb = self._open.get(key)
+            if wb is not None:
+                self._open.move_to_end(key)
+                wb.last_used = time.time()
+                return wb
+        if not create and not (directory / APP_DB).exists():
+            raise KeyError(f"Workbook not found: {name}")
+        directory.mkdir(parents=True, exist_ok=True)
+        opened = Workbook(name, directory, self.pool_size)  # schema setup, outside the lock
+        evicted: List[Workbook] = []
+        with self._lock:
+            wb = self._open.get(key)
+            if wb is None:
+                wb = self._open[key] = opened
+                self.opens += 1
+                while len(self._open) > self.max_open:
+                    evicted.append(self._open.popitem(last=False)[1])
+                    self.evictions += 1
+            else:  # another request opened it meanwhile
+                evicted.append(opened)
+            self._open.move_to_end(key)
+        for old in evicted:
+            old.close()
+        return wb
+
+    def current(self) -> Optional[Workbook]:
+        """Open workbook of the current request, or None for the default database."""
+        name = current_workbook.get()
+        return None if name is None else self.get(name)
+
+    def close_all(self) -> None:
+        with self._lock:
+            opened, self._open = list(self._open.values()), OrderedDict()
+        for wb in opened:
+            wb.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            opened = [wb.stats() for wb in reversed(self._open.values())]
+        return {
+            "enabled": workbooks_dir() is not None,
+            "workbooks_dir": workbooks_dir(),
+            "max_open": self.max_open,
+            "pool_size": self.pool_size,
+            "opens": self.opens,
+            "evictions": self.evictions,
+            "open": opened,  # most recently used first
+        }
+
+
+# Process-wide registry used by the API
+workbooks = WorkbookRegistry()
@@ -136,6 +136,18 @@ class TestImportJobsIntegration:
         data = response.json()
         assert "Only .xlsx files are supported" in data["detail"]
     
+    def test_rejected_upload_fails_the_job(self, client, valid_excel_file, monkeypatch):
+        """Test that a 413 leaves the job failed, not queued."""
+        monkeypatch.setenv("LORIEN_MAX_UPLOAD_BYTES", "16")
+        response = client.post(
+            "/api/v1/import/excel",
+            files={"file": ("big.xlsx", valid_excel_file, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+        )
+        assert response.status_code == 413
+
+        jobs = [j for j in client.get("/api/v1/import/jobs").json() if j["filename"] == "big.xlsx"]
+        assert jobs and all(j["state"] == "failed" and j["finished_at"] for j in jobs)
+    
     def test_get_import_jobs(self, client, valid_excel_file):
         """Test getting all import jobs."""
         # First, create an import job
@@ -0,0 +1,36 @@
+"""
+Smoke test for the in-process load benchmark (tools/bench_load.py).
+"""
+
+import asyncio
+
+import pytest
+
+from tools.bench_load import MIX, Workload, missed_targets, prepare, run
+
+
+@pytest.mark.slow
+def test_every_route_in_the_mix_answers_under_load(tmp_path, monkeypatch):
+    import api.dependencies
+
+    db_path, legacy_db_path = str(tmp_path / "app.db"), str(tmp_path / "legacy.db")
+    monkeypatch.setenv("LORIEN_DB_PATH", db_path)
+    monkeypatch.setenv("LORIEN_DB", legacy_db_path)
+    monkeypatch.setattr(api.dependencies, "DB_PATH", db_path)
+    prepare(db_path, legacy_db_path, "partial", 1000, seed=0)
+
+    results = asyncio.run(run(Workload(db_path, seed=0), MIX, [4], duration=1.5, seed=0))
+    level = results[0]
+    assert level["concurrency"] == 4 and level["requests"] > 0
+    assert level["errors"] == 0, missed_targets(results)
+    for op, r in level["routes"].items():
+        assert r["p50"] <= r["p95"] <= r["p99"] <= r["max"]
+
+
+def test_missed_targets_reports_slow_routes_and_failures():
+    results = [{"concurrency": 8, "routes": {
+        "path": {"p95": 80.0, "target_p95_ms": 50, "meets_target": False, "errors": 0},
+        "stats": {"p95": 500.0, "errors": 2, "error_statuses": [500]},
+        "children": {"p95": 10.0, "target_p95_ms": 150, "meets_target": True, "errors": 0},
+    }}]
+    assert missed_targets(results) == ["c=8 path: p95 80 ms > 50 ms", "c=8 stats: 2 failed ([500])"]
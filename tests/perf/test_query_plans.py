@@ -0,0 +1,319 @@
+"""
+EXPLAIN QUERY PLAN checks for the application's own SQL, on the real schema.
+
+Statements are extracted from the repository modules by walking their AST.
+The harness takes string literals and f-strings passed to execute() or
+executemany(). It also follows names bound once, in the same function,
+to such a string. An interpolated name bound to a string constant is
+substituted, and so is the first branch of ``x if cond else y``. Every
+other hole is tried as ``?``, which fits ``IN ({marks})`` and
+``WHERE {clause}``, then as empty, which fits an optional clause. A
+statement that parses neither way, such as ``SET {fields}``, is skipped;
+list a representative form in REGISTERED instead.
+
+The plans come from two databases, both holding a generated tree and
+ANALYZEd:
+
+- the storage database: storage/schema.sql, every migration, and the
+  CREATE statements the modules run themselves;
+- the legacy database: the api/db.py schema.
+
+Parameters are bound as NULL. The plan of a parameterized statement does
+not depend on the values bound.
+
+A full scan (``SCAN t``, with or without ``USING [COVERING] INDEX``) of
+nodes, triage or an audit table fails the test unless the enclosing
+function is listed in EXPECTED_SCANS. An entry that no longer scans
+fails too, so the list only shrinks. Statements that cannot be prepared on
+either schema at all are listed in KNOWN_UNPREPARED, under the same rule.
+"""
+
+import ast
+import contextlib
+import io
+import re
+import sqlite3
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+MODULES = ["storage/sqlite.py", "api/repositories/*.py", "api/core/*.py"]
+WATCHED = re.compile(r"^(nodes|triage|\w*audit\w*)$")
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Representative forms of statements assembled at run time: (location, sql).
+REGISTERED: List[Tuple[str, str]] = [
+    ("api/core/dictionary_governance.py::DictionaryGovernanceManager.update_term",
+     "UPDATE dictionary_terms_governance SET term = ?, status = ?, version = ?, updated_at = ? WHERE id = ?"),
+    ("api/core/large_workbook_manager.py::LargeWorkbookManager.update_job_status",
+     "UPDATE large_import_jobs SET status = ?, progress_data = ?, completed_at = CURRENT_TIMESTAMP WHERE id = ?"),
+    ("api/core/large_workbook_manager.py::LargeWorkbookManager._update_chunk_status",
+     "UPDATE large_import_chunks SET status = ?, processed_at = CURRENT_TIMESTAMP WHERE id = ?"),
+    ("api/repositories/admin_repo.py::_count_table", "SELECT COUNT(*) FROM nodes"),
+    ("api/repositories/admin_repo.py::clear_workspace", "DELETE FROM triage"),
+    ("storage/sqlite.py::SQLiteRepository.update_import_job",
+     "UPDATE import_jobs SET state = ?, message = ?, finished_at = ? WHERE id = ?"),
+]
+
+# Functions allowed to read a watched table end to end, and why.
+_WHOLE_TREE = "whole-tree report or export"
+_COUNTS = "table-wide counts"
+_ADMIN = "clears the table"
+_INTEGRITY = "integrity check over every node"
+EXPECTED_SCANS: Dict[str, Dict[str, str]] = {
+    "api/core/audit_expansion.py::EnhancedAuditManager.get_enhanced_audit_stats": {"enhanced_audit_log": _COUNTS},
+    "api/core/orphan_repair.py::OrphanRepairManager.detect_orphans": {"nodes": _INTEGRITY},
+    "api/core/orphan_repair.py::OrphanRepairManager.get_orphan_summary": {"nodes": _INTEGRITY},
+    "api/repositories/admin_repo.py::_count_table": {"nodes": _COUNTS},
+    "api/repositories/admin_repo.py::delete_nodes": {"nodes": _ADMIN},
+    "api/repositories/admin_repo.py::clear_workspace": {"nodes": _ADMIN, "triage": _ADMIN},
+    "api/repositories/audit.py::AuditManager.get_audit_stats": {"audit_log": _COUNTS},
+    "api/repositories/performance.py::PerformanceOptimizer.get_database_stats": {"nodes": _COUNTS},
+    "api/repositories/performance.py::StreamingCSVExporter.export_tree_streaming": {"nodes": _WHOLE_TREE},
+    "api/repositories/tree_repo.py::iter_node_rows": {"nodes": _WHOLE_TREE},
+    # Served on every editor navigation: picks the first parent with fewer
+    # than five children, which no index can answer.
+    "api/repositories/tree_repo.py::next_incomplete_parent": {"nodes": "hot path; child counts per parent"},
+    "api/repositories/tree_repo.py::parents_query": {"nodes": _WHOLE_TREE},
+    "api/repositories/tree_repo.py::progress_stats": {"nodes": _WHOLE_TREE},
+    "api/repositories/tree_repo.py::root_options": {"nodes": "distinct root labels, read in index order"},
+    "api/repositories/tree_repo.py::stats": {"nodes": _WHOLE_TREE},
+    "api/repositories/tree_repo.py::detect_conflicts": {"nodes": _INTEGRITY},
+    "api/repositories/tree_repo.py::list_parent_labels": {"nodes": _WHOLE_TREE},
+    "storage/sqlite.py::SQLiteRepository.check_integrity": {"nodes": _INTEGRITY, "triage": _INTEGRITY,
+                                                            "red_flag_audit": _INTEGRITY},
+    "storage/sqlite.py::SQLiteRepository.clear_database": {"nodes": _ADMIN, "triage": _ADMIN},
+    "storage/sqlite.py::SQLiteRepository.get_database_info": {"nodes": _COUNTS, "triage": _COUNTS},
+    "storage/sqlite.py::SQLiteRepository.get_duplicate_labels": {"nodes": _INTEGRITY},
+    "storage/sqlite.py::SQLiteRepository.get_orphan_nodes": {"nodes": _INTEGRITY},
+    "storage/sqlite.py::SQLiteRepository.get_parents_with_missing_slots": {"nodes": _WHOLE_TREE},
+    "storage/sqlite.py::SQLiteRepository.get_tree_coverage": {"nodes": _WHOLE_TREE},
+    "storage/sqlite.py::SQLiteRepository.get_tree_stats": {"nodes": _WHOLE_TREE},
+    "storage/sqlite.py::SQLiteRepository.iter_node_rows": {"nodes": _WHOLE_TREE},
+}
+
+# Statements that reference tables or columns the schema does not have.
+KNOWN_UNPREPARED: Dict[str, str] = {
+    "api/core/audit_expansion.py::EnhancedAuditManager._undo_triage_update": "nodes has no triage column",
+    "api/core/audit_expansion.py::EnhancedAuditManager._undo_dictionary_update": "no dictionary table",
+    "storage/sqlite.py::SQLiteRepository.find_parents_with_too_few_children": "no v_parents_too_few view",
+    "storage/sqlite.py::SQLiteRepository.find_parents_with_too_many_children": "no v_parents_too_many view",
+    "storage/sqlite.py::SQLiteRepository.create_red_flag_audit": "red_flag_audit has red_flag_id, not flag_id",
+    "storage/sqlite.py::SQLiteRepository.get_red_flag_audit_with_branch": "red_flag_audit has red_flag_id, not flag_id",
+    "storage/sqlite.py::SQLiteRepository.get_red_flag_audit_by_id": "red_flag_audit has red_flag_id, not flag_id",
+}
+
+
+class Statement:
+    """One execute() call site; an f-string has a variant per way of filling its holes."""
+
+    __slots__ = ("location", "line", "variants")
+
+    def __init__(self, location: str, line: int, *variants: str):
+        self.location, self.line, self.variants = location, line, variants
+
+    @property
+    def sql(self) -> str:
+        return self.variants[0]
+
+    def __repr__(self) -> str:
+        first = " ".join(self.sql.split())[:80]
+        return f"{self.location}:{self.line} {first}"
+
+
+def _render(node: ast.AST, constants: Dict[str, str]) -> Optional[Tuple[str, ...]]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return (node.value,)
+    if not isinstance(node, ast.JoinedStr):
+        return None
+    variants = []
+    for hole in ("?", ""):  # "IN ({marks})" and "WHERE {clause}" need "?"; a whole optional clause needs ""
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value.value, ast.Name) and value.value.id in constants:
+                parts.append(constants[value.value.id])
+            elif isinstance(value.value, ast.IfExp) and isinstance(value.value.body, ast.Constant):
+                parts.append(str(value.value.body.value))
+            else:
+                parts.append(hole)
+        variants.append("".join(parts))
+    return tuple(dict.fromkeys(variants))
+
+
+def _function_statements(path: str, qualname: str, func: ast.AST) -> Iterator[Statement]:
+    assigned: Dict[str, List[ast.AST]] = defaultdict(list)
+    for node in ast.walk(func):
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    assigned[target.id].append(node.value)
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+            assigned[node.target.id].append(node.value)
+    constants = {name: values[0].value for name, values in assigned.items()
+                 if len(values) == 1 and isinstance(values[0], ast.Constant) and isinstance(values[0].value, str)}
+    for node in ast.walk(func):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ("execute", "executemany") and node.args):
+            continue
+        arg = node.args[0]
+        if isinstance(arg, ast.Name) and len(assigned.get(arg.id, ())) == 1:
+            arg = assigned[arg.id][0]
+        variants = _render(arg, constants)
+        if variants is not None:
+            yield Statement(f"{path}::{qualname}", node.lineno, *variants)
+
+
+def extract(path: str) -> List[Statement]:
+    """Every statically known statement in one module, tagged with its function."""
+    tree = ast.parse((ROOT / path).read_text())
+    statements: List[Statement] = []
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                visit(child, f"{prefix}{child.name}.")
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                statements.extend(_function_statements(path, f"{prefix}{child.name}", child))
+
+    visit(tree, "")
+    return statements
+
+
+def all_statements() -> List[Statement]:
+    paths = sorted({str(p.relative_to(ROOT)) for pattern in MODULES for p in ROOT.glob(pattern)})
+    statements = [s for path in paths for s in extract(path)]
+    statements.extend(Statement(location, 0, sql) for location, sql in REGISTERED)
+    return statements
+
+
+def _bindings(sql: str):
+    named = re.findall(r"(?<![:\w]):(\w+)", sql)
+    return {name: None for name in named} if named else (None,) * sql.count("?")
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, _bindings(sql))]
+
+
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:WHERE|ON|USING|JOIN|LEFT|INNER|CROSS|GROUP|ORDER|"
+    r"LIMIT|SET|VALUES|SELECT|UNION|HAVING|WINDOW|NATURAL|AND|OR)\b)(\w+))?", re.IGNORECASE)
+_SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?$")
+
+
+def scanned_tables(sql: str, plan: List[str]) -> Set[str]:
+    """Real table names read end to end, with aliases resolved from the SQL."""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias:
+            aliases[alias.lower()] = table.lower()
+    return {aliases.get(m.group(1).lower(), m.group(1).lower()) for m in map(_SCAN.match, plan) if m}
+
+
+def _ddl(statements: List[Statement]) -> List[str]:
+    return [s.sql for s in statements if re.match(r"\s*CREATE\s", s.sql, re.IGNORECASE)]
+
+
+def explain_all(tmp: Path) -> Tuple[List[Tuple[Statement, str, List[str]]], List[Statement]]:
+    """
+    Plan every extracted statement on the real schema.
+
+    Returns:
+        (statement, variant, plan) for each statement one of the two
+        databases can prepare, and the statements neither can
+    """
+    from storage.migrate import run_migration
+    from tools.bench_load import prepare
+
+    app_db, legacy_db = str(tmp / "app.db"), str(tmp / "legacy.db")
+    prepare(app_db, legacy_db, "partial", 3000, seed=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for migration in sorted(p.name for p in (ROOT / "storage" / "migrations").glob("*.sql")):
+            run_migration(app_db, migration)
+
+    statements = all_statements()
+    conns = [sqlite3.connect(app_db), sqlite3.connect(legacy_db)]
+    try:
+        for conn in conns:
+            for ddl in _ddl(statements):
+                with contextlib.suppress(sqlite3.Error):
+                    conn.executescript(ddl)
+            conn.execute("ANALYZE")
+
+        explained, unprepared = [], []
+        for statement in statements:
+            head = statement.sql.lstrip().split(None, 1)[0].upper() if statement.sql.strip() else ""
+            if head not in EXPLAINABLE:
+                continue
+            plan = next(((sql, plan) for conn in conns for sql in statement.variants
+                         for plan in [_try_explain(conn, sql)] if plan is not None), None)
+            if plan is None:
+                unprepared.append(statement)
+            else:
+                explained.append((statement, *plan))
+        return explained, unprepared
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def _try_explain(conn: sqlite3.Connection, sql: str) -> Optional[List[str]]:
+    try:
+        return explain(conn, sql)
+    except sqlite3.Error:
+        return None
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    return explain_all(tmp_path_factory.mktemp("plans"))
+
+
+def test_extraction_finds_the_repository_queries():
+    statements = {s.location: s for s in all_statements()}
+    assert "storage/sqlite.py::SQLiteRepository.get_children" in statements
+    parents_query = statements["api/repositories/tree_repo.py::parents_query"]
+    assert "WITH ch AS" in parents_query.sql and "{" not in parents_query.sql
+    conflicts = statements["api/repositories/tree_repo.py::detect_conflicts"]
+    assert len(conflicts.variants) == 2 and "LEFT JOIN nodes c ON c.parent_id = p.id\n      \n" in conflicts.variants[1]
+
+
+def test_scanned_tables_resolves_aliases():
+    sql = "SELECT p.id FROM nodes p LEFT JOIN nodes AS c ON c.parent_id = p.id JOIN triage t ON t.node_id = c.id"
+    plan = ["SCAN p", "SEARCH c USING INDEX idx (parent_id=?)", "SCAN t USING COVERING INDEX x"]
+    assert scanned_tables(sql, plan) == {"nodes", "triage"}
+    assert scanned_tables("SELECT COUNT(*) FROM nodes WHERE depth = 1", ["SEARCH nodes USING INDEX d (depth=?)"]) == set()
+
+
+def test_no_unexpected_full_scans(plans):
+    explained, _ = plans
+    assert len(explained) > 200
+
+    found: Dict[str, Set[str]] = defaultdict(set)
+    unexpected = []
+    for statement, sql, plan in explained:
+        tables = {t for t in scanned_tables(sql, plan) if WATCHED.match(t)}
+        found[statement.location] |= tables
+        allowed = EXPECTED_SCANS.get(statement.location, {})
+        unexpected.extend(f"{statement!r}: SCAN {t} ({'; '.join(plan)})" for t in sorted(tables - set(allowed)))
+    assert not unexpected, "full scans not in EXPECTED_SCANS:\n" + "\n".join(unexpected)
+
+    stale = [f"{location}: {table}" for location, tables in EXPECTED_SCANS.items()
+             for table in tables if table not in found.get(location, set())]
+    assert not stale, "EXPECTED_SCANS entries that no longer scan:\n" + "\n".join(stale)
+
+
+def test_statements_prepare_against_the_schema(plans):
+    _, unprepared = plans
+    # a dynamic call site is covered by its REGISTERED form, which must prepare itself
+    registered = {location for location, _ in REGISTERED}
+    unprepared = [s for s in unprepared if s.location not in registered or s.line == 0]
+    broken = {s.location for s in unprepared}
+    assert broken - set(KNOWN_UNPREPARED) == set(), [s for s in unprepared if s.location not in KNOWN_UNPREPARED]
+    assert set(KNOWN_UNPREPARED) - broken == set(), "KNOWN_UNPREPARED entries that prepare now"
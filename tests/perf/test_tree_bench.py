@@ -0,0 +1,70 @@
+"""
+Tests for the synthetic tree generator and the benchmark regression gate.
+"""
+
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from tools.bench_tree import OPERATIONS, compare, run_case
+from tools.treegen import FULL_SUBTREE, build, generate
+
+
+def test_generator_is_deterministic_and_valid():
+    assert list(generate("partial", 2000, seed=3)) == list(generate("partial", 2000, seed=3))
+    assert list(generate("partial", 2000, seed=3)) != list(generate("partial", 2000, seed=4))
+
+    rows = list(generate("full", 2 * FULL_SUBTREE + 10))
+    assert len(rows) == 2 * FULL_SUBTREE
+    children = Counter(parent for _, parent, _, _, _ in rows if parent is not None)
+    assert set(children.values()) == {5}
+    assert Counter(depth for _, _, depth, _, _ in rows)[5] == 2 * 5 ** 5
+
+    seen = {}
+    for node_id, parent, depth, slot, label in generate("partial", 5000, seed=1):
+        if parent is None:
+            assert depth == 0 and slot == 0
+        else:
+            assert seen[parent] == depth - 1 and 1 <= slot <= 5
+        seen[node_id] = depth
+    assert len(seen) == 5000
+
+
+def test_compare_applies_tolerance_and_floor():
+    def result(**ops):
+        return {"cases": {"partial-1e3": {"ops": {op: {"median_ms": ms} for op, ms in ops.items()}}}}
+
+    baseline = result(stats=10.0, search=1.0, export=100.0)
+    current = result(stats=13.0, search=1.9, export=120.0, navigate=50.0)
+    regressions = compare(baseline, current, tolerance=0.25, floor_ms=2.0)
+    assert [(r["op"], r["ratio"]) for r in regressions] == [("stats", 1.3)]
+    assert compare(baseline, current, tolerance=0.5) == []
+
+    # a machine twice as slow on the reference workload is not a regression
+    slow_machine = result(stats=20.0, search=2.0, export=200.0)
+    assert compare({**baseline, "reference_ms": 5.0}, {**slow_machine, "reference_ms": 10.0}) == []
+    slower = compare({**baseline, "reference_ms": 5.0}, {**result(stats=26.0), "reference_ms": 10.0})
+    assert [(r["op"], r["baseline_ms"], r["ratio"]) for r in slower] == [("stats", 20.0, 1.3)]
+
+
+@pytest.mark.slow
+def test_small_case_runs_every_operation(tmp_path):
+    result = run_case(tmp_path, "partial", 1000, repeat=1)
+    assert result["nodes"] == 1000 and set(result["ops"]) == set(OPERATIONS)
+    assert all(r["median_ms"] >= 0 for r in result["ops"].values())
+
+    # cascade_flags rolls back; the imported copy holds every complete path
+    db = tmp_path / "partial-1e3-s0.db"
+    assert sqlite3.connect(db).execute("SELECT COUNT(*) FROM node_red_flags").fetchone()[0] == 0
+    leaves = "SELECT COUNT(*) FROM nodes WHERE depth = 5"
+    imported = sqlite3.connect(tmp_path / "import-target.db")
+    assert imported.execute(leaves).fetchone()[0] == sqlite3.connect(db).execute(leaves).fetchone()[0] > 0
+
+
+def test_build_counts_match_database(tmp_path):
+    counts = build(str(tmp_path / "t.db"), "partial", 3000, seed=2)
+    conn = sqlite3.connect(tmp_path / "t.db")
+    assert conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0] == counts["nodes"] == 3000
+    assert conn.execute("SELECT COUNT(*) FROM triage").fetchone()[0] == counts["triage"]
+    assert conn.execute("SELECT COUNT(*) FROM change_journal").fetchone()[0] == 0
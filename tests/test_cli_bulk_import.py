@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from cli.commands import import_excel, fix_tree
+from core.constants import EXIT_SUCCESS, EXIT_IMPORT_ERROR
+from storage.sqlite import SQLiteRepository
+from storage.tree_fix import enforce_five
+
+CANON = ["Vital Measurement","Node 1","Node 2","Node 3","Node 4","Node 5","Diagnostic Triage","Actions"]
+
+@pytest.fixture
+def repo(tmp_path):
+    return SQLiteRepository(db_path=str(tmp_path / "cli.db"))
+
+def _count(repo, sql):
+    with repo._get_connection() as conn:
+        return conn.execute(sql).fetchone()[0]
+
+def _workbook(tmp_path, rows, name="wb.xlsx"):
+    path = tmp_path / name
+    pd.DataFrame(rows, columns=CANON).to_excel(path, index=False)
+    return str(path)
+
+def test_import_excel_reuses_repeated_labels(repo, tmp_path):
+    rows = [["Pulse", "High", "Fast", "A", "B", f"Leaf{i}", "Triage", "Act"] for i in range(3)]
+    rows.append(["Pulse", "Low", "", "", "", "", "", ""])
+    path = _workbook(tmp_path, rows)
+
+    assert import_excel(repo, path, "placeholder", jobs=1, chunk_size=2) == EXIT_SUCCESS
+    assert _count(repo, "SELECT COUNT(*) FROM nodes WHERE depth = 0") == 1
+    assert _count(repo, "SELECT COUNT(*) FROM nodes") == 1 + 2 + 1 + 1 + 1 + 3
+    assert _count(repo, "SELECT COUNT(*) FROM v_paths_complete") == 3
+
+    # Re-import is idempotent
+    assert import_excel(repo, path, "placeholder", jobs=2, chunk_size=2) == EXIT_SUCCESS
+    assert _count(repo, "SELECT COUNT(*) FROM nodes") == 9
+
+def test_import_excel_dry_run_writes_nothing(repo, tmp_path, capsys):
+    path = _workbook(tmp_path, [["Pulse", "High", "", "", "", "", "", ""]])
+    assert import_excel(repo, path, "placeholder", jobs=1, dry_run=True) == EXIT_SUCCESS
+    assert "Would create: 1 roots, 1 nodes" in capsys.readouterr().out
+    assert _count(repo, "SELECT COUNT(*) FROM nodes") == 0
+
+def test_import_excel_rejects_bad_header(repo, tmp_path):
+    path = tmp_path / "bad.xlsx"
+    pd.DataFrame([["x"]], columns=["Diagnosis"]).to_excel(path, index=False)
+    assert import_excel(repo, str(path), "placeholder", jobs=1) == EXIT_IMPORT_ERROR
+
+def test_enforce_five_placeholder_and_prune(repo):
+    root = repo.create_root_node("R")
+    a = repo.create_child_node(root, 1, "A", 1)
+    repo.create_child_node(a, 1, "B", 2)
+    conn = repo._get_connection()
+
+    pruned = enforce_five(conn, "prune", dry_run=True)
+    assert pruned["nodes_deleted"] == 2  # B, then A once it is childless
+    assert _count(repo, "SELECT COUNT(*) FROM nodes") == 3
+
+    assert fix_tree(repo, True, "placeholder") == EXIT_SUCCESS
+    assert _count(repo, "SELECT COUNT(*) FROM v_missing_slots") == 0
+    assert _count(repo, "SELECT COUNT(*) FROM nodes WHERE label = 'Option 2' AND depth = 1") == 1
+    conn.close()
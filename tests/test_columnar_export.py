@@ -0,0 +1,108 @@
+import io
+
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+from cli.commands import export_columnar
+from core.constants import CANON_HEADERS
+from core.exporters.columnar import NODE_COLUMNS, format_from_path, write_columnar
+from storage.sqlite import SQLiteRepository
+
+ROWS = [
+    ("Pulse", "High", "Fast", "A", "B", "C", "T1", "Act"),
+    ("Pulse", "High", "Fast", "A", "B", "D", "T2", "Act"),
+    ("BP", "Low", None, None, None, None, "", ""),
+]
+
+def test_parquet_round_trip_with_dictionary_labels():
+    buf = io.BytesIO()
+    assert write_columnar(iter(ROWS), buf, "parquet") == 3
+    table = pq.read_table(io.BytesIO(buf.getvalue()), read_dictionary=CANON_HEADERS)
+    assert table.column_names == CANON_HEADERS
+    assert pa.types.is_dictionary(table.schema.field("Vital Measurement").type)
+    assert table.to_pandas()["Node 5"].tolist()[:2] == ["C", "D"]
+
+def test_arrow_batches_extend_one_running_dictionary():
+    rows = [("Pulse", f"N{i % 7}", None, None, None, None, "", "") for i in range(50)]
+    buf = io.BytesIO()
+    write_columnar(iter(rows), buf, "arrow", batch_rows=8)
+    reader = pa_ipc.open_file(io.BytesIO(buf.getvalue()))
+    assert reader.num_record_batches == 7
+    table = reader.read_all()
+    assert table.num_rows == 50
+    assert table.column("Node 1").to_pylist() == [r[1] for r in rows]
+
+def test_arrow_dictionaries_grow_by_deltas_and_parquet_groups_stay_local():
+    rows = [("Pulse", f"N{i}", None, None, None, None, "", "") for i in range(24)]
+    buf = io.BytesIO()
+    write_columnar(iter(rows), buf, "arrow", batch_rows=8)
+    reader = pa_ipc.open_file(io.BytesIO(buf.getvalue()))
+    assert reader.read_all().column("Node 1").to_pylist() == [r[1] for r in rows]
+    assert reader.stats.num_dictionary_deltas == 2 and reader.stats.num_replaced_dictionaries == 0
+
+    buf = io.BytesIO()
+    write_columnar(iter(rows), buf, "parquet", batch_rows=8)
+    parquet = pq.ParquetFile(io.BytesIO(buf.getvalue()), read_dictionary=["Node 1"])
+    groups = [parquet.read_row_group(g).column("Node 1").chunk(0) for g in range(parquet.num_row_groups)]
+    assert [len(g.dictionary) for g in groups] == [8, 8, 8]
+
+def test_nodes_table_schema():
+    buf = io.BytesIO()
+    write_columnar(iter([(1, None, 0, 0, "Pulse", 0), (2, 1, 1, 1, "High", 1)]), buf, "parquet", table="nodes")
+    table = pq.read_table(io.BytesIO(buf.getvalue()))
+    assert table.column_names == NODE_COLUMNS
+    assert table.schema.field("depth").type == pa.int8()
+    assert table.column("is_leaf").to_pylist() == [False, True]
+
+def test_format_from_path():
+    assert format_from_path("x.PARQUET") == "parquet"
+    assert format_from_path("x.feather") == "arrow"
+    assert format_from_path("x.csv") is None
+
+def test_api_export_streams_paths_and_nodes(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_DB", str(tmp_path / "columnar.db"))
+    from fastapi.testclient import TestClient
+    from api.app import app
+    from api.db import get_conn, ensure_schema
+    from api.repositories.tree_repo import import_dataframe
+
+    conn = get_conn()
+    ensure_schema(conn)
+    import_dataframe(conn, pd.DataFrame([list(r) for r in ROWS], columns=CANON_HEADERS))
+    conn.close()
+
+    client = TestClient(app)
+    r = client.get("/api/v1/tree/export.parquet")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/vnd.apache.parquet"
+    df = pq.read_table(io.BytesIO(r.content)).to_pandas()
+    assert sorted(df["Node 5"].dropna()) == ["C", "D"]
+
+    r = client.get("/api/v1/tree/export.arrow", params={"table": "nodes"})
+    assert r.status_code == 200
+    nodes = pa_ipc.open_file(io.BytesIO(r.content)).read_all()
+    assert nodes.column_names == NODE_COLUMNS
+    assert nodes.num_rows == 9
+
+    assert client.get("/api/v1/tree/export.arrow", params={"table": "bogus"}).status_code == 422
+
+def test_cli_export_infers_format(tmp_path):
+    repo = SQLiteRepository(db_path=str(tmp_path / "cli.db"))
+    node = repo.create_root_node("Pulse")
+    for depth in range(1, 6):
+        node = repo.create_child_node(node, 1, f"L{depth}", depth)
+
+    out = tmp_path / "paths.parquet"
+    assert export_columnar(repo, str(out)) == 0
+    assert pq.read_table(out).to_pandas()["Node 5"].tolist() == ["L5"]
+
+    out = tmp_path / "nodes.arrow"
+    assert export_columnar(repo, str(out), table="nodes") == 0
+    nodes = pa_ipc.open_file(str(out)).read_all()
+    assert nodes.column("is_leaf").to_pylist() == [False] * 5 + [True]
+
+    assert export_columnar(repo, str(tmp_path / "out.bin")) != 0
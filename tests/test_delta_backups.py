@@ -0,0 +1,161 @@
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+from storage.backup import backup_database, restore_database
+from storage.journal import (
+    delta_base, export_delta, journal_timeline, parse_delta_filename, read_delta, trim_journal,
+)
+from storage.sqlite import SQLiteRepository
+
+def _state(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        nodes = conn.execute("SELECT id, parent_id, depth, slot, label, is_leaf FROM nodes ORDER BY id").fetchall()
+        triage = conn.execute("SELECT node_id, diagnostic_triage, actions FROM triage ORDER BY node_id").fetchall()
+        flags = conn.execute("SELECT node_id, red_flag_id FROM node_red_flags ORDER BY 1, 2").fetchall()
+    finally:
+        conn.close()
+    return nodes, triage, flags
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SQLiteRepository(db_path=str(tmp_path / "app.db"))
+    node = repo.create_root_node("Pulse")
+    for depth in range(1, 6):
+        node = repo.create_child_node(node, 1, f"L{depth}", depth)
+    repo.leaf_id = node
+    return repo
+
+def _journal(repo):
+    with repo._get_connection() as conn:
+        return [tuple(r) for r in conn.execute("SELECT tbl, op FROM change_journal ORDER BY seq")]
+
+def test_journal_skips_touch_trigger_updates(repo):
+    assert _journal(repo) == [("nodes", "I")] * 6
+    with repo._get_connection() as conn:
+        conn.execute("UPDATE nodes SET label = 'L1b' WHERE depth = 1")
+        conn.execute("DELETE FROM nodes WHERE depth = 5")
+    assert _journal(repo)[6:] == [("nodes", "U"), ("nodes", "D")]
+
+def test_base_plus_deltas_reproduces_live_state(repo, tmp_path):
+    backups = tmp_path / "backups"
+    with pytest.raises(ValueError, match="full backup"):
+        export_delta(repo._db_path, str(backups))
+
+    base = backup_database(repo._db_path, str(backups / "base.db.gz"), compression="gzip")
+    assert base["journal_seq"] == 6
+    assert _journal(repo) == []  # pruned: captured by the base
+    assert export_delta(repo._db_path, str(backups))["path"] is None
+
+    with repo._get_connection() as conn:
+        conn.execute("INSERT INTO triage (node_id, diagnostic_triage, actions) VALUES (?, 'T', 'A')", (repo.leaf_id,))
+        conn.execute("INSERT INTO red_flags (id, name) VALUES (1, 'Bleeding')")
+        conn.execute("INSERT INTO node_red_flags (node_id, red_flag_id) VALUES (?, 1)", (repo.leaf_id,))
+    first = export_delta(repo._db_path, str(backups))
+    assert (first["seq_from"], first["seq_to"], first["entries"]) == (7, 9, 3)
+
+    root = repo.create_root_node("BP")
+    repo.create_child_node(root, 2, "High", 1)
+    with repo._get_connection() as conn:
+        conn.execute("UPDATE triage SET actions = 'A2' WHERE node_id = ?", (repo.leaf_id,))
+        conn.execute("DELETE FROM nodes WHERE label = 'L4'")  # cascades to L5, triage, flag link
+    second = export_delta(repo._db_path, str(backups))
+    header, rows = read_delta(second["path"])
+    assert header["seq_from"] == 10 and len(list(rows)) == second["entries"]
+
+    target = tmp_path / "restored.db"
+    SQLiteRepository(db_path=str(target))
+    out = restore_database(base["path"], str(target), deltas=[second["path"], first["path"]])
+    assert out["deltas"]["deltas_applied"] == 2
+    assert _state(target) == _state(repo._db_path)
+
+def test_later_full_backup_keeps_older_chains(repo, tmp_path):
+    backups = tmp_path / "backups"
+    old_base = backup_database(repo._db_path, str(backups / "old.db"))
+    repo.create_root_node("BP")
+    first = export_delta(repo._db_path, str(backups))
+    repo.create_root_node("HR")
+    backup_database(repo._db_path, str(backups / "new.db"))
+    backup_database(repo._db_path, str(backups / "pre_restore.db"), checkpoint=False)
+    assert _journal(repo) == [("nodes", "I")]  # still needed by the old base's chain
+
+    repo.create_root_node("RR")
+    second = export_delta(repo._db_path, str(backups))
+    assert second["seq_from"] == first["seq_to"] + 1 and second["entries"] == 2
+    target = tmp_path / "restored.db"
+    SQLiteRepository(db_path=str(target))
+    restore_database(old_base["path"], str(target), deltas=[first["path"], second["path"]])
+    assert _state(target) == _state(repo._db_path)
+
+def test_trimmed_journal_needs_a_new_full_backup(repo, tmp_path):
+    backups = tmp_path / "backups"
+    backup_database(repo._db_path, str(backups / "base.db"))
+    for label in ("BP", "HR", "RR"):
+        repo.create_root_node(label)
+    with repo._get_connection() as conn:
+        assert trim_journal(conn, 2) == 1
+        assert delta_base(conn) is None
+    with pytest.raises(ValueError, match="full backup"):
+        export_delta(repo._db_path, str(backups))
+
+    fresh = backup_database(repo._db_path, str(backups / "fresh.db"))
+    repo.create_root_node("SpO2")
+    assert export_delta(repo._db_path, str(backups))["seq_from"] == fresh["journal_seq"] + 1
+
+def test_restore_starts_new_timeline(repo, tmp_path):
+    backups = tmp_path / "backups"
+    base = backup_database(repo._db_path, str(backups / "base.db"))
+    repo.create_root_node("BP")
+    old_delta = export_delta(repo._db_path, str(backups))
+
+    with repo._get_connection() as conn:
+        before = journal_timeline(conn)
+    restore_database(base["path"], repo._db_path)
+    with repo._get_connection() as conn:
+        assert journal_timeline(conn) != before
+    assert parse_delta_filename(old_delta["path"])[0] == before
+    # Old-timeline deltas are ignored, and a new delta needs a new full backup
+    with pytest.raises(ValueError, match="full backup"):
+        export_delta(repo._db_path, str(backups))
+
+def test_delta_endpoints(repo, tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_DB_PATH", repo._db_path)
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    client = TestClient(app)
+    assert client.post("/api/v1/backup/delta").status_code == 409
+    assert client.post("/api/v1/backup", params={"wait": "true"}).json()["ok"]
+    repo.create_root_node("BP")
+    delta = client.post("/api/v1/backup/delta").json()
+    assert delta["entries"] == 1 and delta["path"].endswith(".jsonl.gz")
+    assert client.get("/api/v1/backup/status").json()["deltas"][0]["seq_to"] == delta["seq_to"]
+
+    with repo._get_connection() as conn:
+        conn.execute("DELETE FROM nodes")
+    body = client.post("/api/v1/restore", params={"with_deltas": "true"}).json()
+    assert body["deltas"]["entries"] == 1
+    assert sorted(r[4] for r in _state(repo._db_path)[0] if r[2] == 0) == ["BP", "Pulse"]
+
+def test_delta_with_unknown_column_is_rejected(repo, tmp_path):
+    backups = tmp_path / "backups"
+    base = backup_database(repo._db_path, str(backups / "base.db"))
+    repo.create_root_node("BP")
+    delta = export_delta(repo._db_path, str(backups))["path"]
+
+    with gzip.open(delta, "rt") as fh:
+        header, entry = fh.read().splitlines()
+    seq, tbl, op, key, data = json.loads(entry)
+    data["label) VALUES ('x'); DROP TABLE triage; --"] = 1
+    with gzip.open(delta, "wt") as fh:
+        fh.write(header + "\n" + json.dumps([seq, tbl, op, key, data]) + "\n")
+
+    target = tmp_path / "restored.db"
+    SQLiteRepository(db_path=str(target))
+    before = _state(target)
+    with pytest.raises(ValueError, match="Unknown columns for nodes"):
+        restore_database(base["path"], str(target), deltas=[delta])
+    assert _state(target) == before
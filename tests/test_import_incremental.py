@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from api.db import get_conn, ensure_schema
+from api.repositories.tree_repo import import_dataframe_incremental
+
+CANON = ["Vital Measurement","Node 1","Node 2","Node 3","Node 4","Node 5","Diagnostic Triage","Actions"]
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_DB", str(tmp_path / "incr.db"))
+    c = get_conn()
+    ensure_schema(c)
+    yield c
+    c.close()
+
+def _df(rows):
+    return pd.DataFrame(rows, columns=CANON)
+
+def _labels(conn):
+    return sorted(r[0] for r in conn.execute("SELECT label FROM nodes"))
+
+def test_second_identical_import_skips_every_row(conn):
+    rows = [["Pulse","High","Fast","","","","T1","A1"], ["Pulse","Low","","","","","T2","A2"]]
+    first = import_dataframe_incremental(conn, _df(rows))
+    assert first["incremental"]["inserted"] == 2
+
+    second = import_dataframe_incremental(conn, _df(rows))
+    assert second["incremental"] == {"inserted": 0, "changed": 0, "unchanged": 2, "removed": 0, "nodes_removed": 0}
+    assert second["skipped"]["unchanged_rows"] == 2
+    assert second["rows_processed"] == 0
+
+def test_changed_and_removed_paths_are_applied(conn):
+    import_dataframe_incremental(conn, _df([
+        ["Pulse","High","Fast","","","","T1","A1"],
+        ["Pulse","Low","Slow","","","","T2","A2"],
+    ]))
+    out = import_dataframe_incremental(conn, _df([
+        ["Pulse","High","Fast","","","","T1 revised","A1"],
+        ["BP","Low","","","","","",""],
+    ]))
+    inc = out["incremental"]
+    assert (inc["inserted"], inc["changed"], inc["unchanged"], inc["removed"]) == (1, 1, 0, 1)
+    # Pulse > Low > Slow vanished; its now-childless ancestors below the root are pruned
+    assert inc["nodes_removed"] == 2
+    assert _labels(conn) == ["BP", "Fast", "High", "Low", "Pulse"]
+    triage = conn.execute(
+        "SELECT o.diagnostic_triage FROM outcomes o JOIN nodes n ON n.id=o.node_id WHERE n.label='Fast'"
+    ).fetchone()[0]
+    assert triage == "T1 revised"
+
+def test_removed_path_keeps_nodes_shared_with_other_paths(conn):
+    import_dataframe_incremental(conn, _df([
+        ["Pulse","High","","","","","T0",""],
+        ["Pulse","High","Fast","","","","T1",""],
+    ]))
+    out = import_dataframe_incremental(conn, _df([["Pulse","High","","","","","T0",""]]))
+    assert out["incremental"]["removed"] == 1
+    assert out["incremental"]["nodes_removed"] == 1
+    assert _labels(conn) == ["High", "Pulse"]
+
+def test_deleted_leaf_is_reapplied(conn):
+    rows = [["Pulse","High","","","","","T",""]]
+    import_dataframe_incremental(conn, _df(rows))
+    conn.execute("DELETE FROM outcomes")
+    conn.execute("DELETE FROM nodes WHERE label='High'")
+    out = import_dataframe_incremental(conn, _df(rows))
+    assert out["incremental"]["changed"] == 1
+    assert "High" in _labels(conn)
+
+def test_removed_path_keeps_hand_made_nodes(conn):
+    # Pulse > High was made by hand; the import only adds Fast below it
+    root = conn.execute("INSERT INTO nodes(parent_id,label,depth,slot) VALUES (NULL,'Pulse',0,NULL)").lastrowid
+    conn.execute("INSERT INTO nodes(parent_id,label,depth,slot) VALUES (?,'High',1,1)", (root,))
+    import_dataframe_incremental(conn, _df([["Pulse","High","Fast","","","","T1",""]]))
+
+    out = import_dataframe_incremental(conn, _df([["BP","Low","","","","","",""]]))
+    assert out["incremental"]["removed"] == 1 and out["incremental"]["nodes_removed"] == 1
+    assert _labels(conn) == ["BP", "High", "Low", "Pulse"]
@@ -0,0 +1,87 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from core.importers.stream_import import PathRecordDecoder, StreamFormatError
+
+CANON = ["Vital Measurement","Node 1","Node 2","Node 3","Node 4","Node 5","Diagnostic Triage","Actions"]
+HEADER = ",".join(CANON) + "\n"
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_DB", str(tmp_path / "stream.db"))
+    from api.app import app
+    return TestClient(app)
+
+def _feed_bytewise(decoder, data: bytes):
+    out = []
+    for i in range(len(data)):
+        out.extend(decoder.feed(data[i:i + 1]))
+    out.extend(decoder.close())
+    return out
+
+def test_csv_decoder_handles_split_chunks_and_quoted_newlines():
+    body = (HEADER + 'Pulse,High,"A\nB",,,,"X, y",Act\nBP,Low,C,,,,,\n').encode("utf-8")
+    records = _feed_bytewise(PathRecordDecoder("csv"), body)
+    assert [r["Vital Measurement"] for r in records] == ["Pulse", "BP"]
+    assert records[0]["Node 2"] == "A\nB"
+    assert records[0]["Diagnostic Triage"] == "X, y"
+
+def test_csv_decoder_rejects_bad_header():
+    with pytest.raises(StreamFormatError) as exc:
+        PathRecordDecoder("csv").feed(b"Diagnosis,Node 1\n")
+    assert exc.value.args[0]["col_index"] == 0
+
+def test_ndjson_decoder_accepts_objects_and_arrays():
+    lines = [
+        json.dumps({"Vital Measurement": "Pulse", "Node 1": "High"}),
+        json.dumps(["BP", "Low", "", "", "", "", "T", "A"]),
+    ]
+    records = _feed_bytewise(PathRecordDecoder("ndjson"), ("\n".join(lines)).encode())
+    assert records[0]["Node 1"] == "High" and records[0]["Node 2"] is None
+    assert records[1]["Actions"] == "A"
+
+def test_stream_endpoint_imports_csv_in_batches(client):
+    rows = "".join(f"VM{i % 3},N1-{i},N2,,,,T,A\n" for i in range(10))
+    r = client.post("/api/v1/import/stream?batch_size=4", content=(HEADER + rows).encode(),
+                    headers={"Content-Type": "text/csv"})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["rows"] == 10
+    assert body["batches"] == 3
+    assert body["result"]["rows_processed"] == 10
+    roots = client.get("/api/v1/tree/root-options").json()["items"]
+    assert sorted(roots) == ["VM0", "VM1", "VM2"]
+
+def test_stream_endpoint_ndjson_and_422_ctx(client):
+    ok = client.post("/api/v1/import/stream?format=ndjson",
+                     content=json.dumps({"Vital Measurement": "Pulse", "Node 1": "High"}).encode())
+    assert ok.status_code == 200, ok.text
+
+    bad = client.post("/api/v1/import/stream", content=b"Wrong,Header\n",
+                      headers={"Content-Type": "text/csv"})
+    assert bad.status_code == 422
+    detail = bad.json()["detail"][0]
+    assert detail["type"] == "value_error.stream_record"
+    assert detail["ctx"]["rows_committed"] == 0
+
+def test_stream_endpoint_requires_format(client):
+    r = client.post("/api/v1/import/stream", content=b"x", headers={"Content-Type": "application/octet-stream"})
+    assert r.status_code == 415
+
+def test_stream_replace_is_atomic(client):
+    seed = HEADER + "Old,A,,,,,,\n"
+    assert client.post("/api/v1/import/stream", content=seed.encode(), headers={"Content-Type": "text/csv"}).status_code == 200
+
+    # the bad row sits past the first committed-size batch; nothing may be cleared
+    broken = HEADER + "".join(f"New{i},A,,,,,,\n" for i in range(5)) + "Bad,row\n"
+    r = client.post("/api/v1/import/stream?mode=replace&batch_size=2", content=broken.encode(),
+                    headers={"Content-Type": "text/csv"})
+    assert r.status_code == 422 and r.json()["detail"][0]["ctx"]["rows_committed"] == 0
+    assert client.get("/api/v1/tree/root-options").json()["items"] == ["Old"]
+
+    fresh = HEADER + "".join(f"New{i},A,,,,,,\n" for i in range(5))
+    r = client.post("/api/v1/import/stream?mode=replace&batch_size=2", content=fresh.encode(),
+                    headers={"Content-Type": "text/csv"})
+    assert r.status_code == 200 and r.json()["batches"] == 3 and r.json()["result"]["rows_processed"] == 5
+    assert sorted(client.get("/api/v1/tree/root-options").json()["items"]) == [f"New{i}" for i in range(5)]
@@ -0,0 +1,115 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from storage import querystats
+from storage.index_advisor import IndexAdvisor
+from storage.sqlite import SQLiteRepository
+
+LOOKUP = "SELECT id FROM nodes WHERE parent_id=? AND label=? AND depth=?"
+ROOT_BY_LABEL = "SELECT id FROM nodes WHERE depth = 0 AND LOWER(label) = LOWER(?)"
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.delenv("LORIEN_SLOW_QUERY_MS", raising=False)
+    monkeypatch.setenv("LORIEN_SLOW_QUERY_DB", str(tmp_path / "slow.db"))
+    monkeypatch.setenv("LORIEN_DB_PATH", str(tmp_path / "app.db"))
+    querystats.reset()
+    path = str(tmp_path / "app.db")
+    SQLiteRepository(db_path=path)
+    rows, nid = [], 0
+    for r in range(300):
+        nid += 1
+        root = nid
+        rows.append((nid, None, 0, 0, f"Root {r}"))
+        for slot in range(1, 6):
+            nid += 1
+            rows.append((nid, root, 1, slot, f"Child {slot}"))
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO nodes (id, parent_id, depth, slot, label) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_recommends_indexes_for_the_workload_and_leaves_the_live_db_alone(db):
+    report = IndexAdvisor().run(db, [LOOKUP, ROOT_BY_LABEL])
+    assert report["statements"] == 2 and not report["skipped"]
+
+    by_statement = {s["sql"]: r for r in report["recommendations"] for s in r["statements"]}
+    lookup = by_statement[LOOKUP]
+    assert set(lookup["columns"]) == {"parent_id", "label", "depth"}
+    assert any(lookup["name"] in d for d in next(s for s in lookup["statements"] if s["sql"] == LOOKUP)["plan_after"])
+    assert any(r["columns"][0] == "LOWER(label)" for r in report["recommendations"])
+    assert all(r["write_cost_us_per_row"] is not None for r in report["recommendations"])
+
+    dropped = {d["name"]: d for d in report["drop"]}
+    assert dropped["idx_node_red_flags_node"]["reason"].startswith("redundant")
+    assert dropped["idx_node_red_flags_node"]["in_schema"]
+    # unused, but serving FK checks/cascades: nodes.parent_id, node_red_flags.red_flag_id
+    assert not {"idx_nodes_parent_depth", "idx_nodes_parent_slot", "idx_node_red_flags_flag"} & set(dropped)
+
+    live = {r[0] for r in sqlite3.connect(db).execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert not any(r["name"] in live for r in report["recommendations"])
+
+
+def test_traced_workload_is_replayed(db, monkeypatch):
+    monkeypatch.setenv("LORIEN_SQL_TRACE", "true")
+    queries = querystats.RequestQueries("/tree")
+    token = querystats.current_queries.set(queries)
+    try:
+        conn = querystats.connect(db)
+        for i in range(3):
+            conn.execute(LOOKUP, (1, f"Child {i + 1}", 1)).fetchall()
+    finally:
+        querystats.current_queries.reset(token)
+    querystats.finish(queries, "GET")
+
+    report = IndexAdvisor().run(db)
+    lookup = next(s for r in report["recommendations"] for s in r["statements"] if s["sql"] == LOOKUP)
+    assert lookup["calls"] == 3
+
+
+def test_apply_endpoint_creates_recommended_index_and_refuses_schema_drops(db):
+    from api.app import app
+    client = TestClient(app)
+    r = client.post("/api/v1/admin/performance/index-advisor", params={"wait": "true"}, json={"statements": [LOOKUP]})
+    assert r.status_code == 200
+    report = r.json()
+    name = report["recommendations"][0]["name"]
+    r = client.post("/api/v1/admin/performance/index-advisor/apply", params={"name": name})
+    assert r.status_code == 200 and r.json()["action"] == "create"
+    assert sqlite3.connect(db).execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+
+    assert client.post("/api/v1/admin/performance/index-advisor/apply", params={"name": name}).status_code == 404
+    schema_drop = next(d["name"] for d in report["drop"] if d["in_schema"])
+    assert client.post("/api/v1/admin/performance/index-advisor/apply",
+                       params={"name": schema_drop}).status_code == 409
+
+
+def test_trigger_lookups_keep_their_index(db):
+    conn = sqlite3.connect(db)
+    conn.executescript("""
+        CREATE INDEX idx_nodes_updated_at ON nodes(updated_at);
+        CREATE TRIGGER tr_test_lookup AFTER DELETE ON triage BEGIN
+          SELECT COUNT(*) FROM nodes WHERE updated_at = OLD.updated_at;
+        END;
+    """)
+    conn.close()
+    dropped = {d["name"] for d in IndexAdvisor().run(db, [LOOKUP])["drop"]}
+    assert "idx_nodes_label" in dropped and "idx_nodes_updated_at" not in dropped
+
+
+def test_advisor_runs_as_a_background_job(db):
+    from api.app import app
+    client = TestClient(app)
+    r = client.post("/api/v1/admin/performance/index-advisor", json={"statements": [LOOKUP]})
+    assert r.status_code == 202 and r.json()["state"] in ("queued", "running", "completed")
+    job_id = r.json()["job_id"]
+    from storage.index_advisor import index_advisor
+    assert index_advisor.job(job_id).done.wait(30)
+    job = client.get(f"/api/v1/admin/performance/index-advisor/jobs/{job_id}").json()
+    assert job["state"] == "completed" and job["report"]["statements"] >= 1
+    assert client.get("/api/v1/admin/performance/index-advisor/jobs/nope").status_code == 404
@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+
+from storage.backup import backup_database, restore_database
+from storage.integrity import IntegrityScanner, cached_results, run_foreign_key_check, summarize
+from storage.sqlite import SQLiteRepository
+
+def _repo(tmp_path):
+    repo = SQLiteRepository(db_path=str(tmp_path / "app.db"))
+    root = repo.create_root_node("Pulse")
+    repo.create_child_node(root, 1, "High", 1)
+    return repo
+
+def test_scans_are_persisted_with_age(tmp_path):
+    repo = _repo(tmp_path)
+    assert summarize(cached_results(repo.db_path))["ok"] is None
+
+    scanner = IntegrityScanner()
+    scanner.attach(repo.db_path)
+    assert scanner.due() == ["quick", "full", "foreign_keys"]
+    for kind in ("quick", "full", "foreign_keys"):
+        assert scanner.scan(kind)["ok"]
+
+    cached = cached_results(repo.db_path)
+    assert cached["foreign_keys"]["tables_checked"] > 4
+    assert all(0 <= r["age_seconds"] < 60 for r in cached.values())
+    assert scanner.due() == []
+    # A fresh scanner (e.g. after a restart) sees the stored results
+    fresh = IntegrityScanner()
+    fresh.attach(repo.db_path)
+    fresh.every["quick"] = 0
+    assert fresh.due() == ["quick"]
+
+def test_concurrent_triggers_share_one_scan(tmp_path, monkeypatch):
+    repo = _repo(tmp_path)
+    scanner = IntegrityScanner()
+    scanner.attach(repo.db_path)
+    release, runs = threading.Event(), []
+
+    def _slow_quick_check(conn):
+        runs.append(1)
+        release.wait(5)
+        return {"ok": True, "errors": []}
+
+    monkeypatch.setattr("storage.integrity.run_quick_check", _slow_quick_check)
+    events = []
+    callers = [threading.Thread(target=lambda: events.append(scanner.trigger("quick"))) for _ in range(8)]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join()
+    assert len({id(e) for e in events}) == 1 and scanner.in_progress() == ["quick"]
+    release.set()
+    assert events[0].wait(5) and runs == [1]
+
+def test_foreign_key_check_reports_per_table(tmp_path):
+    repo = _repo(tmp_path)
+    conn = sqlite3.connect(repo.db_path)  # foreign_keys off: orphan slips in
+    conn.execute("INSERT INTO triage (node_id, diagnostic_triage, actions) VALUES (999, 'T', 'A')")
+    conn.commit()
+    out = run_foreign_key_check(conn)
+    conn.close()
+    assert not out["ok"] and out["violations"] == {"triage": 1}
+    assert out["errors"][0]["parent"] == "nodes"
+
+def test_restore_replaces_cached_results(tmp_path):
+    repo = _repo(tmp_path)
+    base = backup_database(repo.db_path, str(tmp_path / "base.db"))
+    scanner = IntegrityScanner()
+    scanner.attach(repo.db_path)
+    scanner.scan("full")
+
+    restore_database(base["path"], repo.db_path)
+    cached = cached_results(repo.db_path)
+    assert cached["full"] is None and cached["quick"]["ok"]
+
+def test_integrity_endpoints_answer_from_cache(tmp_path, monkeypatch):
+    repo = _repo(tmp_path)
+    monkeypatch.setenv("LORIEN_DB_PATH", repo.db_path)
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    client = TestClient(app)
+    body = client.get("/api/v1/health/integrity").json()
+    assert body["results"]["quick"] is None and body["summary"]["ok"] is None
+
+    r = client.post("/api/v1/health/integrity/scan", params={"kind": "foreign_keys", "wait": "true"})
+    assert r.status_code == 202 and r.json()["result"]["ok"]
+    assert client.post("/api/v1/health/integrity/scan", params={"kind": "bogus"}).status_code == 422
+
+    integrity = client.get("/api/v1/health").json()["db"]["integrity"]
+    assert integrity["ok"] is True and "foreign_keys" in integrity["age_seconds"]
@@ -0,0 +1,120 @@
+import sqlite3
+
+from storage.maintenance import (
+    MaintenanceConfig, MaintenanceScheduler, collect_metrics, run_incremental_vacuum,
+)
+from storage.sqlite import SQLiteRepository
+
+def _bloat(path, rows=3000):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("CREATE TABLE scratch (v TEXT)")
+    conn.executemany("INSERT INTO scratch VALUES (?)", [("x" * 400,)] * rows)
+    conn.execute("DELETE FROM scratch")
+    return conn
+
+def _scheduler(db_path, **settings):
+    config = MaintenanceConfig()
+    config.update(**{"quiet_seconds": 0, "vacuum_min_free_pages": 1, "vacuum_step_sleep": 0, **settings})
+    scheduler = MaintenanceScheduler(config)
+    scheduler.attach(db_path)
+    return scheduler
+
+def test_new_databases_use_incremental_auto_vacuum(tmp_path):
+    repo = SQLiteRepository(db_path=str(tmp_path / "app.db"))
+    metrics = collect_metrics(repo.db_path)
+    assert metrics["auto_vacuum"] == "incremental" and metrics["journal_mode"] == "wal"
+
+def test_incremental_vacuum_is_bounded(tmp_path):
+    path = str(tmp_path / "app.db")
+    SQLiteRepository(db_path=path)
+    conn = _bloat(path)
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    assert free > 100
+
+    out = run_incremental_vacuum(conn, pages_per_step=10, max_steps=3, step_sleep=0)
+    assert out == {"pages_freed": 30, "steps": 3, "freelist_count": free - 30, "interrupted": False}
+    conn.close()
+
+def test_vacuum_stops_when_another_writer_commits(tmp_path, monkeypatch):
+    path = str(tmp_path / "app.db")
+    repo = SQLiteRepository(db_path=path)
+    conn = _bloat(path)
+    calls = []
+
+    def _sleep_and_write(_):
+        calls.append(1)
+        repo.create_root_node(f"R{len(calls)}")
+
+    monkeypatch.setattr("storage.maintenance.time.sleep", _sleep_and_write)
+    out = run_incremental_vacuum(conn, pages_per_step=5, max_steps=10, step_sleep=1)
+    conn.close()
+    assert out["steps"] == 1 and out["interrupted"]
+
+def test_tick_runs_due_tasks_only_when_quiet(tmp_path):
+    path = str(tmp_path / "app.db")
+    SQLiteRepository(db_path=path)
+    _bloat(path).close()
+    assert collect_metrics(path)["wal_size_bytes"] > 0
+
+    busy = _scheduler(path, quiet_seconds=3600)
+    assert set(busy.tick()) == {"optimize"}
+
+    scheduler = _scheduler(path)
+    ran = scheduler.tick()
+    assert set(ran) == {"optimize", "analyze", "checkpoint", "vacuum"}
+    assert ran["checkpoint"]["busy"] is False
+    metrics = scheduler.status()["metrics"]
+    assert metrics["wal_size_bytes"] == 0 and metrics["checkpoint_lag_frames"] == 0
+    assert metrics["freelist_count"] < 300
+    # optimize/analyze are periodic; checkpoint has nothing left to do
+    assert "checkpoint" not in scheduler.tick() and "analyze" not in scheduler.tick()
+
+def test_maintenance_endpoints(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("LORIEN_DB_PATH", str(db_path))
+    SQLiteRepository(db_path=str(db_path)).create_root_node("Pulse")
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    client = TestClient(app)
+    status = client.get("/api/v1/admin/performance/maintenance").json()
+    assert status["db_path"] == str(db_path)
+    assert {"wal_size_bytes", "checkpoint_lag_frames", "freelist_count"} <= set(status["metrics"])
+
+    r = client.post("/api/v1/admin/performance/maintenance/run", params={"task": "checkpoint"})
+    assert r.status_code == 200 and r.json()["result"]["lag_frames"] == 0
+    assert client.post("/api/v1/admin/performance/maintenance/run", params={"task": "nope"}).status_code == 422
+
+    r = client.put("/api/v1/admin/performance/maintenance", json={"enabled": False, "quiet_seconds": 5})
+    assert r.json()["config"]["quiet_seconds"] == 5.0
+    assert client.put("/api/v1/admin/performance/maintenance", json={"interval": 0}).status_code == 422
+    assert "maintenance" in client.get("/api/v1/admin/performance/health").json()
+
+def test_journal_is_capped_when_no_backups_run(tmp_path):
+    repo = SQLiteRepository(db_path=str(tmp_path / "app.db"))
+    for label in ("Pulse", "BP", "HR", "RR"):
+        repo.create_root_node(label)
+    scheduler = _scheduler(repo.db_path, journal_max_rows=3)
+    assert scheduler.tick()["journal"] == {"trimmed": 1, "max_rows": 3}
+    assert "journal" not in scheduler.tick()
+
+def test_analyze_is_not_repeated_on_every_boot(tmp_path):
+    path = str(tmp_path / "app.db")
+    SQLiteRepository(db_path=path)
+    assert "analyze" in _scheduler(path).tick()
+    # statistics exist now; a restarted scheduler waits analyze_every
+    assert "analyze" not in _scheduler(path).tick()
+
+def test_failed_task_backs_off_instead_of_counting_as_run(tmp_path, monkeypatch):
+    path = str(tmp_path / "app.db")
+    SQLiteRepository(db_path=path)
+    scheduler = _scheduler(path)
+
+    def _broken(conn):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr("storage.maintenance.run_optimize", _broken)
+    assert "optimize" not in scheduler.tick()
+    assert scheduler.tasks["optimize"]["errors"] == 1 and "optimize" not in scheduler._last_run
+    assert not scheduler.due("optimize")
+    assert scheduler.due("optimize", now=scheduler._retry_at["optimize"])
@@ -0,0 +1,106 @@
+import os
+import random
+import shutil
+import threading
+import time
+
+import pytest
+
+from api import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics(monkeypatch):
+    monkeypatch.delenv("LORIEN_METRICS_DIR", raising=False)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_percentiles_within_bucket_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1) for _ in range(20000)]
+    for v in values:
+        metrics.record_response_time("/r", v)
+    stats = metrics.snapshot()["response_times"]["/r"]
+    exact = sorted(values)
+    for name, q in metrics.PERCENTILES:
+        want = exact[int(len(exact) * q)]
+        assert abs(stats[name] - want) / want < 0.1, (name, stats[name], want)
+    assert stats["count"] == 20000 and stats["max"] == max(values)
+
+
+def test_concurrent_threads_lose_no_updates():
+    def work():
+        for _ in range(5000):
+            metrics.increment_route_hit("/hot")
+            metrics.increment_status_code(200)
+            metrics.record_response_time("/hot", 1.0)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    snap = metrics.snapshot()
+    assert snap["route_hits"]["/hot"] == 40000
+    assert snap["status_codes"][200] == 40000
+    assert snap["response_times"]["/hot"]["count"] == 40000
+
+
+def test_worker_files_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_METRICS_DIR", str(tmp_path))
+    metrics.increment_route_hit("/a")
+    metrics.record_response_time("/a", 10.0)
+    # pretend another (live) worker wrote the same totals
+    os.replace(metrics.flush(), tmp_path / f"lorien_metrics_{os.getppid()}.json")
+    metrics.increment_route_hit("/a")
+    metrics.increment_import_success()
+
+    snap = metrics.snapshot()
+    assert snap["processes"] == 2
+    assert snap["route_hits"]["/a"] == 3
+    assert snap["response_times"]["/a"]["count"] == 2  # one local, one from the file
+    assert snap["import_success"] == 1
+
+
+def test_files_of_gone_workers_are_dropped(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_METRICS_DIR", str(tmp_path))
+    metrics.increment_route_hit("/a")
+    written = metrics.flush()
+    dead = tmp_path / "lorien_metrics_999999999.json"
+    silent = tmp_path / f"lorien_metrics_{os.getppid()}.json"
+    shutil.copy(written, dead)
+    shutil.copy(written, silent)
+    old = time.time() - metrics.STALE_FLUSHES * metrics.flush_interval() - 1
+    os.utime(silent, (old, old))
+
+    snap = metrics.snapshot()
+    assert snap["processes"] == 1 and snap["route_hits"]["/a"] == 1
+    assert not dead.exists() and not silent.exists() and os.path.exists(written)
+
+
+def test_prometheus_exposition():
+    metrics.increment_route_hit('/tree/"x"')
+    metrics.increment_status_code(409)
+    metrics.record_response_time("/tree", 3.0)
+    text = metrics.prometheus_text()
+    assert 'lorien_route_hits_total{route="/tree/\\"x\\""} 1' in text
+    assert 'lorien_http_responses_total{code="409"} 1' in text
+    assert 'lorien_request_duration_seconds_bucket{route="/tree",le="+Inf"} 1' in text
+    assert 'lorien_request_duration_seconds_count{route="/tree"} 1' in text
+    buckets = [line for line in text.splitlines() if line.startswith('lorien_request_duration_seconds_bucket')]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts) and counts[-1] == 1
+
+
+def test_route_label_is_the_normalized_path(monkeypatch):
+    from fastapi.testclient import TestClient
+    from api.app import app
+    monkeypatch.setenv("ANALYTICS_ENABLED", "true")
+    client = TestClient(app)
+    for node_id in (1, 2, 3):
+        client.get(f"/api/v1/node/{node_id}")
+    hits = metrics.snapshot()["route_hits"]
+    assert hits.get("/api/v1/node/{id}") == 3
+    assert not any(route.endswith(("/1", "/2", "/3")) for route in hits)
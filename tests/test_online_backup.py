@@ -0,0 +1,198 @@
+import gzip
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+from storage.backup import (
+    BackupJobRegistry, backup_database, backup_filename, decompress_backup, is_backup_file,
+    restore_database,
+)
+from storage.sqlite import SQLiteRepository
+
+def _seed(path, rows=2000):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO t (v) VALUES (?)", [("x" * 200,)] * rows)
+    conn.commit()
+    return conn
+
+def test_backup_includes_uncheckpointed_wal_pages(tmp_path):
+    src = tmp_path / "live.db"
+    conn = _seed(str(src))  # kept open: committed pages still live in -wal
+    progress = []
+    out = backup_database(str(src), str(tmp_path / "b.db"), pages_per_step=8,
+                          step_sleep=0, progress=lambda d, t: progress.append((d, t)))
+    conn.close()
+
+    assert out["integrity"]["ok"]
+    assert len(progress) > 1 and progress[-1][0] == progress[-1][1] == out["pages"]
+    copy = sqlite3.connect(out["path"])
+    assert copy.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2000
+    assert copy.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    copy.close()
+
+def test_writers_proceed_during_stepped_backup(tmp_path):
+    src = tmp_path / "live.db"
+    _seed(str(src)).close()
+    writes = []
+
+    def _write(done, total):
+        if len(writes) < 3:
+            w = sqlite3.connect(str(src), timeout=1)
+            w.execute("INSERT INTO t (v) VALUES ('during')")
+            w.commit()
+            w.close()
+            writes.append(done)
+
+    out = backup_database(str(src), str(tmp_path / "b.db"), pages_per_step=16,
+                          step_sleep=0, progress=_write)
+    assert len(writes) == 3
+    copy = sqlite3.connect(out["path"])
+    # Backup restarted after each write, so the snapshot holds every committed row
+    assert copy.execute("SELECT COUNT(*) FROM t WHERE v = 'during'").fetchone()[0] == 3
+    copy.close()
+
+def test_backup_that_keeps_restarting_finishes_in_one_step(tmp_path):
+    src = tmp_path / "live.db"
+    _seed(str(src)).close()
+
+    def _write_every_step(done, total):
+        w = sqlite3.connect(str(src), timeout=1)
+        w.execute("INSERT INTO t (v) VALUES ('during')")
+        w.commit()
+        w.close()
+
+    out = backup_database(str(src), str(tmp_path / "b.db"), pages_per_step=16,
+                          step_sleep=0, progress=_write_every_step, max_restarts=2)
+    assert out["restarts"] == 3 and out["single_step"] and out["integrity"]["ok"]
+    copy = sqlite3.connect(out["path"])
+    # Every write committed before the final step is in the snapshot
+    assert copy.execute("SELECT COUNT(*) FROM t WHERE v = 'during'").fetchone()[0] == 4
+    copy.close()
+
+def test_gzip_backup_round_trips(tmp_path):
+    src = tmp_path / "live.db"
+    _seed(str(src)).close()
+    name = backup_filename("gzip")
+    assert is_backup_file(name) and name.endswith(".db.gz")
+
+    out = backup_database(str(src), str(tmp_path / name), compression="gzip")
+    assert out["size_bytes"] < src.stat().st_size
+    with gzip.open(out["path"]) as fh:
+        assert fh.read(16) == b"SQLite format 3\x00"
+    decompress_backup(out["path"], str(tmp_path / "plain.db"))
+    plain = sqlite3.connect(str(tmp_path / "plain.db"))
+    assert plain.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2000
+    plain.close()
+    assert not list(tmp_path.glob("*.partial")) and not list(tmp_path.glob("*.tmp"))
+
+def test_registry_reports_failure(tmp_path):
+    registry = BackupJobRegistry()
+    job = registry.start(str(tmp_path / "missing" / "nope.db"), str(tmp_path / "b.db"))
+    assert job.done.wait(10)
+    assert job.state == "failed" and job.error
+    assert registry.get(job.id) is job
+
+def test_backup_endpoint_runs_as_job(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("LORIEN_DB_PATH", str(db_path))
+    SQLiteRepository(db_path=str(db_path)).create_root_node("Pulse")
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    client = TestClient(app)
+    assert client.post("/api/v1/backup").status_code == 202
+    r = client.post("/api/v1/backup", params={"compression": "gzip", "wait": "true"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["ok"] and body["state"] == "completed"
+    assert body["integrity"]["ok"] and body["path"].endswith(".db.gz")
+
+    job = client.get(f"/api/v1/backup/jobs/{body['job_id']}").json()
+    assert job["percent"] == 100.0 and job["result"]["compression"] == "gzip"
+    status = client.get("/api/v1/backup/status").json()
+    assert status["backups"][0]["compression"] == "gzip"
+    assert client.get("/api/v1/backup/jobs/unknown").status_code == 404
+
+def test_restore_swaps_into_open_database(tmp_path):
+    live_path = tmp_path / "app.db"
+    repo = SQLiteRepository(db_path=str(live_path))
+    repo.create_root_node("Pulse")
+    backup = backup_database(str(live_path), str(tmp_path / backup_filename("gzip")), compression="gzip")
+
+    reader = sqlite3.connect(str(live_path))
+    reader.execute("DELETE FROM nodes")
+    reader.commit()
+    assert reader.execute("SELECT COUNT(*) FROM nodes").fetchone()[0] == 0
+
+    out = restore_database(backup["path"], str(live_path))
+    assert out["integrity"]["ok"] and out["downtime_ms"] >= 0
+    # The connection opened before the restore stays usable and sees restored rows
+    assert reader.execute("SELECT label FROM nodes").fetchall() == [("Pulse",)]
+    reader.close()
+    assert not list(tmp_path.glob(".app.db.restore-*"))
+
+def test_restore_rejects_invalid_backup_without_touching_live(tmp_path):
+    live_path = tmp_path / "app.db"
+    SQLiteRepository(db_path=str(live_path)).create_root_node("Pulse")
+    bogus = tmp_path / "lorien_backup_20250101_000000.db"
+    sqlite3.connect(str(bogus)).execute("CREATE TABLE other (x)").connection.close()
+
+    with pytest.raises(ValueError, match="nodes"):
+        restore_database(str(bogus), str(live_path))
+    conn = sqlite3.connect(str(live_path))
+    assert conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0] == 1
+    conn.close()
+
+def test_restore_endpoint_reports_downtime(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("LORIEN_DB_PATH", str(db_path))
+    repo = SQLiteRepository(db_path=str(db_path))
+    repo.create_root_node("Pulse")
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    client = TestClient(app)
+    assert client.post("/api/v1/backup", params={"wait": "true"}).json()["ok"]
+    repo.create_root_node("Added later")
+
+    r = client.post("/api/v1/restore")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["integrity"]["ok"] and "downtime_ms" in body
+    with repo._get_connection() as conn:
+        assert [r[0] for r in conn.execute("SELECT label FROM nodes WHERE depth = 0")] == ["Pulse"]
+    assert client.post("/api/v1/restore", params={"filename": "nope.db"}).status_code == 404
+
+def test_registry_shares_running_job_and_keeps_it(tmp_path, monkeypatch):
+    from storage import backup
+    release = threading.Event()
+    real = backup.backup_database
+
+    def _slow(*args, **kwargs):
+        release.wait(10)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(backup, "backup_database", _slow)
+    src = tmp_path / "live.db"
+    _seed(str(src)).close()
+    registry = BackupJobRegistry(keep=1)
+    first = registry.start(str(src), str(tmp_path / "a.db"))
+    assert registry.start(str(src), str(tmp_path / "a.db")) is first
+    second = registry.start(str(src), str(tmp_path / "b.db"))
+    assert second is not first and registry.get(first.id) is first  # running: never evicted
+    release.set()
+    assert first.done.wait(10) and second.done.wait(10)
+    assert first.state == second.state == "completed"
+
+    third = registry.start(str(src), str(tmp_path / "a.db"))
+    assert third is not first and third.done.wait(10)
+    assert registry.get(first.id) is None
+
+def test_backup_names_differ_within_a_second():
+    when = datetime(2025, 1, 1, 12, 0, 0)
+    names = [backup_filename("gzip", when.replace(microsecond=us)) for us in (1, 2)]
+    assert names[0] != names[1] and sorted(names) == names
@@ -0,0 +1,83 @@
+import csv
+import sqlite3
+
+from cli.commands import EXIT_SUCCESS, import_excel
+from core.constants import CANON_HEADERS
+from storage.partitioned import ID_BITS, PartitionedRepository, partition_of
+
+def _record(vm, *nodes, triage=None):
+    rec = dict.fromkeys(CANON_HEADERS)
+    rec["Vital Measurement"] = vm
+    rec.update(zip(CANON_HEADERS[1:6], nodes))
+    rec["Diagnostic Triage"] = triage
+    return rec
+
+def test_roots_get_their_own_files_and_routable_ids(tmp_path):
+    store = PartitionedRepository(str(tmp_path / "parts"))
+    pulse = store.create_root_node("Pulse")
+    bp = store.create_root_node("BP")
+    assert (partition_of(pulse), partition_of(bp)) == (1, 2)
+    assert pulse == (1 << ID_BITS) + 1
+
+    child = store.create_child_node(bp, 1, "High", 1)
+    assert partition_of(child) == 2
+    assert [c.label for c in store.get_children(bp)] == ["High"]
+    assert store.list_roots() == [(pulse, "Pulse"), (bp, "BP")]
+    assert sorted(p.name for p in (tmp_path / "parts").glob("part_*.db")) == ["part_000001.db", "part_000002.db"]
+    # Reopening keeps the assignments
+    assert PartitionedRepository(str(tmp_path / "parts")).partition_for_root("BP", create=False) == 2
+
+def test_group_mode_hashes_roots_into_fixed_files(tmp_path):
+    store = PartitionedRepository(str(tmp_path / "parts"), groups=2)
+    for i in range(12):
+        store.create_root_node(f"VM{i}")
+    assert set(store.partitions()) == {1, 2}
+    assert len(store.list_roots()) == 12
+    assert PartitionedRepository(str(tmp_path / "parts"), groups=5).groups == 2
+
+def test_writers_on_different_roots_do_not_block(tmp_path):
+    store = PartitionedRepository(str(tmp_path / "parts"))
+    pulse = store.create_root_node("Pulse")
+    bp = store.create_root_node("BP")
+
+    holder = sqlite3.connect(store.repo_for_node(pulse).db_path, timeout=0, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")  # Pulse's writer lock is taken
+    try:
+        assert store.create_child_node(bp, 1, "High", 1)
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+def test_bulk_writer_applies_partitions_in_parallel(tmp_path):
+    store = PartitionedRepository(str(tmp_path / "parts"))
+    records = [
+        _record(vm, "A", "B", "C", "D", f"E{i}", triage="T")
+        for vm in ("Pulse", "BP", "Temp") for i in range(3)
+    ]
+    with store.bulk_writer(dry_run=True) as writer:
+        writer.apply(records)
+        assert writer.summary["created"] == {"roots": 3, "nodes": 21}
+    assert store.partitions() == []
+
+    with store.bulk_writer(jobs=3) as writer:
+        writer.apply(records[:5])
+        writer.apply(records[5:])
+        summary = writer.summary
+    assert summary["rows_processed"] == 9 and summary["updated"]["triage"] == 9
+    assert summary["created"] == {"roots": 3, "nodes": 21}
+    rows = list(store.iter_complete_path_rows())
+    assert [r[0] for r in rows] == ["Pulse"] * 3 + ["BP"] * 3 + ["Temp"] * 3
+    for idx in store.partitions():
+        assert all(partition_of(node[0]) == idx for node in store.repo(idx).iter_node_rows())
+
+def test_cli_import_into_partitions(tmp_path):
+    path = tmp_path / "paths.csv"
+    with open(path, "w", newline="") as fh:
+        out = csv.writer(fh)
+        out.writerow(CANON_HEADERS)
+        out.writerow(["Pulse", "High", "Fast", "A", "B", "C", "T1", "Act"])
+        out.writerow(["BP", "Low", "X", "Y", "Z", "W", "T2", "Act"])
+    store = PartitionedRepository(str(tmp_path / "parts"))
+    assert import_excel(store, str(path), "placeholder", jobs=1) == EXIT_SUCCESS
+    assert [label for _, label in store.list_roots()] == ["Pulse", "BP"]
+    assert len(list(store.iter_complete_path_rows())) == 2
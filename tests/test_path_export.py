@@ -0,0 +1,54 @@
+import csv
+
+import pytest
+
+from cli.commands import export_csv
+from core.constants import CANON_HEADERS
+from core.engine import DecisionTreeEngine
+from core.import_export import ImportExportEngine
+from storage.sqlite import SQLiteRepository
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SQLiteRepository(db_path=str(tmp_path / "export.db"))
+    root = repo.create_root_node("Pulse")
+    # Second branch lives in slot 3 at depth 1: the old slot == depth walk missed it
+    for slot, label in ((3, "Low"), (1, "High")):
+        node = repo.create_child_node(root, slot, label, 1)
+        for depth in range(2, 6):
+            node = repo.create_child_node(node, 2, f"{label}{depth}", depth)
+        with repo._get_connection() as conn:
+            conn.execute("INSERT INTO triage (node_id, diagnostic_triage, actions) VALUES (?, ?, ?)",
+                         (node, f"T-{label}", "Act"))
+    repo.create_child_node(root, 5, "Dead end", 1)  # incomplete branch, never exported
+    return repo
+
+def test_single_query_streams_every_complete_path_in_slot_order(repo, monkeypatch):
+    opened = []
+    original = repo._get_connection
+    monkeypatch.setattr(repo, "_get_connection", lambda: opened.append(1) or original())
+
+    rows = list(repo.iter_complete_path_rows(batch_size=1))
+    assert len(opened) == 1
+    assert [r[1] for r in rows] == ["High", "Low"]
+    assert rows[1] == ("Pulse", "Low", "Low2", "Low3", "Low4", "Low5", "T-Low", "Act")
+
+def test_export_to_dataframe_uses_repository(repo):
+    engine = ImportExportEngine(DecisionTreeEngine(), repository=repo)
+    df = engine.export_to_dataframe()
+    assert list(df.columns) == CANON_HEADERS
+    assert df["Node 5"].tolist() == ["High5", "Low5"]
+    assert engine.export_paths()[0]["Diagnostic Triage"] == "T-High"
+
+def test_engine_fallback_walks_all_branches():
+    df = ImportExportEngine(DecisionTreeEngine()).export_to_dataframe()
+    assert list(df.columns) == CANON_HEADERS  # mock tree has no depth-5 leaves
+    assert df.empty
+
+def test_cli_export_csv_streams_rows(repo, tmp_path):
+    out = tmp_path / "paths.csv"
+    assert export_csv(repo, str(out)) == 0
+    with open(out, newline="") as fh:
+        rows = list(csv.reader(fh))
+    assert rows[0] == CANON_HEADERS
+    assert [r[1] for r in rows[1:]] == ["High", "Low"]
@@ -0,0 +1,129 @@
+import asyncio
+import sys
+import time
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+from api import profiling
+from api.core.rbac import Permission
+from api.profiling import Profile, profiler
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    monkeypatch.setenv("LORIEN_PROFILE_TOKEN", "s3cret")
+    monkeypatch.delenv("LORIEN_PROFILE_SAMPLE", raising=False)
+    profiler.clear()
+    yield profiler
+    profiler.clear()
+
+
+def test_sample_rates_and_admin_check(monkeypatch):
+    monkeypatch.setenv("LORIEN_PROFILE_SAMPLE", "*=0.001, /tree=0.01, /tree/export=0.5, bogus=x")
+    rates = profiling.sample_rates()
+    assert profiling.sample_rate(rates, "/api/v1/tree/export") == 0.5
+    assert profiling.sample_rate(rates, "/tree/children") == 0.01
+    assert profiling.sample_rate(rates, "/health") == 0.001
+    monkeypatch.setenv("LORIEN_PROFILE_SAMPLE", "0.2")
+    assert profiling.sample_rates() == [("", 0.2)]
+
+    assert profiling.requested("tok", "tok", {}, rbac_enabled=False)
+    assert not profiling.requested("nope", "tok", {}, rbac_enabled=False)
+    assert not profiling.requested("tok", None, {}, rbac_enabled=False)
+    assert not profiling.requested("tok", "tok", {"permissions": {Permission.READ_TREE}}, rbac_enabled=True)
+    assert profiling.requested("tok", "tok", {"permissions": {Permission.ADMIN_SYSTEM}}, rbac_enabled=True)
+
+
+def test_profile_aggregates_tree_folded_and_layers():
+    profile = Profile("GET", "/tree/export", "on_demand")
+    route = "api/routers/tree.py:export"
+    profile.stacks.update({
+        (route, "storage/sqlite.py:SQLiteRepository.export"): 6,
+        (route, "pandas/core/frame.py:DataFrame.to_csv"): 3,
+        (route,): 1,
+        profiling.WAITING: 2,
+    })
+    profile.samples, profile.sampled_ms = 12, 24.0
+
+    assert profile.layers() == {"repository": 12.0, "pandas": 6.0, "waiting": 4.0, "router": 2.0}
+    tree = profile.call_tree()
+    assert tree["total_ms"] == 24.0
+    export = tree["children"][0]
+    assert export["name"] == route and export["total_ms"] == 20.0 and export["self_ms"] == 2.0
+    assert [c["samples"] for c in export["children"]] == [6, 3]
+    assert f"GET /tree/export;{route};storage/sqlite.py:SQLiteRepository.export 6\n" in profile.folded()
+
+
+def test_sample_attributes_loop_and_worker_stacks():
+    def repository_call(profile):
+        profiler.sample([profile], 5.0)
+
+    profile = Profile("GET", "/x", "on_demand", anchor=sys._getframe())
+    other = Profile("GET", "/y", "on_demand", anchor=object())
+    repository_call(profile)
+    ((stack, _),) = profile.stacks.items()
+    assert stack[0].endswith("test_sample_attributes_loop_and_worker_stacks.<locals>.repository_call")
+    assert other.stacks == {} and profile.samples == 1
+
+    # a worker runs the call in the request's context; nothing above the call is kept
+    worker = Profile("GET", "/z", "on_demand")
+
+    async def request():
+        profiling.current_profile.set(worker)
+        await anyio.to_thread.run_sync(repository_call, worker)
+
+    asyncio.run(request())
+    ((stack, _),) = worker.stacks.items()
+    assert stack[0].endswith("<locals>.repository_call")
+
+
+def test_on_demand_profile_is_served_to_admins(profiles):
+    from api.app import app
+    client = TestClient(app)
+    assert "x-profile-id" not in client.get("/health", headers={"X-Lorien-Profile": "wrong"}).headers
+
+    response = client.get("/health", headers={"X-Lorien-Profile": "s3cret"})
+    profile_id = response.headers["x-profile-id"]
+    assert "x-profile-id" not in client.get("/health?_profile=s3cret").headers  # header only
+    assert client.get("/health", headers={"X-Lorien-Profile": "s3cret"}).headers["x-profile-id"] != profile_id
+
+    listing = client.get("/api/v1/admin/performance/profiles").json()
+    assert listing["on_demand"] and [p["trigger"] for p in listing["profiles"]] == ["on_demand"] * 2
+    body = client.get(f"/api/v1/admin/performance/profiles/{profile_id}").json()
+    assert body["status"] == 200 and body["call_tree"]["name"] == "GET /health"
+    folded = client.get(f"/api/v1/admin/performance/profiles/{profile_id}?format=folded")
+    assert folded.headers["content-type"].startswith("text/plain")
+    assert client.get("/api/v1/admin/performance/profiles/0-0").status_code == 404
+    assert client.delete("/api/v1/admin/performance/profiles").json()["removed"] == 2
+
+
+def test_sync_endpoint_time_is_attributed_to_its_worker(profiles, monkeypatch, caplog):
+    # Fails if worker attribution finds nothing, e.g. after an AnyIO upgrade
+    # changes the worker frames the sampler reads the request context from.
+    from fastapi import FastAPI
+    from api.middleware.pipeline import RequestPipelineMiddleware
+
+    monkeypatch.setenv("LORIEN_PROFILE_INTERVAL_MS", "1")
+    monkeypatch.setenv("LORIEN_PROFILE_SAMPLE", "/busy=1")  # sampled: no token, so RBAC state does not matter
+
+    def busy_in_worker():
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            pass
+
+    app = FastAPI()
+
+    @app.get("/busy")
+    def busy():
+        busy_in_worker()
+        return {"ok": True}
+
+    app.add_middleware(RequestPipelineMiddleware)
+    with caplog.at_level("WARNING", logger="api.profiling"):
+        assert TestClient(app).get("/busy").status_code == 200
+    (profile,) = profiler.profiles()
+    in_worker = sum(n for stack, n in profile.stacks.items() if stack and stack[-1].endswith("busy_in_worker"))
+    assert in_worker > profile.samples / 2, profile.stacks
+    assert "cannot find the request context" not in caplog.text
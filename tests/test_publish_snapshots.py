@@ -0,0 +1,119 @@
+import sqlite3
+
+import pytest
+
+from storage.publish import current_snapshot, list_versions, open_snapshot, publish_snapshot
+from storage.sqlite import SQLiteRepository
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SQLiteRepository(db_path=str(tmp_path / "app.db"))
+    root = repo.create_root_node("Pulse")
+    for slot in range(1, 6):
+        repo.create_child_node(root, slot, f"C{slot}", 1)
+    repo.root_id = root
+    return repo
+
+def test_publish_writes_compacted_read_optimized_snapshot(repo, tmp_path):
+    pub = tmp_path / "published"
+    out = publish_snapshot(repo.db_path, str(pub))
+    assert out["version"] == 1 and current_snapshot(str(pub)) == out["path"]
+    assert "idx_pub_nodes_children" in out["indexes"]
+
+    conn = open_snapshot(out["path"])
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    assert conn.execute("SELECT COUNT(*) FROM change_journal").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    plan = " ".join(r[3] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id, slot, label FROM nodes WHERE parent_id = ? ORDER BY slot", (1,)))
+    assert "COVERING INDEX" in plan
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        conn.execute("DELETE FROM nodes")
+    conn.close()
+
+def test_snapshot_reads_ignore_editor_locks(repo, tmp_path):
+    out = publish_snapshot(repo.db_path, str(tmp_path / "published"))
+    editor = sqlite3.connect(repo.db_path, isolation_level=None)
+    editor.execute("BEGIN EXCLUSIVE")
+    editor.execute("DELETE FROM nodes")
+    try:
+        snapshot = SQLiteRepository(db_path=out["path"], read_only=True)
+        assert [c.label for c in snapshot.get_children(repo.root_id)] == [f"C{i}" for i in range(1, 6)]
+    finally:
+        editor.execute("ROLLBACK")
+        editor.close()
+
+def test_publish_retains_recent_versions(repo, tmp_path):
+    pub = str(tmp_path / "published")
+    for _ in range(4):
+        last = publish_snapshot(repo.db_path, pub, keep=2)
+    assert [v["version"] for v in list_versions(pub)] == [4, 3]
+    assert last["pruned"] and current_snapshot(pub) == last["path"]
+
+def test_concurrent_publishes_reserve_distinct_versions(repo, tmp_path):
+    import threading
+
+    pub = tmp_path / "published"
+    pub.mkdir()
+    (pub / ".version_000001").touch()  # a publish still in flight holds version 1
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(publish_snapshot(repo.db_path, str(pub), keep=5)))
+               for _ in range(3)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    assert sorted(r["version"] for r in results) == [2, 3, 4]
+    assert [v["version"] for v in list_versions(str(pub))] == [4, 3, 2]
+    assert current_snapshot(str(pub)) == max(results, key=lambda r: r["version"])["path"]
+
+def test_replica_mode_serves_current_snapshot_read_only(repo, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    pub = tmp_path / "published"
+    monkeypatch.setenv("LORIEN_DB_PATH", repo.db_path)
+    monkeypatch.setenv("LORIEN_DB", str(tmp_path / "lorien.db"))  # publish copies the legacy tables too
+    client = TestClient(app)
+    assert client.post("/api/v1/admin/publish").json()["version"] == 1
+
+    monkeypatch.setenv("LORIEN_REPLICA_DIR", str(tmp_path / "empty"))
+    assert client.get(f"/api/v1/tree/{repo.root_id}/children").status_code == 503
+
+    monkeypatch.setenv("LORIEN_REPLICA_DIR", str(pub))
+    children = client.get(f"/api/v1/tree/{repo.root_id}/children").json()["children"]
+    assert [c["label"] for c in children] == [f"C{i}" for i in range(1, 6)]
+    assert client.post("/api/v1/admin/publish").status_code == 405
+    assert client.get("/api/v1/admin/publish").json()["replica"] is True
+
+    # Editor changes and republishes; the replica switches on its next request
+    with repo._get_connection() as conn:
+        conn.execute("UPDATE nodes SET label = 'C1b' WHERE label = 'C1'")
+    publish_snapshot(repo.db_path, str(pub))
+    children = client.get(f"/api/v1/tree/{repo.root_id}/children").json()["children"]
+    assert children[0]["label"] == "C1b"
+
+def test_replica_serves_legacy_tree_routes_from_the_snapshot(repo, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    legacy = tmp_path / "lorien.db"
+    monkeypatch.setenv("LORIEN_DB_PATH", repo.db_path)
+    monkeypatch.setenv("LORIEN_DB", str(legacy))
+    client = TestClient(app)
+    header = "Vital Measurement,Node 1,Node 2,Node 3,Node 4,Node 5,Diagnostic Triage,Actions\n"
+    body = header + "Pulse,High,Fast,,,,T,A\nPulse,Low,,,,,,\n"
+    assert client.post("/api/v1/import/stream", content=body.encode(),
+                       headers={"Content-Type": "text/csv"}).status_code == 200
+    published = client.post("/api/v1/admin/publish").json()
+    assert published["legacy_path"].endswith(".legacy.db")
+
+    # the replica never opens the editor's legacy file
+    for path in tmp_path.glob("lorien.db*"):
+        path.unlink()
+    monkeypatch.setenv("LORIEN_REPLICA_DIR", str(tmp_path / "published"))
+    r = client.get("/api/v1/tree/navigate", params={"root": "Pulse"})
+    assert r.status_code == 200, r.text
+    assert [o["label"] for o in r.json()["options"]] == ["High", "Low"]
+    assert client.get("/api/v1/tree/root-options").json()["items"] == ["Pulse"]
+    assert not legacy.exists()
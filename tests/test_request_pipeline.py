@@ -0,0 +1,55 @@
+import os
+from unittest.mock import patch
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from api.middleware.pipeline import RequestPipelineMiddleware
+from api.core.rbac import rbac_manager
+from api.metrics import reset, snapshot
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(RequestPipelineMiddleware, metrics_enabled=True)
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"chunk{i}\n".encode()
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.post("/triage/{node_id}")
+    async def write(node_id: int, request: Request):
+        request.state.etag = 'W/"v2"'
+        return {"if_match": getattr(request.state, "if_match", None)}
+
+    return app
+
+
+def test_pipeline_is_the_only_middleware_layer():
+    from api.app import app
+    assert not any(issubclass(m.cls, BaseHTTPMiddleware) for m in app.user_middleware)
+
+
+def test_streaming_body_passes_through_and_is_counted():
+    reset()
+    with patch.dict(os.environ, {"ANALYTICS_ENABLED": "true"}):
+        with TestClient(_app()).stream("GET", "/stream") as r:
+            assert list(r.iter_bytes()) and r.status_code == 200
+    assert snapshot()["route_hits"]["/stream"] == 1
+
+
+def test_write_auth_returns_401_json_and_etag_flows_through():
+    client = TestClient(_app())
+    with patch.dict(os.environ, {"AUTH_TOKEN": "secret"}), patch.object(rbac_manager, "_rbac_enabled", False):
+        r = client.post("/triage/1")
+        assert r.status_code == 401
+        assert r.json()["detail"]["error"] == "authentication_required"
+
+        r = client.post("/triage/1", headers={"Authorization": "Bearer secret", "If-Match": 'W/"v1"'})
+        assert r.status_code == 200 and r.json() == {"if_match": 'W/"v1"'}
+        assert r.headers["ETag"] == 'W/"v2"'
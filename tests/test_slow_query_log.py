@@ -0,0 +1,97 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from storage import querystats, slowlog
+from storage.slowlog import slow_queries
+
+
+@pytest.fixture
+def slow_log(tmp_path, monkeypatch):
+    monkeypatch.delenv("LORIEN_SQL_TRACE", raising=False)
+    monkeypatch.setenv("LORIEN_SLOW_QUERY_MS", "0.000001")  # everything is slow
+    monkeypatch.setenv("LORIEN_SLOW_QUERY_DB", str(tmp_path / "slow.db"))
+    yield tmp_path
+    slow_queries.close()
+
+
+def test_normalize_and_param_shape():
+    sql = "SELECT *\n  FROM nodes WHERE id IN (1, 2, 3) AND label = 'it''s' AND depth > 2.5"
+    assert slowlog.normalize(sql) == "SELECT * FROM nodes WHERE id IN (?...) AND label = ? AND depth > ?"
+    assert slowlog.normalize("SELECT * FROM nodes WHERE id IN (?,?)") == "SELECT * FROM nodes WHERE id IN (?...)"
+    assert slowlog.param_shape((1, "a", None)) == "(int, str, None)"
+    assert slowlog.param_shape({"id": 3}) == "{id: int}"
+    assert slowlog.param_shape([(1, "a"), (2, "b")]) == "2 x (int, str)"
+
+
+def test_ring_buffer_groups_by_fingerprint_and_flags_full_scans(slow_log, monkeypatch):
+    monkeypatch.setenv("LORIEN_SLOW_QUERY_KEEP", "3")
+    conn = querystats.connect(str(slow_log / "app.db"))
+    conn.execute("CREATE TABLE nodes (id INTEGER PRIMARY KEY, label TEXT)")
+    for i in range(5):
+        conn.execute("SELECT * FROM nodes WHERE label = ?", (f"x{i}",)).fetchall()
+    conn.execute("SELECT * FROM nodes WHERE id = 1").fetchall()
+
+    entries = slow_queries.entries()
+    assert len(entries) == 3 and entries[0]["seq"] == 7  # CREATE, 5 label scans, 1 id lookup
+
+    groups = {g["sql"]: g for g in slow_queries.summary()}
+    scan = groups["SELECT * FROM nodes WHERE label = ?"]
+    assert scan["count"] == 2 and scan["full_scan"] and scan["param_shapes"] == ["(str)"]
+    assert scan["plan"] == ["SCAN nodes"] and scan["p95_ms"] <= scan["max_ms"]
+    lookup = groups["SELECT * FROM nodes WHERE id = ?"]
+    assert not lookup["full_scan"] and lookup["plan"][0].startswith("SEARCH nodes")
+
+
+def test_admin_endpoint_reports_and_clears(slow_log, monkeypatch):
+    from api.app import app
+    monkeypatch.setenv("LORIEN_DB_PATH", str(slow_log / "app.db"))
+    client = TestClient(app)
+    assert client.get("/health").status_code == 200
+
+    body = client.get("/api/v1/admin/performance/slow-queries").json()
+    assert body["enabled"] and body["groups"]
+    assert any("/health" in g["routes"] for g in body["groups"])
+
+    assert client.delete("/api/v1/admin/performance/slow-queries").json()["removed"] > 0
+    assert client.get("/api/v1/admin/performance/slow-queries").json()["groups"] == []
+
+
+def test_workers_sharing_the_log_never_reuse_a_seq(slow_log):
+    conn = querystats.connect(str(slow_log / "app.db"))
+    other = slowlog.SlowQueryLog()  # a second worker process on the same log file
+    try:
+        for i in range(3):
+            slow_queries.record(conn, "SELECT ?", (i,), 1.0)
+            other.record(conn, "SELECT ?", (i,), 1.0)
+        assert [e["seq"] for e in slow_queries.entries()] == [6, 5, 4, 3, 2, 1]
+    finally:
+        other.close()
+
+
+def test_shrinking_keep_keeps_the_newest_entries(slow_log, monkeypatch):
+    conn = querystats.connect(str(slow_log / "app.db"))
+    monkeypatch.setenv("LORIEN_SLOW_QUERY_KEEP", "10")
+    for i in range(8):
+        slow_queries.record(conn, "SELECT ?", (i,), 1.0)
+    monkeypatch.setenv("LORIEN_SLOW_QUERY_KEEP", "4")
+    slow_queries.record(conn, "SELECT 9", None, 1.0)
+    assert [e["seq"] for e in slow_queries.entries()] == [9, 8, 7, 6]
+
+
+def test_scan_slow_only_while_fetching_is_logged(slow_log, monkeypatch):
+    monkeypatch.setenv("LORIEN_SLOW_QUERY_MS", "50")
+    conn = querystats.connect(str(slow_log / "app.db"))
+    conn.create_function("slow", 1, lambda v: time.sleep(0.002) or v)
+    conn.execute("CREATE TABLE nodes (id INTEGER PRIMARY KEY, label TEXT)")
+    conn.executemany("INSERT INTO nodes (label) VALUES (?)", [(f"n{i}",) for i in range(50)])
+    conn.commit()
+
+    # 2 ms per row scanned: execute returns at the first match (row 10), fetching scans the rest
+    cursor = conn.execute("SELECT id, label FROM nodes WHERE slow(label) LIKE '%9%'")
+    assert slow_queries.entries() == []
+    assert len(cursor.fetchall()) == 5
+    (entry,) = slow_queries.entries()
+    assert entry["sql"] == "SELECT id, label FROM nodes WHERE slow(label) LIKE ?"
+    assert entry["duration_ms"] >= 50 and entry["full_scans"] == "nodes"
@@ -0,0 +1,43 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from api.core import uploads
+from api.core.uploads import spool_upload
+
+def _upload(data: bytes, name="f.csv"):
+    return UploadFile(file=io.BytesIO(data), filename=name)
+
+def test_spool_upload_hashes_and_rolls_to_disk(monkeypatch):
+    monkeypatch.setattr(uploads, "SPOOL_MAX_MEMORY", 1024)
+    data = b"x" * 5000
+    with asyncio.run(spool_upload(_upload(data), chunk_size=700)) as up:
+        assert up.size_bytes == len(data)
+        assert up.sha256 == hashlib.sha256(data).hexdigest()
+        assert up.on_disk
+        assert up.open().read() == data
+
+def test_spool_upload_enforces_limit():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(spool_upload(_upload(b"y" * 100), max_bytes=10, chunk_size=8))
+    assert exc.value.status_code == 413
+    assert exc.value.detail[0]["type"] == "value_error.upload_too_large"
+
+def test_dictionary_import_uses_spooled_upload(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_DB", str(tmp_path / "dict.db"))
+    from api.app import app
+    client = TestClient(app)
+    body = b"type,term,hints,red_flag\nnode_label,Chest Pain,,true\nnode_label,Chest Pain,Updated,false\n"
+    r = client.post("/api/v1/dictionary/import", files={"file": ("d.csv", io.BytesIO(body), "text/csv")})
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert (data["inserted"], data["updated"], data["skipped"]) == (1, 1, 0)
+    assert data["sha256"] == hashlib.sha256(body).hexdigest()
+
+    monkeypatch.setenv("LORIEN_MAX_UPLOAD_BYTES", "16")
+    r = client.post("/api/v1/dictionary/import", files={"file": ("d.csv", io.BytesIO(body), "text/csv")})
+    assert r.status_code == 413
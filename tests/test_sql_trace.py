@@ -0,0 +1,88 @@
+import logging
+import sqlite3
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from storage import querystats
+
+
+@pytest.fixture
+def traced(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_SQL_TRACE", "true")
+    monkeypatch.setenv("LORIEN_DB_PATH", str(tmp_path / "app.db"))
+    querystats.reset()
+    yield tmp_path
+    querystats.reset()
+
+
+def test_connect_is_plain_when_tracing_is_off(monkeypatch):
+    monkeypatch.delenv("LORIEN_SQL_TRACE", raising=False)
+    assert type(querystats.connect(":memory:")) is sqlite3.Connection
+
+
+def test_calls_timed_and_trigger_statements_counted(traced):
+    conn = querystats.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT);
+        CREATE TABLE log (id INTEGER);
+        CREATE TRIGGER t_ins AFTER INSERT ON t BEGIN INSERT INTO log VALUES (NEW.id); END;
+    """)
+    queries = querystats.RequestQueries("/t")
+    token = querystats.current_queries.set(queries)
+    try:
+        conn.executemany("INSERT INTO t (v) VALUES (?)", [("a",), ("b",)])
+        for i in (1, 2, 1):
+            row = conn.cursor().execute("SELECT v FROM t WHERE id = ?", (i,)).fetchone()
+        assert row["v"] == "a"
+    finally:
+        querystats.current_queries.reset(token)
+
+    assert queries.queries == 4
+    assert queries.statements > queries.queries  # two rows plus their trigger inserts
+    assert queries.repeated(3) == [("SELECT v FROM t WHERE id = ?", 3, queries.by_sql["SELECT v FROM t WHERE id = ?"][1])]
+    assert len(queries.slowest()) == 4 and queries.sql_ms >= queries.slowest()[0][0]
+
+
+def test_request_headers_route_totals_and_n_plus_one_log(traced, monkeypatch, caplog):
+    from api.app import app
+    monkeypatch.setenv("LORIEN_SQL_TRACE_HEADERS", "true")
+    monkeypatch.setenv("LORIEN_SQL_REPEAT_THRESHOLD", "2")
+    client = TestClient(app)
+
+    with caplog.at_level(logging.WARNING, logger="storage.querystats"):
+        r = client.get("/health")
+    assert r.status_code == 200
+    assert int(r.headers["X-SQL-Queries"]) > 0
+    assert r.headers["Server-Timing"].startswith("sql;dur=")
+    assert any("N+1 suspect: GET /health" in m for m in caplog.messages)
+
+    stats = client.get("/health/sql").json()
+    route = stats["routes"]["GET /health"]
+    assert route["requests"] == 1 and route["queries"] == int(r.headers["X-SQL-Queries"])
+    assert route["n_plus_one_requests"] == 1 and route["slowest"]
+
+    monkeypatch.setenv("LORIEN_SQL_TRACE", "false")
+    assert "X-SQL-Queries" not in client.get("/health").headers
+    assert client.get("/health/sql").status_code == 404
+
+
+def test_rows_read_after_execute_count_toward_the_statement(traced):
+    conn = querystats.connect(":memory:")
+    conn.create_function("slow", 1, lambda v: time.sleep(0.002) or v)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO t (id) VALUES (?)", [(i,) for i in range(50)])
+    queries = querystats.RequestQueries("/t")
+    token = querystats.current_queries.set(queries)
+    try:
+        cursor = conn.execute("SELECT slow(id) FROM t")
+        assert queries.queries == 0  # held open until the rows are read
+        assert len(list(cursor)) == 50
+        rows = conn.execute("SELECT slow(id) FROM t").fetchmany(10)
+    finally:
+        querystats.current_queries.reset(token)
+    assert len(rows) == 10  # dropped cursor: recorded when collected
+    calls, ms = queries.by_sql["SELECT slow(id) FROM t"]
+    assert calls == 2 and ms >= 100 + 20
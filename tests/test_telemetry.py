@@ -199,6 +199,19 @@ class TestHealthMetricsEndpoint:
             assert isinstance(cache["enabled"], bool)
             assert isinstance(cache["ttl_seconds"], int)
 
+    def test_table_counts_are_cached_between_scrapes(self):
+        """Test that scrapes within the TTL do not recount the tables."""
+        from api.routers import health
+        health._counts_cache.clear()
+        with patch.dict(os.environ, {"ANALYTICS_ENABLED": "true"}), \
+                patch.object(health, "_count_rows", wraps=health._count_rows) as count_rows:
+            client = TestClient(app)
+            first = client.get("/api/v1/health/metrics").json()
+            second = client.get("/api/v1/health/metrics").json()
+            assert count_rows.call_count == 4
+            assert first["table_counts"] == second["table_counts"]
+            assert second["cache"]["ttl_seconds"] == health.COUNTS_TTL_SECONDS
+
 
 class TestTelemetryMiddleware:
     """Test telemetry middleware functionality."""
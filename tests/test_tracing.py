@@ -0,0 +1,139 @@
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from storage import querystats, tracing
+from storage.tracing import spans
+
+
+@pytest.fixture
+def traced(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_TRACE", "true")
+    monkeypatch.setenv("LORIEN_TRACE_FILE", str(tmp_path / "spans.jsonl"))
+    spans.clear()
+    yield tmp_path
+    spans.close()
+    spans.clear()
+
+
+def test_spans_nest_and_are_free_outside_a_trace(traced):
+    with tracing.span("outside") as nothing:
+        assert nothing is None
+
+    root = tracing.start_trace("http GET /x")
+    token = tracing.current_span.set(root)
+    with tracing.span("repo", table="nodes") as repo:
+        with tracing.span("sqlite"):
+            pass
+        with pytest.raises(ValueError):
+            with tracing.span("broken"):
+                raise ValueError("boom")
+    tracing.current_span.reset(token)
+    tracing.end_trace(root)
+
+    by_name = {s["name"]: s for s in spans.trace(root.trace_id)}
+    assert set(by_name) == {"http GET /x", "repo", "sqlite", "broken"}
+    assert by_name["sqlite"]["parent_id"] == repo.span_id == by_name["broken"]["parent_id"]
+    assert by_name["repo"]["attributes"] == {"table": "nodes"}
+    assert by_name["broken"]["status"] == "error" and "boom" in by_name["broken"]["attributes"]["error"]
+    lines = (traced / "spans.jsonl").read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines][-1] == "http GET /x"
+
+
+def test_traceparent_is_continued_and_span_budget_enforced(traced, monkeypatch):
+    monkeypatch.setenv("LORIEN_TRACE_MAX_SPANS", "3")
+    root = tracing.start_trace("http GET /y", "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    assert root.trace_id == "0af7651916cd43dd8448eb211c80319c" and root.parent_id == "b7ad6b7169203331"
+    assert tracing.start_trace("x", "garbage").parent_id is None
+
+    token = tracing.current_span.set(root)
+    for _ in range(5):
+        tracing.record("sqlite", 1.5, statement="SELECT 1")
+    tracing.current_span.reset(token)
+    tracing.end_trace(root)
+    assert len(spans.trace(root.trace_id)) == 3 and root.attributes["dropped_spans"] == 3
+
+
+def test_span_budget_holds_across_threads(traced, monkeypatch):
+    monkeypatch.setenv("LORIEN_TRACE_MAX_SPANS", "50")
+    root = tracing.start_trace("job")
+
+    def _spans():
+        for _ in range(100):
+            root.child("sqlite")
+
+    workers = [threading.Thread(target=_spans) for _ in range(4)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    assert root.trace.spans == 50 and root.trace.dropped == 351
+
+
+def test_spans_are_written_once_per_trace(traced):
+    root = tracing.start_trace("job")
+    token = tracing.current_span.set(root)
+    for _ in range(3):
+        tracing.record("sqlite", 0.5)
+    tracing.current_span.reset(token)
+    assert not (traced / "spans.jsonl").exists()  # buffered until the root ends
+    tracing.end_trace(root)
+    assert len((traced / "spans.jsonl").read_text().splitlines()) == 4
+
+
+def test_breakdown_subtracts_child_time():
+    trace_spans = [
+        {"span_id": "a", "parent_id": None, "name": "http", "duration_ms": 10.0},
+        {"span_id": "b", "parent_id": "a", "name": "repo", "duration_ms": 6.0},
+        {"span_id": "c", "parent_id": "b", "name": "sqlite", "duration_ms": 2.5},
+        {"span_id": "d", "parent_id": "b", "name": "sqlite", "duration_ms": 1.5},
+    ]
+    assert tracing.breakdown(trace_spans) == {
+        "sqlite": {"count": 2, "total_ms": 4.0, "self_ms": 4.0},
+        "http": {"count": 1, "total_ms": 10.0, "self_ms": 4.0},
+        "repo": {"count": 1, "total_ms": 6.0, "self_ms": 2.0},
+    }
+
+
+def test_statements_on_instrumented_connections_become_spans(traced):
+    conn = querystats.connect(str(traced / "app.db"))
+    root = tracing.start_trace("job")
+    token = tracing.current_span.set(root)
+    conn.execute("CREATE TABLE t (x)")
+    conn.execute("SELECT * FROM t").fetchall()
+    tracing.current_span.reset(token)
+    tracing.end_trace(root)
+    statements = [s["attributes"]["statement"] for s in spans.trace(root.trace_id) if s["name"] == "sqlite"]
+    assert statements == ["CREATE TABLE t (x)", "SELECT * FROM t"]
+
+
+def test_traceparent_sampled_flag_decides(traced, monkeypatch):
+    from api.app import app
+    assert tracing.sampled(None) is None and tracing.sampled("garbage") is None
+    parent = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-{}"
+    assert tracing.sampled(parent.format("01")) and tracing.sampled(parent.format("00")) is False
+
+    monkeypatch.setenv("LORIEN_TRACE_SAMPLE", "0")
+    client = TestClient(app)
+    assert "x-trace-id" not in client.get("/health").headers
+    assert "x-trace-id" not in client.get("/health", headers={"traceparent": parent.format("00")}).headers
+    traced_response = client.get("/health", headers={"traceparent": parent.format("01")})
+    assert traced_response.headers["x-trace-id"] == "0af7651916cd43dd8448eb211c80319c"
+
+
+def test_request_trace_id_is_echoed_and_served(traced):
+    from api.app import app
+    client = TestClient(app)
+    response = client.get("/health")
+    trace_id = response.headers["x-trace-id"]
+    assert response.headers["traceparent"].startswith(f"00-{trace_id}-")
+
+    body = client.get(f"/api/v1/admin/performance/traces/{trace_id}").json()
+    names = {s["name"] for s in body["spans"]}
+    assert {"http GET /health", "dependency.get_repository", "response.body"} <= names
+    assert body["breakdown"]["http GET /health"]["count"] == 1
+    listing = client.get("/api/v1/admin/performance/traces").json()
+    assert listing["enabled"] and listing["traces"][-1]["trace_id"] == trace_id
+    assert client.get("/api/v1/admin/performance/traces/" + "0" * 32).status_code == 404
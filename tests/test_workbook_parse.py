@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from core.importers.workbook_parse import normalize_rows, parse_workbook
+
+CANON = ["Vital Measurement","Node 1","Node 2","Node 3","Node 4","Node 5","Diagnostic Triage","Actions"]
+
+def _rows(n):
+    return [[f"VM{i % 4}", f"N1-{i % 5}", f"N2-{i % 3}", "", "Orphan", None, "T" if i % 2 else "nan", ""]
+            for i in range(n)]
+
+def test_normalize_rows_sanitizes_and_truncates_after_blank():
+    recs = normalize_rows([[" Pulse ", "High", None, "Deep", "", "", "nan", "Act"], ["", "X", "", "", "", "", "", ""]])
+    assert len(recs) == 1
+    assert recs[0]["Vital Measurement"] == "Pulse"
+    assert recs[0]["Node 3"] is None  # after the blank Node 2
+    assert recs[0]["Diagnostic Triage"] is None and recs[0]["Actions"] == "Act"
+
+@pytest.mark.parametrize("suffix", [".csv", ".xlsx"])
+def test_batches_come_in_workbook_order(tmp_path, suffix):
+    path = tmp_path / f"wb{suffix}"
+    df = pd.DataFrame(_rows(230), columns=CANON)
+    df.to_csv(path, index=False) if suffix == ".csv" else df.to_excel(path, index=False)
+
+    batches = list(parse_workbook(str(path), chunk_rows=50))
+    assert [b.index for b in batches] == [0, 1, 2, 3, 4]
+    assert [b.first_row for b in batches] == [2, 52, 102, 152, 202]
+    assert sum(b.rows_read for b in batches) == 230
+    assert [r for b in batches for r in b.records] == normalize_rows(_rows(230))
+
+def test_header_mismatch_raises_ctx(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("Diagnosis,Node 1\nx,y\n")
+    with pytest.raises(ValueError) as exc:
+        list(parse_workbook(str(path)))
+    assert exc.value.args[0]["col_index"] == 0
+
+def test_single_writer_applies_batches(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_DB", str(tmp_path / "par.db"))
+    from api.db import get_conn
+    from api.repositories.tree_repo import import_workbook
+
+    path = tmp_path / "wb.csv"
+    pd.DataFrame(_rows(40), columns=CANON).to_csv(path, index=False)
+    seen = []
+    conn = get_conn()
+    summary = import_workbook(conn, str(path), chunk_rows=15,
+                              on_batch=lambda b, s: seen.append((b.index, s["rows_processed"])))
+    assert seen == [(0, 15), (1, 30), (2, 40)]
+    assert summary["rows_processed"] == 40
+    roots = {r[0] for r in conn.execute("SELECT label FROM nodes WHERE parent_id IS NULL")}
+    assert roots == {"VM0", "VM1", "VM2", "VM3"}
+    assert conn.execute("SELECT COUNT(*) FROM nodes WHERE label='Orphan'").fetchone()[0] == 0
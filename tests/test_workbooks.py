@@ -0,0 +1,118 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from storage.workbooks import WorkbookRegistry
+
+
+@pytest.fixture
+def wb_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LORIEN_WORKBOOKS_DIR", str(tmp_path / "workbooks"))
+    monkeypatch.setenv("LORIEN_DB_PATH", str(tmp_path / "default.db"))
+    return tmp_path / "workbooks"
+
+
+def test_registry_evicts_least_recently_used(wb_dir):
+    reg = WorkbookRegistry(max_open=2, pool_size=1)
+    a = reg.get("a", create=True)
+    reg.get("b", create=True)
+    conn = a.acquire()
+    assert reg.get("a") is a  # touch: b is now the oldest
+    reg.get("c", create=True)
+    assert [w["name"] for w in reg.stats()["open"]] == ["c", "a"]
+    assert reg.evictions == 1 and reg.names() == ["a", "b", "c"]
+
+    a.release(conn)
+    assert a.stats()["idle_connections"] == 1 and a.acquire() is conn
+    reg.close_all()
+    a.release(conn)  # lent out during close: closed on return, not pooled
+    assert a.stats()["idle_connections"] == 0
+
+
+def test_repository_calls_reuse_pooled_connections(wb_dir):
+    wb = WorkbookRegistry(pool_size=2).get("a", create=True)
+    root = wb.repo.create_root_node("Pulse")
+    pooled = wb.acquire()
+    wb.release(pooled)
+    for slot in range(1, 4):
+        wb.repo.create_child_node(root, slot, f"C{slot}", 1)
+    assert [c.label for c in wb.repo.get_children(root)] == ["C1", "C2", "C3"]
+    assert list(wb.repo.iter_complete_path_rows()) == []
+    stats = wb.stats()
+    assert stats["lent_connections"] == 0 and stats["idle_connections"] == 1
+    assert wb.acquire() is pooled and pooled.isolation_level is None  # back in autocommit for API use
+
+
+def test_registry_rejects_bad_and_unknown_names(wb_dir):
+    reg = WorkbookRegistry()
+    with pytest.raises(ValueError):
+        reg.get("../etc", create=True)
+    with pytest.raises(KeyError):
+        reg.get("missing")
+
+
+def test_requests_are_routed_to_their_workbook(wb_dir):
+    from api.app import app
+
+    client = TestClient(app)
+    for name in ("site-a", "site-b"):
+        assert client.post("/api/v1/admin/workbooks", params={"name": name}).status_code == 201
+    assert client.post("/api/v1/admin/workbooks", params={"name": "site-a"}).status_code == 409
+
+    from storage.workbooks import workbooks
+    repo = workbooks.get("site-a").repo
+    root = repo.create_root_node("Pulse")
+    repo.create_child_node(root, 1, "High", 1)
+
+    url = f"/api/v1/w/site-a/tree/{root}/children"
+    assert [c["label"] for c in client.get(url).json()["children"]] == ["High"]
+    assert client.get(f"/api/v1/tree/{root}/children", headers={"X-Lorien-Workbook": "site-a"}).status_code == 200
+    assert client.get(f"/api/v1/w/site-b/tree/{root}/children").status_code == 404
+    assert client.get(f"/api/v1/tree/{root}/children").status_code == 404  # default database
+    # get_db_connection dependency: pooled connection of the workbook
+    assert client.get(f"/api/v1/w/site-a/tree/{root}").status_code == 200
+    assert workbooks.get("site-a").stats()["idle_connections"] >= 1
+
+    assert client.get("/api/v1/w/nope/health").status_code == 404
+    r = client.get("/api/v1/w/site-a/health", headers={"X-Lorien-Workbook": "site-b"})
+    assert r.status_code == 400
+    listed = client.get("/api/v1/admin/workbooks").json()
+    assert listed["workbooks"] == ["site-a", "site-b"]
+    assert {w["name"] for w in listed["open"]} == {"site-a", "site-b"}
+
+
+def test_legacy_connections_are_pooled_per_workbook(wb_dir):
+    from api.db import ensure_schema, get_conn
+    from storage.workbooks import current_workbook, workbooks
+
+    wb = workbooks.get("a", create=True)
+    token = current_workbook.set("a")
+    try:
+        conn = get_conn()
+        ensure_schema(conn)  # no-op: the schema was set up when the pool was first used
+        raw = conn._conn
+        conn.execute("INSERT INTO nodes (label, depth) VALUES ('Pulse', 0)")
+        del conn  # routers just drop it: back to the pool
+        assert wb.stats()["legacy_idle_connections"] == 1
+        again = get_conn()
+        assert again._conn is raw and again.execute("SELECT label FROM nodes").fetchone()["label"] == "Pulse"
+        again.close()
+        assert wb.stats()["legacy_lent_connections"] == 0
+    finally:
+        current_workbook.reset(token)
+
+
+def test_workbook_tree_routes_reuse_the_legacy_pool(wb_dir):
+    from api.app import app
+    from storage.workbooks import workbooks
+
+    client = TestClient(app)
+    assert client.post("/api/v1/admin/workbooks", params={"name": "site-a"}).status_code == 201
+    header = "Vital Measurement,Node 1,Node 2,Node 3,Node 4,Node 5,Diagnostic Triage,Actions\n"
+    r = client.post("/api/v1/w/site-a/import/stream", content=(header + "Pulse,High,,,,,,\n").encode(),
+                    headers={"Content-Type": "text/csv"})
+    assert r.status_code == 200, r.text
+    for _ in range(3):
+        nav = client.get("/api/v1/w/site-a/tree/navigate", params={"root": "Pulse"})
+        assert [o["label"] for o in nav.json()["options"]] == ["High"]
+    stats = workbooks.get("site-a").stats()
+    assert stats["legacy_idle_connections"] == 1 and stats["legacy_lent_connections"] == 0
@@ -0,0 +1,352 @@
+"""
+Concurrent load against the API: throughput and p50/p95/p99 latency per route.
+
+Builds a synthetic tree (tools/treegen.py) and points the app at it. Then
+it runs a weighted mix of what editors and calculator users do, at each
+concurrency level:
+
+    children        GET  /tree/{id}/children
+    path            GET  /tree/path?node_id=
+    navigate        GET  /tree/navigate?root=..&n1=..      (calculator drill-down)
+    next_incomplete GET  /tree/next-incomplete-parent
+    stats           GET  /tree/stats                       (dashboard polling)
+    upsert          GET + PUT /tree/parent/{id}/children   (editor save, If-Match)
+    materialize     POST /tree/materialize                 (one parent, fill only: pruning
+                                                            would delete sampled nodes)
+    export          GET  /tree/export
+
+By default the ASGI app runs in this process; no socket is opened.
+``--workers N`` starts ``uvicorn --workers N`` on a free local port and
+loads it over HTTP instead.
+
+    python tools/bench_load.py                                # 1e4-node tree, 1,8,32 in flight
+    python tools/bench_load.py -c 64 -d 30 --nodes 1e5
+    python tools/bench_load.py --workers 4 -c 16,64
+    python tools/bench_load.py --mix children=10,export=0 --check
+
+Each route's p95 is checked against the targets in docs/PERFORMANCE_GUIDELINES.md
+and the route docstrings (``TARGETS_P95_MS``). ``--check`` exits 1 if any
+target is missed or any request fails. A 409 from an upsert counts as a
+conflict, not a failure: two editors saved the same parent.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.treegen import build  # noqa: E402
+
+PREFIX = "/api/v1"
+MIX = {
+    "children": 30, "path": 20, "navigate": 15, "next_incomplete": 8,
+    "stats": 10, "upsert": 10, "materialize": 2, "export": 2,
+}
+TARGETS_P95_MS = {
+    "children": 150,         # navigate queries
+    "path": 50,              # GET /tree/path docstring
+    "navigate": 150,
+    "next_incomplete": 150,
+    "upsert": 200,           # children upsert
+    "materialize": 1000,     # POST /tree/materialize docstring
+    "export": 2000,          # CSV export (streaming)
+}
+SAMPLE = 500
+MIGRATIONS = ("001_add_red_flag_audit.sql", "002_add_flags_namespace.sql", "003_add_dictionary_terms.sql")
+
+
+def prepare(db_path: str, legacy_db_path: str, shape: str, nodes: int, seed: int) -> Dict[str, int]:
+    """
+    Build the tree in both databases the app reads.
+
+    ``db_path`` gets the storage schema plus the migrations storage/migrate.py
+    runs on deployed databases. ``legacy_db_path`` (``LORIEN_DB``: stats and
+    navigate) gets the same nodes and outcomes under the api/db.py schema.
+    """
+    from api.db import ensure_schema
+    from storage.migrate import run_migration
+
+    counts = build(db_path, shape, nodes, seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        failed = [m for m in MIGRATIONS if not run_migration(db_path, m)]
+    if failed:
+        raise RuntimeError(f"migrations failed: {', '.join(failed)}")
+
+    conn = sqlite3.connect(legacy_db_path)
+    try:
+        ensure_schema(conn)
+        conn.execute("ATTACH DATABASE ? AS app", (db_path,))
+        conn.execute("""
+            INSERT INTO nodes (id, parent_id, label, depth, slot)
+            SELECT id, parent_id, label, depth, CASE WHEN parent_id IS NULL THEN NULL ELSE slot END
+            FROM app.nodes ORDER BY id
+        """)
+        conn.execute("""
+            INSERT INTO outcomes (node_id, diagnostic_triage, actions)
+            SELECT node_id, diagnostic_triage, actions FROM app.triage
+        """)
+        conn.commit()
+        conn.execute("DETACH DATABASE app")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return counts
+
+
+class Workload:
+    """Node ids and label paths sampled from the benchmark tree."""
+
+    def __init__(self, db_path: str, seed: int):
+        rng = random.Random(seed)
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute("SELECT id, parent_id, depth, label FROM nodes").fetchall()
+        finally:
+            conn.close()
+        nodes = {r[0]: r for r in rows}
+        self.node_ids = rng.sample(list(nodes), min(SAMPLE, len(nodes)))
+        parents = [r[0] for r in rows if r[2] < 5]
+        self.parent_ids = rng.sample(parents, min(SAMPLE, len(parents)))
+        self.label_paths: List[List[str]] = []
+        for node_id in rng.sample([r[0] for r in rows if r[2] == 5] or list(nodes), min(SAMPLE, len(nodes))):
+            path = []
+            while node_id is not None:
+                _, parent_id, _, label = nodes[node_id]
+                path.append(label)
+                node_id = parent_id
+            self.label_paths.append(path[::-1])
+
+
+def _navigate_params(rng: random.Random, workload: Workload) -> Dict[str, str]:
+    path = rng.choice(workload.label_paths)
+    path = path[:rng.randint(1, len(path))]
+    params = {"root": path[0]}
+    params.update({f"n{i}": label for i, label in enumerate(path[1:], 1)})
+    return params
+
+
+async def _request(client, op: str, rng: random.Random, workload: Workload) -> int:
+    if op == "children":
+        r = await client.get(f"{PREFIX}/tree/{rng.choice(workload.parent_ids)}/children")
+    elif op == "path":
+        r = await client.get(f"{PREFIX}/tree/path", params={"node_id": rng.choice(workload.node_ids)})
+    elif op == "navigate":
+        r = await client.get(f"{PREFIX}/tree/navigate", params=_navigate_params(rng, workload))
+    elif op == "next_incomplete":
+        r = await client.get(f"{PREFIX}/tree/next-incomplete-parent")
+    elif op == "stats":
+        r = await client.get(f"{PREFIX}/tree/stats")
+    elif op == "upsert":
+        parent_id = rng.choice(workload.parent_ids)
+        r = await client.get(f"{PREFIX}/tree/parent/{parent_id}/children")
+        if r.status_code == 200:
+            current = r.json()
+            children = [{"slot": c["slot"], "label": c["label"] or f"Load {c['slot']}"} for c in current["children"]]
+            r = await client.put(f"{PREFIX}/tree/parent/{parent_id}/children",
+                                 json={"children": children}, headers={"If-Match": current["etag"]})
+    elif op == "materialize":
+        r = await client.post(f"{PREFIX}/tree/materialize",
+                              json={"parent_ids": [rng.choice(workload.parent_ids)], "prune_safe": False})
+    elif op == "export":
+        r = await client.get(f"{PREFIX}/tree/export")
+    else:
+        raise ValueError(f"unknown operation: {op}")
+    return r.status_code
+
+
+async def run_level(client, workload: Workload, mix: Dict[str, int], concurrency: int,
+                    duration: float, seed: int) -> Dict[str, Any]:
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds."""
+    from api.metrics import PERCENTILES, Histogram
+
+    ops, weights = zip(*((op, w) for op, w in mix.items() if w > 0))
+    histograms = {op: Histogram() for op in ops}
+    conflicts = {op: 0 for op in ops}
+    errors: Dict[str, List[int]] = {op: [] for op in ops}
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            op = rng.choices(ops, weights)[0]
+            started = time.perf_counter()
+            status = await _request(client, op, rng, workload)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if status == 409:
+                conflicts[op] += 1
+            elif status >= 400:
+                errors[op].append(status)
+            histograms[op].record(elapsed_ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    routes = {}
+    for op in ops:
+        h = histograms[op]
+        summary = {"count": h.count, "requests_per_sec": round(h.count / seconds, 1)}
+        summary.update({name: round(h.percentile(q), 2) for name, q in PERCENTILES})
+        summary["max"] = round(h.max, 2)
+        summary["conflicts"] = conflicts[op]
+        summary["errors"] = len(errors[op])
+        if errors[op]:
+            summary["error_statuses"] = sorted(set(errors[op]))
+        target = TARGETS_P95_MS.get(op)
+        if target is not None:
+            summary["target_p95_ms"] = target
+            summary["meets_target"] = h.count == 0 or summary["p95"] <= target
+        routes[op] = summary
+    total = sum(h.count for h in histograms.values())
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(seconds, 2),
+        "requests_per_sec": round(total / seconds, 1),
+        "errors": sum(len(e) for e in errors.values()),
+        "conflicts": sum(conflicts.values()),
+        "routes": routes,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(workers: int, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    import httpx
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=str(Path(__file__).parent.parent), env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 30 s")
+
+
+async def run(workload: Workload, mix: Dict[str, int], levels: List[int], duration: float, seed: int,
+              url: Optional[str] = None) -> List[Dict[str, Any]]:
+    import httpx
+
+    if url is None:
+        from api.app import app
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None)
+    else:
+        limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+        client = httpx.AsyncClient(base_url=url, timeout=None, limits=limits)
+    async with client:
+        await run_level(client, workload, mix, 1, min(duration, 1.0), seed)  # warm-up
+        return [await run_level(client, workload, mix, c, duration, seed) for c in levels]
+
+
+def missed_targets(results: List[Dict[str, Any]]) -> List[str]:
+    """One line per route that missed its p95 target or returned errors."""
+    missed = []
+    for level in results:
+        for op, r in level["routes"].items():
+            if r.get("meets_target") is False:
+                missed.append(f"c={level['concurrency']} {op}: p95 {r['p95']:.0f} ms > {r['target_p95_ms']} ms")
+            if r["errors"]:
+                missed.append(f"c={level['concurrency']} {op}: {r['errors']} failed ({r['error_statuses']})")
+    return missed
+
+
+def _format(results: List[Dict[str, Any]], workers: int) -> str:
+    lines = []
+    for level in results:
+        lines.append(f"workers={workers or 'in-process'} concurrency={level['concurrency']}: "
+                     f"{level['requests_per_sec']} req/s, {level['errors']} errors, {level['conflicts']} conflicts")
+        lines.append(f"  {'route':<16}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'target':>9}")
+        for op, r in level["routes"].items():
+            target = f"{r['target_p95_ms']}{'' if r['meets_target'] else ' !'}" if "target_p95_ms" in r else "-"
+            lines.append(f"  {op:<16}{r['requests_per_sec']:>8}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}{target:>9}")
+    return "\n".join(lines)
+
+
+def _mix(value: str) -> Dict[str, int]:
+    mix = dict(MIX)
+    for item in filter(None, value.split(",")):
+        op, _, weight = item.partition("=")
+        if op not in MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation: {op}")
+        mix[op] = int(weight)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-c", "--concurrency", default="1,8,32", help="Comma-separated requests in flight")
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--workers", type=int, default=0, help="Run under uvicorn with this many workers (0: in-process)")
+    parser.add_argument("--nodes", type=lambda v: int(float(v)), default=10000, help="Tree size (1e5 works)")
+    parser.add_argument("--shape", choices=("full", "partial"), default="partial")
+    parser.add_argument("--mix", type=_mix, default=dict(MIX), help="Override weights, e.g. export=0,stats=20")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="Also write the results here")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a target is missed or a request fails")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+
+    with tempfile.TemporaryDirectory(prefix="lorien_load_") as tmp:
+        db_path, legacy_db_path = str(Path(tmp) / "app.db"), str(Path(tmp) / "legacy.db")
+        # before anything imports api: api.dependencies reads LORIEN_DB_PATH once
+        os.environ.update(LORIEN_DB_PATH=db_path, LORIEN_DB=legacy_db_path)
+        counts = prepare(db_path, legacy_db_path, args.shape, args.nodes, args.seed)
+        workload = Workload(db_path, args.seed)
+        print(f"{args.shape} tree: {counts['nodes']} nodes", file=sys.stderr)
+        if args.workers:
+            proc, url = _start_server(args.workers, dict(os.environ))
+            try:
+                results = asyncio.run(run(workload, args.mix, levels, args.duration, args.seed, url))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+        else:
+            results = asyncio.run(run(workload, args.mix, levels, args.duration, args.seed))
+
+    print(_format(results, args.workers), file=sys.stderr)
+    report = {"workers": args.workers, "shape": args.shape, **counts, "levels": results}
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(report))
+
+    missed = missed_targets(results)
+    for line in missed:
+        print(f"MISSED {line}", file=sys.stderr)
+    if args.check and missed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Requests/sec of the full API middleware stack on a trivial endpoint.
+
+Calls the ASGI app in-process (no socket, no HTTP client). By default the
+app's middleware is mounted in front of a one-route app, so the number
+measures middleware overhead alone; ``--full`` hits the real app, where
+matching against every mounted route adds its own cost.
+
+    python tools/bench_middleware.py                  # GET / for 5 s, 1 in flight
+    python tools/bench_middleware.py -c 32 -d 10      # 32 concurrent requests
+    python tools/bench_middleware.py --full
+    ANALYTICS_ENABLED=true python tools/bench_middleware.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _scope(path: str) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "server": ("bench", 80), "client": ("127.0.0.1", 1),
+        "headers": [(b"host", b"bench"), (b"user-agent", b"bench")],
+    }
+
+
+async def _one(app, path: str) -> int:
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(_scope(path), receive, send)
+    return status
+
+
+async def run(app, path: str, duration: float, concurrency: int) -> dict:
+    for _ in range(200):  # warm-up: builds the middleware stack, fills caches
+        await _one(app, path)
+    done = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            status = await _one(app, path)
+            if status != 200:
+                raise RuntimeError(f"GET {path} returned {status}")
+            done += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"path": path, "concurrency": concurrency, "requests": done,
+            "seconds": round(elapsed, 2), "requests_per_sec": round(done / elapsed, 1)}
+
+
+def isolated_app():
+    """The API's middleware stack in front of a single trivial route."""
+    from fastapi import FastAPI
+    from api.app import app as api_app
+
+    bench = FastAPI()
+    bench.user_middleware = list(api_app.user_middleware)
+
+    @bench.get("/")
+    async def trivial():
+        return {"ok": True}
+
+    return bench
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--path", default="/", help="Endpoint to hit (default: /)")
+    parser.add_argument("-d", "--duration", type=float, default=5.0, help="Seconds to run")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="Requests in flight")
+    parser.add_argument("--full", action="store_true", help="Hit the real app instead of one trivial route")
+    args = parser.parse_args()
+
+    if args.full:
+        from api.app import app
+    else:
+        app = isolated_app()
+    print(json.dumps(asyncio.run(run(app, args.path, args.duration, args.concurrency))))
+
+
+if __name__ == "__main__":
+    main()
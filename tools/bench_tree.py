@@ -0,0 +1,357 @@
+"""
+Repository benchmarks on synthetic trees, with JSON baselines and a regression gate.
+
+Builds deterministic trees with tools/treegen.py, full 5-ary and partial,
+at each requested size. Each case times the core repository operations
+against the real storage schema:
+
+    import          CSV of every complete path -> empty database (PathBulkWriter)
+    export          stream every complete path (iter_complete_path_rows)
+    stats           get_tree_stats
+    next_incomplete get_next_incomplete_parent
+    missing_slots   get_parents_with_missing_slots
+    navigate        NAVIGATE_WALKS root-to-leaf walks with get_children
+    cascade_flags   assign a red flag to the largest root and its subtree (rolled back)
+    search          search_triage_records over triage text, first 100 hits
+
+Every operation runs ``--repeat`` times; the median is what gets compared.
+
+    python tools/bench_tree.py                                  # 1e3 and 1e4, both shapes
+    python tools/bench_tree.py --sizes 1e3,1e4,1e5,1e6 --workdir /var/tmp/lorien-bench
+    python tools/bench_tree.py --save tools/bench_baselines/tree.json
+    python tools/bench_tree.py --check tools/bench_baselines/tree.json --tolerance 0.25
+
+Each run also times a fixed reference workload (SQLite inserts, an index
+build, point lookups and an aggregate, all in memory). ``--check`` scales
+the baseline by the ratio of the two reference times before comparing, so
+the committed baseline gates relative cost rather than one machine's clock.
+It exits 1 when an operation's median is slower than the scaled baseline by
+more than the tolerance, and by at least ``--floor-ms``, so sub-millisecond
+noise never fails a run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.treegen import SHAPES, build  # noqa: E402
+
+OPERATIONS = ("import", "export", "stats", "next_incomplete", "missing_slots", "navigate", "cascade_flags", "search")
+NAVIGATE_WALKS = 20
+IMPORT_COMMIT_ROWS = 5000
+REFERENCE_ROWS = 20000
+
+
+def case_name(shape: str, nodes: int) -> str:
+    return f"{shape}-{nodes:.0e}".replace("e+0", "e")
+
+
+class _Case:
+    """A built tree plus what the operations need, set up once per case."""
+
+    def __init__(self, workdir: Path, shape: str, nodes: int, seed: int):
+        from storage.sqlite import SQLiteRepository
+
+        self.workdir = workdir
+        self.db_path = workdir / f"{case_name(shape, nodes)}-s{seed}.db"
+        meta_path = self.db_path.with_suffix(".json")
+        if self.db_path.exists() and meta_path.exists():
+            self.counts = json.loads(meta_path.read_text())
+        else:
+            self.db_path.unlink(missing_ok=True)
+            self.counts = build(str(self.db_path), shape, nodes, seed)
+            meta_path.write_text(json.dumps(self.counts))
+        self.repo = SQLiteRepository(db_path=str(self.db_path))
+
+        self.paths_csv = self.db_path.with_suffix(".paths.csv")
+        if not self.paths_csv.exists():
+            from core.constants import CANON_HEADERS
+            with open(self.paths_csv, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(CANON_HEADERS)
+                writer.writerows(self.repo.iter_complete_path_rows())
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("INSERT OR IGNORE INTO red_flags (name) VALUES ('Benchmark flag')")
+            conn.commit()
+            self.flag_id = conn.execute("SELECT id FROM red_flags WHERE name = 'Benchmark flag'").fetchone()[0]
+            self.largest_root = conn.execute(
+                "SELECT parent_id FROM nodes WHERE depth = 1 GROUP BY parent_id ORDER BY COUNT(*) DESC, parent_id LIMIT 1"
+            ).fetchone()[0]
+            roots = [r[0] for r in conn.execute("SELECT id FROM nodes WHERE parent_id IS NULL ORDER BY id")]
+        finally:
+            conn.close()
+        step = max(1, len(roots) // NAVIGATE_WALKS)
+        self.walk_roots = roots[::step][:NAVIGATE_WALKS]
+
+
+def _op_import(case: _Case) -> float:
+    from core.constants import CANON_HEADERS
+    from storage.bulk_import import PathBulkWriter
+    from storage.sqlite import SQLiteRepository
+
+    target = case.workdir / "import-target.db"
+    for suffix in ("", "-wal", "-shm"):
+        Path(str(target) + suffix).unlink(missing_ok=True)
+    SQLiteRepository(db_path=str(target))
+    conn = sqlite3.connect(target)
+    try:
+        started = time.perf_counter()
+        writer = PathBulkWriter(conn)
+        with open(case.paths_csv, newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            batch: List[Dict[str, str]] = []
+            for row in reader:
+                batch.append(dict(zip(CANON_HEADERS, row)))
+                if len(batch) >= IMPORT_COMMIT_ROWS:
+                    writer.apply(batch)
+                    conn.commit()
+                    batch.clear()
+            writer.apply(batch)
+            conn.commit()
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def _op_export(case: _Case) -> float:
+    started = time.perf_counter()
+    sum(1 for _ in case.repo.iter_complete_path_rows())
+    return time.perf_counter() - started
+
+
+def _op_stats(case: _Case) -> float:
+    started = time.perf_counter()
+    case.repo.get_tree_stats()
+    return time.perf_counter() - started
+
+
+def _op_next_incomplete(case: _Case) -> float:
+    started = time.perf_counter()
+    case.repo.get_next_incomplete_parent()
+    return time.perf_counter() - started
+
+
+def _op_missing_slots(case: _Case) -> float:
+    started = time.perf_counter()
+    case.repo.get_parents_with_missing_slots()
+    return time.perf_counter() - started
+
+
+def _op_navigate(case: _Case) -> float:
+    started = time.perf_counter()
+    for root_id in case.walk_roots:
+        node_id = root_id
+        for _ in range(5):
+            children = case.repo.get_children(node_id)
+            if not children:
+                break
+            node_id = children[len(children) // 2].id
+    return time.perf_counter() - started
+
+
+def _op_cascade_flags(case: _Case) -> float:
+    conn = sqlite3.connect(case.db_path, isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        started = time.perf_counter()
+        ids = [r[0] for r in conn.execute("""
+            WITH RECURSIVE descendants(id) AS (
+                SELECT ?
+                UNION ALL
+                SELECT n.id FROM nodes n JOIN descendants d ON n.parent_id = d.id
+            )
+            SELECT id FROM descendants
+        """, (case.largest_root,))]
+        conn.executemany(
+            "INSERT OR IGNORE INTO node_red_flags (node_id, red_flag_id) VALUES (?, ?)",
+            [(node_id, case.flag_id) for node_id in ids],
+        )
+        elapsed = time.perf_counter() - started
+        conn.execute("ROLLBACK")
+        return elapsed
+    finally:
+        conn.close()
+
+
+def _op_search(case: _Case) -> float:
+    started = time.perf_counter()
+    case.repo.search_triage_records(query="Triage 7", limit=100)
+    return time.perf_counter() - started
+
+
+_RUNNERS: Dict[str, Callable[[_Case], float]] = {
+    "import": _op_import,
+    "export": _op_export,
+    "stats": _op_stats,
+    "next_incomplete": _op_next_incomplete,
+    "missing_slots": _op_missing_slots,
+    "navigate": _op_navigate,
+    "cascade_flags": _op_cascade_flags,
+    "search": _op_search,
+}
+
+
+def _reference_once() -> float:
+    conn = sqlite3.connect(":memory:")
+    try:
+        started = time.perf_counter()
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, parent INTEGER, label TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?)",
+                         ((i, i // 5, f"Label {i % 977}") for i in range(REFERENCE_ROWS)))
+        conn.execute("CREATE INDEX t_parent ON t(parent, label)")
+        for i in range(0, REFERENCE_ROWS, 10):
+            conn.execute("SELECT label FROM t WHERE parent = ? ORDER BY label", (i // 5,)).fetchall()
+        conn.execute("SELECT label, COUNT(*) FROM t GROUP BY label").fetchall()
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def reference_ms(repeat: int = 3) -> float:
+    """Fastest time of the fixed reference workload on this machine, now (min is the stablest)."""
+    _reference_once()
+    return round(min(_reference_once() * 1000 for _ in range(max(repeat, 5))), 3)
+
+
+def run_case(workdir: Path, shape: str, nodes: int, seed: int = 0, repeat: int = 3,
+             operations: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Build (or reuse) one tree and time each operation ``repeat`` times."""
+    case = _Case(workdir, shape, nodes, seed)
+    ops = {}
+    for name in operations or OPERATIONS:
+        _RUNNERS[name](case)  # warm-up: page cache, statement cache
+        runs = [_RUNNERS[name](case) * 1000 for _ in range(repeat)]
+        ops[name] = {
+            "median_ms": round(statistics.median(runs), 3),
+            "min_ms": round(min(runs), 3),
+            "runs": repeat,
+        }
+    return {"shape": shape, "target_nodes": nodes, "seed": seed, **case.counts, "ops": ops}
+
+
+def run_suite(workdir: Path, sizes: List[int], shapes: List[str], seed: int = 0, repeat: int = 3,
+              operations: Optional[List[str]] = None, log: Callable[[str], None] = lambda _: None) -> Dict[str, Any]:
+    cases = {}
+    reference = reference_ms(repeat)
+    log(f"reference workload: {reference:.1f} ms")
+    for nodes in sizes:
+        for shape in shapes:
+            name = case_name(shape, nodes)
+            log(f"{name}: building and timing ...")
+            cases[name] = run_case(workdir, shape, nodes, seed, repeat, operations)
+            log(f"{name}: " + ", ".join(f"{op} {r['median_ms']:.1f} ms" for op, r in cases[name]["ops"].items()))
+    return {
+        "version": 2,
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "reference_ms": min(reference, reference_ms(repeat)),  # before and after the cases
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "cases": cases,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.25,
+            floor_ms: float = 2.0) -> List[Dict[str, Any]]:
+    """
+    Operations whose median regressed past the baseline.
+
+    When both sides carry ``reference_ms``, each baseline median is first
+    scaled by ``current / baseline`` reference time, i.e. to what it would
+    be on this machine. A regression is a median more than ``tolerance``
+    (fraction) above that and at least ``floor_ms`` slower. Cases or
+    operations missing from either side are not compared.
+    """
+    base_ref, now_ref = baseline.get("reference_ms"), current.get("reference_ms")
+    scale = now_ref / base_ref if base_ref and now_ref else 1.0
+    regressions = []
+    for name, case in current.get("cases", {}).items():
+        base_case = baseline.get("cases", {}).get(name)
+        if base_case is None:
+            continue
+        for op, result in case["ops"].items():
+            base = base_case["ops"].get(op)
+            if base is None:
+                continue
+            was, now = round(base["median_ms"] * scale, 3), result["median_ms"]
+            if now > was * (1 + tolerance) and now - was >= floor_ms:
+                regressions.append({
+                    "case": name, "op": op, "baseline_ms": was, "current_ms": now,
+                    "ratio": round(now / was, 2) if was else None,
+                })
+    return regressions
+
+
+def _sizes(value: str) -> List[int]:
+    return [int(float(v)) for v in value.split(",") if v]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=_sizes, default=[1000, 10000], help="Comma-separated node counts (1e3,1e5 works)")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help="Comma-separated: full, partial")
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="Comma-separated subset of operations")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep generated trees here and reuse them (default: temporary)")
+    parser.add_argument("--save", metavar="JSON", help="Write the results as a baseline")
+    parser.add_argument("--check", metavar="JSON", help="Fail if slower than this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown as a fraction (default 0.25)")
+    parser.add_argument("--floor-ms", type=float, default=2.0, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    shapes = [s for s in args.shapes.split(",") if s]
+    ops = [o for o in args.ops.split(",") if o]
+    unknown = [s for s in shapes if s not in SHAPES] + [o for o in ops if o not in OPERATIONS]
+    if unknown:
+        parser.error(f"unknown shape/operation: {', '.join(unknown)}")
+
+    def log(message: str) -> None:
+        print(message, file=sys.stderr)
+
+    if args.workdir:
+        Path(args.workdir).mkdir(parents=True, exist_ok=True)
+        results = run_suite(Path(args.workdir), args.sizes, shapes, args.seed, args.repeat, ops, log)
+    else:
+        with tempfile.TemporaryDirectory(prefix="lorien_bench_") as tmp:
+            results = run_suite(Path(tmp), args.sizes, shapes, args.seed, args.repeat, ops, log)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(results, indent=2) + "\n")
+        log(f"baseline written to {args.save}")
+    print(json.dumps(results["cases"], indent=2))
+
+    if args.check:
+        baseline = json.loads(Path(args.check).read_text())
+        if baseline.get("reference_ms"):
+            log(f"reference workload {baseline['reference_ms']:.1f} ms in the baseline, "
+                f"{results['reference_ms']:.1f} ms here; baseline scaled to match")
+        regressions = compare(baseline, results, args.tolerance, args.floor_ms)
+        for r in regressions:
+            log(f"REGRESSION {r['case']} {r['op']}: {r['baseline_ms']:.1f} (scaled) -> {r['current_ms']:.1f} ms (x{r['ratio']})")
+        if regressions:
+            sys.exit(1)
+        log(f"no regressions beyond {args.tolerance:.0%} against {args.check}")
+
+
+if __name__ == "__main__":
+    main()
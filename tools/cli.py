@@ -20,10 +20,9 @@ def cmd_backup(args):
     if _ensure_sqlite3():
         os.system(f"sqlite3 '{db}' \".backup '{target}'\"")
     else:
-        # BEST EFFORT fallback: checkpoint WAL then copy
-        with sqlite3.connect(db) as conn:
-            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
-        shutil.copy2(db, target)
+        # Same online backup API through Python's sqlite3 module (WAL-safe)
+        from storage.backup import backup_database
+        backup_database(str(db), str(target))
     size = target.stat().st_size if target.exists() else 0
     print(f"[OK] Backup created: {target} ({size} bytes)")
 
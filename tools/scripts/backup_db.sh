@@ -29,11 +29,14 @@ echo -e "\033[0;32m[INFO]\033[0m Target: $TARGET"
 src_size=$(stat -c%s "$DB" 2>/dev/null || echo 0)
 echo -e "\033[0;32m[INFO]\033[0m Source file size: ${src_size} bytes"
 
-# Prefer consistent snapshot using sqlite3 .backup; fallback to cp if sqlite3 missing
+# Consistent snapshot via the SQLite backup API (sqlite3 .backup, else Python's
+# sqlite3 module); a plain cp would miss pages still in the -wal file
 if command -v sqlite3 >/dev/null 2>&1; then
   sqlite3 "$DB" ".backup '${TARGET}'"
 else
-  cp -f "$DB" "$TARGET"
+  python3 -c 'import sqlite3, sys
+src = sqlite3.connect(sys.argv[1]); dst = sqlite3.connect(sys.argv[2])
+src.backup(dst, pages=256); dst.close(); src.close()' "$DB" "$TARGET"
 fi
 
 tgt_size=$(stat -c%s "$TARGET" 2>/dev/null || echo 0)
@@ -0,0 +1,154 @@
+"""
+Deterministic synthetic decision trees for benchmarks and plan tests.
+
+Two shapes, both valid under storage/schema.sql (triggers included):
+
+- ``full``: every root has a complete 5-ary subtree down to depth 5,
+  3,906 nodes per root. The node count is rounded down to whole roots,
+  with at least one.
+- ``partial``: closer to real workbooks. A parent gets all five children
+  with probability FULL_PARENT_P, otherwise 1-4 of them in random slots.
+  A branch also stops short of depth 5 with probability STOP_P per
+  level. That leaves incomplete parents and missing slots to find.
+  Generation stops at the requested node count.
+
+Labels repeat across the tree the way clinical vocabularies do: a few
+hundred terms per depth, distinct among siblings. Most leaves at depth 5
+get a triage row. The same (shape, nodes, seed) always produces the same
+rows.
+
+    python tools/treegen.py /tmp/tree.db --shape partial --nodes 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+SHAPES = ("full", "partial")
+FULL_SUBTREE = 1 + 5 + 25 + 125 + 625 + 3125
+FULL_PARENT_P = 0.7
+STOP_P = 0.08
+TRIAGE_P = 0.8
+DEPTH_TERMS = ("Vital Measurement", "Finding", "Qualifier", "Modifier", "Context", "Outcome")
+VOCABULARY = (0, 400, 300, 200, 150, 120)  # distinct labels per depth (roots are all distinct)
+INSERT_BATCH = 10000
+
+Row = Tuple[int, Optional[int], int, int, str]  # id, parent_id, depth, slot, label
+
+
+def generate(shape: str = "partial", nodes: int = 1000, seed: int = 0) -> Iterator[Row]:
+    """Node rows in insertion order (every parent before its children)."""
+    if shape not in SHAPES:
+        raise ValueError(f"shape must be one of: {', '.join(SHAPES)}")
+    rng = random.Random(seed)
+    limit = max(1, nodes // FULL_SUBTREE) * FULL_SUBTREE if shape == "full" else nodes
+    next_id = 1
+    emitted = 0
+    root_index = 0
+    while emitted < limit:
+        root_id = next_id
+        next_id += 1
+        yield root_id, None, 0, 0, f"{DEPTH_TERMS[0]} {root_index:06d}"
+        emitted += 1
+        root_index += 1
+        stack = [(root_id, 0)]
+        while stack and emitted < limit:
+            parent_id, depth = stack.pop()
+            if depth == 5:
+                continue
+            if shape == "full" or rng.random() < FULL_PARENT_P:
+                slots = [1, 2, 3, 4, 5]
+            else:
+                slots = sorted(rng.sample(range(1, 6), rng.randint(1, 4)))
+            terms = rng.sample(range(VOCABULARY[depth + 1]), len(slots))
+            children = []
+            for slot, term in zip(slots, terms):
+                if emitted >= limit:
+                    break
+                child_id = next_id
+                next_id += 1
+                yield child_id, parent_id, depth + 1, slot, f"{DEPTH_TERMS[depth + 1]} {term}"
+                emitted += 1
+                if shape == "full" or rng.random() >= STOP_P:
+                    children.append((child_id, depth + 1))
+            stack.extend(reversed(children))
+
+
+def build(db_path: str, shape: str = "partial", nodes: int = 1000, seed: int = 0) -> Dict[str, int]:
+    """
+    Create ``db_path`` with the storage schema and fill it with a synthetic tree.
+
+    The change journal is suspended while loading, as for a restore, so
+    the database starts with an empty journal.
+
+    Returns:
+        counts of nodes, roots, leaves and triage rows written
+    """
+    from storage.sqlite import SQLiteRepository
+
+    SQLiteRepository(db_path=db_path)
+    rng = random.Random(seed + 1)
+    conn = sqlite3.connect(db_path)
+    counts = {"nodes": 0, "roots": 0, "leaves": 0, "triage": 0}
+    try:
+        conn.execute("UPDATE change_journal_state SET suspended = 1")
+        batch: List[Row] = []
+        triage: List[Tuple[int, str, str]] = []
+
+        def flush() -> None:
+            conn.executemany(
+                "INSERT INTO nodes (id, parent_id, depth, slot, label, is_leaf) VALUES (?, ?, ?, ?, ?, ?)",
+                [(i, p, d, s, label, 1 if d == 5 else 0) for i, p, d, s, label in batch],
+            )
+            conn.executemany("INSERT INTO triage (node_id, diagnostic_triage, actions) VALUES (?, ?, ?)", triage)
+            batch.clear()
+            triage.clear()
+
+        for row in generate(shape, nodes, seed):
+            batch.append(row)
+            counts["nodes"] += 1
+            if row[2] == 0:
+                counts["roots"] += 1
+            elif row[2] == 5:
+                counts["leaves"] += 1
+                if rng.random() < TRIAGE_P:
+                    triage.append((row[0], f"Triage {rng.randrange(50)}", f"Action {rng.randrange(80)}"))
+                    counts["triage"] += 1
+            if len(batch) >= INSERT_BATCH:
+                flush()
+        flush()
+        conn.execute("UPDATE change_journal_state SET suspended = 0")
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("db_path", help="Database file to create (must not exist)")
+    parser.add_argument("--shape", choices=SHAPES, default="partial")
+    parser.add_argument("--nodes", type=lambda v: int(float(v)), default=1000, help="Target node count (1e5 works)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if Path(args.db_path).exists():
+        parser.error(f"{args.db_path} already exists")
+    started = time.perf_counter()
+    counts = build(args.db_path, args.shape, args.nodes, args.seed)
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -278,7 +278,7 @@ with col1:
             with st.status("Creating backup...", expanded=False) as status:
                 status.write("📤 Initiating backup...")
                 
-                backup_result = post_json("/backup", {})
+                backup_result = post_json("/backup?wait=true", {}, timeout=600)
                 
                 status.write("✅ Backup complete!")
                 